@@ -16,12 +16,13 @@ from __future__ import absolute_import, division, print_function
 
 from builtins import range
 from builtins import object
-__all__ = ['PsiObject']
+__all__ = ['PsiObject', 'expectedEntropy']
 
 import math
 import warnings
 import random
 import sys
+import threading
 import time
 from numpy import *
 
@@ -30,7 +31,7 @@ class PsiObject(object):
 
     """Special class to handle internal array and functions of Psi adaptive psychophysical method (Kontsevich & Tyler, 1999)."""
     
-    def __init__(self, x, alpha, beta, xPrecision, aPrecision, bPrecision, delta=0, stepType='lin', TwoAFC=False, prior=None):
+    def __init__(self, x, alpha, beta, xPrecision, aPrecision, bPrecision, delta=0, stepType='lin', TwoAFC=False, prior=None, dtype=float64):
         global stats
         from scipy import stats  # takes a while to load so do it lazy
 
@@ -65,32 +66,85 @@ class PsiObject(object):
                 self._probLambda = prior
             else:
                 self._probLambda = prior.reshape(1, len(self.alpha), len(self.beta), 1)
+        # the posterior is accumulated as log probabilities, so it can't underflow
+        with errstate(divide='ignore'):
+            self._logProbLambda = log(self._probLambda)
             
         #Create P(r | lambda, x)
         if TwoAFC:
-            self._probResponseGivenLambdaX = (1-self._r) + (2*self._r-1) * ((.5 + .5 * stats.norm.cdf(self._x, self._alpha, self._beta)) * (1 - self.delta) + self.delta / 2)
+            probResponseGivenLambdaX = (1-self._r) + (2*self._r-1) * ((.5 + .5 * stats.norm.cdf(self._x, self._alpha, self._beta)) * (1 - self.delta) + self.delta / 2)
         else: # Yes/No
-            self._probResponseGivenLambdaX = (1-self._r) + (2*self._r-1) * (stats.norm.cdf(self._x, self._alpha, self._beta)*(1-self.delta)+self.delta/2)
-        
-    def update(self, response=None):
-        if response is not None:    #response should only be None when Psi is first initialized
-            self._probLambda = self._probLambdaGivenXResponse[response,:,:,self.nextIntensityIndex].reshape((1,len(self.alpha),len(self.beta),1))
-            
-        #Create P(r | x)
-        self._probResponseGivenX = sum(self._probResponseGivenLambdaX * self._probLambda, axis=(1,2)).reshape((len(self.r),1,1,len(self.x)))
-        
-        #Create P(lambda | x, r)
-        self._probLambdaGivenXResponse = self._probLambda*self._probResponseGivenLambdaX/self._probResponseGivenX
-        
-        #Create H(x, r)
-        self._entropyXResponse = -1* sum(self._probLambdaGivenXResponse * log10(self._probLambdaGivenXResponse), axis=(1,2)).reshape((len(self.r),1,1,len(self.x)))
-        
-        #Create E[H(x)]
-        self._expectedEntropyX = sum(self._entropyXResponse * self._probResponseGivenX, axis=0).reshape((1,1,1,len(self.x)))
-        
-        #Generate next intensity
-        self.nextIntensityIndex = argmin(self._expectedEntropyX, axis=3)[0][0][0]
-        self.nextIntensity = self.x[self.nextIntensityIndex]
+            probResponseGivenLambdaX = (1-self._r) + (2*self._r-1) * (stats.norm.cdf(self._x, self._alpha, self._beta)*(1-self.delta)+self.delta/2)
+        # ...stored once as a [lambda, (r, x)] table, with P*log(P) for the entropies
+        self._likelihood = ascontiguousarray(
+            probResponseGivenLambdaX.reshape(len(self.r), -1, len(self.x)).transpose(1, 0, 2).reshape(-1, len(self.r)*len(self.x)),
+            dtype=dtype)
+        self._likelihoodLogL = _xlogx(self._likelihood)
+        self._nextIntensityIndex = 0
+        self._nextThread = None
+
+    def __getstate__(self):
+        self._waitForNext()
+        return self.__dict__
+
+    def __setstate__(self, state):
+        if 'nextIntensityIndex' in state:
+            # saved by a version that kept the 4D arrays of each update
+            table = state.pop('_probResponseGivenLambdaX')
+            nR, nX = table.shape[0], table.shape[-1]
+            state['_likelihood'] = ascontiguousarray(table.reshape(nR, -1, nX).transpose(1, 0, 2).reshape(-1, nR*nX))
+            state['_likelihoodLogL'] = _xlogx(state['_likelihood'])
+            with errstate(divide='ignore'):
+                state['_logProbLambda'] = log(state['_probLambda'])
+            state['_nextIntensityIndex'] = int(state.pop('nextIntensityIndex'))
+            for name in ('nextIntensity', '_probResponseGivenX', '_probLambdaGivenXResponse', '_entropyXResponse', '_expectedEntropyX'):
+                state.pop(name, None)
+        state['_nextThread'] = None
+        self.__dict__.update(state)
+
+    def __json_decode__(self, **attrs):
+        self.__setstate__(attrs)
+
+    @property
+    def nextIntensityIndex(self):
+        self._waitForNext()
+        return self._nextIntensityIndex
+
+    @property
+    def nextIntensity(self):
+        return self.x[self.nextIntensityIndex]
+
+    def update(self, response=None, threaded=False):
+        """Update the posterior with the response to the last intensity
+        (`response` should only be None when Psi is first initialized)
+        and find the next intensity. If `threaded`, the next intensity is
+        found on a background thread, and reading it waits for that.
+        """
+        self._waitForNext()
+        if response is not None:
+            with errstate(divide='ignore'):
+                logLikelihood = log(self._likelihood[:, response*len(self.x) + self._nextIntensityIndex])
+            self._logProbLambda += logLikelihood.reshape(self._logProbLambda.shape)
+            self._logProbLambda -= self._logProbLambda.max()
+            self._probLambda = exp(self._logProbLambda)
+            self._probLambda /= self._probLambda.sum()
+
+        if threaded:
+            self._nextThread = threading.Thread(target=self._findNextIntensity)
+            self._nextThread.daemon = True
+            self._nextThread.start()
+        else:
+            self._findNextIntensity()
+
+    def _findNextIntensity(self):
+        # the intensity minimising E[H(x)]
+        entropy = expectedEntropy(self._probLambda.reshape(1, -1), self._likelihood, self._likelihoodLogL)
+        self._nextIntensityIndex = int(argmin(entropy[0]))
+
+    def _waitForNext(self):
+        if self._nextThread is not None:
+            self._nextThread.join()
+            self._nextThread = None
         
     def estimateLambda(self):
         return (sum(sum(self._alpha.reshape((len(self.alpha),1))*self._probLambda.squeeze(), axis=1)), sum(sum(self._beta.reshape((1,len(self.beta)))*self._probLambda.squeeze(), axis=1)))
@@ -107,3 +161,27 @@ class PsiObject(object):
         
     def savePosterior(self, file):
         save(file, self._probLambda)
+
+
+def _xlogx(p):
+    """p*log(p), taken to be 0 where p is 0"""
+    with errstate(divide='ignore', invalid='ignore'):
+        return where(p > 0, p*log(p), 0).astype(p.dtype)
+
+
+def expectedEntropy(probLambda, likelihood, likelihoodLogL):
+    """The expected entropy (in nats) of the posteriors after a trial at each intensity.
+
+    `probLambda` has a posterior over lambda (alpha, beta) in each row and
+    `likelihood` is P(r | lambda, x) as a [lambda, (r, x)] table (as stored
+    by PsiObject), with `likelihoodLogL` its P*log(P). Rather than forming
+    P(lambda | x, r) for every intensity and response, this uses
+    E[H(x)] = sum_r (P(r|x) log P(r|x) - sum_lambda (P(lambda) log P(lambda) P(r|lambda,x) + P(lambda) P(r|lambda,x) log P(r|lambda,x))),
+    which takes three matrix products. Returns an array of (posteriors, intensities).
+    """
+    probLambda = probLambda.astype(likelihood.dtype, copy=False)
+    probResponseGivenX = dot(probLambda, likelihood)
+    entropy = dot(_xlogx(probLambda), likelihood)
+    entropy += dot(probLambda, likelihoodLogL)
+    entropy -= _xlogx(probResponseGivenX)
+    return -entropy.reshape(len(probLambda), 2, -1).sum(axis=1)
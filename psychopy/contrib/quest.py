@@ -137,6 +137,37 @@ class QuestObject(object):
         self.dim = dim
         self.recompute()
 
+    @property
+    def pdf(self):
+        """The (unnormalized) posterior pdf, which is kept as its log in
+        'logPdf'."""
+        return num.exp(self.logPdf)
+
+    @pdf.setter
+    def pdf(self, pdf):
+        with num.errstate(divide='ignore'):
+            self.logPdf = num.log(num.asarray(pdf, dtype=float))
+
+    def __setstate__(self, state):
+        # objects saved before the pdf was kept as its log
+        if 'pdf' in state:
+            with num.errstate(divide='ignore'):
+                state['logPdf'] = num.log(state.pop('pdf'))
+                state['_logS2'] = num.log(state['s2'])
+        self.__dict__.update(state)
+
+    def __json_decode__(self, **attrs):
+        self.__setstate__(attrs)
+
+    def _relativePdf(self):
+        """The pdf scaled to a maximum of 1, for the estimates that don't
+        depend on its scale (so they work even where the pdf itself would
+        underflow)."""
+        logMax = num.max(self.logPdf)
+        if not num.isfinite(logMax):
+            return self.pdf
+        return num.exp(self.logPdf - logMax)
+
     def beta_analysis(self,stream=None):
         """Analyze the quest function with beta as a free parameter.
 
@@ -183,7 +214,8 @@ class QuestObject(object):
 
         This was converted from the Psychtoolbox's QuestMean function.
         """
-        return self.tGuess + num.sum(self.pdf*self.x)/num.sum(self.pdf)
+        pdf = self._relativePdf()
+        return self.tGuess + num.sum(pdf*self.x)/num.sum(pdf)
 
     def mode(self):
         """Mode of Quest posterior pdf.
@@ -194,8 +226,8 @@ class QuestObject(object):
 
         This was converted from the Psychtoolbox's QuestMode function.
         """
-        iMode = num.argsort(self.pdf)[-1]
-        p=self.pdf[iMode]
+        iMode = num.argsort(self.logPdf)[-1]
+        p=math.exp(self.logPdf[iMode])
         t=self.x[iMode]+self.tGuess
         return t,p
 
@@ -221,8 +253,8 @@ class QuestObject(object):
         This was converted from the Psychtoolbox's QuestPdf function.
         """
         i=int(round((t-self.tGuess)/self.grain))+1+self.dim/2
-        i=min(len(self.pdf),max(1,i))-1
-        p=self.pdf[i]
+        i=int(min(len(self.logPdf),max(1,i))-1)
+        p=math.exp(self.logPdf[i])
         return p
 
     def quantile(self,quantileOrder=None):
@@ -243,7 +275,7 @@ class QuestObject(object):
         """
         if quantileOrder is None:
             quantileOrder = self.quantileOrder
-        p = num.cumsum(self.pdf)
+        p = num.cumsum(self._relativePdf())
         if len(getinf(p[-1])[0]):
             raise RuntimeError('pdf is not finite')
         if p[-1]==0:
@@ -261,8 +293,9 @@ class QuestObject(object):
         Get the sd of the threshold distribution.
 
         This was converted from the Psychtoolbox's QuestSd function."""
-        p=num.sum(self.pdf)
-        sd=math.sqrt(num.sum(self.pdf*self.x**2)/p-(num.sum(self.pdf*self.x)/p)**2)
+        pdf=self._relativePdf()
+        p=num.sum(pdf)
+        sd=math.sqrt(num.sum(pdf*self.x**2)/p-(num.sum(pdf*self.x)/p)**2)
         return sd
 
     def simulate(self,tTest,tActual):
@@ -296,8 +329,8 @@ class QuestObject(object):
             self.gamma = 0.5
         self.i = num.arange(-self.dim/2, self.dim/2+1)
         self.x = self.i * self.grain
-        self.pdf = num.exp(-0.5*(self.x/self.tGuessSd)**2)
-        self.pdf = self.pdf/num.sum(self.pdf)
+        self.logPdf = -0.5*(self.x/self.tGuessSd)**2
+        self.logPdf = self.logPdf-num.log(num.sum(num.exp(self.logPdf)))
         i2 = num.arange(-self.dim,self.dim+1)
         self.x2 = i2*self.grain
         self.p2 = self.delta*self.gamma+(1-self.delta)*(1-(1-self.gamma)*num.exp(-10**(self.beta*self.x2)))
@@ -313,6 +346,8 @@ class QuestObject(object):
         if len(getinf(self.p2)[0]):
             raise RuntimeError('psychometric function p2 is not finite')
         self.s2 = num.array( ((1-self.p2)[::-1], self.p2[::-1]) )
+        with num.errstate(divide='ignore'):
+            self._logS2 = num.log(self.s2)
         if not hasattr(self,'intensity') or not hasattr(self,'response'):
             self.intensity = []
             self.response = []
@@ -327,27 +362,44 @@ class QuestObject(object):
         pE = 1/(1+math.exp(pE/(pL-pH)))
         self.quantileOrder=(pE-pL)/(pH-pL)
 
-        if len(getinf(self.pdf)[0]):
-            raise RuntimeError('prior pdf is not finite')
-
         # recompute the pdf from the historical record of trials
-        for intensity, response in zip(self.intensity,self.response):
-            inten = max(-1e10,min(1e10,intensity)) # make intensity finite
-            ii = len(self.pdf) + self.i-round((inten-self.tGuess)/self.grain)-1
-            if ii[0]<0:
-                ii = ii-ii[0]
-            if ii[-1]>=self.s2.shape[1]:
-                ii = ii+self.s2.shape[1]-ii[-1]-1
-            iii = ii.astype(num.int_)
-            if not num.allclose(ii,iii):
-                raise ValueError('truncation error')
-            self.pdf = self.pdf*self.s2[response,iii]
-            if self.normalizePdf and k%100==0:
-                self.pdf = self.pdf/num.sum(self.pdf) # avoid underflow; keep the pdf normalized
+        self._addTrials(self.intensity, self.response)
         if self.normalizePdf:
-            self.pdf = self.pdf/num.sum(self.pdf) # avoid underflow; keep the pdf normalized
-        if len(getinf(self.pdf)[0]):
-            raise RuntimeError('prior pdf is not finite')
+            self._normalizeLogPdf() # keep the pdf normalized
+
+    def _pdfStarts(self, intensities):
+        """The column of s2 (and _logS2) lined up with the start of the pdf
+        for each intensity, and whether it was beyond the range of the
+        table (in which case the nearest column is used)."""
+        nStarts = self.s2.shape[1]-len(self.logPdf)+1
+        intensities = num.clip(num.asarray(intensities, dtype=float), -1e10, 1e10) # make intensity finite
+        starts = len(self.logPdf)//2-num.round((intensities-self.tGuess)/self.grain).astype(num.int_)
+        outside = (starts < 0) | (starts >= nStarts)
+        return num.clip(starts, 0, nStarts-1), outside
+
+    def _addTrials(self, intensities, responses):
+        """Add the log likelihood of several trials to the pdf at once.
+
+        The trials are counted at each discretised intensity with each
+        response, so each distinct (intensity, response) adds one row of
+        _logS2 times its count."""
+        if not len(intensities):
+            return
+        starts, outside = self._pdfStarts(intensities)
+        nStarts = self.s2.shape[1]-len(self.logPdf)+1
+        responses = num.asarray(responses, dtype=num.int_)
+        counts = num.bincount(responses*nStarts+starts, minlength=self.s2.shape[0]*nStarts)
+        window = num.arange(len(self.logPdf))
+        for response in range(self.s2.shape[0]):
+            theseCounts = counts[response*nStarts:(response+1)*nStarts]
+            used = num.flatnonzero(theseCounts)
+            if len(used):
+                self.logPdf += theseCounts[used].dot(self._logS2[response, used[:, None]+window])
+        return outside
+
+    def _normalizeLogPdf(self):
+        logMax = num.max(self.logPdf)
+        self.logPdf -= logMax+num.log(num.sum(num.exp(self.logPdf-logMax)))
 
     def update(self,intensity,response):
         """Update Quest posterior pdf.
@@ -358,33 +410,50 @@ class QuestObject(object):
         true. You can always call QuestRecompute to recreate q.pdf
         from scratch from the historical record.
 
+        'intensity' and 'response' can also be sequences, to add several
+        trials at once.
+
         This was converted from the Psychtoolbox's QuestUpdate function."""
 
+        if num.ndim(intensity):
+            # several trials
+            responses = num.asarray(response)
+            if len(responses) and (responses.min() < 0 or responses.max() > self.s2.shape[0]):
+                raise RuntimeError('response %g out of range 0 to %d'%(responses.min() if responses.min() < 0 else responses.max(),self.s2.shape[0]))
+            if self.updatePdf:
+                outside = self._addTrials(intensity, responses)
+                if self.warnPdf and outside is not None and outside.any():
+                    self._warnOutOfRange(num.asarray(intensity)[outside][0])
+                if self.normalizePdf:
+                    self._normalizeLogPdf()
+            self.intensity.extend(intensity)
+            self.response.extend(response)
+            return
+
         if response < 0 or response > self.s2.shape[0]:
             raise RuntimeError('response %g out of range 0 to %d'%(response,self.s2.shape[0]))
         if self.updatePdf:
             inten = max(-1e10,min(1e10,intensity)) # make intensity finite
-            ii = len(self.pdf) + self.i-round((inten-self.tGuess)/self.grain)-1
-            if ii[0]<0 or ii[-1] > self.s2.shape[1]:
+            nPdf = len(self.logPdf)
+            start = nPdf//2-int(round((inten-self.tGuess)/self.grain))
+            if start < 0 or start > self.s2.shape[1]-nPdf:
                 if self.warnPdf:
-                    low=(1-len(self.pdf)-self.i[0])*self.grain+self.tGuess
-                    high=(self.s2.shape[1]-len(self.pdf)-self.i[-1])*self.grain+self.tGuess
-                    warnings.warn( 'intensity %.2f out of range %.2f to %.2f. Pdf will be inexact.'%(intensity,low,high),
-                                   RuntimeWarning,stacklevel=2)
-                if ii[0]<0:
-                    ii = ii-ii[0]
-                else:
-                    ii = ii+self.s2.shape[1]-ii[-1]-1
-            iii = ii.astype(num.int_)
-            if not num.allclose(ii,iii):
-                raise ValueError('truncation error')
-            self.pdf = self.pdf*self.s2[response,iii]
+                    self._warnOutOfRange(intensity)
+                start = min(max(start, 0), self.s2.shape[1]-nPdf)
+            # multiply the pdf by the likelihood of the response, in place
+            self.logPdf += self._logS2[response, start:start+nPdf]
             if self.normalizePdf:
-                self.pdf=self.pdf/num.sum(self.pdf)
+                self._normalizeLogPdf()
         # keep a historical record of the trials
         self.intensity.append(intensity)
         self.response.append(response)
 
+    def _warnOutOfRange(self, intensity):
+        low=(1-len(self.logPdf)-self.i[0])*self.grain+self.tGuess
+        high=(self.s2.shape[1]-len(self.logPdf)-self.i[-1])*self.grain+self.tGuess
+        warnings.warn( 'intensity %.2f out of range %.2f to %.2f. Pdf will be inexact.'%(intensity,low,high),
+                       RuntimeWarning,stacklevel=3)
+
 def demo():
     """Demo script for Quest routines.
 
@@ -5,7 +5,7 @@ from __future__ import absolute_import, print_function
 
 from pkg_resources import parse_version
 
-from .base import DataHandler
+from .base import DataHandler, ColumnarDataHandler
 from .experiment import ExperimentHandler
 from .trial import TrialHandler, TrialHandler2, TrialHandlerExt, TrialType
 from .staircase import (StairHandler, QuestHandler, PsiHandler,
@@ -13,11 +13,14 @@ from .staircase import (StairHandler, QuestHandler, PsiHandler,
 
 from .utils import (checkValidFilePath, isValidVariableName, importTrialTypes,
                     sliceFromString, indicesFromString, importConditions,
-                    createFactorialTrialList, bootStraps, functionFromStaircase,
-                    getDateStr)
+                    clearConditionsCache, createFactorialTrialList, bootStraps,
+                    functionFromStaircase, getDateStr)
 
 from .fit import (FitFunction, FitCumNormal, FitLogistic, FitNakaRushton,
-                  FitWeibull)
+                  FitWeibull, fitMany, bootstrapFit)
+
+from .simulation import (PsychometricObserver, StaircaseSimulation,
+                         simulateStaircases)
 
 try:
     # import openpyxl
@@ -566,3 +566,194 @@ class DataHandler(_ComparisonMixin, dict):
         # we have to repeat forcing to 'O' or text gets truncated to 4chars
         self[thisType] = np.where(dat.mask, '--', dat).astype('O')
         self.isNumeric[thisType] = False
+
+
+class _ColumnBuffer(object):
+    """Growable buffer of (position, value) pairs for one data type that
+    have been added but not yet written into that type's array.
+
+    Values are kept in a float array for as long as they are numeric and
+    in a list once a string ('string') or anything else ('object') arrives.
+    """
+
+    def __init__(self, numeric=True, capacity=32):
+        self.n = 0
+        self.positions = np.empty((capacity, 2), dtype=int)
+        self.kind = 'numeric' if numeric else 'object'
+        if numeric:
+            self.values = np.empty(capacity, dtype=float)
+            self.nNumeric = None  # values before this index are numeric
+        else:
+            self.values = []
+            self.nNumeric = 0
+
+    def append(self, position, value, isNumeric):
+        if self.n == len(self.positions):
+            # double the capacity, so appending is O(1) amortised
+            self.positions = np.concatenate([self.positions,
+                                             np.empty_like(self.positions)])
+            if self.kind == 'numeric':
+                self.values = np.concatenate([self.values,
+                                              np.empty_like(self.values)])
+        self.positions[self.n] = position
+        if self.kind == 'numeric':
+            if isNumeric:
+                self.values[self.n] = value
+                self.n += 1
+                return
+            # from here on the array will be of objects
+            self.nNumeric = self.n
+            self.values = self.values[:self.n].tolist()
+            if isinstance(value, basestring):
+                self.kind = 'string'
+            else:
+                self.kind = 'object'
+        elif self.kind == 'string' and not isinstance(value, basestring):
+            self.kind = 'object'
+        self.values.append(value)
+        self.n += 1
+
+
+class ColumnarDataHandler(DataHandler):
+    """A :class:`DataHandler` that buffers added values per data type and
+    only writes them into the (masked or object) arrays when those are
+    accessed, e.g. by saveAsText() or saveAsExcel().
+
+    Adding a value is O(1): the repetition number of each trial is tracked
+    as trials run (rather than summed from the 'ran' array) and the
+    conversion to an object array happens once per data type, when the
+    buffered values are written. Read access (`data['key']`, iteration,
+    keys(), items(), values(), copy(), repr(), pickling) always sees all the
+    values added so far.
+    """
+
+    def __init__(self, dataTypes=None, trials=None, dataShape=None):
+        self._pending = {}  # data type: _ColumnBuffer
+        self._repCounts = {}  # trial index: number of times it has run
+        DataHandler.__init__(self, dataTypes=dataTypes, trials=trials,
+                             dataShape=dataShape)
+
+    def __getitem__(self, key):
+        if key in self._pending:
+            self._flush(key)
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self[key]
+        return default
+
+    def __iter__(self):
+        # also makes dict(handler) go through __getitem__
+        self._flushAll()
+        return dict.__iter__(self)
+
+    def __repr__(self):
+        self._flushAll()
+        return dict.__repr__(self)
+
+    def keys(self):
+        self._flushAll()
+        return dict.keys(self)
+
+    def items(self):
+        self._flushAll()
+        return dict.items(self)
+
+    def values(self):
+        self._flushAll()
+        return dict.values(self)
+
+    def copy(self):
+        self._flushAll()
+        return dict.copy(self)
+
+    def __eq__(self, other):
+        self._flushAll()
+        if isinstance(other, ColumnarDataHandler):
+            other._flushAll()
+        return DataHandler.__eq__(self, other)
+
+    def __getstate__(self):
+        self._flushAll()
+        return self.__dict__
+
+    def add(self, thisType, value, position=None):
+        """Add data to an existing data type (and add a new one if necess)
+        """
+        if not thisType in self:
+            self.addDataType(thisType)
+        if position is None:
+            # 'ran' is always the first thing to update
+            index = self.trials.thisIndex
+            repN = self._repCount(index)
+            if thisType == 'ran':
+                self._repCounts[index] += value
+            else:
+                # because it has already been updated
+                repN -= 1
+            position = (index, repN)
+        elif thisType == 'ran':
+            # recount from the array next time it's needed
+            self._repCounts.pop(position[0], None)
+        position = (position[0], int(position[1]))
+        isNumeric = type(value) in [float, int]
+        if thisType not in self._pending:
+            self._pending[thisType] = _ColumnBuffer(
+                numeric=self.isNumeric[thisType])
+        self._pending[thisType].append(position, value, isNumeric)
+
+    def _repCount(self, index):
+        if index not in self._repCounts:
+            self._repCounts[index] = int(np.sum(self['ran'][index]))
+        return self._repCounts[index]
+
+    def _flushAll(self):
+        for thisType in list(self._pending):
+            self._flush(thisType)
+
+    def _flush(self, thisType):
+        """Write the buffered values of this data type into its array
+        """
+        buff = self._pending.pop(thisType)
+        positions = buff.positions[:buff.n]
+        arr = dict.__getitem__(self, thisType)
+        needed = positions.max(axis=0) + 1
+        if np.any(needed > arr.shape):
+            logging.warning('need a bigger array for: ' + thisType)
+            arr = self._extendArray(thisType, np.maximum(needed, arr.shape))
+        nNumeric = buff.n if buff.nNumeric is None else buff.nNumeric
+        if nNumeric:
+            arr[positions[:nNumeric, 0],
+                positions[:nNumeric, 1]] = buff.values[:nNumeric]
+        if nNumeric == buff.n:
+            return
+        if self.isNumeric[thisType]:
+            self._convertToObjectArray(thisType)
+            arr = dict.__getitem__(self, thisType)
+        objPositions = positions[nNumeric:]
+        objValues = buff.values[nNumeric:]
+        if buff.kind == 'string':
+            arr[objPositions[:, 0], objPositions[:, 1]] = np.array(objValues,
+                                                                   dtype='O')
+        else:
+            # lists or arrays mustn't be broadcast, so insert one by one
+            for (row, col), value in zip(objPositions.tolist(), objValues):
+                arr[row, col] = value
+
+    def _extendArray(self, thisType, newShape):
+        """Grow the array of this data type, masking the new entries
+        """
+        arr = dict.__getitem__(self, thisType)
+        slices = tuple(slice(0, n) for n in arr.shape)
+        if self.isNumeric[thisType]:
+            newArr = np.ma.zeros(newShape, arr.dtype)
+            newArr.mask = True
+            newArr[slices] = arr
+            newArr.mask[slices] = np.ma.getmaskarray(arr)
+        else:
+            newArr = np.empty(newShape, dtype='O')
+            newArr[...] = '--'
+            newArr[slices] = arr
+        dict.__setitem__(self, thisType, newArr)
+        return newArr
@@ -6,12 +6,16 @@ from __future__ import absolute_import, print_function
 # from future import standard_library
 # standard_library.install_aliases()
 from builtins import str
+import os
 import sys
 import copy
+import codecs
+import shutil
 import pickle
 import atexit
 
 from psychopy import logging
+from psychopy.constants import PY3
 from psychopy.tools.filetools import (openOutputFile, genDelimiter,
                                       genFilenameFromDelimiter)
 from .utils import checkValidFilePath
@@ -39,7 +43,9 @@ class ExperimentHandler(_ComparisonMixin):
                  savePickle=True,
                  saveWideText=True,
                  dataFileName='',
-                 autoLog=True):
+                 autoLog=True,
+                 streaming=False,
+                 keepEntries=1000):
         """
         :parameters:
 
@@ -74,6 +80,18 @@ class ExperimentHandler(_ComparisonMixin):
             saveWideText : True (default) or False
 
             autoLog : True (default) or False
+
+            streaming : True or False (default)
+                If True (and a dataFileName was given) each entry is
+                written to the data file(s) as soon as nextEntry() is
+                called, rather than all at the end of the run, so a crash
+                loses at most the current entry. When new columns appear
+                the header line of the wide-text file is rewritten (earlier
+                rows simply have empty trailing cells)
+
+            keepEntries : int or None
+                When streaming, the number of most recent entries that are
+                still kept in memory (in .entries). None keeps them all
         """
         self.loops = []
         self.loopsUnfinished = []
@@ -93,7 +111,19 @@ class ExperimentHandler(_ComparisonMixin):
         self._paramNamesSoFar = []
         self.dataNames = []  # names of all the data (eg. resp.keys)
         self.autoLog = autoLog
+        self.streaming = streaming
+        self.keepEntries = keepEntries
+        self._streamNames = []  # columns written to the stream so far
+        self._streamFile = None
+        self._streamFileName = None
+        self._streamPickle = None
+        self._streamPickleName = None
         if dataFileName in ['', None]:
+            if streaming:
+                logging.warning('ExperimentHandler created with streaming '
+                                'but no dataFileName; nothing will be '
+                                'streamed')
+                self.streaming = False
             logging.warning('ExperimentHandler created with no dataFileName'
                             ' parameter. No data will be saved in the event '
                             'of a crash')
@@ -105,6 +135,14 @@ class ExperimentHandler(_ComparisonMixin):
     def __del__(self):
         self.close()
 
+    def __getstate__(self):
+        # open output streams can't be pickled (e.g. by saveAsPickle)
+        state = self.__dict__.copy()
+        for key in ('_streamFile', '_streamPickle'):
+            if key in state:
+                state[key] = None
+        return state
+
     def addLoop(self, loopHandler):
         """Add a loop such as a :class:`~psychopy.data.TrialHandler`
         or :class:`~psychopy.data.StairHandler`
@@ -232,12 +270,131 @@ class ExperimentHandler(_ComparisonMixin):
             this.update(self.extraInfo)
         self.entries.append(this)
         self.thisEntry = {}
+        if self.streaming:
+            self._streamEntry(this)
+            # only keep a tail in memory (trimmed in chunks, so the cost of
+            # trimming is constant per entry)
+            keep = self.keepEntries
+            if keep is not None and len(self.entries) >= 2 * keep + 1:
+                del self.entries[:len(self.entries) - keep]
+
+    def _getWideTextNames(self):
+        """All the column names of the wide-text output, in order
+        """
+        names = self._getAllParamNames()
+        names.extend(self.dataNames)
+        # names from the extraInfo dictionary
+        names.extend(self._getExtraInfo()[0])
+        return names
+
+    @staticmethod
+    def _formatWideTextRow(entry, names, delim):
+        cells = []
+        for name in names:
+            if name in entry:
+                ename = str(entry[name])
+                if ',' in ename or '\n' in ename:
+                    fmt = u'"%s"%s'
+                else:
+                    fmt = u'%s%s'
+                cells.append(fmt % (entry[name], delim))
+            else:
+                cells.append(delim)
+        cells.append('\n')
+        return u''.join(cells)
+
+    def _streamEntry(self, entry, encoding='utf-8-sig'):
+        """Append a (committed) entry to the streamed output file(s)
+        """
+        if self.saveWideText:
+            delim = ','
+            if self._streamFile is None:
+                fileName = genFilenameFromDelimiter(
+                    self.dataFileName + '.csv', delim)
+                self._streamFile = openOutputFile(fileName, append=False,
+                                                  encoding=encoding)
+                self._streamFileName = self._streamFile.name
+                self._streamFile.write(u'\n')  # placeholder for the header
+            newNames = [name for name in self._getWideTextNames()
+                        if name not in self._streamNames]
+            newNames.extend(name for name in entry
+                            if name not in self._streamNames and
+                            name not in newNames)
+            if newNames:
+                # append new columns (never reorder) so that rows already
+                # written stay valid; only the header line changes
+                self._streamNames.extend(newNames)
+                self._rewriteStreamHeader(delim, encoding)
+            self._streamFile.write(
+                self._formatWideTextRow(entry, self._streamNames, delim))
+            self._streamFile.flush()
+        if self.savePickle:
+            if self._streamPickle is None:
+                self._streamPickleName = self.dataFileName + '_entries.pkl'
+                self._streamPickle = open(self._streamPickleName, 'wb')
+            pickle.dump(entry, self._streamPickle, pickle.HIGHEST_PROTOCOL)
+            self._streamPickle.flush()
+
+    def _rewriteStreamHeader(self, delim, encoding):
+        self._streamFile.close()
+        fileName = self._streamFileName
+        header = u''.join(u'%s%s' % (name, delim)
+                          for name in self._streamNames)
+        tmpName = fileName + '.tmp'
+        with codecs.open(fileName, 'r', encoding=encoding) as old:
+            with codecs.open(tmpName, 'w', encoding=encoding) as new:
+                old.readline()  # drop the previous header
+                new.write(header + u'\n')
+                shutil.copyfileobj(old, new)
+        if PY3:
+            os.replace(tmpName, fileName)
+        else:
+            os.remove(fileName)
+            os.rename(tmpName, fileName)
+        if encoding == 'utf-8-sig':
+            encoding = 'utf-8'  # don't write a second BOM when appending
+        self._streamFile = codecs.open(fileName, 'a', encoding=encoding)
+
+    def _loadStreamedEntries(self):
+        """Reads back every entry written to the streamed pickle file
+        """
+        entries = []
+        with open(self._streamPickleName, 'rb') as f:
+            while True:
+                try:
+                    entries.append(pickle.load(f))
+                except EOFError:
+                    break
+        return entries
+
+    def _closeStream(self):
+        """Write any orphan entry and close the streamed output file(s),
+        then save a .psydat containing all of the streamed entries
+        """
+        if self.thisEntry and (self.saveWideText or self.savePickle):
+            self._streamEntry(self.thisEntry)
+            self.thisEntry = {}
+        if self._streamFile is not None:
+            self._streamFile.close()
+            self._streamFile = None
+            logging.info('saved data to %r' % self._streamFileName)
+        if self._streamPickle is not None:
+            self._streamPickle.close()
+            self._streamPickle = None
+            tail = self.entries
+            self.entries = self._loadStreamedEntries()
+            self.saveAsPickle(self.dataFileName)
+            self.entries = tail
+            os.remove(self._streamPickleName)
 
     def getAllEntries(self):
         """Fetches a copy of all the entries including a final (orphan) entry
         if that exists. This allows entries to be saved even if nextEntry() is
         not yet called.
 
+        When streaming, only the entries still held in memory are returned
+        (see `keepEntries`).
+
         :return: copy (not pointer) to entries
         """
         # check for orphan final data (not committed as a complete entry)
@@ -306,10 +463,7 @@ class ExperimentHandler(_ComparisonMixin):
                            fileCollisionMethod=fileCollisionMethod,
                            encoding=encoding)
 
-        names = self._getAllParamNames()
-        names.extend(self.dataNames)
-        # names from the extraInfo dictionary
-        names.extend(self._getExtraInfo()[0])
+        names = self._getWideTextNames()
         # sort names if requested
         if sortColumns:
             names.sort()
@@ -321,17 +475,7 @@ class ExperimentHandler(_ComparisonMixin):
 
         # write the data for each entry
         for entry in self.getAllEntries():
-            for name in names:
-                if name in entry:
-                    ename = str(entry[name])
-                    if ',' in ename or '\n' in ename:
-                        fmt = u'"%s"%s'
-                    else:
-                        fmt = u'%s%s'
-                    f.write(fmt % (entry[name], delim))
-                else:
-                    f.write(delim)
-            f.write('\n')
+            f.write(self._formatWideTextRow(entry, names, delim))
         if f != sys.stdout:
             f.close()
         logging.info('saved data to %r' % f.name)
@@ -362,6 +506,12 @@ class ExperimentHandler(_ComparisonMixin):
 
         self.savePickle = False
         self.saveWideText = False
+        # stop streaming (what was already streamed stays on disk)
+        for key in ('_streamFile', '_streamPickle'):
+            stream = getattr(self, key, None)
+            if stream is not None:
+                stream.close()
+                setattr(self, key, None)
 
         origEntries = self.entries
         self.entries = self.getAllEntries()
@@ -386,10 +536,13 @@ class ExperimentHandler(_ComparisonMixin):
             if self.autoLog:
                 msg = 'Saving data for %s ExperimentHandler' % self.name
                 logging.debug(msg)
-            if self.savePickle:
-                self.saveAsPickle(self.dataFileName)
-            if self.saveWideText:
-                self.saveAsWideText(self.dataFileName + '.csv')
+            if getattr(self, 'streaming', False):
+                self._closeStream()
+            else:
+                if self.savePickle:
+                    self.saveAsPickle(self.dataFileName)
+                if self.saveWideText:
+                    self.saveAsWideText(self.dataFileName + '.csv')
         self.abort()
         self.autoLog = False
 
@@ -404,3 +557,9 @@ class ExperimentHandler(_ComparisonMixin):
         """
         self.savePickle = False
         self.saveWideText = False
+        # stop streaming (what was already streamed stays on disk)
+        for key in ('_streamFile', '_streamPickle'):
+            stream = getattr(self, key, None)
+            if stream is not None:
+                stream.close()
+                setattr(self, key, None)
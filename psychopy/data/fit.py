@@ -3,7 +3,9 @@
 
 from __future__ import absolute_import, division, print_function
 
-from builtins import object
+from builtins import object, range
+import multiprocessing
+
 import numpy as np
 # from scipy import optimize  # DON'T. It's slow and crashes on some machines
 
@@ -249,3 +251,125 @@ class FitFunction(object):
     def __init__(self, *args, **kwargs):
         raise DeprecationWarning("FitFunction is now fully DEPRECATED: use"
                                  " FitLogistic, FitWeibull etc instead")
+
+
+def _fitRows(args):
+    """Fits each row of yy (in a worker process, when fitMany uses
+    several)
+    """
+    fitClass, xx, yy, sems, guess, expectedMin, optimize_kws = args
+    nParams = fitClass._eval.__code__.co_argcount - 1
+    params = np.full((len(yy), nParams), np.nan)
+    if sems.ndim == 0:
+        sems = float(sems)
+    for rowN in range(len(yy)):
+        try:
+            fit = fitClass(xx[rowN] if xx.ndim == 2 else xx, yy[rowN],
+                           sems=sems[rowN] if np.ndim(sems) == 2 else sems,
+                           guess=guess, expectedMin=expectedMin,
+                           optimize_kws=optimize_kws)
+        except (RuntimeError, ValueError):
+            # the fit failed to converge, leave its parameters as NaN
+            continue
+        params[rowN] = fit.params
+    return params
+
+
+def fitMany(fitClass, xx, yy, sems=1.0, guess=None, expectedMin=0.5,
+            optimize_kws=None, nWorkers=1):
+    """Fit the same function to many datasets (e.g. the participants of a
+    study, or bootstrap resamples) at once.
+
+    usage::
+
+        params = fitMany(FitWeibull, contrasts, pCorrect, nWorkers=4)
+
+    where:
+        fitClass
+            the fit to use, e.g. FitWeibull or FitLogistic
+
+        xx
+            the x values, either shared by all the datasets or an array
+            with a row for each
+
+        yy
+            an array with a row for each dataset
+
+        sems
+            as for the fit, a value or row for all datasets or an array
+            with a row for each
+
+        nWorkers
+            the number of processes to spread the fits across
+
+        params
+            an array with a row of fitted parameters for each dataset (NaN
+            where the fit failed)
+    """
+    yy = np.atleast_2d(np.asarray(yy, dtype=float))
+    xx = np.asarray(xx, dtype=float)
+    sems = np.asarray(sems, dtype=float)
+    chunks = []
+    for rows in np.array_split(np.arange(len(yy)), max(nWorkers, 1)):
+        if not len(rows):
+            continue
+        chunks.append((fitClass,
+                       xx[rows] if xx.ndim == 2 else xx, yy[rows],
+                       sems[rows] if sems.ndim == 2 else sems,
+                       guess, expectedMin, optimize_kws))
+    if nWorkers > 1 and len(chunks) > 1:
+        pool = multiprocessing.Pool(len(chunks))
+        try:
+            params = pool.map(_fitRows, chunks)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        params = [_fitRows(chunk) for chunk in chunks]
+    return np.vstack(params)
+
+
+def bootstrapFit(fitClass, xx, responses, n=1000, ci=95, guess=None,
+                 expectedMin=0.5, optimize_kws=None, nWorkers=1):
+    """Bootstrap confidence intervals for the parameters of a fit.
+
+    The trials of each condition are resampled `n` times (see
+    :func:`~psychopy.data.bootStraps`) and the function fitted to the mean
+    responses of each resample (starting from the fit to the original
+    data).
+
+    usage::
+
+        params, interval = bootstrapFit(FitWeibull, contrasts, responses)
+
+    where:
+        xx
+            the x value of each condition
+
+        responses
+            an array with a row of trial responses (e.g. 0 or 1) for each
+            condition
+
+        ci
+            the size of the confidence interval, in percent
+
+        params
+            an array with the parameters fitted to each resample (NaN where
+            the fit failed)
+
+        interval
+            an array of the lower (first row) and upper bounds of the
+            confidence interval of each parameter
+    """
+    from .utils import bootStraps
+
+    responses = np.asarray(responses, dtype=float)
+    fit = fitClass(xx, responses.mean(axis=1), guess=guess,
+                   expectedMin=expectedMin, optimize_kws=optimize_kws)
+    resampledMeans = bootStraps(responses, n).mean(axis=1).T
+    params = fitMany(fitClass, xx, resampledMeans, guess=fit.params,
+                     expectedMin=expectedMin, optimize_kws=optimize_kws,
+                     nWorkers=nWorkers)
+    interval = np.nanpercentile(params, [50 - ci / 2.0, 50 + ci / 2.0],
+                                axis=0)
+    return params, interval
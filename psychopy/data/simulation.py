@@ -0,0 +1,599 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Simulation of many independent staircases at once, e.g. to choose the
+parameters of a staircase (step sizes, number of trials, priors) before
+running it on real observers.
+
+The staircases of a batch are run in lock-step, with their state held in
+arrays, so each trial of all of them is a handful of numpy operations rather
+than a call to a StairHandler, QuestHandler or PsiHandler per staircase.
+Given the same responses, `StairBatch`, `QuestBatch` and `PsiBatch` choose
+the same intensities as those handlers.
+
+usage::
+
+    from psychopy import data
+
+    observer = data.PsychometricObserver(threshold=-1.0, slope=3.5)
+    sim = data.simulateStaircases(observer, 1000, stairType='quest',
+                                  startVal=-0.5, startValSd=0.3, nTrials=40)
+    print(sim.thresholds.mean(), sim.thresholds.std())
+    # sim.estimates[trialN] gives the estimates after each trial
+"""
+from __future__ import absolute_import, division, print_function
+
+from builtins import object, range
+import copy
+import multiprocessing
+
+import numpy as np
+from scipy import special
+
+from psychopy.contrib.quest import QuestObject
+from psychopy.contrib.psi import PsiObject, expectedEntropy
+
+
+class PsychometricObserver(object):
+    """A simulated observer, responding 1 (correct / detected) with a
+    probability given by a psychometric function of the intensity::
+
+        p = guessRate + (1 - guessRate - lapseRate) * f(intensity)
+
+    where `function` (f) is one of
+
+        * 'weibull': 1 - exp(-10**(slope * (intensity - threshold))), the
+          function of QUEST, for intensities in log units
+        * 'cumNormal': the cumulative normal with mean `threshold` and
+          standard deviation `slope` (as for the PsiHandler)
+        * 'logistic': 1 / (1 + exp(-slope * (intensity - threshold)))
+
+    Each parameter can be a single value or an array with one value per
+    staircase, so a population of observers can be simulated at once.
+    Calling the observer with an array of intensities (one per staircase)
+    returns the probabilities of a 1.
+    """
+
+    def __init__(self, threshold=0.0, slope=3.5, guessRate=0.5,
+                 lapseRate=0.01, function='weibull'):
+        if function not in ('weibull', 'cumNormal', 'logistic'):
+            raise ValueError("function should be 'weibull', 'cumNormal' or "
+                             "'logistic', not %r" % function)
+        self.function = function
+        self.threshold = np.asarray(threshold, dtype=float)
+        self.slope = np.asarray(slope, dtype=float)
+        self.guessRate = np.asarray(guessRate, dtype=float)
+        self.lapseRate = np.asarray(lapseRate, dtype=float)
+
+    def __call__(self, intensities):
+        x = np.asarray(intensities, dtype=float) - self.threshold
+        if self.function == 'weibull':
+            f = 1.0 - np.exp(-10.0 ** (self.slope * x))
+        elif self.function == 'cumNormal':
+            f = special.ndtr(x / self.slope)
+        else:
+            f = special.expit(self.slope * x)
+        return self.guessRate + (1.0 - self.guessRate - self.lapseRate) * f
+
+    def inverse(self, p):
+        """The intensity at which the probability of a 1 is `p` (e.g. the
+        point a staircase should converge to).
+        """
+        f = ((p - self.guessRate) /
+             (1.0 - self.guessRate - self.lapseRate))
+        if self.function == 'weibull':
+            x = np.log10(-np.log(1.0 - f)) / self.slope
+        elif self.function == 'cumNormal':
+            x = special.ndtri(f) * self.slope
+        else:
+            x = special.logit(f) / self.slope
+        return self.threshold + x
+
+    def __getitem__(self, index):
+        """The observer of a subset of the staircases (parameters given as
+        single values are shared by all of them)
+        """
+        observer = copy.copy(self)
+        for name in ('threshold', 'slope', 'guessRate', 'lapseRate'):
+            value = getattr(self, name)
+            if value.ndim:
+                setattr(observer, name, value[index])
+        return observer
+
+
+class StairBatch(object):
+    """`nStairs` StairHandler staircases, run in lock-step.
+
+    The arguments are as for StairHandler, except that `startVal`, `minVal`
+    and `maxVal` can also be arrays with one value per staircase. The
+    staircases present `intensities` (an array with the next intensity of
+    each) and are given the responses to them with `addResponses`;
+    `finished` flags those that are done, which then ignore further
+    responses.
+    """
+
+    def __init__(self, nStairs, startVal, nReversals=None, stepSizes=4,
+                 nTrials=0, nUp=1, nDown=3, applyInitialRule=True,
+                 stepType='db', minVal=None, maxVal=None, **kwargs):
+        self.nStairs = nStairs
+        self.stepSizes = np.atleast_1d(np.asarray(stepSizes, dtype=float))
+        if nReversals is None or nReversals < len(self.stepSizes):
+            nReversals = len(self.stepSizes)
+        self.nReversals = nReversals
+        self.nTrials = nTrials
+        self.nUp = nUp
+        self.nDown = nDown
+        self.applyInitialRule = applyInitialRule
+        self.stepType = stepType
+        self.minVal = minVal
+        self.maxVal = maxVal
+
+        self.intensities = np.empty(nStairs)
+        self.intensities[:] = startVal
+        self.finished = np.zeros(nStairs, dtype=bool)
+        self.nTrialsDone = np.zeros(nStairs, dtype=int)
+        self.nReversalsDone = np.zeros(nStairs, dtype=int)
+        # the intensity of each reversal, NaN beyond nReversalsDone
+        self.reversalIntensities = np.full((nStairs, 2 * nReversals), np.nan)
+        self._lastResponse = np.full(nStairs, -1, dtype=int)
+        self._correctCounter = np.zeros(nStairs, dtype=int)
+        self._direction = np.zeros(nStairs, dtype=int)  # 0 start, -1 down
+        self._stepIndex = np.zeros(nStairs, dtype=int)
+        self._initialRule = np.zeros(nStairs, dtype=bool)
+
+    def addResponses(self, responses):
+        """Add the responses (1 or 0, or bool) of all the staircases to
+        their last intensities and calculate the next ones.
+        """
+        active = ~self.finished
+        correct = np.asarray(responses).astype(bool)
+        response = correct.astype(int)
+
+        # the counter of correct (+) or incorrect (-) responses in a row
+        same = self._lastResponse == response
+        counter = np.where(correct,
+                           np.where(same, self._correctCounter + 1, 1),
+                           np.where(same, self._correctCounter - 1, -1))
+        goDown = counter >= self.nDown
+        goUp = counter <= -self.nUp
+
+        # reversals, with a 1-down 1-up rule until the first one
+        direction = self._direction
+        initial = (self.nReversalsDone == 0) & self.applyInitialRule
+        reversal = np.where(
+            initial, np.where(correct, direction == 1, direction == -1),
+            (goDown & (direction == 1)) | (goUp & (direction == -1)))
+        reversal &= active
+        newDirection = np.where(
+            initial, np.where(correct, -1, 1),
+            np.where(goDown, -1, np.where(goUp, 1, direction)))
+        initialRule = self._initialRule | (reversal & initial)
+        self._recordReversals(reversal)
+        nReversalsDone = self.nReversalsDone
+        self.nTrialsDone += active
+        self.finished |= ((nReversalsDone >= self.nReversals) &
+                          (self.nTrialsDone >= self.nTrials))
+
+        stepIndex = np.where(
+            reversal, np.minimum(nReversalsDone, len(self.stepSizes) - 1),
+            self._stepIndex)
+        stepSize = self.stepSizes[stepIndex]
+
+        # apply the step
+        useInitial = (((nReversalsDone == 0) | initialRule) &
+                      self.applyInitialRule)
+        dec = np.where(useInitial, correct, goDown) & active
+        inc = np.where(useInitial, ~correct, goUp & ~goDown) & active
+        intensities = self.intensities
+        if self.stepType == 'db':
+            factor = 10.0 ** (stepSize / 20.0)
+        elif self.stepType == 'log':
+            factor = 10.0 ** stepSize
+        if self.stepType == 'lin':
+            lower = intensities - stepSize
+            higher = intensities + stepSize
+        else:
+            lower = intensities / factor
+            higher = intensities * factor
+        if self.minVal is not None:
+            lower = np.maximum(lower, self.minVal)
+        if self.maxVal is not None:
+            higher = np.minimum(higher, self.maxVal)
+        self.intensities = np.where(dec, lower,
+                                    np.where(inc, higher, intensities))
+
+        self._correctCounter = np.where(
+            active, np.where(dec | inc, 0, counter), self._correctCounter)
+        self._lastResponse = np.where(active, response, self._lastResponse)
+        self._direction = np.where(active, newDirection, direction)
+        self._stepIndex = stepIndex
+        self._initialRule = np.where(active, initialRule & ~useInitial,
+                                     self._initialRule)
+
+    def _recordReversals(self, reversal):
+        if not reversal.any():
+            return
+        maxReversals = self.reversalIntensities.shape[1]
+        if self.nReversalsDone.max() >= maxReversals:
+            self.reversalIntensities = np.hstack(
+                [self.reversalIntensities,
+                 np.full((self.nStairs, maxReversals), np.nan)])
+        stairs = np.flatnonzero(reversal)
+        self.reversalIntensities[stairs, self.nReversalsDone[stairs]] = \
+            self.intensities[stairs]
+        self.nReversalsDone += reversal
+
+    def estimate(self, nDiscard=None):
+        """The mean of the reversal intensities of each staircase, leaving
+        out the first `nDiscard` reversals. By default these are the
+        reversals before the last step size was reached
+        (len(stepSizes) - 1). NaN for staircases without any to average.
+        """
+        if nDiscard is None:
+            nDiscard = len(self.stepSizes) - 1
+        reversals = self.reversalIntensities[:, nDiscard:]
+        n = np.count_nonzero(~np.isnan(reversals), axis=1)
+        with np.errstate(invalid='ignore'):
+            return np.nansum(reversals, axis=1) / n
+
+
+class QuestBatch(object):
+    """`nStairs` QuestHandler staircases, run in lock-step.
+
+    The arguments are as for QuestHandler, except that `startVal`, `minVal`
+    and `maxVal` can also be arrays with one value per staircase. The
+    posterior pdfs are the rows of `pdf`, all on the same grid of
+    intensities relative to the staircases' `startVal`. Intensities beyond
+    the range of the table are treated as its limits.
+    """
+
+    def __init__(self, nStairs, startVal, startValSd, pThreshold=0.82,
+                 nTrials=None, stopInterval=None, method='quantile',
+                 beta=3.5, delta=0.01, gamma=0.5, grain=0.01, range=None,
+                 minVal=None, maxVal=None, **kwargs):
+        if method not in ('quantile', 'mean', 'mode'):
+            raise ValueError("method should be 'quantile', 'mean' or "
+                             "'mode', not %r" % method)
+        self.nStairs = nStairs
+        self.nTrials = nTrials
+        self.stopInterval = stopInterval
+        self.method = method
+        self.minVal = minVal
+        self.maxVal = maxVal
+        # the tables are relative to the starting guess, so all the
+        # staircases can share them
+        self._quest = QuestObject(0, startValSd, pThreshold, beta, delta,
+                                  gamma, grain=grain, range=range)
+        self.tGuess = np.empty(nStairs)
+        self.tGuess[:] = startVal
+        self.pdf = np.tile(self._quest.pdf, (nStairs, 1))
+
+        self.intensities = self.tGuess.copy()
+        self.finished = np.zeros(nStairs, dtype=bool)
+        self.nTrialsDone = np.zeros(nStairs, dtype=int)
+
+    def addResponses(self, responses):
+        """Add the responses (1 or 0, or bool) of all the staircases to
+        their last intensities and calculate the next ones.
+        """
+        active = ~self.finished
+        quest = self._quest
+        response = np.asarray(responses).astype(int)
+        nPdf = self.pdf.shape[1]
+        intensities = np.clip(self.intensities, -1e10, 1e10)
+        offsets = np.round((intensities - self.tGuess) / quest.grain)
+        first = np.clip(nPdf // 2 - offsets, 0, quest.s2.shape[1] - nPdf)
+        ii = first.astype(int)[:, None] + np.arange(nPdf)
+        self.pdf[active] *= quest.s2[response[:, None], ii][active]
+        # keep the pdfs normalised, to avoid underflow
+        self.pdf[active] /= self.pdf[active].sum(axis=1, keepdims=True)
+        self.nTrialsDone += active
+
+        if self.nTrials is not None:
+            self.finished |= self.nTrialsDone >= self.nTrials
+        if self.stopInterval is not None:
+            self.finished |= self.confInterval(True) < self.stopInterval
+        if self.method == 'mean':
+            nextIntensities = self.mean()
+        elif self.method == 'mode':
+            nextIntensities = self.mode()
+        else:
+            nextIntensities = self.quantile()
+        if self.minVal is not None:
+            nextIntensities = np.maximum(nextIntensities, self.minVal)
+        if self.maxVal is not None:
+            nextIntensities = np.minimum(nextIntensities, self.maxVal)
+        self.intensities = np.where(self.finished, self.intensities,
+                                    nextIntensities)
+
+    def mean(self):
+        """mean of each Quest posterior pdf
+        """
+        return self.tGuess + self.pdf.dot(self._quest.x) / self.pdf.sum(1)
+
+    def mode(self):
+        """mode of each Quest posterior pdf
+        """
+        return self.tGuess + self._quest.x[np.argmax(self.pdf, axis=1)]
+
+    def sd(self):
+        """standard deviation of each Quest posterior pdf
+        """
+        x = self._quest.x
+        total = self.pdf.sum(axis=1)
+        mean = self.pdf.dot(x) / total
+        return np.sqrt(self.pdf.dot(x ** 2) / total - mean ** 2)
+
+    def quantile(self, p=None):
+        """quantile of each Quest posterior pdf (by default the one giving
+        the most informative intensity for the next trial)
+        """
+        if p is None:
+            p = self._quest.quantileOrder
+        cdf = np.cumsum(self.pdf, axis=1)
+        target = p * cdf[:, -1]
+        rows = np.arange(self.nStairs)
+        # interpolate between the points either side of the quantile
+        above = np.clip(np.count_nonzero(cdf < target[:, None], axis=1),
+                        1, cdf.shape[1] - 1)
+        below = cdf[rows, above - 1]
+        step = cdf[rows, above] - below
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = np.where(step > 0, (target - below) / step, 0.0)
+        x = self._quest.x
+        return (self.tGuess + x[above - 1] +
+                np.clip(frac, 0, 1) * (x[above] - x[above - 1]))
+
+    def confInterval(self, getDifference=False):
+        """The 5%--95% confidence interval of each staircase, as an array
+        of (n, 2), or of its widths if `getDifference` is True
+        """
+        interval = np.column_stack([self.quantile(0.05),
+                                    self.quantile(0.95)])
+        if getDifference:
+            return np.abs(interval[:, 1] - interval[:, 0])
+        return interval
+
+    def estimate(self):
+        """The threshold estimate of each staircase (the mean of its pdf)
+        """
+        return self.mean()
+
+
+class PsiBatch(object):
+    """`nStairs` PsiHandler staircases, run in lock-step.
+
+    The arguments are as for PsiHandler (with the `prior` as an array).
+    The posterior of each staircase over the (alpha, beta) grid is in
+    `posterior`, and the next intensities are found from their expected
+    entropies (see `psychopy.contrib.psi.expectedEntropy`).
+    """
+
+    def __init__(self, nStairs, nTrials, intensRange, alphaRange, betaRange,
+                 intensPrecision, alphaPrecision, betaPrecision, delta,
+                 stepType='lin', expectedMin=0.5, prior=None, **kwargs):
+        if expectedMin not in [0, 0.5]:
+            raise NotImplementedError(
+                'Currently, only Yes/No and 2-AFC designs are '
+                'supported. Please specify either `expectedMin=0` '
+                '(Yes/No) or `expectedMin=0.5` (2-AFC).')
+        self.nStairs = nStairs
+        self.nTrials = nTrials
+        self._psi = PsiObject(
+            intensRange, alphaRange, betaRange, intensPrecision,
+            alphaPrecision, betaPrecision, delta=delta, stepType=stepType,
+            TwoAFC=expectedMin == 0.5, prior=prior)
+        nAlpha = len(self._psi.alpha)
+        nBeta = len(self._psi.beta)
+        self.intensityValues = self._psi.x
+        self.posterior = np.tile(
+            self._psi._probLambda.reshape(nAlpha, nBeta), (nStairs, 1, 1))
+
+        self.finished = np.zeros(nStairs, dtype=bool)
+        self.nTrialsDone = np.zeros(nStairs, dtype=int)
+        self._intensityIndex = np.zeros(nStairs, dtype=int)
+        self._chooseIntensities(np.ones(nStairs, dtype=bool))
+
+    def _chooseIntensities(self, stairs):
+        """Find the intensities minimising the expected entropy of the
+        posteriors of the given staircases after the next trial.
+        """
+        posterior = self.posterior[stairs].reshape(np.count_nonzero(stairs),
+                                                   -1)
+        entropy = expectedEntropy(posterior, self._psi._likelihood,
+                                  self._psi._likelihoodLogL)
+        self._intensityIndex[stairs] = np.argmin(entropy, axis=1)
+
+    @property
+    def intensities(self):
+        return self.intensityValues[self._intensityIndex]
+
+    def addResponses(self, responses):
+        """Add the responses (1 or 0, or bool) of all the staircases to
+        their last intensities and choose the next ones.
+        """
+        active = ~self.finished
+        response = np.asarray(responses).astype(int)[active]
+        nAlpha, nBeta = self.posterior.shape[1:]
+        # the columns of the [lambda, (r, x)] table for each staircase
+        columns = (response * len(self.intensityValues) +
+                   self._intensityIndex[active])
+        likelihood = self._psi._likelihood[:, columns].T
+        posterior = self.posterior[active] * likelihood.reshape(
+            -1, nAlpha, nBeta)
+        posterior /= posterior.sum(axis=(1, 2), keepdims=True)
+        self.posterior[active] = posterior
+        self.nTrialsDone += active
+        if self.nTrials is not None:
+            self.finished |= self.nTrialsDone >= self.nTrials
+        if (~self.finished).any():
+            self._chooseIntensities(~self.finished)
+
+    def estimateLambda(self):
+        """Returns arrays of the (location, slope) estimates of each
+        staircase
+        """
+        alpha = np.einsum('nab,a->n', self.posterior, self._psi.alpha)
+        beta = np.einsum('nab,b->n', self.posterior, self._psi.beta)
+        return alpha, beta
+
+    def estimateThreshold(self, thresh, lamb=None):
+        """Returns the intensity estimate of each staircase for the
+        provided probability
+        """
+        alpha, beta = self.estimateLambda() if lamb is None else lamb
+        delta = self._psi.delta
+        if self._psi._TwoAFC:
+            p = (2 * thresh - 1) / (1 - delta)
+        else:
+            p = (thresh - delta / 2) / (1 - delta)
+        return alpha + beta * special.ndtri(p)
+
+    def estimate(self):
+        """The threshold estimate of each staircase (its location
+        estimate)
+        """
+        return self.estimateLambda()[0]
+
+
+class StaircaseSimulation(object):
+    """The results of `simulateStaircases`.
+
+    `thresholds` has the final estimate of each staircase and `nTrials`
+    the number of trials it ran. The traces have a row per trial and a
+    column per staircase: `intensities` and `responses` are NaN after a
+    staircase finished and `estimates`, the estimate after each trial,
+    keeps its final value.
+    """
+
+    def __init__(self, thresholds, nTrials, intensities, responses,
+                 estimates):
+        self.thresholds = thresholds
+        self.nTrials = nTrials
+        self.intensities = intensities
+        self.responses = responses
+        self.estimates = estimates
+
+    @classmethod
+    def concatenate(cls, simulations):
+        """Combine the simulations of several batches of staircases
+        """
+        nRows = max(len(sim.intensities) for sim in simulations)
+
+        def pad(trace, fill):
+            extra = np.empty((nRows - len(trace), trace.shape[1]))
+            extra[:] = fill
+            return np.vstack([trace, extra])
+
+        return cls(
+            np.concatenate([sim.thresholds for sim in simulations]),
+            np.concatenate([sim.nTrials for sim in simulations]),
+            np.hstack([pad(sim.intensities, np.nan) for sim in simulations]),
+            np.hstack([pad(sim.responses, np.nan) for sim in simulations]),
+            np.hstack([pad(sim.estimates, sim.thresholds)
+                       for sim in simulations]))
+
+
+_batchTypes = {'simple': StairBatch, 'quest': QuestBatch, 'psi': PsiBatch}
+
+
+def _simulateBatch(args):
+    """Runs one batch of staircases to the end (in a worker process, when
+    simulateStaircases uses several)
+    """
+    stairType, observer, nStairs, maxTrials, seed, stairArgs = args
+    rng = np.random.RandomState(seed)
+    stairs = _batchTypes[stairType](nStairs, **stairArgs)
+    intensities = []
+    responses = []
+    estimates = []
+    nTrials = np.zeros(nStairs, dtype=int)
+    while not stairs.finished.all() and len(intensities) < maxTrials:
+        active = ~stairs.finished
+        thisIntensities = stairs.intensities.copy()
+        thisResponses = rng.random_sample(nStairs) < observer(thisIntensities)
+        stairs.addResponses(thisResponses)
+        nTrials += active
+        intensities.append(np.where(active, thisIntensities, np.nan))
+        responses.append(np.where(active, thisResponses, np.nan))
+        estimates.append(stairs.estimate())
+    if not intensities:
+        empty = np.empty((0, nStairs))
+        return StaircaseSimulation(stairs.estimate(), nTrials, empty, empty,
+                                   empty)
+    return StaircaseSimulation(estimates[-1], nTrials, np.array(intensities),
+                               np.array(responses), np.array(estimates))
+
+
+def simulateStaircases(observer, nStairs, stairType='simple', nWorkers=1,
+                       batchSize=100, seed=None, maxTrials=1000,
+                       **stairArgs):
+    """Simulates `nStairs` independent staircases run on an observer.
+
+    :Parameters:
+
+        observer:
+            A PsychometricObserver, or any function that takes an array of
+            intensities (one per staircase) and returns the probabilities
+            of a response of 1 to each. To give each staircase a different
+            observer, use a PsychometricObserver with arrays of parameters
+            (or an object that can be sliced in the same way).
+
+        stairType: *'simple'*, 'quest' or 'psi'
+            Simulate StairHandler, QuestHandler or PsiHandler staircases,
+            whose arguments are given as `stairArgs`.
+
+        nWorkers: *1* or an int
+            The number of processes to run batches of staircases in.
+
+        batchSize: *100* or an int
+            The number of staircases run together in each batch. The
+            batches, not the staircases, are shared between the workers.
+
+        seed: *None* or an int
+            Seeds the responses, so a simulation can be repeated exactly
+            (given the same batch size, whatever the number of workers).
+
+        maxTrials: *1000* or an int
+            The most trials to run any staircase for.
+
+    Returns a :class:`StaircaseSimulation` of the thresholds estimated by
+    the staircases and their traces over the trials.
+    """
+    if stairType not in _batchTypes:
+        raise ValueError("stairType should be 'simple', 'quest' or 'psi', "
+                         "not %r" % stairType)
+    starts = list(range(0, nStairs, batchSize))
+    if seed is None:
+        seeds = [None] * len(starts)
+    else:
+        seeds = np.random.RandomState(seed).randint(2 ** 31 - 1,
+                                                    size=len(starts))
+    batches = []
+    for start, batchSeed in zip(starts, seeds):
+        stop = min(start + batchSize, nStairs)
+        if hasattr(observer, '__getitem__'):
+            batchObserver = observer[start:stop]
+        else:
+            batchObserver = observer
+        args = dict(stairArgs)
+        for name in ('startVal', 'minVal', 'maxVal'):
+            if np.ndim(args.get(name)):
+                args[name] = np.asarray(args[name])[start:stop]
+        batches.append((stairType, batchObserver, stop - start, maxTrials,
+                        batchSeed, args))
+
+    if nWorkers > 1 and len(batches) > 1:
+        pool = multiprocessing.Pool(min(nWorkers, len(batches)))
+        try:
+            simulations = pool.map(_simulateBatch, batches)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        simulations = [_simulateBatch(batch) for batch in batches]
+    return StaircaseSimulation.concatenate(simulations)
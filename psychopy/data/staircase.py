@@ -917,6 +917,18 @@ class QuestHandler(StairHandler):
             raise AttributeError("length of intensities and results input "
                                  "must be the same")
         self.incTrials(len(intensities))
+        if (len(intensities) and self.stopInterval is None and
+                not self.finished and self.getExp() is None):
+            # none of the trials can end the staircase, so Quest can add
+            # them all at once
+            self.thisTrialN += len(intensities)
+            self.intensities.extend(intensities)
+            self.data.extend(results)
+            self._quest.update(intensities, results)
+            self._checkFinished()
+            if not self.finished:
+                self.calculateNextIntensity()
+            return
         for intensity, result in zip(intensities, results):
             try:
                 next(self)
@@ -1055,7 +1067,12 @@ class QuestHandler(StairHandler):
 class PsiObject_(PsiObject, _ComparisonMixin):
     """A PsiObject that implements the == and != operators.
     """
-    pass
+    def __eq__(self, other):
+        # compare once any next intensities being found have been
+        self._waitForNext()
+        if isinstance(other, PsiObject):
+            other._waitForNext()
+        return _ComparisonMixin.__eq__(self, other)
 
 
 class PsiHandler(StairHandler):
@@ -1106,7 +1123,9 @@ class PsiHandler(StairHandler):
                  prior=None,
                  fromFile=False,
                  extraInfo=None,
-                 name=''):
+                 name='',
+                 threaded=False,
+                 float32=False):
         """Initializes the handler and creates an internal Psi Object for
         grid approximation.
 
@@ -1179,6 +1198,20 @@ class PsiHandler(StairHandler):
                 Optional name for the PsiHandler used in PsychoPy's built-in
                 logging system.
 
+            threaded    (bool)
+                If True, the next intensity is found on a background thread
+                after each response, so with fine grids it can be computed
+                during the inter-trial interval and `next()` returns
+                without waiting (unless the interval was too short).
+                Defaults to False.
+
+            float32    (bool)
+                If True, the table of response probabilities is stored in
+                single precision, which halves its memory and speeds up the
+                search for the next intensity. Where two intensities are
+                almost equally informative, the one chosen may then differ
+                from the double precision result. Defaults to False.
+
         :Raises:
 
             NotImplementedError
@@ -1208,10 +1241,12 @@ class PsiHandler(StairHandler):
                 prior = None
 
         twoAFC = True if expectedMin == 0.5 else False
+        self.threaded = threaded
         self._psi = PsiObject_(
             intensRange, alphaRange, betaRange, intensPrecision,
             alphaPrecision, betaPrecision, delta=delta,
-            stepType=stepType, TwoAFC=twoAFC, prior=prior)
+            stepType=stepType, TwoAFC=twoAFC, prior=prior,
+            dtype=np.float32 if float32 else np.float64)
 
         self._psi.update(None)
 
@@ -1232,7 +1267,7 @@ class PsiHandler(StairHandler):
         if self.getExp() is not None:
             # update the experiment handler too
             self.getExp().addData(self.name + ".response", result)
-        self._psi.update(result)
+        self._psi.update(result, threaded=self.threaded)
 
     def __next__(self):
         """Advances to next trial and returns it.
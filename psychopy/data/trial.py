@@ -21,7 +21,7 @@ from psychopy.tools.arraytools import shuffleArray
 from psychopy.tools.filetools import (openOutputFile, genDelimiter,
                                       genFilenameFromDelimiter)
 from .utils import importConditions
-from .base import _BaseTrialHandler, DataHandler
+from .base import _BaseTrialHandler, DataHandler, ColumnarDataHandler
 
 
 class TrialType(dict):
@@ -167,7 +167,7 @@ class TrialHandler(_BaseTrialHandler):
         self.extraInfo = extraInfo
         self.seed = seed
         # create dataHandler
-        self.data = DataHandler(trials=self)
+        self.data = ColumnarDataHandler(trials=self)
         if dataTypes != None:
             self.data.addDataType(dataTypes)
         self.data.addDataType('ran')
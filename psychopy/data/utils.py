@@ -13,6 +13,7 @@ import re
 import pickle
 import time
 import codecs
+import copy
 import numpy as np
 import pandas as pd
 
@@ -168,108 +169,81 @@ def indicesFromString(indsString):
         pass
 
 
-def importConditions(fileName, returnFieldNames=False, selection=""):
-    """Imports a list of conditions from an .xlsx, .csv, or .pkl file
-
-    The output is suitable as an input to :class:`TrialHandler`
-    `trialTypes` or to :class:`MultiStairHandler` as a `conditions` list.
-
-    If `fileName` ends with:
-
-        - .csv:  import as a comma-separated-value file
-            (header + row x col)
-        - .xlsx: import as Excel 2007 (xlsx) files.
-            No support for older (.xls) is planned.
-        - .pkl:  import from a pickle file as list of lists
-            (header + row x col)
-
-    The file should contain one row per type of trial needed and one column
-    for each parameter that defines the trial type. The first row should give
-    parameter names, which should:
-
-        - be unique
-        - begin with a letter (upper or lower case)
-        - contain no spaces or other punctuation (underscores are permitted)
+# parsed conditions files, by (path, mtime, size), most recently used last
+_conditionsCache = OrderedDict()
+maxCachedConditions = 8
+_sidecarVersion = 1
 
 
-    `selection` is used to select a subset of condition indices to be used
-    It can be a list/array of indices, a python `slice` object or a string to
-    be parsed as either option.
-    e.g.:
-
-        - "1,2,4" or [1,2,4] or (1,2,4) are the same
-        - "2:5"       # 2, 3, 4 (doesn't include last whole value)
-        - "-10:2:"    # tenth from last to the last in steps of 2
-        - slice(-10, 2, None)  # the same as above
-        - random(5) * 8  # five random vals 0-8
-
+def _assertValidVarNames(fieldNames, fileName):
+    """screens a list of names as candidate variable names. if all
+    names are OK, return silently; else raise  with msg
     """
+    fileName = pathToString(fileName)
+    if not all(fieldNames):
+        msg = ('Conditions file %s: Missing parameter name(s); '
+               'empty cell(s) in the first row?')
+        raise ValueError(msg % fileName)
+    for name in fieldNames:
+        OK, msg = isValidVariableName(name)
+        if not OK:
+            # tailor message to importConditions
+            msg = msg.replace('Variables', 'Parameters (column headers)')
+            raise ValueError('Conditions file %s: %s%s"%s"' %
+                              (fileName, msg, os.linesep * 2, name))
+
+
+def _convertColumn(column):
+    """Convert a column (pandas Series) of a conditions file to a list of
+    values. Missing values become None, escaped newlines in strings are
+    replaced and strings that look like lists are evaluated. Only columns
+    holding objects (strings) need looking at value by value, and each
+    distinct list is only compiled once.
+    """
+    values = np.asarray(column)
+    converted = list(values)  # numbers are kept as numpy scalars
+    for index in np.flatnonzero(pd.isnull(values)):
+        converted[index] = None
+    if values.dtype != object:
+        return converted
+
+    indices = np.array([index for index, val in enumerate(converted)
+                        if isinstance(val, (basestring, bytes))], dtype=int)
+    if not len(indices):
+        return converted
+    strings = pd.Series(
+        [val.decode('utf-8-sig') if isinstance(val, bytes) else val
+         for val in (converted[index] for index in indices)], dtype=object)
+    strings = strings.str.replace('\\n', '\n', regex=False)
+    looksLikeList = (strings.str.startswith('[') &
+                     strings.str.endswith(']')).values
+    for index, val in zip(indices, strings.values):
+        converted[index] = val
+    compiled = {}
+    for index in indices[looksLikeList]:
+        val = converted[index]
+        if val not in compiled:
+            compiled[val] = compile(val, '<conditions>', 'eval')
+        converted[index] = eval(compiled[val])  # a new list for each row
+    return converted
+
+
+def _conditionsFromDataFrame(dataframe, fileName):
+    """Convert a pandas dataframe to a list of dicts, column by column.
+    This helper function is used by csv or excel imports via pandas
+    """
+    fieldNames = [str(name) for name in dataframe.columns]
+    _assertValidVarNames(fieldNames, fileName)
+    columns = [_convertColumn(dataframe.iloc[:, colN])
+               for colN in range(len(fieldNames))]
+    trialList = [OrderedDict(zip(fieldNames, row)) for row in zip(*columns)]
+    return trialList, fieldNames
 
-    def _assertValidVarNames(fieldNames, fileName):
-        """screens a list of names as candidate variable names. if all
-        names are OK, return silently; else raise  with msg
-        """
-        fileName = pathToString(fileName)
-        if not all(fieldNames):
-            msg = ('Conditions file %s: Missing parameter name(s); '
-                   'empty cell(s) in the first row?')
-            raise ValueError(msg % fileName)
-        for name in fieldNames:
-            OK, msg = isValidVariableName(name)
-            if not OK:
-                # tailor message to importConditions
-                msg = msg.replace('Variables', 'Parameters (column headers)')
-                raise ValueError('Conditions file %s: %s%s"%s"' %
-                                  (fileName, msg, os.linesep * 2, name))
-
-    if fileName in ['None', 'none', None]:
-        if returnFieldNames:
-            return [], []
-        return []
-    if not os.path.isfile(fileName):
-        msg = 'Conditions file not found: %s'
-        raise ValueError(msg % os.path.abspath(fileName))
-
-    def pandasToDictList(dataframe):
-        """Convert a pandas dataframe to a list of dicts.
-        This helper function is used by csv or excel imports via pandas
-        """
-        # convert the resulting dataframe to a numpy recarray
-        trialsArr = dataframe.to_records(index=False)
-        # Check for new line characters in strings, and replace escaped characters
-        for record in trialsArr:
-            for idx, element in enumerate(record):
-                if isinstance(element, str):
-                    record[idx] = element.replace('\\n', '\n')
-        if trialsArr.shape == ():
-            # convert 0-D to 1-D with one element:
-            trialsArr = trialsArr[np.newaxis]
-        fieldNames = list(trialsArr.dtype.names)
-        _assertValidVarNames(fieldNames, fileName)
-
-        # convert the record array into a list of dicts
-        trialList = []
-        for trialN, trialType in enumerate(trialsArr):
-            thisTrial = OrderedDict()
-            for fieldN, fieldName in enumerate(fieldNames):
-                val = trialsArr[trialN][fieldN]
-
-                if isinstance(val, basestring):
-                    if val.startswith('[') and val.endswith(']'):
-                        # val = eval('%s' %unicode(val.decode('utf8')))
-                        val = eval(val)
-                elif type(val) == np.string_:
-                    val = str(val.decode('utf-8-sig'))
-                    # if it looks like a list, convert it:
-                    if val.startswith('[') and val.endswith(']'):
-                        # val = eval('%s' %unicode(val.decode('utf8')))
-                        val = eval(val)
-                elif np.isnan(val):
-                    val = None
-                thisTrial[fieldName] = val
-            trialList.append(thisTrial)
-        return trialList, fieldNames
 
+def _readConditionsFile(fileName):
+    """Read all the conditions of a file (see `importConditions`), returning
+    (trialList, fieldNames)
+    """
     if fileName.endswith('.csv') or (fileName.endswith(('.xlsx','.xls','.xlsm'))
                                      and haveXlrd):
         if fileName.endswith('.csv'):
@@ -282,8 +256,7 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
         unnamed = trialsArr.columns.to_series().str.contains('^Unnamed: ')
         trialsArr = trialsArr.loc[:, ~unnamed]  # clear unnamed cols
         logging.debug(u"Clearing unnamed columns from {}".format(fileName))
-        trialList, fieldNames = pandasToDictList(trialsArr)
-
+        trialList, fieldNames = _conditionsFromDataFrame(trialsArr, fileName)
     elif fileName.endswith(('.xlsx','.xlsm')):
         if not haveOpenpyxl:
             raise ImportError('openpyxl or xlrd is required for loading excel '
@@ -367,6 +340,161 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
     else:
         raise IOError('Your conditions file should be an '
                       'xlsx, csv or pkl file')
+    return trialList, fieldNames
+
+
+def _sidecarPath(fileName):
+    """The path of the binary copy of a parsed conditions file"""
+    return fileName + '.cache'
+
+
+def _readSidecar(fileName, stamp):
+    """Returns (trialList, fieldNames) from the sidecar of `fileName` if it
+    was written for this version of the file (`stamp` being its (mtime,
+    size)), or None
+    """
+    path = _sidecarPath(fileName)
+    if not os.path.isfile(path):
+        return None
+    try:
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+    except Exception:
+        logging.warning(u"Could not read conditions cache {}".format(path))
+        return None
+    if (not isinstance(saved, dict) or
+            saved.get('version') != _sidecarVersion or
+            saved.get('stamp') != stamp):
+        return None  # out of date
+    logging.debug(u"Read conditions from cache {}".format(path))
+    return saved['trialList'], saved['fieldNames']
+
+
+def _writeSidecar(fileName, stamp, trialList, fieldNames):
+    """Save the parsed conditions next to `fileName`, so that they can be
+    loaded without parsing the file again. Failing to (e.g. in a read-only
+    folder) is only logged.
+    """
+    path = _sidecarPath(fileName)
+    tmpPath = path + '.tmp'
+    saved = {'version': _sidecarVersion, 'stamp': stamp,
+             'trialList': trialList, 'fieldNames': fieldNames}
+    try:
+        with open(tmpPath, 'wb') as f:
+            pickle.dump(saved, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if os.path.isfile(path):
+            os.remove(path)
+        os.rename(tmpPath, path)
+    except Exception:
+        logging.warning(u"Could not write conditions cache {}".format(path))
+        if os.path.isfile(tmpPath):
+            os.remove(tmpPath)
+
+
+def _loadConditions(fileName, useCache=True, sidecar=False):
+    """Returns (trialList, fieldNames) of all the conditions in a file,
+    parsed by `_readConditionsFile` or, if the file hasn't changed since, from
+    the in-memory cache or the sidecar. The result is shared with the cache
+    so must not be modified.
+    """
+    info = os.stat(fileName)
+    stamp = (info.st_mtime, info.st_size)
+    key = (os.path.abspath(fileName),) + stamp
+    if useCache and key in _conditionsCache:
+        conditions = _conditionsCache.pop(key)
+        _conditionsCache[key] = conditions  # most recently used
+        return conditions
+
+    conditions = None
+    if sidecar:
+        conditions = _readSidecar(fileName, stamp)
+    if conditions is None:
+        conditions = _readConditionsFile(fileName)
+        if sidecar:
+            _writeSidecar(fileName, stamp, *conditions)
+
+    if useCache:
+        _conditionsCache[key] = conditions
+        while len(_conditionsCache) > maxCachedConditions:
+            _conditionsCache.popitem(last=False)
+    return conditions
+
+
+def _copyCondition(condition):
+    """A copy of a cached condition, with copies of its list values so
+    that they can be modified without changing the cache
+    """
+    condition = condition.copy()
+    for name, value in list(condition.items()):
+        if isinstance(value, list):
+            condition[name] = copy.deepcopy(value)
+    return condition
+
+
+def clearConditionsCache():
+    """Forget the conditions files loaded by `importConditions` (sidecar
+    files are left where they are).
+    """
+    _conditionsCache.clear()
+
+
+def importConditions(fileName, returnFieldNames=False, selection="",
+                     useCache=True, sidecar=False):
+    """Imports a list of conditions from an .xlsx, .csv, or .pkl file
+
+    The output is suitable as an input to :class:`TrialHandler`
+    `trialTypes` or to :class:`MultiStairHandler` as a `conditions` list.
+
+    If `fileName` ends with:
+
+        - .csv:  import as a comma-separated-value file
+            (header + row x col)
+        - .xlsx: import as Excel 2007 (xlsx) files.
+            No support for older (.xls) is planned.
+        - .pkl:  import from a pickle file as list of lists
+            (header + row x col)
+
+    The file should contain one row per type of trial needed and one column
+    for each parameter that defines the trial type. The first row should give
+    parameter names, which should:
+
+        - be unique
+        - begin with a letter (upper or lower case)
+        - contain no spaces or other punctuation (underscores are permitted)
+
+
+    `selection` is used to select a subset of condition indices to be used
+    It can be a list/array of indices, a python `slice` object or a string to
+    be parsed as either option.
+    e.g.:
+
+        - "1,2,4" or [1,2,4] or (1,2,4) are the same
+        - "2:5"       # 2, 3, 4 (doesn't include last whole value)
+        - "-10:2:"    # tenth from last to the last in steps of 2
+        - slice(-10, 2, None)  # the same as above
+        - random(5) * 8  # five random vals 0-8
+
+    Parsed files are kept in memory (the last `maxCachedConditions` of
+    them) and reused by later calls for as long as the file isn't modified,
+    so loading the same file again, e.g. with a different `selection`, is
+    quick. Each call returns new dicts (and lists, for values that are
+    lists). Set `useCache=False` to always read the file.
+
+    With `sidecar=True` the parsed conditions are also saved next to the
+    file (as `fileName + '.cache'`, a pickle) and loaded from there by
+    later sessions, until the file is modified.
+
+    """
+    if fileName in ['None', 'none', None]:
+        if returnFieldNames:
+            return [], []
+        return []
+    if not os.path.isfile(fileName):
+        msg = 'Conditions file not found: %s'
+        raise ValueError(msg % os.path.abspath(fileName))
+
+    allConds, fieldNames = _loadConditions(fileName, useCache, sidecar)
+    fieldNames = list(fieldNames)
 
     # if we have a selection then try to parse it
     if isinstance(selection, basestring) and len(selection) > 0:
@@ -381,12 +509,18 @@ def importConditions(fileName, returnFieldNames=False, selection=""):
 
     # the selection might now be a slice or a series of indices
     if isinstance(selection, slice):
-        trialList = trialList[selection]
+        trialList = allConds[selection]
     elif len(selection) > 0:
-        allConds = trialList
         trialList = []
         for ii in selection:
             trialList.append(allConds[int(round(ii))])
+    else:
+        trialList = allConds
+    if useCache:
+        # copies, as the parsed conditions are shared with the cache
+        trialList = [_copyCondition(thisTrial) for thisTrial in trialList]
+    else:
+        trialList = list(trialList)
 
     logging.exp('Imported %s as conditions, %d conditions, %d params' %
                 (fileName, len(trialList), len(fieldNames)))
@@ -453,7 +587,8 @@ def createFactorialTrialList(factors):
 def bootStraps(dat, n=1):
     """Create a list of n bootstrapped resamples of the data
 
-    SLOW IMPLEMENTATION (Python for-loop)
+    The trials of all the conditions and resamples are drawn together, so
+    thousands of resamples are quick to make.
 
     Usage:
         ``out = bootStraps(dat, n=1)``
@@ -476,16 +611,9 @@ def bootStraps(dat, n=1):
         # adds a dimension (arraynow has shape (1,Ntrials))
         dat = np.array([dat])
 
-    nTrials = dat.shape[1]
-    # initialise a matrix to store output
-    resamples = np.zeros(dat.shape + (n,), dat.dtype)
-    rand = np.random.rand
-    for stimulusN in range(dat.shape[0]):
-        thisStim = dat[stimulusN, :]  # fetch data for this stimulus
-        for sampleN in range(n):
-            indices = np.floor(nTrials * rand(nTrials)).astype('i')
-            resamples[stimulusN, :, sampleN] = np.take(thisStim, indices)
-    return resamples
+    nConditions, nTrials = dat.shape
+    indices = np.random.randint(nTrials, size=(nConditions, nTrials, n))
+    return dat[np.arange(nConditions)[:, None, None], indices]
 
 
 def functionFromStaircase(intensities, responses, bins=10):
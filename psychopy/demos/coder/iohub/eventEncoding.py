@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Compares the time taken to send ioHub events to the experiment process
+as one list per event (the default), with sending them as one binary
+structured array per event type (io.getEvents(as_type='array')).
+
+Runs without starting the ioHub Server: the events are made up, and only
+packing on the server side and unpacking on the experiment side are timed.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import timeit
+
+import msgpack
+from psychopy.iohub.devices.keyboard import KeyboardPressEvent
+from psychopy.iohub.net import packEventArrays, unpackEventArrays
+
+EVENT_COUNTS = 10, 100, 1000, 10000
+REPEATS = 20
+
+
+def makeEvents(n):
+    events = []
+    for i in range(n):
+        t = i * 0.001
+        events.append([0, 0, 0, i, KeyboardPressEvent.EVENT_TYPE_ID, t, t, t,
+                       0.0, 0.0, 0, 0, 30, 65, 97, b'a', 0, 0, b'a', 0.0, 0])
+    return events
+
+
+def dtypeLookup(event_type):
+    return KeyboardPressEvent.NUMPY_DTYPE
+
+
+def sendLists(events):
+    data = msgpack.packb(('GET_EVENTS_RESULT', events))
+    events = msgpack.unpackb(data)[1]
+    # what getEvents(as_type='namedtuple') does with each event
+    return [KeyboardPressEvent.createEventAsNamedTuple(e) for e in events]
+
+
+def sendArrays(events):
+    data = msgpack.packb(('GET_EVENT_ARRAYS_RESULT',
+                          packEventArrays(events, dtype_lookup=dtypeLookup)))
+    return unpackEventArrays(msgpack.unpackb(data)[1], dtypeLookup)
+
+
+print('%8s %12s %12s %8s' % ('events', 'lists (ms)', 'arrays (ms)',
+                             'speedup'))
+for n in EVENT_COUNTS:
+    events = makeEvents(n)
+    tLists = min(timeit.repeat(lambda: sendLists(events), number=1,
+                               repeat=REPEATS))
+    tArrays = min(timeit.repeat(lambda: sendArrays(events), number=1,
+                                repeat=REPEATS))
+    print('%8d %12.3f %12.3f %8.1f' % (n, tLists * 1000, tArrays * 1000,
+                                       tLists / tArrays))
+
+# The contents of this file are in the public domain.
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+How long does it take to update the dots of a DotStim on each frame?
+
+This times the dot update alone (no window is opened and nothing is
+drawn) for fields with different numbers of dots, coherences and shapes,
+so you can check the update fits comfortably within a frame at your
+monitor's refresh rate (e.g. 6.9 ms at 144 Hz) before adding drawing.
+"""
+
+from __future__ import division
+from __future__ import print_function
+
+from psychopy.tools.dottools import benchmarkDots
+
+refreshRate = 144.0
+for nFields in [1, 4]:
+    print("\n%i field(s) updated together" % nFields)
+    print("shape    coherence  nDots   median(ms)  max(ms)")
+    for row in benchmarkDots(nDots=[1000, 5000, 20000],
+                             coherence=[0.1, 0.5, 1.0],
+                             fieldShape=['sqr', 'circle'],
+                             nFields=nFields, nFrames=300):
+        print("%-8s %-10.1f %-7i %-11.3f %.3f" % (
+            row['fieldShape'], row['coherence'], row['nDots'],
+            row['medianMs'], row['maxMs']))
+print("\n(one frame at %i Hz is %.1f ms)" % (refreshRate, 1000 / refreshRate))
+
+# The contents of this file are in the public domain.
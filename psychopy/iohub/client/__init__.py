@@ -25,7 +25,7 @@ from ..lazy_import import lazy_import
 from .. import _pkgroot, IOHUB_DIRECTORY
 from ..util import yload, yLoader
 from ..errors import print2err, ioHubError, printExceptionDetailsToStdErr
-from ..util import isIterable, updateDict, win32MessagePump
+from ..util import isIterable, updateDict, win32MessagePump, takeEvents
 from ..devices import DeviceEvent, import_device
 from ..devices.computer import Computer
 from ..devices.experiment import MessageEvent, LogEvent
@@ -284,6 +284,12 @@ class ioHubConnection(object):
         self._iohub_server_config = None
         self._shutdown_attempted = False
         self._cv_order = None
+        # shared memory ring buffer that events are read from when the
+        # config has event_transport: shared_memory
+        self._event_ring_buffer = None
+        # {device id: device name}, used to filter events by device
+        # when they are read from shared memory
+        self._event_device_names = None
 
         self.iohub_status = self._startServer(ioHubConfig, ioHubConfigAbsPath)
         if self.iohub_status != 'OK':
@@ -322,7 +328,9 @@ class ioHubConnection(object):
         """
         return self.devices.getDevice(deviceName)
 
-    def getEvents(self, device_label=None, as_type='namedtuple'):
+    def getEvents(self, device_label=None, as_type='namedtuple',
+                  event_types=None, start_time=None, end_time=None,
+                  max_count=None):
         """Retrieve any events that have been collected by the ioHub Process
         from monitored devices since the last call to getEvents() or
         clearEvents().
@@ -338,6 +346,20 @@ class ioHubConnection(object):
         providing a valid device name as the device_label argument will
         result in only events from that device being returned.
 
+        When the ioHub config sets 'event_transport: shared_memory', events
+        for all devices are read from a shared memory buffer that the ioHub
+        Server writes to, instead of being requested over UDP.
+
+        The event_types, start_time, end_time and max_count arguments query
+        the *Global Event Buffer* instead: only the events matching them
+        (and device_label, if given) are removed from the buffer and sent to
+        the experiment process, all other events are kept for later calls.
+        For example, to get up to 10 key presses and leave any eye tracker
+        samples in the buffer::
+
+            kb_presses = io.getEvents('keyboard', max_count=10,
+                event_types=[EventConstants.KEYBOARD_PRESS])
+
         Events can be received in one of several object types by providing the
         optional as_type property to the method. Valid values for as_type are
         the following str values:
@@ -347,6 +369,12 @@ class ioHubConnection(object):
             * 'dict': Each event converted to a dict object.
             * 'object': Each event is converted to a DeviceEvent subclass
                         based on the event's type.
+            * 'array': A dict of {event type id: numpy record array}, with
+                       one record per event, using the event class's
+                       NUMPY_DTYPE. String attributes are bytes. Events
+                       are sent by the ioHub Server as one binary buffer
+                       per event type, which is much faster than the other
+                       types for large numbers of events.
 
         Args:
             device_label (str): Name of device to retrieve events for.
@@ -355,12 +383,36 @@ class ioHubConnection(object):
 
             as_type (str): Returned event object type. Default: 'namedtuple'.
 
+            event_types (list): Event type ids of the events to retrieve.
+
+            start_time (float): Only retrieve events with a hub time at or
+                                after start_time.
+
+            end_time (float): Only retrieve events with a hub time at or
+                              before end_time.
+
+            max_count (int): Retrieve at most the max_count oldest matching
+                             events.
+
         Returns:
             tuple: List of event objects; object type controlled by 'as_type'.
         """
         r = None
-        if device_label is None:
-            events = self._sendToHubServer(('GET_EVENTS',))[1]
+        if isinstance(event_types, int):
+            event_types = [event_types, ]
+        query = (event_types is not None or start_time is not None or
+                 end_time is not None or max_count is not None)
+        if as_type == 'array':
+            return self._getEventArrays(device_label, query, event_types,
+                                        start_time, end_time, max_count)
+        if query:
+            r = self._queryEvents(device_label, event_types, start_time,
+                                  end_time, max_count)
+        elif device_label is None:
+            if self._event_ring_buffer is not None:
+                events = self._event_ring_buffer.read()
+            else:
+                events = self._sendToHubServer(('GET_EVENTS',))[1]
             if events is None:
                 r = self.allEvents
             else:
@@ -388,6 +440,60 @@ class ioHubConnection(object):
 
         return []
 
+    def _queryDevices(self, device_label):
+        if device_label is None:
+            return None
+        return [self.devices.getDevice(device_label).getName(), ]
+
+    def _getEventArrays(self, device_label, query, event_types, start_time,
+                        end_time, max_count):
+        from ..net import eventArrays, unpackEventArrays
+        # events kept client side by wait() or a filtered query, and device
+        # buffer events, are lists that get grouped into arrays here
+        if not self.allEvents:
+            if self._event_ring_buffer is None:
+                if device_label is None or query:
+                    packed = self._sendToHubServer(
+                        ('GET_EVENTS', self._queryDevices(device_label),
+                         event_types, start_time, end_time, max_count,
+                         True))[1]
+                    return unpackEventArrays(packed)
+            elif device_label is None and not query:
+                return self._event_ring_buffer.readArrays()
+        events = self.getEvents(device_label, 'list', event_types,
+                                start_time, end_time, max_count)
+        return eventArrays(events, DeviceEvent.EVENT_TYPE_ID_INDEX)
+
+    def _queryEvents(self, device_label, event_types, start_time, end_time,
+                     max_count):
+        devices = self._queryDevices(device_label)
+        if self._event_ring_buffer is None:
+            events = self._sendToHubServer(
+                ('GET_EVENTS', devices, event_types, start_time, end_time,
+                 max_count, False))[1]
+            return events or []
+
+        # all events are already in shared memory; filter them here and
+        # keep the others in allEvents for the next getEvents() call.
+        self.allEvents.extend(self._event_ring_buffer.read())
+        device_ids = None
+        if devices is not None:
+            if self._event_device_names is None:
+                names = self._sendToHubServer(
+                    ('RPC', 'getEventDeviceNames'))[2]
+                self._event_device_names = dict(
+                    (device_id,
+                     name.decode('utf-8') if isinstance(name, bytes) else name)
+                    for device_id, name in names)
+            device_ids = [device_id for device_id, name
+                          in self._event_device_names.items()
+                          if name in devices]
+        r, self.allEvents = takeEvents(
+            self.allEvents, event_types, start_time, end_time, max_count,
+            DeviceEvent.EVENT_TYPE_ID_INDEX, DeviceEvent.EVENT_HUB_TIME_INDEX,
+            device_ids, DeviceEvent.DEVICE_ID_INDEX)
+        return r
+
     def clearEvents(self, device_label='all'):
         """Clears unread events from the ioHub Server's Event Buffer(s)
         so that unneeded events are not discarded.
@@ -414,6 +520,8 @@ class ioHubConnection(object):
         if device_label.lower() == 'all':
             self.allEvents = []
             self._sendToHubServer(('RPC', 'clearEventBuffer', [True, ]))
+            if self._event_ring_buffer is not None:
+                self._event_ring_buffer.discard()
             try:
                 self.getDevice('keyboard')._clearLocalEvents()
             except:
@@ -421,6 +529,8 @@ class ioHubConnection(object):
         elif device_label in [None, '', False]:
             self.allEvents = []
             self._sendToHubServer(('RPC', 'clearEventBuffer', [False, ]))
+            if self._event_ring_buffer is not None:
+                self._event_ring_buffer.discard()
             try:
                 self.getDevice('keyboard')._clearLocalEvents()
             except:
@@ -793,6 +903,23 @@ class ioHubConnection(object):
         r = self._sendToHubServer(('RPC', 'flushIODataStoreFile'))
         return r
 
+    def getDataStoreWriteStats(self):
+        """Get statistics about how events are being written to the
+        ioDataStore file.
+
+        Args:
+            None
+
+        Returns:
+            dict: with keys 'events_written', 'write_rate' (average events
+            written / sec), 'backlog' (events waiting in the write buffers)
+            and 'tables' (the same stats for each event table), or None if
+            the ioDataStore is not enabled.
+
+        """
+        r = self._sendToHubServer(('RPC', 'getDataStoreWriteStats'))
+        return r[2]
+
     def startCustomTasklet(self, task_name, task_class_path, **class_kwargs):
         """
         Instruct the iohub server to start running a custom tasklet given
@@ -898,6 +1025,19 @@ class ioHubConnection(object):
 
         self._iohub_server_config = ioHubConfig
 
+        # >>>>> Create shared memory event buffer, if requested. It must
+        # exist before the ioHub Server starts, which attaches to it.
+        if self._iohub_server_config.get('event_transport',
+                                         'udp') == 'shared_memory':
+            from ..shmem import SharedEventRingBuffer, eventBufferName
+            self._event_ring_buffer = SharedEventRingBuffer(
+                eventBufferName(Computer.current_process.pid), create=True,
+                slot_count=self._iohub_server_config.get(
+                    'shared_memory_event_slots', 8192),
+                slot_size=self._iohub_server_config.get(
+                    'shared_memory_event_slot_size', 512))
+        # <<<<< Done creating shared memory event buffer
+
         # >>>>> Create open UDP port to ioHub Server
 
         server_udp_port = self._iohub_server_config.get('udp_port', 9000)
@@ -1262,6 +1402,9 @@ class ioHubConnection(object):
                 printExceptionDetailsToStdErr()
             finally:
                 ioHubConnection.ACTIVE_CONNECTION = None
+                if self._event_ring_buffer is not None:
+                    self._event_ring_buffer.close()
+                    self._event_ring_buffer = None
                 self._server_process = None
                 Computer.iohub_process_id = None
                 Computer.iohub_process = None
@@ -14,6 +14,7 @@ from builtins import object
 from pkg_resources import parse_version
 from ..server import DeviceEvent
 from ..constants import EventConstants
+from ..devices import Computer
 from ..errors import ioHubError, printExceptionDetailsToStdErr, print2err
 
 
@@ -65,6 +66,56 @@ FILE_VERSION = '0.8.1.1'
 SCHEMA_AUTHORS = 'Sol Simpson'
 SCHEMA_MODIFIED_DATE = 'November 24th, 2016'
 
+getTime = Computer.getTime
+
+
+class EventTableWriteBuffer(object):
+    """Write-behind buffer for one event table.
+
+    Events are copied into a preallocated numpy structured array (using the
+    table's dtype) and appended to the table in bulk once the buffer is
+    full, or once the oldest buffered event has waited max_interval sec.
+    """
+    def __init__(self, etable, dtype, size=256, max_interval=0.25):
+        self.table = etable
+        self.size = max(int(size), 1)
+        self.max_interval = max_interval
+        self._array = np.zeros(self.size, dtype=dtype)
+        self._count = 0
+        self._first_buffered_time = None
+        self.events_written = 0
+        self.write_count = 0
+
+    @property
+    def backlog(self):
+        return self._count
+
+    def add(self, event):
+        """Buffer one event (an event list). Returns the number of events
+        written to the table as a result (0 if none were)."""
+        if self._count == 0:
+            self._first_buffered_time = getTime()
+        self._array[self._count] = tuple(event)
+        self._count += 1
+        if self._count >= self.size:
+            return self.write()
+        return 0
+
+    def isStale(self, ctime):
+        return (self._count > 0 and self.max_interval is not None and
+                ctime - self._first_buffered_time >= self.max_interval)
+
+    def write(self):
+        """Append all buffered events to the table."""
+        count = self._count
+        if count:
+            self.table.append(self._array[:count])
+            self._count = 0
+            self._first_buffered_time = None
+            self.events_written += count
+            self.write_count += 1
+        return count
+
 
 class DataStoreFile(object):
     def __init__(self, fileName, folderPath, fmode='a', iohub_settings=None):
@@ -83,6 +134,13 @@ class DataStoreFile(object):
         self.flushCounter = self.settings.get('flush_interval', 32)
         self._eventCounter = 0
 
+        # per event table write-behind buffers, see EventTableWriteBuffer
+        self.writeBufferSize = self.settings.get('write_buffer_size', 256)
+        self.writeBufferInterval = self.settings.get('write_buffer_interval',
+                                                     0.25)
+        self._writeBuffers = dict()
+        self._writeStartTime = getTime()
+
         self.TABLES = dict()
         self._eventGroupMappings = dict()
         self.emrtFile = open_file(self.filePath, mode=fmode)
@@ -372,19 +430,32 @@ class DataStoreFile(object):
                 return True
             return False
 
+    def _getWriteBuffer(self, eventClass):
+        table_label = eventClass.IOHUB_DATA_TABLE
+        wbuffer = self._writeBuffers.get(table_label)
+        if wbuffer is None:
+            wbuffer = EventTableWriteBuffer(self.TABLES[table_label],
+                                            eventClass.NUMPY_DTYPE,
+                                            self.writeBufferSize,
+                                            self.writeBufferInterval)
+            self._writeBuffers[table_label] = wbuffer
+        return wbuffer
+
+    def _bufferEvent(self, event):
+        etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
+        eventClass = EventConstants.getClass(etype)
+        event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX] = self.active_experiment_id
+        event[DeviceEvent.EVENT_SESSION_ID_INDEX] = self.active_session_id
+        return self._getWriteBuffer(eventClass).add(event)
+
     def _handleEvent(self, event):
         try:
             if self.checkForExperimentAndSessionIDs(event) is False:
                 return False
-            etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
-            eventClass = EventConstants.getClass(etype)
-            etable = self.TABLES[eventClass.IOHUB_DATA_TABLE]
-            event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX] = self.active_experiment_id
-            event[DeviceEvent.EVENT_SESSION_ID_INDEX] = self.active_session_id
-
-            np_array = np.array([tuple(event), ], dtype=eventClass.NUMPY_DTYPE)
-            etable.append(np_array)
-            self.bufferedFlush()
+            written = self._bufferEvent(event)
+            written += self.writeStaleBuffers()
+            if written:
+                self.bufferedFlush(written)
         except Exception:
             print2err("Error saving event: ", event)
             printExceptionDetailsToStdErr()
@@ -393,27 +464,63 @@ class DataStoreFile(object):
         try:
             if self.checkForExperimentAndSessionIDs(len(events)) is False:
                 return False
-
-            event = events[0]
-
-            etype = event[DeviceEvent.EVENT_TYPE_ID_INDEX]
-            eventClass = EventConstants.getClass(etype)
-            etable = self.TABLES[eventClass.IOHUB_DATA_TABLE]
-
-            np_events = []
+            # events can be for different tables; each goes to the
+            # write buffer of its own table
+            written = 0
             for event in events:
-                event[DeviceEvent.EVENT_EXPERIMENT_ID_INDEX] = self.active_experiment_id
-                event[DeviceEvent.EVENT_SESSION_ID_INDEX] = self.active_session_id
-                np_events.append(tuple(event))
-
-            np_array = np.array(np_events, dtype=eventClass.NUMPY_DTYPE)
-            etable.append(np_array)
-            self.bufferedFlush(len(np_events))
+                written += self._bufferEvent(event)
+            written += self.writeStaleBuffers()
+            if written:
+                self.bufferedFlush(written)
         except ioHubError as e:
             print2err(e)
         except Exception:
             printExceptionDetailsToStdErr()
 
+    def writeStaleBuffers(self):
+        """Write the buffered events of any table whose oldest buffered event
+        has been waiting longer than write_buffer_interval.
+        Returns the number of events written."""
+        written = 0
+        if self._writeBuffers:
+            ctime = getTime()
+            for wbuffer in self._writeBuffers.values():
+                if wbuffer.isStale(ctime):
+                    written += wbuffer.write()
+        return written
+
+    def writeBufferedEvents(self):
+        """Append all buffered events to their tables (without flushing the
+        file). Returns the number of events written."""
+        written = 0
+        for wbuffer in self._writeBuffers.values():
+            try:
+                written += wbuffer.write()
+            except Exception:
+                printExceptionDetailsToStdErr()
+        return written
+
+    def getWriteStats(self):
+        """Returns a dict with the number of events written to the file,
+        the average write rate (events / sec) since the file was opened,
+        and the number of events waiting in the write buffers (backlog),
+        in total and for each event table."""
+        written = 0
+        backlog = 0
+        tables_stats = dict()
+        for table_label, wbuffer in self._writeBuffers.items():
+            written += wbuffer.events_written
+            backlog += wbuffer.backlog
+            tables_stats[table_label] = dict(events_written=wbuffer.events_written,
+                                             table_writes=wbuffer.write_count,
+                                             backlog=wbuffer.backlog)
+        duration = getTime() - self._writeStartTime
+        rate = 0.0
+        if duration > 0:
+            rate = written / duration
+        return dict(events_written=written, write_rate=rate,
+                    backlog=backlog, tables=tables_stats)
+
     def bufferedFlush(self,eventCount=1):
         """
         If flushCounter threshold is >=0 then do some checks. If it is < 0,
@@ -434,6 +541,7 @@ class DataStoreFile(object):
     def flush(self):
         try:
             if self.emrtFile:
+                self.writeBufferedEvents()
                 self.emrtFile.flush()
         except tables.ClosedFileError:
             pass
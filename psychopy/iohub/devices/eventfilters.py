@@ -142,9 +142,13 @@ class MovingWindowFilter(object):
     value is added to the MovingWindow using MovingWindow.add.
     None is returned until the MovingWindow is full.
 
+    MovingWindow.add_many adds a batch of values (or events) at once, giving
+    the same results as calling add for each of them, but filtering all
+    windows of the batch in one numpy operation.
+
     The base class implements a moving window averaging filter, no weights.
     To change the filter used, extend this class and replace the filteredValue
-    method.
+    method, and the filteredValues method used by add_many.
 
     """
 
@@ -193,6 +197,17 @@ class MovingWindowFilter(object):
         """
         return self._filtering_buffer.mean()
 
+    def filteredValues(self, values, windows):
+        """Returns the filtered value of each window of a batch, as
+        filteredValue() would for a window holding the same values.
+
+        values is the 1D array of all values of the batch, including the
+        values already in the window before the batch was added. windows is
+        a 2D, read only view of values, with one row per full window.
+
+        """
+        return windows.mean(axis=1)
+
     def add(self, event):
         """Add the given iohub event ( in list form ) to the moving window. The
         value of the specified event attribute when the filter was created is
@@ -217,6 +232,68 @@ class MovingWindowFilter(object):
             if self.isFull():
                 return None, self.filteredValue()
 
+    def add_many(self, events):
+        """Add a batch of iohub events (in list form), or a 1D array of
+        values, to the moving window.
+
+        Returns (filtered_events, filtered_values): the events and filtered
+        values that add() would have returned for each of the given events,
+        leaving out the calls that would have returned None because the
+        window was not full yet. filtered_events is None when values were
+        given instead of events.
+
+        """
+        if type(self).add is not MovingWindowFilter.add:
+            # filters with their own add() are run one event at a time
+            results = [r for r in (self.add(e) for e in events) if r]
+            if not results:
+                return None, np.empty(0)
+            filtered_events, filtered_values = zip(*results)
+            if filtered_events[0] is None:
+                return None, np.asarray(filtered_values)
+            return list(filtered_events), np.asarray(filtered_values)
+
+        fbuffer = self._filtering_buffer
+        length = fbuffer.max_size
+        with_events = len(events) and isinstance(events[0], (list, tuple))
+        if with_events:
+            field = self._event_field_index
+            new_values = [e[field] for e in events]
+        else:
+            new_values = events
+        new_values = np.asarray(new_values, dtype=fbuffer._dtype)
+
+        # values still in the window from earlier adds come first
+        prior_count = min(len(fbuffer), length - 1)
+        if prior_count:
+            values = np.concatenate((fbuffer[-prior_count:], new_values))
+        else:
+            values = new_values
+        window_count = len(values) - length + 1
+
+        for v in new_values[-length:]:
+            fbuffer.append(v)
+        filtered_events = None
+        if with_events:
+            all_events = list(self._events)[-prior_count:] if prior_count \
+                else []
+            all_events.extend(events)
+            self._events.extend(events[-length:])
+        if window_count <= 0:
+            return filtered_events, np.empty(0, dtype=fbuffer._dtype)
+
+        windows = np.lib.stride_tricks.as_strided(
+            values, shape=(window_count, length),
+            strides=(values.strides[0], values.strides[0]), writeable=False)
+        filtered_values = self.filteredValues(values, windows)
+        if with_events:
+            active = self._active_index
+            filtered_events = all_events[active:active + window_count]
+            if self._inplace:
+                for e, v in zip(filtered_events, filtered_values.tolist()):
+                    e[field] = v
+        return filtered_events, filtered_values
+
     def isFull(self):
         return self._filtering_buffer.isFull()
 
@@ -242,6 +319,9 @@ class PassThroughFilter(MovingWindowFilter):
     def filteredValue(self):
         return self._filtering_buffer[0]
 
+    def filteredValues(self, values, windows):
+        return windows[:, 0].copy()
+
 # ------
 
 
@@ -258,6 +338,9 @@ class MedianFilter(MovingWindowFilter):
     def filteredValue(self):
         return np.median(self._filtering_buffer.getElements())
 
+    def filteredValues(self, values, windows):
+        return np.median(windows, axis=1)
+
 # ------
 
 
@@ -285,6 +368,11 @@ class WeightedAverageFilter(MovingWindowFilter):
             self._weights,
             'valid')
 
+    def filteredValues(self, values, windows):
+        # each 'valid' output of convolving the whole batch is the value of
+        # one window
+        return np.convolve(values, self._weights, 'valid')
+
 
 # ------
 
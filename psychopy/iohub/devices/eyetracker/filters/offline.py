@@ -0,0 +1,386 @@
+# Part of the psychopy.iohub library.
+# Copyright (C) 2012-2016 iSolver Software Solutions
+# Distributed under the terms of the GNU General Public License (GPL).
+"""
+ioHub Eye Tracker Offline Sample Event Parser
+
+Re-parses the eye samples saved in an ioHub DataStore (HDF5) file into
+fixation, saccade and blink events, for example to try different velocity
+filter or adaptive velocity threshold settings on archived sessions.
+
+EyeTrackerEventBatchParser runs the same steps as the online
+EyeTrackerEventParser (binocular averaging, interpolation of missing data,
+position and velocity filtering, adaptive velocity thresholds and sample
+categorisation), but over whole numpy arrays of samples instead of one
+sample at a time. parseDataStoreFile reads the samples of each session in
+chunks, parses the sessions in a pool of processes, and writes the new
+events to the file's eye tracker event tables.
+
+Example::
+
+    from psychopy.iohub.devices.eyetracker.filters.offline import \\
+        parseDataStoreFile
+
+    parser_kwargs = dict(
+        sampling_rate=1000,
+        adaptive_vel_thresh_history=2.0,
+        position_filter=dict(name='MedianFilter', length=3,
+                             knot_pos='center'),
+        display_device=dict(mm_size=dict(width=500, height=280),
+                            pixel_res=(1920, 1080), eye_distance=550))
+    event_counts = parseDataStoreFile('events.hdf5', parser_kwargs)
+
+Events created by the batch parser have the event_id of the sample they
+start or end at (online, the ioHub Server gives them new event ids), and
+their filter_id set to the parser's filter_id. Writing them first removes any events of the same
+session that have this filter_id, so a session can be re-parsed as often as
+needed without touching the events reported by the eye tracker itself.
+"""
+from __future__ import division, absolute_import
+
+import copy
+import multiprocessing
+
+import numpy as np
+from numpy.lib.stride_tricks import as_strided
+
+from ....constants import EventConstants
+from ... import DeviceEvent
+from .. import eye_events
+from .parser import EyeTrackerEventParser, MONOCULAR_EYE_SAMPLE, LEFT_EYE
+
+EYETRACKER_EVENTS_GROUP = '/data_collection/events/eyetracker'
+
+_SAMPLE_CLASSES = (eye_events.BinocularEyeSampleEvent,
+                   eye_events.MonocularEyeSampleEvent)
+_PARSED_EVENT_CLASSES = (eye_events.FixationStartEvent,
+                         eye_events.FixationEndEvent,
+                         eye_events.SaccadeStartEvent,
+                         eye_events.SaccadeEndEvent,
+                         eye_events.BlinkStartEvent,
+                         eye_events.BlinkEndEvent)
+
+FIX, SAC, MIS = 0, 1, 2
+
+
+def _addEyeEventClassMappings():
+    event_classes = _SAMPLE_CLASSES + _PARSED_EVENT_CLASSES
+    EventConstants.addClassMappings(
+        [c.EVENT_TYPE_ID for c in event_classes],
+        dict((c.__name__, c) for c in event_classes))
+
+
+def _iterativeThresholds(windows):
+    # EyeTrackerEventParser.addVelocityToAdaptiveThreshold for each row of
+    # windows at once; rows stop being updated once they have converged.
+    thresholds = windows.min(axis=1) + windows.std(axis=1) * 3.0
+    below = windows < thresholds[:, np.newaxis]
+    active = np.arange(len(windows))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        while len(active):
+            w = windows[active]
+            mask = below[active]
+            count = mask.sum(axis=1)
+            mean = np.where(mask, w, 0.0).sum(axis=1) / count
+            var = np.where(mask, (w - mean[:, np.newaxis]) ** 2,
+                           0.0).sum(axis=1) / count
+            new = mean + 3.0 * np.sqrt(var)
+            below[active] = w < new[:, np.newaxis]
+            converged = ~(np.abs(new - thresholds[active]) >= 1.0)
+            thresholds[active] = new
+            active = active[~converged]
+    return thresholds
+
+
+def adaptiveVelocityThresholds(velocity, history_length, chunk_size=256):
+    """Returns the adaptive velocity threshold of each sample for one
+    velocity component, as EyeTrackerEventParser.addVelocityToAdaptiveThreshold
+    calculates it sample by sample: from the last history_length velocities
+    greater than 0. Samples without a velocity greater than 0, and those
+    seen before the history is full, get NaN.
+
+    Thresholds are calculated for chunk_size samples at a time.
+    """
+    velocity = np.asarray(velocity, dtype=np.float64)
+    thresholds = np.empty(len(velocity))
+    thresholds.fill(np.nan)
+    positive = np.flatnonzero(velocity > 0.0)
+    if len(positive) <= history_length:
+        return thresholds
+    values = np.ascontiguousarray(velocity[positive])
+    step = values.strides[0]
+    # the history of the n-th positive velocity is values[n - length + 1:n + 1]
+    windows = as_strided(values,
+                         shape=(len(values) - history_length + 1,
+                                history_length),
+                         strides=(step, step), writeable=False)[1:]
+    results = np.empty(len(windows))
+    for start in range(0, len(windows), chunk_size):
+        results[start:start + chunk_size] = _iterativeThresholds(
+            windows[start:start + chunk_size])
+    thresholds[positive[history_length:]] = results
+    return thresholds
+
+
+class EyeTrackerEventBatchParser(EyeTrackerEventParser):
+    """Parses whole arrays of eye samples into eye events, using the same
+    kwargs and classification as EyeTrackerEventParser.
+    """
+    def __init__(self, **kwargs):
+        _addEyeEventClassMappings()
+        EyeTrackerEventParser.__init__(self, **kwargs)
+        self.sample_type = MONOCULAR_EYE_SAMPLE
+        self.io_sample_class = eye_events.MonocularEyeSampleEvent
+        self.io_event_fields = self.io_sample_class.CLASS_ATTRIBUTE_NAMES
+        self.io_event_ix = self.io_event_fields.index
+        self.history_length = len(self.adaptive_x_vthresh_buffer)
+        self._start_event_methods = {
+            FIX: self.createFixationStartEventArray,
+            SAC: self.createSaccadeStartEventArray,
+            MIS: self.createBlinkStartEventArray}
+        self._end_event_methods = {
+            FIX: self.createFixationEndEventArray,
+            SAC: self.createSaccadeEndEventArray,
+            MIS: self.createBlinkEndEventArray}
+
+    def monoSampleArray(self, samples):
+        """Returns (mono, valid) for a structured array of binocular or
+        monocular eye samples. mono is a 2D float array with one column per
+        MonocularEyeSampleEvent attribute; binocular samples are averaged
+        as by EyeTrackerEventParser._convertToMonoAveraged. valid is True
+        for samples that have eye position data.
+        """
+        names = samples.dtype.names
+        status = samples['status']
+        mono = np.zeros((len(samples), len(self.io_event_fields)))
+        for i, field in enumerate(self.io_event_fields):
+            if field in names:
+                mono[:, i] = samples[field]
+            elif field == 'eye':
+                mono[:, i] = LEFT_EYE
+            elif field.endswith('_type'):
+                mono[:, i] = samples['left_%s' % field]
+            else:
+                left = samples['left_%s' % field].astype(np.float64)
+                right = samples['right_%s' % field].astype(np.float64)
+                mono[:, i] = np.where(status == 0, (left + right) / 2.0,
+                                      np.where(status == 20, right, left))
+        if 'left_gaze_x' in names:
+            mono[:, self.io_event_ix('type')] = MONOCULAR_EYE_SAMPLE
+            valid = status != 22
+        else:
+            valid = status == 0
+        return mono, valid
+
+    def _filterFields(self, mono):
+        ix = self.io_event_ix
+        field_filters = ((self.x_position_filter, ix('angle_x')),
+                         (self.y_position_filter, ix('angle_y')),
+                         (self.x_velocity_filter, ix('velocity_x')),
+                         (self.y_velocity_filter, ix('velocity_y')),
+                         (self.xy_velocity_filter, ix('velocity_xy')))
+        for field_filter, column in field_filters:
+            _junk, filtered = field_filter.add_many(mono[:, column])
+            first = field_filter._active_index
+            mono[first:first + len(filtered), column] = filtered
+        # the samples returned by the last filter are the ones parsed
+        return (self.xy_velocity_filter._active_index, len(filtered),
+                self.xy_velocity_filter._filtering_buffer.max_size)
+
+    def parseSamples(self, samples):
+        """Parses a structured array of the eye samples of one session
+        (rows of a BinocularEyeSampleEvent or MonocularEyeSampleEvent
+        table, in time order). Returns a dict of
+        {event type id: list of events}, each event a list of event
+        attribute values.
+        """
+        self.reset()
+        ix = self.io_event_ix
+        mono, valid = self.monoSampleArray(samples)
+        valid_rows = np.flatnonzero(valid)
+        if len(valid_rows) == 0:
+            return dict()
+        # missing data before the first valid sample is discarded, missing
+        # data after the last one is never interpolated
+        mono = mono[valid_rows[0]:valid_rows[-1] + 1]
+        valid = valid[valid_rows[0]:valid_rows[-1] + 1]
+        valid_rows = valid_rows - valid_rows[0]
+
+        ax, ay = ix('angle_x'), ix('angle_y')
+        mono[valid, ax], mono[valid, ay] = self.pix2deg(
+            mono[valid, ix('gaze_x')], mono[valid, ix('gaze_y')])
+        invalid_rows = np.flatnonzero(~valid)
+        if len(invalid_rows):
+            for column in (ax, ay, ix('pupil_measure1')):
+                mono[invalid_rows, column] = np.interp(
+                    invalid_rows, valid_rows, mono[valid_rows, column])
+
+        vx, vy = ix('velocity_x'), ix('velocity_y')
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dt = np.diff(mono[:, ix('time')])
+            mono[1:, vx] = np.abs(np.diff(mono[:, ax])) / dt
+            mono[1:, vy] = np.abs(np.diff(mono[:, ay])) / dt
+            mono[1:, ix('velocity_xy')] = np.hypot(mono[1:, vx],
+                                                   mono[1:, vy])
+
+        first, count, length = self._filterFields(mono)
+        samples = mono[first:first + count]
+        # online, a sample's thresholds are only calculated if the sample
+        # added to the filters when it was returned (length - 1 - first
+        # samples later) was a valid one.
+        lag = length - 1 - first
+        updated = valid[first + lag:first + lag + count]
+        valid = valid[first:first + count]
+        for column, vcolumn in ((ix('raw_x'), vx), (ix('raw_y'), vy)):
+            samples[updated, column] = adaptiveVelocityThresholds(
+                samples[updated, vcolumn], self.history_length)
+
+        with np.errstate(invalid='ignore'):
+            saccade = ((samples[:, vx] >= samples[:, ix('raw_x')]) |
+                       (samples[:, vy] >= samples[:, ix('raw_y')]))
+        category = np.where(valid, np.where(saccade, SAC, FIX), MIS)
+        return self.createEyeEventsFromCategories(samples, category)
+
+    def createEyeEventsFromCategories(self, samples, category):
+        """Creates the start and end events of each run of samples with the
+        same category, as EyeTrackerEventParser.parseEvent does when the
+        category changes. The first run has no start event, so no events
+        are created for it, and the last run is not ended.
+        """
+        changes = np.flatnonzero(category[1:] != category[:-1]) + 1
+        starts = np.concatenate(([0], changes)).tolist()
+        ends = (np.concatenate((changes, [len(category)])) - 1).tolist()
+        filter_id_index = DeviceEvent.EVENT_FILTER_ID_INDEX
+        events = dict()
+        for run in range(1, len(starts)):
+            new_events = []
+            if run > 1:
+                start, end = starts[run - 1], ends[run - 1]
+                new_events.append(self._end_event_methods[
+                    category[start]](samples[end], samples[start],
+                                     samples[start:end + 1]))
+            new_events.append(self._start_event_methods[
+                category[starts[run]]](samples[starts[run]]))
+            for event in new_events:
+                event[filter_id_index] = self.filter_id
+                events.setdefault(event[DeviceEvent.EVENT_TYPE_ID_INDEX],
+                                  []).append(event)
+        return events
+
+
+def _sampleTable(hubfile):
+    group = hubfile.get_node(EYETRACKER_EVENTS_GROUP)
+    for sample_class in _SAMPLE_CLASSES:
+        name = sample_class.__name__
+        if name in group and group._f_get_child(name).nrows:
+            return group._f_get_child(name)
+    raise ValueError('%s has no eye sample data.' % hubfile.filename)
+
+
+def _readSessionSamples(table, session_id, chunk_size):
+    rows = table.get_where_list('session_id == %d' % session_id)
+    chunks = [table.read_coordinates(rows[i:i + chunk_size])
+              for i in range(0, len(rows), chunk_size)]
+    if not chunks:
+        return np.empty(0, dtype=table.dtype)
+    return np.concatenate(chunks)
+
+
+def _parseSession(args):
+    from ....datastore.util import open_file
+    file_path, session_id, parser_kwargs, chunk_size = args
+    hubfile = open_file(file_path, 'r')
+    try:
+        samples = _readSessionSamples(_sampleTable(hubfile), session_id,
+                                      chunk_size)
+    finally:
+        hubfile.close()
+    parser = EyeTrackerEventBatchParser(**copy.deepcopy(parser_kwargs))
+    events = parser.parseSamples(samples)
+    arrays = dict()
+    for event_class in _PARSED_EVENT_CLASSES:
+        class_events = events.get(event_class.EVENT_TYPE_ID, [])
+        arrays[event_class.__name__] = np.array(
+            [tuple(e) for e in class_events], dtype=event_class.NUMPY_DTYPE)
+    return session_id, parser.filter_id, arrays
+
+
+def _writeSessionEvents(hubfile, session_id, filter_id, arrays):
+    group = hubfile.get_node(EYETRACKER_EVENTS_GROUP)
+    counts = dict()
+    for event_class in _PARSED_EVENT_CLASSES:
+        name = event_class.__name__
+        if name in group:
+            table = group._f_get_child(name)
+        else:
+            table = hubfile.create_table(group, name,
+                                         event_class.NUMPY_DTYPE,
+                                         title='EyeTracker Data')
+        # remove the events of an earlier batch parse of the session
+        old_rows = table.get_where_list(
+            '(session_id == %d) & (filter_id == %d)' % (session_id,
+                                                        filter_id))
+        if len(old_rows):
+            breaks = np.flatnonzero(np.diff(old_rows) != 1) + 1
+            for rows in reversed(np.split(old_rows, breaks)):
+                table.remove_rows(rows[0], rows[-1] + 1)
+        if len(arrays[name]):
+            table.append(arrays[name])
+        table.flush()
+        counts[name] = len(arrays[name])
+    return counts
+
+
+def parseDataStoreFile(file_path, parser_kwargs, session_ids=None,
+                       chunk_size=100000, processes=None):
+    """Re-parses the eye samples of an ioHub DataStore file into fixation,
+    saccade and blink events, and writes them to the file's eye tracker
+    event tables.
+
+    Args:
+        file_path (str): Path of the ioHub .hdf5 file.
+        parser_kwargs (dict): EyeTrackerEventParser kwargs: sampling_rate,
+            display_device, and optionally position_filter,
+            velocity_filter and adaptive_vel_thresh_history.
+        session_ids (list): Sessions to parse. Default: all sessions with
+            eye samples.
+        chunk_size (int): Number of samples read from the file at a time.
+        processes (int): Number of processes used to parse sessions in
+            parallel. Default: the number of CPUs. 1 parses in this process.
+
+    Returns:
+        dict: {session id: {event table name: number of events written}}
+    """
+    from ....datastore.util import open_file
+    if session_ids is None:
+        hubfile = open_file(file_path, 'r')
+        try:
+            table = _sampleTable(hubfile)
+            session_ids = set()
+            for start in range(0, table.nrows, chunk_size):
+                session_ids.update(np.unique(table.read(
+                    start, start + chunk_size, field='session_id')).tolist())
+        finally:
+            hubfile.close()
+        session_ids = sorted(session_ids)
+
+    jobs = [(file_path, session_id, parser_kwargs, chunk_size)
+            for session_id in session_ids]
+    if processes == 1 or len(jobs) < 2:
+        results = [_parseSession(job) for job in jobs]
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_parseSession, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+    # HDF5 files can only be written from one process
+    hubfile = open_file(file_path, 'a')
+    try:
+        return dict((session_id, _writeSessionEvents(hubfile, session_id,
+                                                     filter_id, arrays))
+                    for session_id, filter_id, arrays in results)
+    finally:
+        hubfile.close()
@@ -7,6 +7,9 @@ from __future__ import division, absolute_import
 import struct
 from weakref import proxy
 
+from past.builtins import unicode
+
+import numpy as np
 from gevent import sleep, Greenlet
 import msgpack
 try:
@@ -17,6 +20,7 @@ except ImportError:
     print2err("Warning: msgpack_numpy could not be imported. ",
               "This may cause issues for iohub.")
 
+from .constants import EventConstants
 from .devices import Computer
 from .errors import print2err, printExceptionDetailsToStdErr
 from .util import NumPyRingBuffer as RingBuffer
@@ -25,6 +29,61 @@ MAX_PACKET_SIZE = 64 * 1024
 
 defTimeout = 0.1
 
+
+def _eventClassDtype(event_type):
+    return EventConstants.getClass(event_type).NUMPY_DTYPE
+
+
+def _encodeStrings(event):
+    return tuple(v.encode('utf-8') if isinstance(v, unicode) else v
+                 for v in event)
+
+
+def eventArrays(events, type_index=4, dtype_lookup=None):
+    """Groups ioHub events (each a list of event attribute values) by event
+    type. Returns a dict of {event type id: numpy record array}, using the
+    NUMPY_DTYPE of each event class (or the dtype returned by dtype_lookup
+    for an event type id). String attributes become bytes.
+    """
+    dtype_lookup = dtype_lookup or _eventClassDtype
+    grouped = dict()
+    for event in events:
+        grouped.setdefault(event[type_index], []).append(event)
+    arrays = dict()
+    for event_type, type_events in grouped.items():
+        dtype = np.dtype(dtype_lookup(event_type))
+        try:
+            records = np.array([tuple(e) for e in type_events], dtype=dtype)
+        except UnicodeEncodeError:
+            records = np.array([_encodeStrings(e) for e in type_events],
+                               dtype=dtype)
+        arrays[event_type] = records.view(np.recarray)
+    return arrays
+
+
+def packEventArrays(events, type_index=4, dtype_lookup=None):
+    """Packs ioHub events as one contiguous structured array buffer per event
+    type, instead of one list per event. Returns a list of
+    [event type id, bytes], which msgpack sends as raw binary data.
+    """
+    arrays = eventArrays(events, type_index, dtype_lookup)
+    return [[event_type, arrays[event_type].tobytes()]
+            for event_type in sorted(arrays)]
+
+
+def unpackEventArrays(packed, dtype_lookup=None):
+    """Returns the events packed by packEventArrays() as a dict of
+    {event type id: numpy record array}. The arrays use the received
+    buffers without copying them, so they are read only.
+    """
+    dtype_lookup = dtype_lookup or _eventClassDtype
+    arrays = dict()
+    for event_type, data in packed or []:
+        dtype = np.dtype(dtype_lookup(event_type))
+        arrays[event_type] = np.frombuffer(data, dtype=dtype).view(
+            np.recarray)
+    return arrays
+
 class SocketConnection(object): # pylint: disable=too-many-instance-attributes
     def __init__(
             self,
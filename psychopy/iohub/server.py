@@ -8,7 +8,6 @@ from past.builtins import xrange
 
 import os
 import sys
-from operator import itemgetter
 from collections import deque, OrderedDict
 
 import msgpack
@@ -27,8 +26,8 @@ from psychopy.constants import PY3
 from . import _pkgroot
 from . import IOHUB_DIRECTORY, EXP_SCRIPT_DIRECTORY, _DATA_STORE_AVAILABLE
 from .errors import print2err, printExceptionDetailsToStdErr, ioHubError
-from .net import MAX_PACKET_SIZE
-from .util import convertCamelToSnake, win32MessagePump
+from .net import MAX_PACKET_SIZE, packEventArrays
+from .util import convertCamelToSnake, win32MessagePump, DeviceEventBuffers
 from .util import yload, yLoader
 from .constants import DeviceConstants, EventConstants
 from .devices import DeviceEvent, import_device
@@ -75,7 +74,7 @@ class udpServer(DatagramServer):
                                payload, replyTo], replyTo)
             return True
         elif request_type == 'GET_EVENTS':
-            return self.handleGetEvents(replyTo)
+            return self.handleGetEvents(replyTo, request)
         elif request_type == 'EXP_DEVICE':
             return self.handleExperimentDeviceRequest(request, replyTo)
         elif request_type == 'CUSTOM_TASK':
@@ -176,16 +175,39 @@ class udpServer(DatagramServer):
         edata = ('CUSTOM_TASK_REPLY', request)
         self.sendResponse(edata, replyTo)
 
-    def handleGetEvents(self, replyTo):
+    def handleGetEvents(self, replyTo, query=None):
+        """Sends the events in the global event buffer, sorted by hub time.
+
+        query is an optional list of [devices, event_types, start_time,
+        end_time, max_count, as_arrays]; any that are given (not None)
+        limit the events sent to those from the named devices, of the given
+        event type ids, within the hub time window, and to the max_count
+        oldest of them. Events that are not sent stay in the buffer.
+
+        If as_arrays is True, the events are sent packed as one structured
+        array per event type (see net.packEventArrays) in a
+        GET_EVENT_ARRAYS_RESULT reply.
+        """
         try:
             self.iohub.processDeviceEvents()
-            currentEvents = list(self.iohub.eventBuffer)
-            self.iohub.eventBuffer.clear()
+            devices = event_types = start_time = end_time = max_count = None
+            as_arrays = False
+            if query:
+                (devices, event_types, start_time, end_time, max_count,
+                 as_arrays) = query
+            if devices is not None:
+                devices = [unicode(d, 'utf-8') if isinstance(d, bytes) else d
+                           for d in devices]
+            currentEvents = self.iohub.eventBuffer.take(
+                devices, event_types, start_time, end_time, max_count)
+            if as_arrays:
+                self.sendResponse(
+                    ('GET_EVENT_ARRAYS_RESULT', packEventArrays(
+                        currentEvents, DeviceEvent.EVENT_TYPE_ID_INDEX)),
+                    replyTo)
+                return True
 
             if len(currentEvents) > 0:
-                currentEvents = sorted(
-                    currentEvents, key=itemgetter(
-                        DeviceEvent.EVENT_HUB_TIME_INDEX))
                 self.sendResponse(
                     ('GET_EVENTS_RESULT', currentEvents), replyTo)
             else:
@@ -197,6 +219,12 @@ class udpServer(DatagramServer):
             self.sendResponse('IOHUB_GET_EVENTS_ERROR', replyTo)
             return False
 
+    def getEventDeviceNames(self):
+        """Returns a list of [device id, device name] pairs for the devices
+        whose events are kept in the global event buffer. (A list, as dict
+        results have their keys converted to str.)"""
+        return self.iohub.eventBuffer.getDeviceNames()
+
     def handleExperimentDeviceRequest(self, request, replyTo):
         request_type = unicode(request.pop(0), 'utf-8') # convert bytes to string for compatibility
         io_dev_dict = ioServer.deviceDict
@@ -456,10 +484,16 @@ class udpServer(DatagramServer):
     def flushIODataStoreFile(self):
         dsfile = self.iohub.dsfile
         if dsfile:
-            dsfile.emrtFile.flush()
+            dsfile.flush()
             return True
         return False
 
+    def getDataStoreWriteStats(self):
+        dsfile = self.iohub.dsfile
+        if dsfile:
+            return dsfile.getWriteStats()
+        return None
+
     def shutDown(self):
         try:
             self.setPriority('normal')
@@ -522,7 +556,12 @@ class ioServer(object):
         self._hookDevice = None
         self._all_dev_conf_errors = []
         ebuf_sz = config.get('global_event_buffer', 2048)
-        ioServer.eventBuffer = deque(maxlen=ebuf_sz)
+        ioServer.eventBuffer = DeviceEventBuffers(
+            ebuf_sz, DeviceEvent.EVENT_TYPE_ID_INDEX,
+            DeviceEvent.EVENT_HUB_TIME_INDEX, DeviceEvent.DEVICE_ID_INDEX)
+        self.eventRingBuffer = None
+        if config.get('event_transport', 'udp') == 'shared_memory':
+            self._initEventRingBuffer()
 
         self._running = True
         # start UDP service
@@ -533,6 +572,36 @@ class ioServer(object):
 
         self._addPubSubListeners()
 
+    def _initEventRingBuffer(self):
+        # the experiment process created the shared memory block before
+        # starting the server; events in eventBuffer are moved into it by
+        # processEventsTasklet, UDP GET_EVENTS requests are not needed.
+        try:
+            from .shmem import SharedEventRingBuffer, eventBufferName
+            if Computer.psychopy_process:
+                name = eventBufferName(Computer.psychopy_process.pid)
+                self.eventRingBuffer = SharedEventRingBuffer(name)
+                self.log('Sending events using shared memory: %s' % name)
+        except Exception:
+            print2err('Error opening shared memory event buffer, '
+                      'falling back to UDP.')
+            printExceptionDetailsToStdErr()
+            self.eventRingBuffer = None
+
+    def writeEventRingBuffer(self):
+        """Moves events from the global event buffer into the shared memory
+        ring buffer (in hub time order), keeping any that don't fit for
+        the next call."""
+        ebuffer = self.eventBuffer
+        if not ebuffer:
+            return 0
+        events = ebuffer.take()
+        written = self.eventRingBuffer.write(
+            events, DeviceEvent.EVENT_TYPE_ID_INDEX)
+        if written < len(events):
+            ebuffer.extend(events[written:])
+        return written
+
     def _initDataStore(self, config, script_dir):
         try:
             # initial dataStore setup
@@ -828,6 +897,9 @@ class ioServer(object):
                 self.log('%s: Streaming Events are Enabled.' % dev_cls_name)
                 # add listener for global event queue
                 dev_instance._addEventListener(self, monitor_evt_ids)
+                # device ids are set by processDeviceEvents()
+                self.eventBuffer.addDevice(dev_instance.name,
+                                           len(self.devices))
                 self.log('ioServer Event Listener: {}'.format(monitor_evt_ids))
 
                 # add listener for device event queue
@@ -868,17 +940,29 @@ class ioServer(object):
         while self._running:
             stime = Computer.getTime()
             self.processDeviceEvents()
+            if self.eventRingBuffer is not None:
+                self.writeEventRingBuffer()
+            if self.dsfile:
+                # don't let events of low rate devices wait in the
+                # datastore write buffers for too long
+                written = self.dsfile.writeStaleBuffers()
+                if written:
+                    self.dsfile.bufferedFlush(written)
             dur = sleep_interval - (Computer.getTime() - stime)
             gevent.sleep(max(0.001, dur))
 
     def processDeviceEvents(self):
-        for device in self.devices:
+        # each event is given the id of the device it came from (its
+        # position in self.devices, from 1), which is what the global event
+        # buffer sorts events by
+        for device_id, device in enumerate(self.devices, 1):
             evt = []
             try:
                 events = device._getNativeEventBuffer()
                 while events:
                     evt = device._getIOHubEventObject(events.popleft())
                     if evt:
+                        evt[DeviceEvent.DEVICE_ID_INDEX] = device_id
                         etype = evt[DeviceEvent.EVENT_TYPE_ID_INDEX]
                         for l in device._getEventListeners(etype):
                             l._handleEvent(evt)
@@ -887,6 +971,7 @@ class ioServer(object):
                 for efilter in device._filters.values():
                     filtered_events.extend(efilter._removeOutputEvents())
                 for evt in filtered_events:
+                    evt[DeviceEvent.DEVICE_ID_INDEX] = device_id
                     etype = evt[DeviceEvent.EVENT_TYPE_ID_INDEX]
                     for l in device._getEventListeners(etype):
                         l._handleEvent(evt)
@@ -907,9 +992,7 @@ class ioServer(object):
     def clearEventBuffer(self, call_proc_events=True):
         if call_proc_events is True:
             self.processDeviceEvents()
-        l = len(self.eventBuffer)
-        self.eventBuffer.clear()
-        return l
+        return self.eventBuffer.clear()
 
     def checkForPsychopyProcess(self, sleep_interval):
         while self._running:
@@ -952,6 +1035,10 @@ class ioServer(object):
 
             self.closeDataStoreFile()
 
+            if self.eventRingBuffer is not None:
+                self.eventRingBuffer.close()
+                self.eventRingBuffer = None
+
             while self.devices:
                 self.devices.pop(0)._close()
         except Exception:
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+# Part of the psychopy.iohub library.
+# Copyright (C) 2012-2016 iSolver Software Solutions
+# Distributed under the terms of the GNU General Public License (GPL).
+"""Shared memory transport of ioHub events from the ioHub Server to the
+experiment process.
+
+When the ioHub config has 'event_transport: shared_memory', the experiment
+process creates a SharedEventRingBuffer and the ioHub Server writes the
+events of its global event buffer into it, so that
+ioHubConnection.getEvents() reads them straight from shared memory instead
+of requesting them over UDP. UDP is still used for all other requests.
+
+The ring buffer has a single writer (the ioHub Server) and a single reader
+(the experiment process), so no locks are needed: each side only ever
+updates its own counter. Every slot has the same, fixed size and holds one
+event, stored as a record of the event class's NUMPY_DTYPE.
+"""
+from __future__ import division, absolute_import
+
+import os
+import struct
+import tempfile
+
+import numpy as np
+
+from .constants import EventConstants
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None  # python < 3.8; use a memory mapped file instead
+    import mmap
+
+HEADER_SIZE = 64
+_HEADER = struct.Struct('<8sII')  # magic, slot_size, slot_count
+_MAGIC = b'IOHUBRB1'
+_COUNTERS_OFFSET = 16  # uint64 write_count, read_count
+SLOT_HEADER_SIZE = 8  # uint32 event type id, uint32 record size
+SLOT_HEADER_DTYPE = np.dtype([('type', '<u4'), ('size', '<u4')])
+
+
+def eventBufferName(psychopy_pid):
+    """Name of the shared memory block used for the events sent to the
+    experiment process with the given process id."""
+    return 'iohub_events_%d' % psychopy_pid
+
+
+def _eventClassDtype(event_type):
+    return EventConstants.getClass(event_type).NUMPY_DTYPE
+
+
+class SharedEventRingBuffer(object):
+    """A single producer / single consumer ring buffer of ioHub events,
+    held in shared memory.
+
+    Args:
+        name (str): Name of the shared memory block.
+        create (bool): True to create the block (done by the experiment
+                       process), False to attach to an existing one.
+        slot_count (int): Number of events the buffer can hold.
+        slot_size (int): Bytes per event, including an 8 byte slot header.
+                         Must be large enough for the largest event record.
+        dtype_lookup (callable): Returns the numpy dtype for an event type
+                                 id. Defaults to the NUMPY_DTYPE of the
+                                 event class.
+    """
+    def __init__(self, name, create=False, slot_count=8192, slot_size=512,
+                 dtype_lookup=None):
+        self.name = name
+        self._owner = create
+        self._dtype_lookup = dtype_lookup or _eventClassDtype
+        self._dtypes = dict()
+        self._shm = None
+        self._mmap = None
+        self._mmap_path = None
+        if create:
+            size = HEADER_SIZE + slot_count * slot_size
+            self._buf = self._open(size, True)
+            self._buf[:_HEADER.size] = _HEADER.pack(_MAGIC, slot_size,
+                                                    slot_count)
+        else:
+            header = self._open(None, False)
+            magic, slot_size, slot_count = _HEADER.unpack(
+                bytes(header[:_HEADER.size]))
+            if magic != _MAGIC:
+                raise ValueError('%s is not an ioHub event buffer' % name)
+            self._buf = header
+        self.slot_size = slot_size
+        self.slot_count = slot_count
+        self.max_record_size = slot_size - SLOT_HEADER_SIZE
+
+        # [write_count, read_count]: only the writer updates write_count and
+        # only the reader updates read_count
+        self._counters = np.ndarray(2, dtype='<u8', buffer=self._buf,
+                                    offset=_COUNTERS_OFFSET)
+        if create:
+            self._counters[:] = 0
+        self._slots = np.ndarray((slot_count, slot_size), dtype=np.uint8,
+                                 buffer=self._buf, offset=HEADER_SIZE)
+        self.overflow_count = 0
+
+    def _open(self, size, create):
+        if shared_memory is not None:
+            if create:
+                self._shm = shared_memory.SharedMemory(self.name, create=True,
+                                                       size=size)
+            else:
+                self._shm = shared_memory.SharedMemory(self.name)
+                try:
+                    # only the creator should unlink the block at exit
+                    from multiprocessing import resource_tracker
+                    resource_tracker.unregister(self._shm._name,
+                                                'shared_memory')
+                except Exception: # pylint: disable=broad-except
+                    pass
+            return self._shm.buf
+        self._mmap_path = os.path.join(tempfile.gettempdir(), self.name)
+        if create:
+            with open(self._mmap_path, 'wb') as f:
+                f.truncate(size)
+        with open(self._mmap_path, 'r+b') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0)
+        return memoryview(self._mmap)
+
+    def _getDtype(self, event_type):
+        dtype = self._dtypes.get(event_type)
+        if dtype is None:
+            dtype = np.dtype(self._dtype_lookup(event_type))
+            if dtype.itemsize > self.max_record_size:
+                raise ValueError('Event type %d records (%d bytes) do not '
+                                 'fit a %d byte slot.' % (
+                                     event_type, dtype.itemsize,
+                                     self.slot_size))
+            self._dtypes[event_type] = dtype
+        return dtype
+
+    @property
+    def backlog(self):
+        """Number of events written but not yet read."""
+        write_count, read_count = self._counters.tolist()
+        return write_count - read_count
+
+    def write(self, events, type_index=4):
+        """Write event lists to the buffer, in order, for as long as there
+        is free space. Returns the number of events written; the caller
+        keeps any others and tries again later."""
+        write_count, read_count = self._counters.tolist()
+        free = self.slot_count - (write_count - read_count)
+        count = min(free, len(events))
+        if count < len(events):
+            self.overflow_count += 1
+        slots = self._slots
+        for i in range(count):
+            event = events[i]
+            event_type = event[type_index]
+            dtype = self._getDtype(event_type)
+            slot = slots[(write_count + i) % self.slot_count]
+            slot[:SLOT_HEADER_SIZE].view(SLOT_HEADER_DTYPE)[0] = (
+                event_type, dtype.itemsize)
+            slot[SLOT_HEADER_SIZE:SLOT_HEADER_SIZE + dtype.itemsize].view(
+                dtype)[0] = tuple(event)
+        if count:
+            # publish the new events only once their slots are written
+            self._counters[0] = write_count + count
+        return count
+
+    def _takeSlots(self):
+        """Copy all unread slots out of shared memory and mark them read."""
+        write_count, read_count = self._counters.tolist()
+        count = write_count - read_count
+        if count <= 0:
+            return None
+        start = read_count % self.slot_count
+        end = start + count
+        if end <= self.slot_count:
+            slots = self._slots[start:end].copy()
+        else:
+            slots = np.concatenate([self._slots[start:],
+                                    self._slots[:end - self.slot_count]])
+        self._counters[1] = write_count
+        return slots
+
+    def read(self):
+        """Returns the list of all events written since the last read, each
+        as a list of event attribute values. String attributes are bytes, as
+        they are when events are received over UDP."""
+        slots = self._takeSlots()
+        if slots is None:
+            return []
+        headers = slots[:, :SLOT_HEADER_SIZE].copy().view(
+            SLOT_HEADER_DTYPE)[:, 0]
+        events = []
+        for slot, event_type in zip(slots, headers['type'].tolist()):
+            dtype = self._getDtype(event_type)
+            events.append(list(slot[SLOT_HEADER_SIZE:SLOT_HEADER_SIZE +
+                                    dtype.itemsize].view(dtype)[0].tolist()))
+        return events
+
+    def readArrays(self):
+        """Returns the events written since the last read as a dict of
+        {event type id: numpy record array}, without converting each event
+        to a list."""
+        slots = self._takeSlots()
+        if slots is None:
+            return {}
+        headers = slots[:, :SLOT_HEADER_SIZE].copy().view(
+            SLOT_HEADER_DTYPE)[:, 0]
+        arrays = dict()
+        for event_type in np.unique(headers['type']).tolist():
+            dtype = self._getDtype(event_type)
+            records = slots[headers['type'] == event_type,
+                            SLOT_HEADER_SIZE:SLOT_HEADER_SIZE +
+                            dtype.itemsize]
+            arrays[event_type] = np.ascontiguousarray(records).view(
+                dtype)[:, 0].view(np.recarray)
+        return arrays
+
+    def discard(self):
+        """Mark all written events as read, without reading them."""
+        self._counters[1] = self._counters[0]
+
+    def close(self):
+        self._counters = None
+        self._slots = None
+        self._buf = None
+        if self._shm is not None:
+            self._shm.close()
+            if self._owner:
+                self._shm.unlink()
+            self._shm = None
+        elif self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+            if self._owner:
+                os.remove(self._mmap_path)
@@ -362,6 +362,169 @@ class NumPyRingBuffer(object):
             return self.max_size
         return self._index
 
+###############################################################################
+#
+# Per device buffering of ioHub events (event lists), with filtered retrieval.
+#
+
+
+def takeEvents(events, event_types=None, start_time=None, end_time=None,
+               max_count=None, type_index=4, time_index=7, device_ids=None,
+               device_index=2):
+    """Splits a list of ioHub events (each a list of event attribute values)
+    into the events that match the given event type ids, device ids and hub
+    time window, and all other events.
+
+    Returns (matched, others). matched is sorted by hub time and holds at
+    most the max_count oldest matching events; newer matching events are
+    returned in others, so that they can be kept for a later call.
+    """
+    if event_types is not None:
+        event_types = set(event_types)
+    if device_ids is not None:
+        device_ids = set(device_ids)
+    matched = []
+    others = []
+    for event in events:
+        if event_types is not None and event[type_index] not in event_types:
+            others.append(event)
+            continue
+        if device_ids is not None and event[device_index] not in device_ids:
+            others.append(event)
+            continue
+        etime = event[time_index]
+        if ((start_time is not None and etime < start_time) or
+                (end_time is not None and etime > end_time)):
+            others.append(event)
+            continue
+        matched.append(event)
+    matched.sort(key=lambda e: e[time_index])
+    if max_count is not None and len(matched) > max_count:
+        others.extend(matched[max_count:])
+        others.sort(key=lambda e: e[time_index])
+        matched = matched[:max_count]
+    return matched, others
+
+
+class DeviceEventBuffers(object):
+    """A buffer of ioHub events that keeps a separate deque of up to max_size
+    events for each device, so that the events of some devices or event
+    types can be taken from the buffer without touching, or losing, the
+    events of the others.
+
+    Events are assigned to a device by their device_id field, using the
+    device ids given to addDevice(), so devices that stream the same event
+    types keep their events apart. Events with any other device id are kept
+    under the device name None.
+
+    Example::
+
+        buffers = DeviceEventBuffers(1024)
+        buffers.addDevice('keyboard', 1)
+        buffers.extend(events)
+        presses = buffers.take(event_types=[EventConstants.KEYBOARD_PRESS],
+                               max_count=10)
+    """
+    def __init__(self, max_size, type_index=4, time_index=7, device_index=2):
+        self.max_size = max_size
+        self.type_index = type_index
+        self.time_index = time_index
+        self.device_index = device_index
+        self._buffers = collections.OrderedDict()
+        self._device_names = dict()
+
+    def addDevice(self, name, device_id):
+        """Have events with the given device id buffered for device
+        name."""
+        self._device_names[device_id] = name
+        self._getBuffer(name)
+
+    def getDeviceNames(self):
+        """Returns a list of [device id, device name] pairs."""
+        return [[device_id, name]
+                for device_id, name in self._device_names.items()]
+
+    def _getBuffer(self, name):
+        buf = self._buffers.get(name)
+        if buf is None:
+            buf = self._buffers[name] = collections.deque(
+                maxlen=self.max_size)
+        return buf
+
+    def append(self, event):
+        self._getBuffer(self._device_names.get(event[self.device_index])
+                        ).append(event)
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def _selectBuffers(self, devices):
+        if devices is None:
+            return list(self._buffers.values())
+        return [self._buffers[name] for name in devices
+                if name in self._buffers]
+
+    def take(self, devices=None, event_types=None, start_time=None,
+             end_time=None, max_count=None):
+        """Removes and returns the events of the given devices (all devices
+        if None) that match the given event type ids and hub time window,
+        sorted by hub time. At most max_count events are returned, the
+        oldest first. All other events stay in the buffer.
+        """
+        buffers = self._selectBuffers(devices)
+        if (event_types is None and start_time is None and end_time is None
+                and max_count is None):
+            events = []
+            for buf in buffers:
+                events.extend(buf)
+                buf.clear()
+            events.sort(key=lambda e: e[self.time_index])
+            return events
+
+        events = []
+        for buf in buffers:
+            matched, others = takeEvents(buf, event_types, start_time,
+                                         end_time, None, self.type_index,
+                                         self.time_index)
+            if matched:
+                buf.clear()
+                buf.extend(others)
+                events.extend(matched)
+        events, excess = takeEvents(events, None, None, None, max_count,
+                                    self.type_index, self.time_index)
+        if excess:
+            # put events beyond max_count back, in hub time order
+            for event in excess:
+                self.append(event)
+            for buf in buffers:
+                ordered = sorted(buf, key=lambda e: e[self.time_index])
+                buf.clear()
+                buf.extend(ordered)
+        return events
+
+    def clear(self, devices=None):
+        """Removes all events of the given devices (all devices if None).
+        Returns the number of events removed."""
+        count = 0
+        for buf in self._selectBuffers(devices):
+            count += len(buf)
+            buf.clear()
+        return count
+
+    def __iter__(self):
+        for buf in list(self._buffers.values()):
+            for event in buf:
+                yield event
+
+    def __len__(self):
+        return sum(len(buf) for buf in self._buffers.values())
+
+    def __bool__(self):
+        return any(self._buffers.values())
+
+    __nonzero__ = __bool__
+
 ###############################################################################
 #
 # Generate a set of points in a NxM grid. Useful for creating calibration target positions,
@@ -29,17 +29,21 @@ messages, (which PsychoPy doesn't use) using the commands::
 """
 
 # Much of the code below is based conceptually, if not syntactically, on the
-# python logging module but it's simpler (no threading) and maintaining a
-# stack of log entries for later writing (don't want files written while
-# drawing)
+# python logging module but it's simpler (no threading by default) and
+# maintaining a stack of log entries for later writing (don't want files
+# written while drawing). Optionally the writing can be handed to a
+# background thread (see setAsyncWriter)
 
 from __future__ import absolute_import, print_function
 
 from builtins import object
 from past.builtins import basestring
 from os import path
+from collections import deque
 import atexit
 import sys
+import struct
+import threading
 import codecs
 import locale
 from psychopy import clock
@@ -210,6 +214,375 @@ class LogFile(object):
             pass
 
 
+# layout of BinaryLogFile files: a fixed header followed by fixed-width
+# records of (t, level, obj, msg), where obj and msg are indices into a
+# table of unique strings that is stored in a sidecar file (+'.str')
+_binaryLogMagic = b'PSYLOG\x00\x01'
+_binaryLogHeader = struct.Struct('<8sII')  # magic, version, recordSize
+_binaryLogRecord = struct.Struct('<diii')  # t, level, obj, msg
+_binaryLogString = struct.Struct('<I')  # length of the utf8 string to follow
+_binaryLogVersion = 1
+
+
+class BinaryLogFile(object):
+    """A binary, fixed-width record target for the logging system.
+
+    Each entry is stored as its time, level, object name and message, with
+    the (often repeated) names and messages stored just once in a string
+    table in a sidecar file (`f` + '.str'). Use :func:`readBinaryLog` to
+    load the log back as numpy arrays, which is much faster than parsing
+    the text output of a :class:`LogFile`.
+    """
+
+    def __init__(self, f, level=WARNING, filemode='a', logger=None):
+        """Create a binary log file as a target for logged entries
+
+        :parameters:
+
+            - f:
+                path to the file. The string table is written to a file of
+                the same name with '.str' appended
+
+            - level:
+                The minimum level of importance that a message must have
+                to be logged by this target.
+
+            - filemode: 'a', 'w'
+                Append or overwrite existing log file. A ValueError is
+                raised if the file to append to isn't a binary log of
+                this version
+
+        """
+        super(BinaryLogFile, self).__init__()
+        self.filename = f
+        self.level = level
+        self._stringIDs = {}
+        if filemode == 'a' and path.isfile(f) and path.getsize(f):
+            with open(f, 'rb') as existing:
+                header = existing.read(_binaryLogHeader.size)
+            if (len(header) < _binaryLogHeader.size or
+                    _binaryLogHeader.unpack(header) != (
+                        _binaryLogMagic, _binaryLogVersion,
+                        _binaryLogRecord.size)):
+                raise ValueError("%s is not a binary PsychoPy log of "
+                                 "version %i, so can't be appended to"
+                                 % (f, _binaryLogVersion))
+            strings, stringsSize = _readBinaryLogStrings(f + '.str',
+                                                         withSize=True)
+            for n, string in enumerate(strings):
+                self._stringIDs[string] = n
+            self.stream = open(f, 'ab')
+            # drop anything partially written (e.g. after a crash), which
+            # would misalign what is appended
+            partial = ((path.getsize(f) - _binaryLogHeader.size) %
+                       _binaryLogRecord.size)
+            if partial:
+                self.stream.truncate(path.getsize(f) - partial)
+            self.stringStream = open(f + '.str', 'ab')
+            self.stringStream.truncate(stringsSize)
+        else:
+            self.stream = open(f, 'wb')
+            self.stream.write(_binaryLogHeader.pack(
+                _binaryLogMagic, _binaryLogVersion, _binaryLogRecord.size))
+            self.stringStream = open(f + '.str', 'wb')
+        if logger is None:
+            logger = root
+        self.logger = logger
+        self.logger.addTarget(self)
+
+    def setLevel(self, level):
+        """Set a new minimal level for the log file
+        """
+        if type(level) is not int:
+            raise TypeError("BinaryLogFile.setLevel() should be given an int,"
+                            " which is usually one of logging.INFO (not "
+                            "logging.info)")
+        self.level = level
+        self.logger._calcLowestTarget()
+
+    def _getStringID(self, string, newStrings):
+        if string is None:
+            return -1
+        try:
+            return self._stringIDs[string]
+        except KeyError:
+            stringID = self._stringIDs[string] = len(self._stringIDs)
+            encoded = string.encode('utf-8')
+            newStrings.append(_binaryLogString.pack(len(encoded)) + encoded)
+            return stringID
+
+    def writeEntries(self, entries):
+        """Write a list of :class:`_LogEntry` objects to the file (the
+        logger calls this instead of `write()`)
+        """
+        records = []
+        newStrings = []
+        for thisEntry in entries:
+            obj = getattr(thisEntry.obj, 'name', None)
+            if obj is not None and not isinstance(obj, basestring):
+                obj = str(obj)
+            message = thisEntry.message
+            if not isinstance(message, basestring):
+                message = str(message)
+            records.append(_binaryLogRecord.pack(
+                thisEntry.t, thisEntry.level,
+                self._getStringID(obj, newStrings),
+                self._getStringID(message, newStrings)))
+        # strings first, so that every record on disk can be resolved
+        if newStrings:
+            self.stringStream.write(b''.join(newStrings))
+            self.stringStream.flush()
+        self.stream.write(b''.join(records))
+
+    def write(self, txt):
+        """Text can't be written directly to a binary log; log it as an
+        entry instead
+        """
+        raise TypeError("BinaryLogFile can't receive raw text; use "
+                        "logging.log() to add entries")
+
+    def close(self):
+        """Stop logging to this file and close it
+        """
+        self.logger.removeTarget(self)
+        self.stream.close()
+        self.stringStream.close()
+
+
+def _readBinaryLogStrings(filename, withSize=False):
+    """Returns the strings of a string table (and, `withSize`, the number
+    of bytes they take up, without any partially written string at the end)
+    """
+    strings = []
+    pos = 0
+    if path.isfile(filename):
+        with open(filename, 'rb') as f:
+            buff = f.read()
+        while pos + _binaryLogString.size <= len(buff):
+            length, = _binaryLogString.unpack_from(buff, pos)
+            end = pos + _binaryLogString.size + length
+            if end > len(buff):
+                break  # a partially written string (e.g. after a crash)
+            strings.append(
+                buff[pos + _binaryLogString.size:end].decode('utf-8'))
+            pos = end
+    if withSize:
+        return strings, pos
+    return strings
+
+
+class BinaryLog(object):
+    """The contents of a :class:`BinaryLogFile`, as returned by
+    :func:`readBinaryLog`.
+
+    `records` is a numpy structured array with fields 't', 'level', 'obj'
+    and 'msg' (the last two index into `strings`, or are -1 for no object).
+    """
+
+    def __init__(self, records, strings):
+        super(BinaryLog, self).__init__()
+        self.records = records
+        self.strings = strings
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def t(self):
+        return self.records['t']
+
+    @property
+    def level(self):
+        return self.records['level']
+
+    def select(self, level=None, levels=None, tStart=None, tStop=None,
+               obj=None, message=None):
+        """Return the records matching all of the given criteria
+
+        :parameters:
+
+            - level:
+                the minimum level of entries to include (as for a LogFile)
+
+            - levels:
+                a list of the exact levels to include, e.g. [DATA, EXP]
+
+            - tStart, tStop:
+                only entries with tStart <= t < tStop
+
+            - obj, message:
+                only entries of this object name or with exactly this
+                message
+
+        """
+        import numpy
+        records = self.records
+        mask = numpy.ones(len(records), dtype=bool)
+        if level is not None:
+            mask &= records['level'] >= level
+        if levels is not None:
+            mask &= numpy.in1d(records['level'], levels)
+        if tStart is not None:
+            mask &= records['t'] >= tStart
+        if tStop is not None:
+            mask &= records['t'] < tStop
+        for field, string in (('obj', obj), ('msg', message)):
+            if string is not None:
+                try:
+                    stringID = self.strings.index(string)
+                except ValueError:
+                    stringID = -2  # matches nothing
+                mask &= records[field] == stringID
+        return records[mask]
+
+    def messages(self, records=None):
+        """Return the message strings for the given (or all) records
+        """
+        if records is None:
+            records = self.records
+        strings = self.strings
+        return [strings[n] for n in records['msg']]
+
+    def toText(self, records=None,
+               format="%(t).4f \t%(levelname)s \t%(message)s"):
+        """Replay records as text, in the format that a :class:`LogFile`
+        would have written them
+        """
+        if records is None:
+            records = self.records
+        strings = self.strings
+        lines = []
+        for t, lev, msg in zip(records['t'].tolist(),
+                               records['level'].tolist(),
+                               records['msg'].tolist()):
+            lines.append(format % {'t': t, 't_ms': t * 1000, 'level': lev,
+                                   'levelname': getLevel(lev),
+                                   'message': strings[msg]})
+        return lines
+
+
+def readBinaryLog(filename, level=None, levels=None, tStart=None,
+                  tStop=None):
+    """Load a file written by :class:`BinaryLogFile`, optionally keeping
+    only the entries of given levels or times (see :meth:`BinaryLog.select`)
+
+    The records are memory-mapped, so only the parts that are used get
+    read from disk.
+    """
+    import numpy
+    with open(filename, 'rb') as f:
+        header = f.read(_binaryLogHeader.size)
+    if len(header) < _binaryLogHeader.size:
+        raise IOError("%s is not a binary PsychoPy log" % filename)
+    magic, version, recordSize = _binaryLogHeader.unpack(header)
+    if magic != _binaryLogMagic or recordSize != _binaryLogRecord.size:
+        raise IOError("%s is not a binary PsychoPy log" % filename)
+    dtype = numpy.dtype([('t', '<f8'), ('level', '<i4'),
+                         ('obj', '<i4'), ('msg', '<i4')])
+    nRecords = ((path.getsize(filename) - _binaryLogHeader.size)
+                // dtype.itemsize)
+    if nRecords:
+        records = numpy.memmap(filename, dtype=dtype, mode='r',
+                               offset=_binaryLogHeader.size,
+                               shape=(nRecords,))
+    else:
+        records = numpy.zeros(0, dtype=dtype)
+    log = BinaryLog(records, _readBinaryLogStrings(filename + '.str'))
+    if (level, levels, tStart, tStop) != (None, None, None, None):
+        log.records = log.select(level=level, levels=levels,
+                                 tStart=tStart, tStop=tStop)
+    return log
+
+
+class _LogWriter(threading.Thread):
+    """A background thread that formats and writes log entries for a
+    :class:`_Logger`, so that file output doesn't happen on the thread that
+    called :func:`flush` (which is often the drawing thread).
+
+    Entries handed over by the logger wait in a bounded queue. If the queue
+    is full then the calling thread blocks until the writer has caught up
+    (entries are never dropped).
+    """
+
+    def __init__(self, logger, maxPending=10000):
+        threading.Thread.__init__(self, name='PsychoPyLogWriter')
+        self.daemon = True  # never stop python from exiting (atexit drains)
+        self.logger = logger
+        self.maxPending = maxPending
+        self.pending = deque()
+        self.nWritten = 0
+        self._cond = threading.Condition()
+        self._writing = False
+        self._stopRequested = False
+
+    def put(self, entries):
+        """Add a list of entries to the queue for writing
+        """
+        if not entries:
+            return
+        with self._cond:
+            # only wait while the writer has something to write, otherwise
+            # a batch larger than maxPending would wait forever
+            while (self.maxPending and self.pending and
+                   len(self.pending) + len(entries) > self.maxPending):
+                self._cond.wait()
+            self.pending.extend(entries)
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until all queued entries have been written.
+        Returns False if `timeout` (sec) expired first.
+        """
+        if timeout is not None:
+            deadline = clock.getTime() + timeout
+        with self._cond:
+            while self.pending or self._writing:
+                if not self.is_alive():
+                    return False
+                if timeout is None:
+                    self._cond.wait()
+                    continue
+                # Condition.wait() returns None on Python 2, so check the
+                # time rather than its return value
+                remaining = deadline - clock.getTime()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def halt(self, timeout=None):
+        """Write everything that is still queued and then end the thread
+        """
+        with self._cond:
+            self._stopRequested = True
+            self._cond.notify_all()
+        if self.is_alive():
+            self.join(timeout)
+
+    def run(self):
+        while True:
+            with self._cond:
+                while not self.pending and not self._stopRequested:
+                    self._cond.wait()
+                if not self.pending:  # stop was requested and we're done
+                    break
+                batch = list(self.pending)
+                self.pending.clear()
+                self._writing = True
+                self._cond.notify_all()  # there's space in the queue again
+            try:
+                self.logger._write(batch, catchErrors=True)
+            except Exception as err:
+                # never let the thread die with entries still to write
+                sys.stderr.write(u"Could not write log entries: %r\n"
+                                 % (err,))
+            finally:
+                with self._cond:
+                    self.nWritten += len(batch)
+                    self._writing = False
+                    self._cond.notify_all()
+
+
 class _Logger(object):
     """Maintains a set of log targets (text streams such as files of stdout)
 
@@ -217,10 +590,14 @@ class _Logger(object):
 
     """
 
-    def __init__(self, format="%(t).4f \t%(levelname)s \t%(message)s"):
+    def __init__(self, format="%(t).4f \t%(levelname)s \t%(message)s",
+                 maxFlushed=None):
         """The string-formatted elements %(xxxx)f can be used, where
         each xxxx is an attribute of the LogEntry.
         e.g. t, t_ms, level, levelname, message
+
+        `maxFlushed` is the number of already-written entries to keep in
+        self.flushed (None keeps them all, 0 keeps none).
         """
         super(_Logger, self).__init__()
         self.targets = []
@@ -228,6 +605,8 @@ class _Logger(object):
         self.toFlush = []
         self.format = format
         self.lowestTarget = 50
+        self.writer = None
+        self.setMaxFlushed(maxFlushed)
 
     def __del__(self):
         self.flush()
@@ -236,6 +615,43 @@ class _Logger(object):
         # terminal or Builder output. proper fix: fix coder unicode bug #97
         # (currently closed)
 
+    def setMaxFlushed(self, maxFlushed=None):
+        """Set how many written entries are retained in self.flushed.
+
+        None keeps the full history (the default), 0 keeps nothing and
+        any other value keeps only the most recent `maxFlushed` entries.
+        """
+        if maxFlushed is None:
+            self.flushed = list(self.flushed)
+        else:
+            self.flushed = deque(self.flushed, maxlen=int(maxFlushed))
+        self.maxFlushed = maxFlushed
+
+    def startWriter(self, maxPending=10000):
+        """Start writing entries on a background thread.
+
+        Subsequent calls to flush() hand the current entries to the writer
+        thread and return immediately. `maxPending` is the number of
+        entries that can be queued before flush() has to wait for the
+        writer (0 or None for no limit).
+        """
+        if self.writer is not None:
+            self.writer.maxPending = maxPending
+            return
+        self.writer = _LogWriter(self, maxPending=maxPending)
+        self.writer.start()
+
+    def stopWriter(self):
+        """Write any outstanding entries and go back to writing
+        synchronously, on the thread that calls flush()
+        """
+        if self.writer is None:
+            return
+        writer = self.writer
+        writer.put(self._takeEntries())
+        writer.halt()
+        self.writer = None
+
     def addTarget(self, target):
         """Add a target, typically a :class:`~log.LogFile` to the logger
         """
@@ -271,35 +687,121 @@ class _Logger(object):
         self.toFlush.append(
             _LogEntry(t=t, level=level, message=message, obj=obj))
 
-    def flush(self):
-        """Process all current messages to each target
+    def _takeEntries(self):
+        """Swap out the current entries (for writing) and start a new list
+        """
+        entries = self.toFlush
+        self.toFlush = []  # a new empty list
+        return entries
+
+    def _write(self, entries, catchErrors=False):
+        """Format the entries and send them to each target, using a single
+        write (and stream flush) per target
+
+        With `catchErrors` an error writing to one target is reported on
+        sys.stderr and the other targets are still written to (as the
+        background writer must keep going).
         """
-        # loop through targets then entries in toFlush
-        # so that stream.flush can be called just once
         formatted = {}  # keep a dict - so only do the formatting once
-        for target in self.targets:
-            for thisEntry in self.toFlush:
-                if thisEntry.level >= target.level:
-                    if not thisEntry in formatted:
-                        # convert the entry into a formatted string
-                        formatted[thisEntry] = self.format % thisEntry.__dict__
-                    target.write(formatted[thisEntry] + '\n')
-            if hasattr(target.stream, 'flush'):
-                target.stream.flush()
+        for target in list(self.targets):
+            try:
+                self._writeTarget(target, entries, formatted)
+            except Exception as err:
+                if not catchErrors:
+                    raise
+                sys.stderr.write(u"Could not write log entries to %r: %r\n"
+                                 % (target, err))
         # finished processing entries - move them to self.flushed
-        self.flushed.extend(self.toFlush)
-        self.toFlush = []  # a new empty list
+        self.flushed.extend(entries)
+
+    def _writeTarget(self, target, entries, formatted):
+        if hasattr(target, 'writeEntries'):
+            # e.g. BinaryLogFile, which doesn't want formatted text
+            target.writeEntries(
+                [e for e in entries if e.level >= target.level])
+            target.stream.flush()
+            return
+        lines = []
+        for thisEntry in entries:
+            if thisEntry.level >= target.level:
+                if not thisEntry in formatted:
+                    # convert the entry into a formatted string
+                    formatted[thisEntry] = self.format % thisEntry.__dict__
+                lines.append(formatted[thisEntry] + '\n')
+        if lines:
+            target.write(''.join(lines))
+        if hasattr(target.stream, 'flush'):
+            target.stream.flush()
+
+    def flush(self, wait=False):
+        """Process all current messages to each target
+
+        If a background writer is running (see startWriter) the messages
+        are handed to it and this returns straight away, unless `wait` is
+        True in which case it returns once everything has been written.
+        """
+        entries = self._takeEntries()
+        writer = self.writer
+        if writer is not None and writer.is_alive():
+            writer.put(entries)
+            if wait:
+                writer.wait()
+        else:
+            self._write(entries)
 
 root = _Logger()
 console = LogFile()
 
 
-def flush(logger=root):
+def flush(logger=root, wait=False):
     """Send current messages in the log to all targets
+
+    When using a background writer (see :func:`setAsyncWriter`) the
+    messages are handed over to the writer thread and this returns
+    immediately, unless `wait` is True.
+    """
+    logger.flush(wait=wait)
+
+
+def setAsyncWriter(enabled=True, maxPending=10000, maxFlushed=None,
+                   logger=root):
+    """Write log entries on a background thread, rather than on the
+    thread that calls :func:`flush` (typically the one drawing your
+    stimuli).
+
+    :parameters:
+
+        - enabled:
+            True to start the background writer, False to write any
+            outstanding entries and return to synchronous writing
+
+        - maxPending:
+            how many entries can be waiting for the writer before
+            :func:`flush` has to wait for it to catch up (None for no limit)
+
+        - maxFlushed:
+            how many written entries the logger should retain in memory.
+            None keeps the whole history (as in synchronous mode), 0 keeps
+            none of them
+
+    Everything that has been logged is still written when python exits.
+    Note that targets are then written from another thread, so they
+    should be files or streams that don't mind that (not GUI widgets).
     """
-    logger.flush()
+    logger.setMaxFlushed(maxFlushed)
+    if enabled:
+        logger.startWriter(maxPending=maxPending)
+    else:
+        logger.stopWriter()
+
+
+def _flushAtExit():
+    # write anything outstanding, including whatever the writer thread is
+    # still holding, before the interpreter goes away
+    flush()
+    root.stopWriter()
 # make sure this function gets called as python closes
-atexit.register(flush)
+atexit.register(_flushAtExit)
 
 
 def critical(msg, t=None, obj=None):
@@ -66,11 +66,13 @@ class HammingWindow(object):
         self.endWindow = numpy.hanning(self.winSamples*2)[self.winSamples:]
         self.finalWinStart = self.soundSamples-self.winSamples
 
-    def nextBlock(self, t, blockSize):
+    def nextBlock(self, t, blockSize, out=None):
         """Returns a block to be multiplied with the current sound block or 1.0
 
         :param t: current position in time (secs)
         :param blockSize: block size for the sound needing the hanning window
+        :param out: optional 1D array (of at least blockSize) to fill, rather
+                    than allocating a new one
         :return: numpy array of length blockSize
         """
         startSample = int(t*self.sampleRate)
@@ -79,7 +81,7 @@ class HammingWindow(object):
             # 2 options:
             #  - block is fully within window
             #  - block starts in window but ends after window
-            block = numpy.ones(blockSize)
+            block = self._ones(blockSize, out)
             winEndII = min(self.winSamples,  # if block goes beyond hann win
                            startSample+blockSize)  # if block shorter
             blockEndII = min(self.winSamples-startSample,  # if block beyond
@@ -93,7 +95,7 @@ class HammingWindow(object):
             #  - block starts before win
             #  - start/end during win
             #  - start during but end after win
-            block = numpy.ones(blockSize)  # the initial flat part
+            block = self._ones(blockSize, out)  # the initial flat part
             blockStartII = max(self.finalWinStart-startSample,
                          0)  # if block start inside window
             blockEndII = min(blockSize,  # if block ends in hann win
@@ -110,6 +112,14 @@ class HammingWindow(object):
             block.shape = [len(block), 1]
         return block
 
+    @staticmethod
+    def _ones(blockSize, out):
+        if out is None:
+            return numpy.ones(blockSize)
+        block = out[:blockSize]
+        block.fill(1.0)
+        return block
+
 class _SoundBase(object):
     """Base class for sound object, from one of many ways.
     """
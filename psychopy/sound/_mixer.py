@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""Block mixing for the sounddevice backend.
+
+The audio callback runs every few ms, so nothing here allocates sample
+buffers once a stream is running: each source is rendered into its own
+slice of a preallocated block array and the slices are summed, with their
+volumes, in a single vectorised step. The same code renders sounds
+offline (`Mixer.render`), which is how it is tested without a sound card.
+"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+from __future__ import absolute_import, division, print_function
+
+from builtins import object
+import threading
+
+import numpy as np
+
+_TABLE_SIZE = 4096
+# one period of a sine, with a guard point so index+1 never wraps
+_sineTable = np.sin(np.arange(_TABLE_SIZE + 1) * 2 * np.pi / _TABLE_SIZE)
+_sineSlopes = np.diff(_sineTable)
+
+
+class WavetableOscillator(object):
+    """Sine tone synthesis from a wavetable, one block at a time.
+
+    A phase accumulator holds the table position of the next sample, so
+    the tone stays continuous across blocks and its precision doesn't
+    degrade as playback time grows. Samples are linearly interpolated from
+    the table (error < 1e-6).
+    """
+
+    def __init__(self, freq, sampleRate, blockSize):
+        self.freq = freq
+        self.sampleRate = sampleRate
+        self.blockSize = blockSize
+        self._increment = freq * _TABLE_SIZE / float(sampleRate)
+        self._offsets = np.arange(blockSize) * self._increment
+        self._position = np.empty(blockSize)
+        self._index = np.empty(blockSize, dtype=np.intp)
+        self._slope = np.empty(blockSize)
+        self.block = np.empty(blockSize)
+        self.column = self.block[:, np.newaxis]  # for broadcasting
+        self.phase = 0.0
+
+    def seek(self, t):
+        """Set the phase to that of time `t` (s) in the tone"""
+        self.phase = (self.freq * t) % 1.0 * _TABLE_SIZE
+
+    def fill(self):
+        """Synthesise the next block into (and return) `self.block`"""
+        pos = self._position
+        np.add(self._offsets, self.phase, out=pos)
+        np.fmod(pos, _TABLE_SIZE, out=pos)
+        np.floor(pos, out=self.block)
+        self._index[...] = self.block
+        pos -= self.block  # fractional part
+        np.take(_sineTable, self._index, out=self.block, mode='clip')
+        np.take(_sineSlopes, self._index, out=self._slope, mode='clip')
+        self._slope *= pos
+        self.block += self._slope
+        self.phase = ((self.phase + self.blockSize * self._increment)
+                      % _TABLE_SIZE)
+        return self.block
+
+
+class _MixerInput(object):
+    __slots__ = ('source', 'volume')
+
+    def __init__(self, source):
+        self.source = source
+        self.volume = float(source.volume)  # volume of the last block
+
+
+class Mixer(object):
+    """Sums the blocks of all the sounds playing on a stream.
+
+    Sources need a `volume` attribute and a `_fillBlock(out)` method that
+    writes their next block into `out` (a blockSize x channels float32
+    array) and returns the number of frames written. A source that writes
+    fewer than blockSize frames has finished: it is removed and its `_EOS()`
+    method, if any, is called.
+
+    A change of volume is ramped linearly over one block rather than
+    applied as a step, which would click.
+
+    Sources can be added and removed from any thread, including from the
+    audio callback (where finished sources are removed).
+
+    `nUnderruns` and `nOverruns` count the blocks for which the audio driver
+    reported an output underflow or overflow.
+    """
+
+    def __init__(self, channels, blockSize, maxSources=8):
+        self.channels = channels
+        self.blockSize = blockSize
+        self._inputs = ()  # replaced, never modified, so the callback can
+        # iterate over it while sounds are added from the main thread
+        self._lock = threading.Lock()  # held to replace _inputs
+        self._allocate(maxSources)
+        self._ramp = (np.arange(1, blockSize + 1, dtype=np.float32) /
+                      blockSize)
+        self._mix = np.zeros((blockSize, channels), dtype=np.float32)
+        self.nBlocks = 0
+        self.nUnderruns = 0
+        self.nOverruns = 0
+
+    def _allocate(self, maxSources):
+        self._gains = np.ones((maxSources, self.blockSize), dtype=np.float32)
+        self._blocks = np.zeros((maxSources, self.blockSize, self.channels),
+                                dtype=np.float32)
+        self.maxSources = maxSources
+
+    @property
+    def sources(self):
+        """The sources currently being mixed"""
+        return [thisInput.source for thisInput in self._inputs]
+
+    def add(self, source):
+        with self._lock:
+            for thisInput in self._inputs:
+                if thisInput.source is source:
+                    return
+            inputs = self._inputs + (_MixerInput(source),)
+            if len(inputs) > self.maxSources:
+                # buffers must exist before the callback can see the input
+                self._allocate(self.maxSources * 2)
+            self._inputs = inputs
+
+    def remove(self, source):
+        with self._lock:
+            self._inputs = tuple(thisInput for thisInput in self._inputs
+                                 if thisInput.source is not source)
+
+    def mix(self, out, status=None):
+        """Fill `out` (blockSize x channels) with the next block of the mix.
+
+        `status` is the status flags passed to a sounddevice callback.
+        """
+        if status:
+            if status.output_underflow:
+                self.nUnderruns += 1
+            if status.output_overflow:
+                self.nOverruns += 1
+        self.nBlocks += 1
+        inputs = self._inputs  # must be fetched before the buffers
+        blocks = self._blocks
+        gains = self._gains
+        finished = None
+        for ii, thisInput in enumerate(inputs):
+            source = thisInput.source
+            block = blocks[ii]
+            nFrames = source._fillBlock(block)
+            if nFrames < self.blockSize:
+                block[nFrames:] = 0
+                if finished is None:
+                    finished = []
+                finished.append(source)
+            volume = float(source.volume)
+            gain = gains[ii]
+            if volume == thisInput.volume:
+                gain.fill(volume)
+            else:
+                np.multiply(self._ramp, volume - thisInput.volume, out=gain)
+                gain += thisInput.volume
+                thisInput.volume = volume
+        nInputs = len(inputs)
+        if nInputs:
+            np.einsum('sf,sfc->fc', gains[:nInputs], blocks[:nInputs],
+                      out=self._mix)
+            out[...] = self._mix
+        else:
+            out.fill(0)
+        if finished:
+            for source in finished:
+                self.remove(source)
+                if hasattr(source, '_EOS'):
+                    source._EOS()
+
+    def render(self, nFrames):
+        """Mix `nFrames` frames offline, as the audio callback would have.
+
+        Returns an nFrames x channels float32 array.
+        """
+        out = np.zeros((nFrames, self.channels), dtype=np.float32)
+        for start in range(0, nFrames, self.blockSize):
+            stop = min(start + self.blockSize, nFrames)
+            if stop - start == self.blockSize:
+                self.mix(out[start:stop])
+            else:
+                self.mix(self._mix)
+                out[start:stop] = self._mix[:stop - start]
+        return out
@@ -9,6 +9,8 @@ import sys
 import os
 import time
 import re
+import struct
+from collections import OrderedDict, namedtuple
 try:
     import readline  # Work around GH-2230
 except ImportError:
@@ -19,6 +21,7 @@ from psychopy.constants import (PLAYING, PAUSED, FINISHED, STOPPED,
                                 NOT_STARTED)
 from psychopy.exceptions import SoundFormatError, DependencyError
 from ._base import _SoundBase, HammingWindow
+from ._mixer import Mixer, WavetableOscillator
 
 try:
     import sounddevice as sd
@@ -142,6 +145,141 @@ class _StreamsDict(dict):
 streams = _StreamsDict()
 
 
+DecodedAudio = namedtuple('DecodedAudio',
+                          ['data', 'sampleRate', 'duration', 'scale'])
+
+# numpy dtype and scale to [-1, 1] for the WAV subtypes we can memory-map
+_wavSubtypes = {'PCM_16': ('<i2', 1.0 / 2**15),
+                'PCM_32': ('<i4', 1.0 / 2**31),
+                'FLOAT': ('<f4', None),
+                'DOUBLE': ('<f8', None)}
+
+
+def _wavDataOffset(filename):
+    """Returns the byte offset of the samples in a RIFF WAV file, or None
+    """
+    with open(filename, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            return None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunkID, chunkSize = struct.unpack('<4sI', header)
+            if chunkID == b'data':
+                return f.tell()
+            f.seek(chunkSize + chunkSize % 2, 1)  # chunks are word aligned
+
+
+class _DecodedAudioCache(object):
+    """Decoded sound files, shared by all the sounds that play them.
+
+    Sounds using the same file (and start/stop times and channels) get
+    read-only views of one array, so a file used on every trial is decoded
+    once. Arrays are kept up to a total of `maxBytes`, and up to
+    `maxEntries` of them, least recently used arrays being dropped first
+    (sounds still using them keep them alive). Set `maxBytes` to 0 to stop
+    caching.
+
+    WAV files larger than `mmapMinBytes` are memory-mapped rather than read
+    into memory (unless a mono file is played in stereo). Their samples may
+    then be integers, to be multiplied by the `scale` of the DecodedAudio.
+    Set `mmapMinBytes` to None to always read files into memory.
+
+    Use the instance `audioCache` rather than creating a new instance.
+    """
+
+    def __init__(self, maxBytes=256 * 2**20, mmapMinBytes=16 * 2**20,
+                 maxEntries=128):
+        self.maxBytes = maxBytes
+        self.maxEntries = maxEntries  # memory-mapped files count 0 bytes
+        self.mmapMinBytes = mmapMinBytes
+        self.nBytes = 0
+        self._entries = OrderedDict()  # key: (DecodedAudio, nBytes)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, filename, channels=-1, startTime=0, stopTime=-1):
+        """Returns a DecodedAudio for the section of the file from
+        `startTime` to `stopTime` (s; -1 for the end), with a read-only
+        frames x channels array as its `data`.
+        """
+        filename = os.path.abspath(filename)
+        stat = os.stat(filename)
+        key = (filename, stat.st_mtime, stat.st_size, channels,
+               startTime or 0, stopTime or -1)
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries[key] = self._entries.pop(key)  # most recently used
+            audio = cached[0]
+        else:
+            audio = self._decode(filename, channels, startTime, stopTime)
+            nBytes = 0 if isinstance(audio.data, np.memmap) \
+                else audio.data.nbytes
+            if self.maxBytes and nBytes <= self.maxBytes:
+                self._entries[key] = (audio, nBytes)
+                self.nBytes += nBytes
+                self._evict()
+        # a new view, so that each sound can reshape its own
+        return audio._replace(data=audio.data.view())
+
+    def _decode(self, filename, channels, startTime, stopTime):
+        with sf.SoundFile(filename) as f:
+            fileDuration = float(len(f)) / f.samplerate
+            if startTime and startTime > 0:
+                startFrame = int(startTime * f.samplerate)
+                t = startTime
+            else:
+                startFrame = 0
+                t = 0
+            if stopTime and stopTime > 0:
+                duration = min(stopTime - t, fileDuration)
+            else:
+                duration = fileDuration - t
+            nFrames = int(f.samplerate * duration)
+            data, scale = self._mapWav(f, filename, startFrame, nFrames,
+                                       channels)
+            if data is None:
+                f.seek(startFrame)
+                data = f.read(frames=nFrames, dtype='float32',
+                              always_2d=True)
+                if channels == 2 and data.shape[1] == 1:
+                    data = data.repeat(2, axis=1)
+                data.flags.writeable = False
+        return DecodedAudio(data, f.samplerate, duration, scale)
+
+    def _mapWav(self, f, filename, startFrame, nFrames, channels):
+        if (self.mmapMinBytes is None or f.format != 'WAV' or
+                f.subtype not in _wavSubtypes or
+                (channels == 2 and f.channels == 1)):
+            return None, None
+        dtype, scale = _wavSubtypes[f.subtype]
+        if nFrames * f.channels * np.dtype(dtype).itemsize < self.mmapMinBytes:
+            return None, None
+        offset = _wavDataOffset(filename)
+        if offset is None:
+            return None, None
+        data = np.memmap(filename, dtype=dtype, mode='r', offset=offset,
+                         shape=(len(f), f.channels))
+        return data[startFrame:startFrame + nFrames], scale
+
+    def _evict(self):
+        while self._entries and (self.nBytes > self.maxBytes or
+                                 len(self._entries) > self.maxEntries):
+            _, (audio, nBytes) = self._entries.popitem(last=False)
+            self.nBytes -= nBytes
+
+    def clear(self):
+        """Drop all the cached sounds"""
+        self._entries.clear()
+        self.nBytes = 0
+
+
+audioCache = _DecodedAudioCache()
+
+
 class _SoundStream(object):
     def __init__(self, sampleRate, channels, blockSize,
                  device=None, duplex=False):
@@ -156,7 +294,7 @@ class _SoundStream(object):
         self.label = getStreamLabel(sampleRate, channels, blockSize)
         if device == 'default':
             device = None
-        self.sounds = []  # list of dicts for sounds currently playing
+        self.mixer = Mixer(channels, blockSize)
         self.takeTimeStamp = False
         self.frameN = 1
         # self.frameTimes = range(5)  # DEBUGGING: store the last 5 callbacks
@@ -190,46 +328,36 @@ class _SoundStream(object):
             logging.info("Entered callback: {} ms after sound start"
                          .format(
                 (time.time() - self._tSoundRequestPlay) * 1000))
-        t0 = time.time()
         self.frameN += 1
-        toSpk.fill(0)
-        for thisSound in list(self.sounds): # copy (Py2 doesn't have list.copy)
-            dat = thisSound._nextBlock()  # fetch the next block of data
-            dat *= thisSound.volume  # Set the volume block by block
-            if self.channels == 2 and len(dat.shape) == 2:
-                toSpk[:len(dat), :] += dat  # add to out stream
-            elif self.channels == 2 and len(dat.shape) == 1:
-                toSpk[:len(dat), 0] += dat  # add to out stream
-                toSpk[:len(dat), 1] += dat  # add to out stream
-            elif self.channels == 1 and len(dat.shape) == 2:
-                toSpk[:len(dat), :] += dat  # add to out stream
-            else:
-                toSpk[:len(dat), 0] += dat  # add to out stream
-            # check if that was a short block (sound is finished)
-            if len(dat) < len(toSpk[:, :]):
-                self.remove(thisSound)
-                thisSound._EOS()
-                # check if that took a long time
-                # t1 = time.time()
-                # if (t1-t0) > 0.001:
-                #     logging.debug("buffer_callback took {:.3f}ms that frame"
-                #                  .format((t1-t0)*1000))
-                # self.frameTimes.pop(0)
-                # if hasattr(self, 'lastFrameTime'):
-                #     self.frameTimes.append(time.time()-self.lastFrameTime)
-                # self.lastFrameTime = time.time()
-                # if self.takeTimeStamp:
-                #     logging.debug("Callback durations: {}".format(self.frameTimes))
-                #     self.takeTimeStamp = False
+        self.mixer.mix(toSpk, status)
+
+    @property
+    def sounds(self):
+        """The sounds currently playing on this stream"""
+        return self.mixer.sources
+
+    @property
+    def nUnderruns(self):
+        """Number of blocks for which the sound card ran out of data"""
+        return self.mixer.nUnderruns
+
+    @property
+    def nOverruns(self):
+        """Number of blocks for which the sound card reported an overflow"""
+        return self.mixer.nOverruns
+
+    def render(self, nFrames):
+        """Mixes the next `nFrames` frames of the playing sounds and returns
+        them (nFrames x channels), without using the sound card. Useful for
+        testing, or on systems without an audio device.
+        """
+        return self.mixer.render(nFrames)
 
     def add(self, sound):
-        # t0 = time.time()
-        self.sounds.append(sound)
-        # logging.debug("took {} ms to add".format((time.time()-t0)*1000))
+        self.mixer.add(sound)
 
     def remove(self, sound):
-        if sound in self.sounds:
-            self.sounds.remove(sound)
+        self.mixer.remove(sound)
 
     def __del__(self):
         if hasattr(self, '_sdStream'):
@@ -300,6 +428,8 @@ class SoundDeviceSound(_SoundBase):
         self.sndArr = None
         self.hamming = hamming
         self._hammingWindow = None  # will be created during setSound
+        self._osc = None  # tone synthesis, for freq sounds
+        self._sndScale = None  # for integer samples (see audioCache)
 
         # setSound (determines sound type)
         self.setSound(value, secs=self.secs, octave=self.octave,
@@ -378,8 +508,41 @@ class SoundDeviceSound(_SoundBase):
             self._hammingWindow = HammingWindow(winSecs=hammDur,
                                                 soundSecs=self.secs,
                                                 sampleRate=self.sampleRate)
+        else:
+            self._hammingWindow = None
+        self._allocateBlocks()
+
+    def _allocateBlocks(self):
+        """Creates the buffers used to fill each block, so that playing the
+        sound doesn't allocate memory in the audio callback
+        """
+        self._winBlock = np.ones(self.blockSize)
+        if self.sourceType == 'freq':
+            self._osc = WavetableOscillator(self.freq, self.sampleRate,
+                                            self.blockSize)
+            self._osc.seek(self.t)
+        else:
+            self._osc = None
+        if self.sourceType == 'file' and self.preBuffer == 0:
+            self._fileBlock = np.zeros(
+                (self.blockSize, self.sndFile.channels), dtype=np.float32)
 
     def _setSndFromFile(self, filename):
+        if self.preBuffer == -1:
+            # full pre-buffer, shared with other sounds using this file
+            audio = audioCache.get(filename, channels=self.channels,
+                                   startTime=self.startTime,
+                                   stopTime=self.stopTime)
+            self.sndFile = None
+            self.sampleRate = audio.sampleRate
+            if self.channels == -1:  # if channels was auto then set to file val
+                self.channels = audio.data.shape[1]
+            self.duration = audio.duration
+            self.durationFrames = int(round(self.duration * self.sampleRate))
+            self._setSndFromArray(audio.data)
+            self._sndScale = audio.scale
+            self._channelCheck(self.sndArr)
+            return
         self.sndFile = f = sf.SoundFile(filename)
         self.sourceType = 'file'
         self.sampleRate = f.samplerate
@@ -401,16 +564,7 @@ class SoundDeviceSound(_SoundBase):
             self.duration = fileDuration - self.t
         # can now calculate duration in frames
         self.durationFrames = int(round(self.duration * self.sampleRate))
-        # are we preloading or streaming?
-        if self.preBuffer == 0:
-            # no buffer - stream from disk on each call to nextBlock
-            pass
-        elif self.preBuffer == -1:
-            # full pre-buffer. Load requested duration to memory
-            sndArr = self.sndFile.read(
-                frames=int(self.sampleRate * self.duration))
-            self.sndFile.close()
-            self._setSndFromArray(sndArr)
+        # no buffer - stream from disk on each call to nextBlock
         self._channelCheck(self.sndArr)  # Check for fewer channels in stream vs data array
 
     def _setSndFromFreq(self, thisFreq, secs, hamming=True):
@@ -425,6 +579,7 @@ class SoundDeviceSound(_SoundBase):
     def _setSndFromArray(self, thisArray):
 
         self.sndArr = np.asarray(thisArray)
+        self._sndScale = None
         if thisArray.ndim == 1:
             self.sndArr.shape = [len(thisArray), 1]  # make 2D for broadcasting
         if self.channels == 2 and self.sndArr.shape[1] == 1:  # mono -> stereo
@@ -488,68 +643,70 @@ class SoundDeviceSound(_SoundBase):
             self.seek(0)
         self.status = STOPPED
 
-    def _nextBlock(self):
+    def _fillBlock(self, out):
+        """Writes the next block of the sound into `out` (a blockSize x
+        channels array, owned by the stream's mixer) and returns the number
+        of frames written. Fewer than blockSize frames means the sound has
+        finished. The sound data (e.g. self.sndArr) is never modified.
+        """
         if self.status == STOPPED:
-            return
-        samplesLeft = int((self.stopTime - self.t) * self.sampleRate)
-        nSamples = min(self.blockSize, samplesLeft)
+            return 0
+        blockSize = len(out)
+        if self.sourceType == 'freq':
+            nFrames = int(round((self.secs - self.t) * self.sampleRate))
+        elif self.stopTime and self.stopTime > 0:
+            nFrames = int((self.stopTime - self.t) * self.sampleRate)
+        else:
+            nFrames = blockSize
+        nFrames = max(0, min(blockSize, nFrames))
+
         if self.sourceType == 'file' and self.preBuffer == 0:
             # streaming sound block-by-block direct from file
-            block = self.sndFile.read(nSamples)
-            # TODO: check if we already finished using sndFile?
+            fileBlock = self._fileBlock[:nFrames]
+            nFrames = len(self.sndFile.read(out=fileBlock, dtype='float32'))
+            out[:nFrames] = fileBlock[:nFrames]
         elif (self.sourceType == 'file' and self.preBuffer == -1) \
                 or self.sourceType == 'array':
             # An array, or a file entirely loaded into an array
             ii = int(round(self.t * self.sampleRate))
-            if self.stereo == 1:  # don't treat as boolean. Might be -1
-                block = self.sndArr[ii:ii + nSamples, :]
-            elif self.stereo == 0:
-                block = self.sndArr[ii:ii + nSamples]
-            else:
-                raise IOError("Unknown stereo type {!r}"
-                              .format(self.stereo))
-            if ii + nSamples > len(self.sndArr):
-                self._EOS()
-
+            nFrames = max(0, min(nFrames, len(self.sndArr) - ii))
+            out[:nFrames] = self.sndArr[ii:ii + nFrames]
+            if self._sndScale is not None:  # memory-mapped integer samples
+                out[:nFrames] *= self._sndScale
         elif self.sourceType == 'freq':
-            startT = self.t
-            stopT = self.t + self.blockSize/float(self.sampleRate)
-            xx = np.linspace(
-                start=startT * self.freq * 2 * np.pi,
-                stop=stopT * self.freq * 2 * np.pi,
-                num=self.blockSize, endpoint=False
-            )
-            xx.shape = [self.blockSize, 1]
-            block = np.sin(xx)
-            # if run beyond our desired t then set to zeros
-            if stopT > (self.secs):
-                tRange = np.linspace(startT, self.blockSize*self.sampleRate,
-                                     num=self.blockSize, endpoint=False)
-                block[tRange > self.secs] = 0
-                # and inform our EOS function that we finished
-                self._EOS(reset=False)  # don't set t=0
-
+            self._osc.fill()
+            out[...] = self._osc.column
         else:
-            raise IOError("SoundDeviceSound._nextBlock doesn't correctly handle"
+            raise IOError("SoundDeviceSound._fillBlock doesn't correctly handle"
                           "{!r} sounds yet".format(self.sourceType))
 
         if self._hammingWindow:
-            thisWin = self._hammingWindow.nextBlock(self.t, self.blockSize)
+            thisWin = self._hammingWindow.nextBlock(self.t, blockSize,
+                                                    out=self._winBlock)
             if thisWin is not None:
-                if len(block) == len(thisWin):
-                    block *= thisWin
-                elif block.shape[0] == 0:
-                    pass
-                else:
-                    block *= thisWin[0:len(block)]
-        self.t += self.blockSize/float(self.sampleRate)
-        return block
+                out[:nFrames] *= thisWin[:nFrames]
+        self.t += blockSize/float(self.sampleRate)
+        return nFrames
+
+    def _nextBlock(self):
+        """Returns the next block of the sound as a new array (the stream's
+        mixer uses _fillBlock instead)
+        """
+        if self.status == STOPPED:
+            return
+        block = np.zeros((self.blockSize, max(self.channels, 1)))
+        nFrames = self._fillBlock(block)
+        if nFrames < self.blockSize:
+            self._EOS()
+        return block[:nFrames]
 
     def seek(self, t):
         self.t = t
         self.frameN = int(round(t * self.sampleRate))
         if self.sndFile and not self.sndFile.closed:
             self.sndFile.seek(self.frameN)
+        if self._osc is not None:
+            self._osc.seek(t)
 
     def _EOS(self, reset=True):
         """Function called on End Of Stream
@@ -0,0 +1,79 @@
+"""Tests for the partial updates of ElementArrayStim (no window needed)
+"""
+import numpy
+
+from psychopy.tools import gltools
+from psychopy.visual.elementarray import ElementArrayStim
+
+
+def _stim(nElements=10):
+    """An ElementArrayStim with just the state used by the update logic"""
+    stim = ElementArrayStim.__new__(ElementArrayStim)
+    stim.__dict__.update(nElements=nElements, _dirty={}, _vbos=None,
+                         _needVertexUpdate=False, _needColorUpdate=False,
+                         _needTexCoordUpdate=False)
+    return stim
+
+
+def test_markDirty():
+    stim = _stim()
+    old = numpy.zeros((10, 2))
+    new = old.copy()
+    stim._markDirty('vertices', old, new.copy())  # nothing changed
+    assert stim._dirty == {} and not stim._needVertexUpdate
+
+    new[3] = 1
+    new[5, 1] = 1
+    stim._markDirty('vertices', old, new)
+    assert stim._dirty == {'vertices': (3, 6)}
+    assert stim._needVertexUpdate and not stim._needColorUpdate
+    # ranges are merged until they are used
+    old, new = new, new.copy()
+    new[8] = 2
+    stim._markDirty('vertices', old, new)
+    assert stim._dirty['vertices'] == (3, 9)
+    assert stim._dirtyRange('vertices') == (3, 9)
+    assert stim._dirtyRange('vertices') == (0, 10)  # all by default
+
+    # all the elements, when the values can't be compared
+    stim._markDirty('colors')
+    assert stim._dirty == {'colors': (0, 10)} and stim._needColorUpdate
+    stim._dirty.clear()
+    stim._markDirty('texCoords', old, numpy.zeros((12, 2)))
+    assert stim._dirty == {'texCoords': (0, 10)}
+    stim._dirty.clear()
+    stim._markDirty('texCoords', numpy.zeros(10), numpy.ones(10))
+    assert stim._dirty == {'texCoords': (0, 10)}
+
+
+def test_uploadVBO(monkeypatch):
+    updates, deleted = [], []
+    monkeypatch.setattr(gltools, 'updateVBO',
+                        lambda vbo, data, offset=0: updates.append(
+                            (vbo.id, data.size, offset)))
+    monkeypatch.setattr(gltools, 'deleteVBO',
+                        lambda vbo: deleted.append(vbo.id))
+
+    def vbo(name, size, nElements=10):
+        count = nElements * 4 * size
+        return gltools.VertexBufferObject(name, size, count, count // size,
+                                          None, None, dict())
+
+    stim = _stim()
+    stim._vbos = dict(vertices=vbo('vertices', 3), colors=vbo('colors', 4))
+    verts = numpy.zeros((10, 4, 3))
+    # only the values of the changed elements are copied
+    stim._uploadVBO('vertices', verts[0:2], 0)
+    stim._uploadVBO('vertices', verts[4:7], 4)
+    assert updates == [('vertices', 24, 0), ('vertices', 36, 48)]
+    stim._uploadVBO('vertices', verts, 0)
+    assert updates[-1] == ('vertices', 120, 0)
+    assert deleted == [] and stim._vbos is not None
+
+    # once nElements has changed the VBOs are made again
+    stim.nElements = 12
+    stim._uploadVBO('colors', numpy.zeros((12, 4, 4)), 0)
+    assert sorted(deleted) == ['colors', 'vertices']
+    assert stim._vbos is None
+    stim._uploadVBO('colors', numpy.zeros((12, 4, 4)), 0)  # no VBOs to update
+    assert len(updates) == 3
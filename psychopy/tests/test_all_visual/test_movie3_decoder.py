@@ -0,0 +1,118 @@
+"""Tests for the background frame decoder of MovieStim3 (no window needed)
+"""
+import threading
+import time
+
+import numpy
+import pytest
+
+movie3 = pytest.importorskip('psychopy.visual.movie3')
+
+
+class _Clip(object):
+    """A stand in for a moviepy clip, whose frames are filled with the
+    frame number (at 10 fps)"""
+    w, h = 4, 2
+
+    def __init__(self, missing=()):
+        self.missing = missing
+        self.decoded = []
+
+    def get_frame(self, t):
+        frameN = int(round(t * 10))
+        self.decoded.append(frameN)
+        if frameN in self.missing:
+            raise OSError('no frame')
+        return numpy.full((self.h, self.w, 3), frameN, numpy.uint8)
+
+
+def _waitForDecoder(decoder, timeout=5.0):
+    """Wait until the decoder has no free buffers or has reached the end"""
+    t0 = time.time()
+    while time.time() - t0 < timeout:
+        with decoder._cond:
+            if not decoder._free or decoder._nextT > decoder._duration:
+                return
+        time.sleep(0.005)
+    raise AssertionError('the decoder never stopped')
+
+
+@pytest.fixture
+def decoder():
+    decoders = []
+
+    def make(clip, duration=1.0, queueSize=4):
+        decoder = movie3._FrameDecoder(clip, 0.1, duration,
+                                       queueSize=queueSize)
+        decoder.start()
+        decoders.append(decoder)
+        return decoder
+    yield make
+    for decoder in decoders:
+        decoder.stop()
+
+
+def test_queue(decoder):
+    clip = _Clip()
+    dec = decoder(clip)
+    frameT, buf, nSkipped = dec.getFrame(0.0, wait=True)
+    assert frameT == 0.0 and nSkipped == 0
+    assert numpy.all(buf == 0)
+    # the decoder stops queueSize frames ahead of the frame that is held
+    _waitForDecoder(dec)
+    assert [round(frameT, 3) for frameT, b in dec._ready] == [
+        0.1, 0.2, 0.3, 0.4]
+    dec.release(buf)
+
+    # frames that are due together: the older ones are skipped
+    frameT, buf, nSkipped = dec.getFrame(0.3)
+    assert frameT == pytest.approx(0.3) and nSkipped == 2
+    assert numpy.all(buf == 3)
+    assert dec.getFrame(0.3) is None  # nothing more due yet
+    dec.release(buf)
+    # no buffers are lost or made
+    _waitForDecoder(dec)
+    assert len(dec._free) + len(dec._ready) == 5
+
+
+def test_seek(decoder):
+    clip = _Clip()
+    dec = decoder(clip, duration=0.95)
+    _waitForDecoder(dec)
+    dec.seek(0.7)
+    assert dec.getFrame(0.0) is None  # the queued frames were dropped
+    frameT, buf, nSkipped = dec.getFrame(0.7, wait=True)
+    assert frameT == pytest.approx(0.7) and numpy.all(buf == 7)
+    dec.release(buf)
+    # decoding ends at the duration of the clip
+    _waitForDecoder(dec)
+    assert max(clip.decoded) == 9
+    assert [round(frameT, 3) for frameT, b in dec._ready] == [0.8, 0.9]
+
+
+def test_missing_frame(decoder):
+    dec = decoder(_Clip(missing=[1]), duration=0.25)
+    _waitForDecoder(dec)
+    times = []
+    while dec._ready:
+        frameT, buf, nSkipped = dec.getFrame(dec._ready[0][0])
+        times.append(round(frameT, 3))
+        dec.release(buf)
+    assert times == [0.0, 0.2]
+
+
+def test_wait_timeout(decoder):
+    class _SlowClip(_Clip):
+        def get_frame(self, t):
+            if t > 0:
+                resume.wait()
+            return _Clip.get_frame(self, t)
+    resume = threading.Event()
+    try:
+        dec = decoder(_SlowClip())
+        frameT, buf, nSkipped = dec.getFrame(0.0, wait=True)
+        t0 = time.time()
+        assert dec.getFrame(0.5, wait=True, timeout=0.2) is None
+        assert 0.15 < time.time() - t0 < 2.0
+    finally:
+        resume.set()
@@ -0,0 +1,122 @@
+"""Tests for the noise samples and noise banks of NoiseStim
+"""
+import multiprocessing
+
+import numpy
+
+from psychopy import visual
+from psychopy.visual import noise
+
+
+def _whiteSpectrum(size):
+    spectrum = numpy.ones((size, size))
+    spectrum[0, 0] = 0
+    return spectrum
+
+
+def test_makeNoiseSample():
+    rng = numpy.random.RandomState
+    binaryValues = numpy.repeat([1.0, -1.0], 12)
+    for noiseType, noiseTex in [('Binary', binaryValues), ('Normal', None),
+                                ('uniform', None)]:
+        sample = noise._makeNoiseSample(noiseType, noiseTex, None, (6, 4),
+                                        3.0, rng=rng(1))
+        assert sample.shape == (4, 6)
+        again = noise._makeNoiseSample(noiseType, noiseTex, None, (6, 4),
+                                       3.0, rng=rng(1))
+        assert numpy.all(sample == again)
+    # binary noise is a shuffle of the values
+    sample = noise._makeNoiseSample('Binary', binaryValues, None, (6, 4),
+                                    3.0, rng=rng(2))
+    assert sorted(sample.ravel()) == sorted(binaryValues)
+    sample = noise._makeNoiseSample('Uniform', None, None, (6, 4), 3.0)
+    assert sample.min() >= -1 and sample.max() <= 1
+
+    # Fourier based noise is clipped at noiseClip * its rms contrast
+    sample = noise._makeNoiseSample('White', _whiteSpectrum(32), 32, None,
+                                    2.0, rng=rng(3))
+    assert sample.shape == (32, 32)
+    assert sample.min() >= -1 and sample.max() <= 1
+    assert numpy.isclose(numpy.abs(sample).max(), 1)
+    other = noise._makeNoiseSample('White', _whiteSpectrum(32), 32, None,
+                                   2.0, rng=rng(4))
+    assert not numpy.all(sample == other)
+
+
+def test_bankSamples_in_workers():
+    # bank samples depend only on their seed, not on where they're made
+    sampleArgs = ('White', _whiteSpectrum(16), 16, None, 3.0)
+    seeds = [(5, n) for n in range(4)]
+    local = [noise._makeBankSample(sampleArgs, seed) for seed in seeds]
+    assert local[0].dtype == numpy.float32
+    assert not numpy.all(local[0] == local[1])
+    pool = multiprocessing.Pool(2, noise._initBankWorker, (sampleArgs,))
+    try:
+        remote = pool.map(noise._makeWorkerBankSample, seeds)
+    finally:
+        pool.terminate()
+    for ours, theirs in zip(local, remote):
+        assert numpy.all(ours == theirs)
+
+
+class Test_noiseBank(object):
+    def setup_class(self):
+        self.win = visual.Window([128, 128], pos=[50, 50], allowGUI=False,
+                                 autoLog=False)
+
+    def teardown_class(self):
+        self.win.close()
+
+    def _stim(self, noiseType='Filtered'):
+        return visual.NoiseStim(self.win, units='pix', size=(64, 64),
+                                texRes=64, noiseType=noiseType,
+                                noiseElementSize=4, noiseFilterLower=0.05,
+                                noiseFilterUpper=0.2, noiseFilterOrder=1,
+                                noiseClip=3.0, autoLog=False)
+
+    def test_bank(self):
+        for noiseType in ['Filtered', 'Binary']:
+            self._testBank(noiseType)
+
+    def _testBank(self, noiseType):
+        stim = self._stim(noiseType)
+        stim.buildNoiseBank(3, seed=7)
+        bank = list(stim._noiseBank)
+        assert len(bank) == 3
+        # updateNoise() cycles through the bank
+        first = stim._noiseBankIndex
+        for n in range(3):
+            stim.updateNoise()
+            assert stim._noiseBankIndex == first + n + 1
+        # the same seed gives the same bank, in worker processes too
+        other = self._stim(noiseType)
+        other.buildNoiseBank(3, seed=7, processes=2)
+        for ours, theirs in zip(bank, other._noiseBank):
+            assert numpy.all(ours == theirs)
+        background = self._stim(noiseType)
+        background.buildNoiseBank(3, seed=7, background=True)
+        background._noiseBankThread.join()
+        assert all(numpy.all(ours == theirs)
+                   for ours, theirs in zip(bank, background._noiseBank))
+        stim.clearNoiseBank()
+        assert stim._noiseBank == []
+        # and again, after making samples without the bank
+        stim.updateNoise()
+        stim.buildNoiseBank(3, seed=7)
+        for ours, theirs in zip(bank, stim._noiseBank):
+            assert numpy.all(ours == theirs)
+
+    def test_rebuild_skipped(self):
+        stim = self._stim()
+        stim.buildNoiseBank(2, seed=1)
+        noiseTex, bank = stim.noiseTex, stim._noiseBank
+        # the same parameters: neither the spectrum nor the bank is made again
+        stim.buildNoise()
+        assert stim.noiseTex is noiseTex
+        assert stim._noiseBank is bank
+        # a parameter that changes the spectrum rebuilds both
+        stim.noiseFilterUpper = 0.3
+        stim.buildNoise()
+        assert stim.noiseTex is not noiseTex
+        assert stim._noiseBank is not bank
+        assert not numpy.all(stim._noiseBank[0] == bank[0])
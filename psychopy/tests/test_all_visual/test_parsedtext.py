@@ -0,0 +1,71 @@
+"""Tests for the line wrapping of TextBox documents (no window needed)
+"""
+import random
+
+import pytest
+
+from psychopy.visual.textbox.parsedtext import (ParsedTextDocument,
+                                                ParsedTextLine)
+
+
+class _Font(object):
+    monospace = True
+    charcode2unichr = dict((code, chr(code)) for code in range(32, 127))
+
+
+class _TextBox(object):
+    _current_glfont = _Font()
+
+
+class _TextGrid(object):
+    def __init__(self, columns, rows=100):
+        self._shape = (columns, rows)
+        self._size = (columns * 10, rows * 20)
+        self._text_box = _TextBox()
+
+
+@pytest.fixture
+def grid(monkeypatch):
+    # the glyphs of the font are cached by the first line made
+    monkeypatch.setattr(ParsedTextLine, 'charcodes_with_glyphs', None)
+    monkeypatch.setattr(ParsedTextLine, 'replacement_charcode', None)
+    return _TextGrid
+
+
+def _lines(doc):
+    return [(line.getText(), line.getIndexRange(), line.getIndex())
+            for line in doc.getParsedLines()]
+
+
+def test_relayout(grid):
+    textGrid = grid(6)
+    text = u'fbafcc e acg fgbegc afee ededed'
+    doc = ParsedTextDocument(text, textGrid)
+    doc.insertText(u'a', 19)
+    fresh = ParsedTextDocument(doc.getText(), textGrid)
+    assert _lines(doc) == _lines(fresh)
+    assert [line for line, r, i in _lines(doc)] == [
+        u'fbafcc', u' e ', u'acg fg', u'begca ', u'afee ', u'ededed']
+
+    # the lines of later paragraphs are kept
+    doc = ParsedTextDocument(u'ab cd ef\ngh ij kl\n', textGrid)
+    last = doc.getParsedLines()[-1]
+    doc.deleteText(0, 3)
+    assert doc.getParsedLines()[-1] is last
+    assert _lines(doc) == _lines(ParsedTextDocument(doc.getText(), textGrid))
+
+
+def test_relayout_edits(grid):
+    # typing and deleting gives the same lines as parsing the text afresh
+    rng = random.Random(3)
+    textGrid = grid(6)
+    doc = ParsedTextDocument(u'', textGrid)
+    for n in range(1000):
+        length = doc.getTextLength()
+        index = rng.randint(0, length)
+        if length and rng.random() < 0.3:
+            doc.deleteText(index, min(index + rng.randint(1, 3), length))
+        else:
+            doc.insertText(rng.choice(u'abcdefg     \n'), index)
+        fresh = ParsedTextDocument(doc.getText(), textGrid)
+        assert _lines(doc) == _lines(fresh), repr(doc.getText())
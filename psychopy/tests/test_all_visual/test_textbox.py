@@ -28,6 +28,20 @@ class Test_textbox(object):
             self.win.flip()
             assert tb.getText() == tb.getDisplayedText() == text
 
+    def test_edit(self):
+        self.win.units = 'pix'
+        tb = TextBox(self.win, text='one two three\nfour',
+                     textgrid_shape=(8, 6))
+        doc = tb._getTextWrappedDoc()
+        lines = doc.getParsedLines()[:]
+        tb.setText('one two three\nfour five')
+        assert [line.getText() for line in doc.getParsedLines()] == [
+            'one two ', 'three\n', 'four ', 'five']
+        # only the edited paragraph was wrapped again
+        assert doc.getParsedLines()[:2] == lines[:2]
+        assert doc.getParsedLines()[2] is not lines[2]
+        tb.draw()
+
     def test_something(self):
         # to-do: test visual display, char position, etc
         pass
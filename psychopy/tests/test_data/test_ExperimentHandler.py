@@ -6,6 +6,7 @@ import numpy as np
 import os, glob, shutil
 import io
 from tempfile import mkdtemp
+from psychopy.tools.filetools import fromFile
 
 logging.console.setLevel(logging.DEBUG)
 
@@ -99,6 +100,41 @@ class TestExperimentHandler(object):
             contents = f.read()
         assert contents == "mutable,\n[1],\n[9999],\n"
 
+    def test_streaming(self):
+        fileName = self.tmpDir + 'streamed'
+        exp = data.ExperimentHandler(
+            name='testExp',
+            extraInfo={'participant': 'jwp'},
+            savePickle=True,
+            saveWideText=True,
+            dataFileName=fileName,
+            streaming=True,
+            keepEntries=2
+        )
+        for n in range(10):
+            exp.addData('n', n)
+            if n >= 5:  # a new column part-way through the run
+                exp.addData('late', n * 10)
+            exp.nextEntry()
+            # the file is complete after every entry
+            with io.open(fileName + '.csv', 'r', encoding='utf-8-sig') as f:
+                lines = f.read().splitlines()
+            assert len(lines) == n + 2
+        assert len(exp.entries) <= 2 * 2
+        assert lines[0] == 'n,participant,late,'
+        assert lines[1] == '0,jwp,'
+        assert lines[-1] == '9,jwp,90,'
+
+        exp.addData('n', 10)  # an orphan entry, saved on close
+        exp.close()
+        with io.open(fileName + '.csv', 'r', encoding='utf-8-sig') as f:
+            lines = f.read().splitlines()
+        assert lines[-1] == '10,,,'  # orphans don't get extraInfo
+        # the psydat holds every entry, not just those kept in memory
+        saved = fromFile(fileName + '.psydat')
+        assert [entry['n'] for entry in saved.entries] == list(range(11))
+        assert not os.path.exists(fileName + '_entries.pkl')
+
     def test_unicode_conditions(self):
         fileName = self.tmpDir + 'unicode_conds'
 
@@ -489,6 +489,27 @@ class TestQuestHandler(_BaseTestStairHandler):
         assert self.stairs._quest.x[0] == -range/2
         assert self.stairs._quest.x[-1] == range/2
 
+    def test_importData(self):
+        intensities = [0.5, 0.3, 0.35, 0.2, 0.25, 0.1, 0.9, 0.4]
+        responses = [1, 1, 0, 1, 0, 0, 1, 1]
+        q1 = data.QuestHandler(0.5, 0.2, pThreshold=0.63, gamma=0.01,
+                               nTrials=20, minVal=0, maxVal=1)
+        q2 = data.QuestHandler(0.5, 0.2, pThreshold=0.63, gamma=0.01,
+                               nTrials=20, minVal=0, maxVal=1)
+        # all the trials at once, or one at a time
+        q1.importData(intensities, responses)
+        for intensity, response in zip(intensities, responses):
+            q2.incTrials(1)
+            q2.__next__()
+            q2.addResponse(response, intensity)
+        assert q1.intensities == q2.intensities
+        assert q1.data == q2.data
+        assert np.allclose(q1._quest.pdf, q2._quest.pdf)
+        assert np.allclose(q1.__next__(), q2.__next__())
+        # and replaying the history gives the same pdf
+        q1._quest.recompute()
+        assert np.allclose(q1._quest.pdf, q2._quest.pdf)
+
     def test_comparison_equals(self):
         q1 = data.QuestHandler(0.5, 0.2, pThreshold=0.63, gamma=0.01,
                                nTrials=20, minVal=0, maxVal=1)
@@ -707,6 +728,25 @@ class TestPsiHandler(_BaseTestStairHandler):
         p_loaded = fromFile(path)
         assert p == p_loaded
 
+    def test_threaded(self):
+        p1 = data.PsiHandler(nTrials=10, intensRange=[0.1, 10],
+                             alphaRange=[0.1, 10], betaRange=[0.1, 3],
+                             intensPrecision=0.1, alphaPrecision=0.1,
+                             betaPrecision=0.1, delta=0.01)
+
+        p2 = data.PsiHandler(nTrials=10, intensRange=[0.1, 10],
+                             alphaRange=[0.1, 10], betaRange=[0.1, 3],
+                             intensPrecision=0.1, alphaPrecision=0.1,
+                             betaPrecision=0.1, delta=0.01, threaded=True)
+
+        for response in [1, 1, 0, 1, 0, 0, 1, 1, 1, 1]:
+            assert p1.__next__() == p2.__next__()
+            p1.addResponse(response)
+            p2.addResponse(response)
+        assert np.allclose(p1.estimateLambda(), p2.estimateLambda())
+        p2.threaded = False
+        assert p1 == p2
+
 
 class TestMultiStairHandler(_BaseTestMultiStairHandler):
     """
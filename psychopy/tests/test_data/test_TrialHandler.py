@@ -53,6 +53,49 @@ class TestTrialHandler(object):
             print(repr(header), type(header), len(header))
         assert expected_header == str(header)
 
+    def test_columnar_data_matches_DataHandler(self):
+        conds = data.createFactorialTrialList({'ori': [0, 90, 180]})
+        trials = data.TrialHandler(conds, nReps=4, method='random',
+                                   seed=self.random_seed, autoLog=False)
+        assert isinstance(trials.data, data.ColumnarDataHandler)
+        reference = data.DataHandler(trials=trials)
+        reference.addDataType('ran')
+        reference['ran'].mask = False
+        reference.addDataType('order')
+        for trial in trials:
+            reference.add('ran', 1)
+            reference.add('order', trials.thisN)
+            values = [('rt', 0.5 + trials.thisN),
+                      ('key', 'left' if trials.thisN % 2 else 'right'),
+                      ('mixed', trials.thisN if trials.thisN < 5 else 'x'),
+                      ('keys', [trials.thisN, 'a'])]
+            for name, value in values:
+                trials.addData(name, value)
+                reference.add(name, value)
+            if trials.thisN == 6:  # reading part-way through mustn't matter
+                assert trials.data['rt'].count() == 7
+        assert sorted(trials.data.keys()) == sorted(reference.keys())
+        for name in reference.dataTypes:
+            ours, theirs = trials.data[name], reference[name]
+            assert ours.dtype == theirs.dtype
+            if np.ma.isMaskedArray(theirs):
+                assert np.all(ours.mask == theirs.mask)
+                assert np.all(ours.filled(-1) == theirs.filled(-1))
+            else:
+                assert ours.tolist() == theirs.tolist()
+
+    def test_columnar_data_read_after_add(self):
+        trials = data.TrialHandler([{'ori': 0}], nReps=3, autoLog=False)
+        for trial in trials:
+            trials.addData('rt', 0.5 + trials.thisN)
+            # anything reading the whole handler sees the value just added
+            assert ('%.1f' % (0.5 + trials.thisN)) in repr(trials.data)
+            assert ('%.1f' % (0.5 + trials.thisN)) in str(trials.data)
+            for copied in [dict(trials.data), trials.data.copy()]:
+                assert copied['rt'].count() == trials.thisN + 1
+            assert [name for name in trials.data] == list(trials.data.keys())
+        assert dict(trials.data)['rt'].tolist() == [[0.5, 1.5, 2.5]]
+
     def test_psydat_filename_collision_renaming(self):
         for count in range(1,20):
             trials = data.TrialHandler([], 1, autoLog=False)
@@ -88,6 +88,26 @@ def test_logistic():
     if PLOTTING:
         plotFit(modResps, thresh, 'Logistic (thresh=%.2f, params=%s)' %(fit.inverse(0.75), fit.params))
 
+def test_fitMany():
+    # the same as fitting each dataset on its own
+    yy = numpy.array([responses, cumNorm(contrasts, sd=0.05, thresh=0.3)])
+    params = data.fitMany(data.FitCumNormal, contrasts, yy, nWorkers=2)
+    assert numpy.allclose(params, [[thresh, sd], [0.3, 0.05]])
+    fit = data.FitLogistic(contrasts, yy[1], expectedMin=0.5)
+    params = data.fitMany(data.FitLogistic, contrasts, yy)
+    assert numpy.allclose(params[1], fit.params)
+
+def test_bootstrapFit():
+    numpy.random.seed(1)
+    trials = (numpy.random.rand(len(contrasts), 50) <
+              responses[:, None]).astype(float)
+    params, interval = data.bootstrapFit(data.FitCumNormal, contrasts,
+                                         trials, n=200, guess=[thresh, sd])
+    assert params.shape == (200, 2)
+    assert interval.shape == (2, 2)
+    assert numpy.all(interval[0] < interval[1])
+    assert interval[0, 0] < thresh < interval[1, 0]
+
 def teardown():
     if PLOTTING:
         pylab.show()
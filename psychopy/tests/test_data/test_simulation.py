@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Tests for psychopy.data.simulation"""
+
+from __future__ import division
+
+import numpy as np
+import pytest
+
+from psychopy import data
+from psychopy.data.simulation import StairBatch, QuestBatch, PsiBatch
+
+
+def _runHandlers(handlers, batch, responses):
+    """Run the handlers and the batch on the same responses, checking they
+    present the same intensities"""
+    for trialResponses in responses:
+        intensities = []
+        for handler in handlers:
+            try:
+                intensities.append(next(handler))
+            except StopIteration:
+                intensities.append(np.nan)
+        assert np.allclose(np.isnan(intensities), batch.finished)
+        assert np.allclose(np.array(intensities)[~batch.finished],
+                           batch.intensities[~batch.finished])
+        for handler, response in zip(handlers, trialResponses):
+            if not handler.finished:
+                handler.addResponse(int(response))
+        batch.addResponses(trialResponses)
+
+
+@pytest.mark.parametrize('stairArgs', [
+    dict(startVal=10.0, stepSizes=[8, 4, 2, 1], nTrials=30),
+    dict(startVal=0.5, stepSizes=0.1, stepType='lin', nUp=1, nDown=2,
+         minVal=0.1, maxVal=1.0, nReversals=6),
+    dict(startVal=1.0, stepSizes=[0.2, 0.1], stepType='log',
+         applyInitialRule=False, nTrials=20)])
+def test_stairBatch(stairArgs):
+    rng = np.random.RandomState(0)
+    responses = rng.random_sample((80, 20)) < 0.7
+    handlers = [data.StairHandler(autoLog=False, **stairArgs)
+                for stairN in range(20)]
+    batch = StairBatch(20, **stairArgs)
+    _runHandlers(handlers, batch, responses)
+    for stairN, handler in enumerate(handlers):
+        assert batch.nReversalsDone[stairN] == len(
+            handler.reversalIntensities)
+        assert np.allclose(
+            batch.reversalIntensities[stairN, :len(
+                handler.reversalIntensities)], handler.reversalIntensities)
+
+
+def test_questBatch():
+    questArgs = dict(startVal=0.5, startValSd=0.3, pThreshold=0.75,
+                     nTrials=30, minVal=-1, maxVal=1)
+    rng = np.random.RandomState(1)
+    responses = rng.random_sample((30, 10)) < 0.75
+    handlers = [data.QuestHandler(autoLog=False, **questArgs)
+                for stairN in range(10)]
+    batch = QuestBatch(10, **questArgs)
+    _runHandlers(handlers, batch, responses)
+    assert batch.finished.all()
+    assert np.allclose([handler.mean() for handler in handlers],
+                       batch.mean())
+    assert np.allclose([handler.sd() for handler in handlers], batch.sd())
+
+
+def test_psiBatch():
+    psiArgs = dict(nTrials=20, intensRange=[0, 1], alphaRange=[0, 1],
+                   betaRange=[0.05, 0.5], intensPrecision=0.05,
+                   alphaPrecision=0.05, betaPrecision=0.05, delta=0.04)
+    rng = np.random.RandomState(2)
+    responses = rng.random_sample((20, 5)) < 0.75
+    handlers = [data.PsiHandler(**psiArgs) for stairN in range(5)]
+    batch = PsiBatch(5, **psiArgs)
+    _runHandlers(handlers, batch, responses)
+    alpha, beta = batch.estimateLambda()
+    expected = np.array([handler.estimateLambda() for handler in handlers])
+    assert np.allclose(expected[:, 0], alpha)
+    assert np.allclose(expected[:, 1], beta)
+
+
+def test_simulateStaircases():
+    observer = data.PsychometricObserver(
+        threshold=np.linspace(-1.5, -0.5, 40), slope=3.5, guessRate=0.5,
+        lapseRate=0.01)
+    questArgs = dict(startVal=-1.0, startValSd=0.5, pThreshold=0.82,
+                     nTrials=60, gamma=0.5, delta=0.01)
+    sim = data.simulateStaircases(observer, 40, stairType='quest',
+                                  batchSize=10, seed=3, **questArgs)
+    assert sim.intensities.shape == sim.estimates.shape == (60, 40)
+    assert np.all(sim.nTrials == 60)
+    error = sim.thresholds - observer.inverse(0.82)
+    assert abs(error.mean()) < 0.05
+    # the estimates converge on the threshold
+    firstError = sim.estimates[0] - observer.inverse(0.82)
+    assert np.abs(error).mean() < np.abs(firstError).mean()
+    # the same, run in parallel
+    parallel = data.simulateStaircases(observer, 40, stairType='quest',
+                                       batchSize=10, seed=3, nWorkers=2,
+                                       **questArgs)
+    assert np.allclose(parallel.thresholds, sim.thresholds)
+
+
+def test_simulateStairHandler():
+    observer = data.PsychometricObserver(threshold=0.4, slope=30,
+                                         function='logistic', guessRate=0,
+                                         lapseRate=0)
+    sim = data.simulateStaircases(observer, 200, startVal=0.8,
+                                  stepSizes=[0.1, 0.05, 0.02],
+                                  stepType='lin', nReversals=20, nTrials=0,
+                                  nUp=1, nDown=1, seed=4)
+    assert np.all(np.isnan(sim.intensities[sim.nTrials.max():]))
+    # a 1-up 1-down staircase converges on the 50% point
+    assert abs(np.mean(sim.thresholds) - 0.4) < 0.02
+    # the batches don't depend on the number of workers
+    parallel = data.simulateStaircases(observer, 200, startVal=0.8,
+                                       stepSizes=[0.1, 0.05, 0.02],
+                                       stepType='lin', nReversals=20,
+                                       nTrials=0, nUp=1, nDown=1, seed=4,
+                                       nWorkers=2)
+    assert np.all(parallel.thresholds == sim.thresholds)
@@ -125,6 +125,46 @@ class Test_utilsClass:
         assert len(conds) == 6
         assert len(list(conds[0].keys())) == 6
 
+    def test_importConditions_cache(self, tmpdir):
+        fileName = str(tmpdir.join('conds.csv'))
+        with open(fileName, 'w') as f:
+            f.write('pos,label,n\n"[1, 2]",a\\nb,1\n"[3, 4]",,2\n')
+        conds = utils.importConditions(fileName)
+        assert conds == [{'pos': [1, 2], 'label': 'a\nb', 'n': 1},
+                         {'pos': [3, 4], 'label': None, 'n': 2}]
+        # reused, but each call gets its own dicts and lists
+        conds[0]['n'] = 10
+        conds[1]['pos'].append(5)
+        assert utils.importConditions(fileName, selection='0') == [
+            {'pos': [1, 2], 'label': 'a\nb', 'n': 1}]
+        again = utils.importConditions(fileName)
+        assert again[1]['pos'] == [3, 4]
+        assert again[0]['pos'] is not conds[0]['pos']
+        # the file is read again once modified
+        with open(fileName, 'w') as f:
+            f.write('pos,label,n\n"[5, 6]",c,3\n')
+        os.utime(fileName, (1e9, 1e9))
+        assert utils.importConditions(fileName) == [
+            {'pos': [5, 6], 'label': 'c', 'n': 3}]
+
+    def test_importConditions_sidecar(self, tmpdir):
+        fileName = str(tmpdir.join('conds.csv'))
+        with open(fileName, 'w') as f:
+            f.write('a,b\n1,x\n2,"[1]"\n')
+        conds = utils.importConditions(fileName, useCache=False, sidecar=True)
+        assert os.path.isfile(fileName + '.cache')
+        utils.clearConditionsCache()
+        assert utils.importConditions(fileName, sidecar=True) == conds
+        # an out of date sidecar is ignored and replaced
+        with open(fileName, 'w') as f:
+            f.write('a,b\n3,y\n')
+        os.utime(fileName, (1e9, 1e9))
+        assert utils.importConditions(fileName, sidecar=True) == [
+            {'a': 3, 'b': 'y'}]
+        utils.clearConditionsCache()
+        assert utils.importConditions(fileName, sidecar=True) == [
+            {'a': 3, 'b': 'y'}]
+
 
 if __name__ == '__main__':
     pytest.main()
@@ -0,0 +1,145 @@
+""" Test the per table write buffers of the ioHub DataStore
+"""
+import numpy as np
+import pytest
+
+datastore = pytest.importorskip('psychopy.iohub.datastore')
+
+_DTYPE = [('experiment_id', 'u4'), ('session_id', 'u4'),
+          ('device_id', 'u2'), ('event_id', 'u4'), ('type', 'u1'),
+          ('time', 'f8')]
+
+
+class _Table(object):
+    """Records what is appended, as a pytables Table would store it"""
+    def __init__(self):
+        self.appends = []
+
+    def append(self, rows):
+        self.appends.append(np.array(rows, copy=True))
+
+    @property
+    def event_ids(self):
+        return [int(i) for rows in self.appends for i in rows['event_id']]
+
+
+class _File(object):
+    def __init__(self):
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+class _Clock(object):
+    def __init__(self):
+        self.time = 100.0
+
+    def __call__(self):
+        return self.time
+
+
+def _event(event_id, etype=22):
+    return [0, 0, 0, event_id, etype, event_id * 0.01]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(datastore, 'getTime', clock)
+    return clock
+
+
+def _dataStore(clock, monkeypatch, size=4, interval=0.25):
+    """A DataStoreFile without an hdf5 file; events of type 22 and 23 go to
+    one table and type 52 to another."""
+    classes = {}
+    for etype, label in [(22, 'KEYBOARD'), (23, 'KEYBOARD'), (52, 'GAZE')]:
+        classes[etype] = type('Event%d' % etype, (object, ),
+                              dict(IOHUB_DATA_TABLE=label,
+                                   NUMPY_DTYPE=_DTYPE))
+    monkeypatch.setattr(datastore.EventConstants, 'getClass',
+                        staticmethod(classes.get))
+    store = datastore.DataStoreFile.__new__(datastore.DataStoreFile)
+    store.TABLES = dict(KEYBOARD=_Table(), GAZE=_Table())
+    store.emrtFile = _File()
+    store.flushCounter = -1
+    store._eventCounter = 0
+    store.writeBufferSize = size
+    store.writeBufferInterval = interval
+    store._writeBuffers = dict()
+    store._writeStartTime = clock()
+    store.active_experiment_id = 1
+    store.active_session_id = 2
+    return store
+
+
+def test_write_buffer(clock):
+    table = _Table()
+    wbuffer = datastore.EventTableWriteBuffer(table, _DTYPE, size=3,
+                                             max_interval=0.5)
+    assert wbuffer.add(_event(0)) == 0
+    assert wbuffer.add(_event(1)) == 0
+    assert table.appends == [] and wbuffer.backlog == 2
+    # full, so written in a single append
+    assert wbuffer.add(_event(2)) == 3
+    assert len(table.appends) == 1 and table.event_ids == [0, 1, 2]
+    assert wbuffer.backlog == 0 and wbuffer.write_count == 1
+
+    # only stale once the oldest buffered event has waited max_interval
+    assert not wbuffer.isStale(clock())
+    clock.time += 1.0
+    wbuffer.add(_event(3))
+    clock.time += 0.4
+    wbuffer.add(_event(4))
+    assert not wbuffer.isStale(clock())
+    clock.time += 0.1
+    assert wbuffer.isStale(clock())
+    assert wbuffer.write() == 2
+    assert wbuffer.write() == 0
+    assert table.event_ids == [0, 1, 2, 3, 4]
+    assert wbuffer.events_written == 5 and wbuffer.write_count == 2
+    assert not wbuffer.isStale(clock() + 10)
+
+
+def test_handle_events(clock, monkeypatch):
+    store = _dataStore(clock, monkeypatch)
+    store._handleEvents([_event(0), _event(1, 52), _event(2, 23)])
+    keyboard, gaze = store.TABLES['KEYBOARD'], store.TABLES['GAZE']
+    assert keyboard.appends == [] and gaze.appends == []
+
+    # the keyboard buffer fills up, and is the only one written
+    store._handleEvents([_event(3), _event(4, 52), _event(5)])
+    assert keyboard.event_ids == [0, 2, 3, 5]
+    assert gaze.appends == []
+    rows = keyboard.appends[0]
+    assert rows['experiment_id'].tolist() == [1] * 4
+    assert rows['session_id'].tolist() == [2] * 4
+
+    # the gaze events are written once the oldest has waited long enough
+    clock.time += 0.2
+    assert store.writeStaleBuffers() == 0
+    clock.time += 0.05
+    store._handleEvent(_event(6))
+    assert gaze.event_ids == [1, 4]
+    assert keyboard.event_ids == [0, 2, 3, 5]
+
+    # flushing the file writes everything still buffered
+    store.flush()
+    assert keyboard.event_ids == [0, 2, 3, 5, 6]
+    assert store.emrtFile.flushes == 1
+
+
+def test_write_stats(clock, monkeypatch):
+    store = _dataStore(clock, monkeypatch)
+    assert store.getWriteStats() == dict(events_written=0, write_rate=0.0,
+                                         backlog=0, tables=dict())
+    store._handleEvents([_event(n) for n in range(5)] + [_event(5, 52)])
+    clock.time += 2.0
+    stats = store.getWriteStats()
+    assert stats['events_written'] == 4
+    assert stats['backlog'] == 2
+    assert stats['write_rate'] == pytest.approx(2.0)
+    assert stats['tables'] == dict(
+        KEYBOARD=dict(events_written=4, table_writes=1, backlog=1),
+        GAZE=dict(events_written=0, table_writes=0, backlog=1))
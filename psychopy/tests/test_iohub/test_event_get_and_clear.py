@@ -92,3 +92,23 @@ def testAllBuffersClear():
     assert len(exp_events) == 0
 
     stopHubProcess()
+
+@skip_under_travis
+def testFilteredGetEvents():
+    """
+    """
+    io = startHubProcess()
+
+    ctime = getTime()
+    for i in range(5):
+        io.sendMessageEvent("Message %d" % i, sec_time=ctime + i)
+
+    events = io.getEvents('experiment', start_time=ctime + 1, max_count=2)
+    assert [e.text for e in events] == ["Message 1", "Message 2"]
+
+    # events not returned by the query are kept in the global buffer
+    events = io.getEvents()
+    assert [e.text for e in events] == ["Message 0", "Message 3",
+                                        "Message 4"]
+
+    stopHubProcess()
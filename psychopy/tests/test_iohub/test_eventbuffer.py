@@ -0,0 +1,67 @@
+""" Test the per device global event buffer of the ioHub Server
+"""
+from psychopy.iohub.util import DeviceEventBuffers, takeEvents
+
+KB_PRESS, KB_RELEASE, GAZE, MOUSE_MOVE = 22, 23, 52, 34
+KEYBOARD, TRACKER, MOUSE, TOUCH = 1, 2, 3, 4
+
+
+def _event(device_id, etype, time):
+    return [0, 0, device_id, 0, etype, time, time, time]
+
+
+def test_take():
+    buffers = DeviceEventBuffers(100)
+    buffers.addDevice('keyboard', KEYBOARD)
+    buffers.addDevice('tracker', TRACKER)
+    buffers.extend(_event(TRACKER, GAZE, t * 0.1) for t in range(50))
+    buffers.extend(_event(KEYBOARD, KB_PRESS, t) for t in range(5))
+    buffers.append(_event(KEYBOARD, KB_RELEASE, 0.5))
+    assert len(buffers) == 56
+
+    presses = buffers.take(event_types=[KB_PRESS], start_time=1,
+                           max_count=3)
+    assert [e[7] for e in presses] == [1, 2, 3]
+    assert len(buffers) == 53
+
+    kb = buffers.take(devices=['keyboard'])
+    assert [(e[4], e[7]) for e in kb] == [(KB_PRESS, 0), (KB_RELEASE, 0.5),
+                                          (KB_PRESS, 4)]
+    assert buffers.take(devices=['mouse']) == []
+
+    gaze = buffers.take(end_time=0.45)
+    assert len(gaze) == 5
+    assert buffers.clear() == 45
+    assert not buffers
+
+
+def test_shared_event_types():
+    # two devices streaming the same event type keep their events apart
+    buffers = DeviceEventBuffers(100)
+    buffers.addDevice('mouse', MOUSE)
+    buffers.addDevice('touch', TOUCH)
+    buffers.extend(_event(MOUSE, MOUSE_MOVE, t) for t in range(3))
+    buffers.extend(_event(TOUCH, MOUSE_MOVE, t + 0.5) for t in range(2))
+    assert buffers.getDeviceNames() == [[MOUSE, 'mouse'], [TOUCH, 'touch']]
+    touch = buffers.take(devices=['touch'], event_types=[MOUSE_MOVE])
+    assert [e[2] for e in touch] == [TOUCH, TOUCH]
+    assert [e[7] for e in buffers.take(devices=['mouse'])] == [0, 1, 2]
+    assert not buffers
+
+
+def test_take_events_by_device():
+    events = [_event(MOUSE, MOUSE_MOVE, 0), _event(TOUCH, MOUSE_MOVE, 1),
+              _event(MOUSE, MOUSE_MOVE, 2)]
+    matched, others = takeEvents(events, [MOUSE_MOVE], device_ids=[MOUSE])
+    assert [e[7] for e in matched] == [0, 2]
+    assert [e[7] for e in others] == [1]
+
+
+def test_max_size():
+    buffers = DeviceEventBuffers(3)
+    buffers.addDevice('keyboard', KEYBOARD)
+    buffers.extend(_event(TRACKER, GAZE, t) for t in range(10))
+    buffers.append(_event(KEYBOARD, KB_PRESS, 10))
+    # each device has its own max_size, so a fast device can not push the
+    # events of a slow one out of the buffer
+    assert [e[7] for e in buffers.take()] == [7, 8, 9, 10]
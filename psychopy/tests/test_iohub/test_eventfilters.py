@@ -0,0 +1,64 @@
+""" Test that batches added to ioHub moving window filters give the same
+    results as adding one value at a time
+"""
+import numpy as np
+import pytest
+
+from psychopy.iohub.constants import EventConstants
+from psychopy.iohub.devices.experiment import MessageEvent
+from psychopy.iohub.devices.eventfilters import (MovingWindowFilter,
+    PassThroughFilter, MedianFilter, WeightedAverageFilter, StampFilter)
+
+_FILTERS = [(MovingWindowFilter, dict(length=5, knot_pos='center')),
+            (MovingWindowFilter, dict(length=4, knot_pos='oldest')),
+            (PassThroughFilter, dict()),
+            (MedianFilter, dict(length=7, knot_pos=2)),
+            (WeightedAverageFilter, dict(weights=(25, 50, 25), knot_pos=1)),
+            (StampFilter, dict(level=1))]
+
+
+def _oneByOne(efilter, items):
+    results = [r for r in (efilter.add(i) for i in items) if r]
+    return ([r[0] for r in results],
+            [np.asarray(r[1]).item() for r in results])
+
+
+@pytest.mark.parametrize('filterClass, kwargs', _FILTERS)
+def test_add_many_values(filterClass, kwargs):
+    values = np.random.RandomState(1).normal(0, 10, 200).tolist()
+    expected = _oneByOne(filterClass(**kwargs), values)[1]
+    efilter = filterClass(**kwargs)
+    filtered = []
+    # batches smaller and larger than the window
+    for start, stop in [(0, 2), (2, 3), (3, 50), (50, 51), (51, 200)]:
+        events, batch = efilter.add_many(values[start:stop])
+        assert events is None
+        filtered.extend(batch.tolist())
+    assert filtered == expected
+
+
+def test_add_many_events():
+    EventConstants.addClassMappings([MessageEvent.EVENT_TYPE_ID],
+                                    {'MessageEvent': MessageEvent})
+    field = MessageEvent.CLASS_ATTRIBUTE_NAMES.index('msg_offset')
+
+    def makeEvents():
+        events = []
+        for i in range(50):
+            event = [0] * len(MessageEvent.CLASS_ATTRIBUTE_NAMES)
+            event[MessageEvent.EVENT_ID_INDEX] = i
+            event[field] = float(i % 7)
+            events.append(event)
+        return events
+
+    kwargs = dict(length=3, knot_pos='center', inplace=True,
+                  event_type=MessageEvent.EVENT_TYPE_ID,
+                  event_field_name='msg_offset')
+    expected = _oneByOne(MedianFilter(**kwargs), makeEvents())
+    efilter = MedianFilter(**kwargs)
+    events = makeEvents()
+    first, firstValues = efilter.add_many(events[:10])
+    rest, restValues = efilter.add_many(events[10:])
+    assert first + rest == expected[0]
+    assert firstValues.tolist() + restValues.tolist() == expected[1]
+    assert [e[field] for e in first[:3]] == expected[1][:3]
@@ -0,0 +1,22 @@
+""" Test packing ioHub events as structured arrays
+"""
+import msgpack
+
+from psychopy.iohub.net import packEventArrays, unpackEventArrays
+
+_DTYPES = {5: [('event_id', 'u4'), ('type', 'u1'), ('time', 'f8'),
+               ('text', 'S8')],
+           6: [('event_id', 'u4'), ('type', 'u1'), ('x', 'f4')]}
+
+
+def test_event_arrays():
+    events = [[0, 5, 0.5, u'caf\xe9'], [1, 6, 2.0], [2, 5, 1.5, 'b'],
+              [3, 6, 4.0]]
+    packed = packEventArrays(events, type_index=1,
+                             dtype_lookup=_DTYPES.get)
+    assert [p[0] for p in packed] == [5, 6]
+    data = msgpack.unpackb(msgpack.packb(packed))
+    arrays = unpackEventArrays(data, dtype_lookup=_DTYPES.get)
+    assert arrays[5].event_id.tolist() == [0, 2]
+    assert arrays[5].text.tolist() == [u'caf\xe9'.encode('utf-8'), b'b']
+    assert arrays[6].x.tolist() == [2.0, 4.0]
@@ -0,0 +1,80 @@
+""" Test that the offline eye event parser creates the same events as the
+    online EyeTrackerEventParser
+"""
+import numpy as np
+
+from psychopy.iohub.devices.eyetracker import eye_events
+from psychopy.iohub.devices.eyetracker.filters.offline import (
+    EyeTrackerEventBatchParser, adaptiveVelocityThresholds)
+from psychopy.iohub.devices.eyetracker.filters.parser import \
+    EyeTrackerEventParser
+
+SAMPLE = eye_events.BinocularEyeSampleEvent
+EVENT_CLASSES = dict((c.EVENT_TYPE_ID, c) for c in (
+    eye_events.FixationStartEvent, eye_events.FixationEndEvent,
+    eye_events.SaccadeStartEvent, eye_events.SaccadeEndEvent,
+    eye_events.BlinkStartEvent, eye_events.BlinkEndEvent))
+
+
+def _parserKwargs():
+    return dict(sampling_rate=500, adaptive_vel_thresh_history=0.2,
+                position_filter=dict(name='MedianFilter', length=3,
+                                     knot_pos='center'),
+                velocity_filter=dict(name='MovingWindowFilter', length=3,
+                                     knot_pos='center'),
+                display_device=dict(mm_size=dict(width=500, height=280),
+                                    pixel_res=(1920, 1080),
+                                    eye_distance=550))
+
+
+def _samples(n=2000):
+    rs = np.random.RandomState(0)
+    samples = np.zeros(n, dtype=SAMPLE.NUMPY_DTYPE)
+    samples['type'] = SAMPLE.EVENT_TYPE_ID
+    samples['event_id'] = np.arange(n)
+    samples['time'] = np.arange(n) * 0.002
+    # a 15 sample saccade every 300 samples
+    x = np.cumsum((np.arange(n) % 300 < 15) * 20.0) % 800 - 400
+    for eye in ('left', 'right'):
+        samples[eye + '_gaze_x'] = x + rs.normal(0, 1, n)
+        samples[eye + '_gaze_y'] = rs.normal(0, 1, n)
+        samples[eye + '_pupil_measure1'] = 1000
+    samples['status'][1000:1040] = 22  # blink
+    samples['status'][1500:1505] = 2  # right eye missing
+    return samples
+
+
+def test_batch_matches_online():
+    samples = _samples()
+    batch = EyeTrackerEventBatchParser(**_parserKwargs())
+    batch_events = batch.parseSamples(samples)
+
+    online = EyeTrackerEventParser(**_parserKwargs())
+    for sample in samples.tolist():
+        online._addInputEvent(list(sample))
+    online_events = dict()
+    for event in online._removeOutputEvents():
+        if event[4] != eye_events.MonocularEyeSampleEvent.EVENT_TYPE_ID:
+            online_events.setdefault(event[4], []).append(event)
+
+    assert sorted(batch_events) == sorted(online_events)
+    assert len(batch_events[eye_events.BlinkEndEvent.EVENT_TYPE_ID]) == 1
+    for event_type, events in batch_events.items():
+        expected = np.array(online_events[event_type], dtype=float)
+        events = np.array(events, dtype=float)
+        # online events get new event ids from the ioHub Server
+        events[:, 3] = expected[:, 3] = 0
+        assert np.allclose(events, expected, equal_nan=True)
+        # events fit the event class's table
+        assert len(events[0]) == len(EVENT_CLASSES[event_type].NUMPY_DTYPE)
+
+
+def test_adaptive_thresholds():
+    velocity = np.random.RandomState(1).gamma(2, 10, 300)
+    velocity[::7] = 0
+    parser = EyeTrackerEventBatchParser(**_parserKwargs())
+    expected = [parser.addVelocityToAdaptiveThreshold(
+        [0] * 28 + [v, v, v, 0])[0] for v in velocity]
+    thresholds = adaptiveVelocityThresholds(velocity, parser.history_length,
+                                            chunk_size=16)
+    assert np.allclose(thresholds, expected, equal_nan=True)
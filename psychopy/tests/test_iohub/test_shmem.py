@@ -0,0 +1,112 @@
+""" Test the shared memory event ring buffer
+"""
+import os
+
+from psychopy.iohub.client import ioHubConnection
+from psychopy.iohub.constants import EventConstants
+from psychopy.iohub.devices.keyboard import KeyboardPressEvent
+from psychopy.iohub.shmem import SharedEventRingBuffer
+
+_DTYPES = {5: [('experiment_id', 'u4'), ('session_id', 'u4'),
+               ('device_id', 'u2'), ('event_id', 'u4'), ('type', 'u1'),
+               ('time', 'f8'), ('key', 'S8')],
+           6: [('experiment_id', 'u4'), ('session_id', 'u4'),
+               ('device_id', 'u2'), ('event_id', 'u4'), ('type', 'u1'),
+               ('x', 'f4')]}
+
+
+def _event(i, strtype=str):
+    if i % 2:
+        key = 'k%d' % i
+        if strtype is bytes:
+            key = key.encode('utf-8')
+        return [0, 0, 0, i, 5, i * 0.5, key]
+    return [0, 0, 0, i, 6, i * 2.0]
+
+
+def test_ring_buffer():
+    name = 'iohub_test_events_%d' % os.getpid()
+    writer = SharedEventRingBuffer(name, create=True, slot_count=4,
+                                   slot_size=64, dtype_lookup=_DTYPES.get)
+    reader = SharedEventRingBuffer(name, dtype_lookup=_DTYPES.get)
+    try:
+        events = [_event(i) for i in range(7)]
+        # only 4 fit; the writer keeps the rest for later
+        assert writer.write(events) == 4
+        assert reader.backlog == 4
+        # string attributes come back as bytes, as they do over UDP
+        assert reader.read() == [_event(i, bytes) for i in range(4)]
+        assert reader.read() == []
+
+        # wraps around the end of the buffer
+        assert writer.write(events[4:]) == 3
+        arrays = reader.readArrays()
+        assert arrays[6].event_id.tolist() == [4, 6]
+        assert arrays[5].key.tolist() == [b'k5']
+
+        writer.write(events[:2])
+        reader.discard()
+        assert reader.backlog == 0
+    finally:
+        reader.close()
+        writer.close()
+
+
+class _Device(object):
+    def __init__(self, name):
+        self.name = name
+
+    def getName(self):
+        return self.name
+
+
+class _Devices(object):
+    def getDevice(self, name):
+        return _Device(name)
+
+
+def test_keyboard_getEvents():
+    EventConstants.addClassMappings(
+        [KeyboardPressEvent.EVENT_TYPE_ID],
+        dict(KeyboardPressEvent=KeyboardPressEvent))
+    name = 'iohub_test_kb_events_%d' % os.getpid()
+    writer = SharedEventRingBuffer(name, create=True, slot_count=8)
+    reader = SharedEventRingBuffer(name)
+    # only the parts of the connection used by getEvents()
+    io = ioHubConnection.__new__(ioHubConnection)
+    io._event_ring_buffer = reader
+    io._event_device_names = None
+    io.allEvents = []
+    io.devices = _Devices()
+    # the reply of the getEventDeviceNames RPC: [device id, name] pairs
+    io._sendToHubServer = lambda request: (
+        'RPC_RESULT', 'getEventDeviceNames', [[1, b'keyboard'],
+                                              [2, b'keyboard2']])
+    try:
+        names = KeyboardPressEvent.CLASS_ATTRIBUTE_NAMES
+
+        def press(device_id, time, key):
+            event = [0] * len(names)
+            event[names.index('device_id')] = device_id
+            event[names.index('type')] = KeyboardPressEvent.EVENT_TYPE_ID
+            event[names.index('time')] = time
+            event[names.index('key')] = key
+            event[names.index('char')] = b' '
+            return event
+
+        writer.write([press(1, 1.5, b'space')])
+        events = io.getEvents()
+        assert len(events) == 1
+        assert events[0].key == u'space' and events[0].char == u' '
+        assert events[0].time == 1.5
+        assert io.getEvents() == []
+
+        # filtered by the device that sent them, not by event type
+        writer.write([press(1, 2.0, b'a'), press(2, 2.5, b'b')])
+        events = io.getEvents(
+            'keyboard2', event_types=[KeyboardPressEvent.EVENT_TYPE_ID])
+        assert [e.key for e in events] == [u'b']
+        assert [e.key for e in io.getEvents()] == [u'a']
+    finally:
+        reader.close()
+        writer.close()
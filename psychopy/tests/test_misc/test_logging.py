@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for psychopy.logging
+
+"""
+import io
+import os
+import shutil
+import threading
+import time
+import pytest
+from tempfile import mkdtemp
+
+from psychopy import logging
+
+
+def _makeLogger(**kwargs):
+    logger = logging._Logger(**kwargs)
+    stream = io.StringIO()
+    logging.LogFile(stream, level=logging.DEBUG, logger=logger)
+    return logger, stream
+
+
+def test_sync_flush():
+    logger, stream = _makeLogger()
+    for n in range(5):
+        logger.log(u'msg%i' % n, level=logging.EXP, t=n)
+    logger.flush()
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 5
+    assert lines[0] == u'0.0000 \tEXP \tmsg0'
+    assert len(logger.flushed) == 5
+
+
+def test_maxFlushed():
+    logger, stream = _makeLogger(maxFlushed=3)
+    for n in range(10):
+        logger.log(u'msg%i' % n, level=logging.DATA, t=n)
+    logger.flush()
+    assert len(stream.getvalue().splitlines()) == 10
+    assert [e.message for e in logger.flushed] == [u'msg7', u'msg8', u'msg9']
+    logger.setMaxFlushed(0)
+    logger.log(u'another', level=logging.DATA, t=0)
+    logger.flush()
+    assert len(logger.flushed) == 0
+
+
+def test_async_writer():
+    logger, stream = _makeLogger()
+    logger.startWriter(maxPending=50)
+    try:
+        for n in range(1000):
+            logger.log(u'msg%i' % n, level=logging.DATA, t=n)
+            if n % 10 == 0:
+                logger.flush()
+        logger.flush(wait=True)
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 1000
+        assert lines[-1].endswith(u'msg999')
+        # stopping the writer must not lose anything still to be flushed
+        logger.log(u'last', level=logging.DATA, t=0)
+    finally:
+        logger.stopWriter()
+    assert logger.writer is None
+    assert stream.getvalue().splitlines()[-1].endswith(u'last')
+
+
+def test_async_writer_timeout():
+    logger, stream = _makeLogger()
+    release = threading.Event()
+    write = logger._write
+
+    def slowWrite(entries, **kwargs):
+        release.wait()
+        write(entries, **kwargs)
+    logger._write = slowWrite
+    logger.startWriter()
+    try:
+        logger.log(u'slow', level=logging.DATA, t=0)
+        logger.flush()
+        t0 = time.time()
+        assert logger.writer.wait(timeout=0.1) is False
+        assert 0.05 < time.time() - t0 < 2.0
+        release.set()
+        assert logger.writer.wait(timeout=5) is True
+        assert stream.getvalue().splitlines()[-1].endswith(u'slow')
+    finally:
+        release.set()
+        logger.stopWriter()
+
+
+class _BrokenTarget(object):
+    level = logging.DEBUG
+
+    def __init__(self):
+        self.nWrites = 0
+
+    def write(self, text):
+        self.nWrites += 1
+        raise IOError('disk full')
+
+
+def test_async_writer_target_error(capsys):
+    logger, stream = _makeLogger()
+    broken = _BrokenTarget()
+    logger.targets.insert(0, broken)  # before the stream
+    logger.startWriter()
+    try:
+        for n in range(10):
+            logger.log(u'msg%i' % n, level=logging.DATA, t=n)
+            logger.flush()
+        assert logger.writer.wait(timeout=5) is True
+        # the writer kept going, and wrote to the other target
+        assert logger.writer.is_alive()
+        assert len(stream.getvalue().splitlines()) == 10
+        assert broken.nWrites > 0
+        assert 'disk full' in capsys.readouterr().err
+    finally:
+        logger.stopWriter()
+    # without the writer errors are raised as before
+    logger.log(u'sync', level=logging.DATA, t=0)
+    with pytest.raises(IOError):
+        logger.flush()
+
+
+class _Named(object):
+    name = u'grating'
+
+
+def test_binary_log():
+    tmpDir = mkdtemp(prefix='psychopy-tests-logging')
+    try:
+        filename = os.path.join(tmpDir, 'session.psylog')
+        logger = logging._Logger()
+        logFile = logging.BinaryLogFile(filename, level=logging.EXP,
+                                        logger=logger)
+        for n in range(100):
+            logger.log(u'onset', level=logging.EXP, t=n * 0.01, obj=_Named())
+            logger.log(u'key %i' % (n % 3), level=logging.DATA, t=n * 0.01)
+            logger.log(u'ignored', level=logging.INFO, t=n * 0.01)
+        logger.flush()
+        logFile.close()
+
+        log = logging.readBinaryLog(filename)
+        assert len(log) == 200
+        assert sorted(log.strings) == [u'grating', u'key 0', u'key 1',
+                                       u'key 2', u'onset']
+        data = log.select(levels=[logging.DATA], tStart=0.5)
+        assert len(data) == 50
+        assert log.messages(data)[:2] == [u'key 2', u'key 0']
+        onsets = log.select(obj=u'grating')
+        assert len(onsets) == 100
+        assert log.toText(onsets[:1]) == [u'0.0000 \tEXP \tonset']
+
+        # appending keeps the existing string table
+        logFile = logging.BinaryLogFile(filename, level=logging.EXP,
+                                        logger=logger)
+        logger.log(u'onset', level=logging.EXP, t=2.0)
+        logger.flush()
+        logFile.close()
+        log = logging.readBinaryLog(filename, level=logging.EXP, tStart=1.5)
+        assert log.messages() == [u'onset']
+        assert len(log.strings) == 5
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+def test_binary_log_append():
+    tmpDir = mkdtemp(prefix='psychopy-tests-logging')
+    try:
+        logger = logging._Logger()
+        # only binary logs of this version can be appended to
+        textLog = os.path.join(tmpDir, 'session.log')
+        with open(textLog, 'w') as f:
+            f.write('0.0000 \tEXP \tonset\n')
+        with pytest.raises(ValueError):
+            logging.BinaryLogFile(textLog, logger=logger)
+        oldLog = os.path.join(tmpDir, 'old.psylog')
+        with open(oldLog, 'wb') as f:
+            f.write(logging._binaryLogHeader.pack(
+                logging._binaryLogMagic, 0, logging._binaryLogRecord.size))
+        with pytest.raises(ValueError):
+            logging.BinaryLogFile(oldLog, logger=logger)
+        assert logger.targets == []
+
+        filename = os.path.join(tmpDir, 'session.psylog')
+        logFile = logging.BinaryLogFile(filename, level=logging.EXP,
+                                        logger=logger)
+        logger.log(u'first', level=logging.EXP, t=0)
+        logger.flush()
+        logFile.close()
+        # as if the last writes were interrupted
+        with open(filename + '.str', 'ab') as f:
+            f.write(logging._binaryLogString.pack(10) + b'sec')
+        with open(filename, 'ab') as f:
+            f.write(b'\x00' * 5)
+        logFile = logging.BinaryLogFile(filename, level=logging.EXP,
+                                        logger=logger)
+        logger.log(u'second', level=logging.EXP, t=1)
+        logger.log(u'first', level=logging.EXP, t=2)
+        logger.flush()
+        logFile.close()
+        log = logging.readBinaryLog(filename)
+        assert log.strings == [u'first', u'second']
+        assert log.messages() == [u'first', u'second', u'first']
+        assert list(log.records['t']) == [0, 1, 2]
+    finally:
+        shutil.rmtree(tmpDir)
+
+
+if __name__ == '__main__':
+    pytest.main()
@@ -0,0 +1,106 @@
+"""Test the block mixer of the sounddevice backend, offline (no sound card)
+"""
+from __future__ import division
+
+import sys
+import threading
+
+import numpy as np
+
+from psychopy.sound._mixer import Mixer, WavetableOscillator
+
+
+class _ArraySource(object):
+    def __init__(self, data, volume=1.0):
+        self.data = data
+        self.volume = volume
+        self.pos = 0
+        self.finished = 0
+
+    def _fillBlock(self, out):
+        nFrames = min(len(out), len(self.data) - self.pos)
+        out[:nFrames] = self.data[self.pos:self.pos + nFrames]
+        self.pos += nFrames
+        return nFrames
+
+    def _EOS(self):
+        self.finished += 1
+
+
+class _EndlessSource(object):
+    volume = 0.5
+
+    def _fillBlock(self, out):
+        out.fill(1)
+        return len(out)
+
+
+def test_oscillator():
+    sampleRate = 44100
+    osc = WavetableOscillator(440, sampleRate, blockSize=64)
+    tone = np.concatenate([osc.fill().copy() for n in range(50)])
+    expected = np.sin(2 * np.pi * 440 * np.arange(64 * 50) / sampleRate)
+    assert np.allclose(tone, expected, atol=1e-6)
+    osc.seek(0.5)
+    assert np.allclose(osc.fill(), np.sin(
+        2 * np.pi * 440 * (0.5 + np.arange(64) / sampleRate)), atol=1e-6)
+
+
+def test_mix():
+    mixer = Mixer(channels=2, blockSize=64)
+    mono = np.ones((100, 1))
+    stereo = np.full((1000, 2), 0.25)
+    short = _ArraySource(mono)
+    long = _ArraySource(stereo, volume=0.5)
+    mixer.add(short)
+    mixer.add(long)
+    mixer.add(short)  # already playing
+    assert mixer.sources == [short, long]
+
+    out = mixer.render(200)
+    assert out.shape == (200, 2)
+    assert np.allclose(out[:100], 1.125)
+    assert np.allclose(out[100:], 0.125)
+    # the short sound finished and was removed
+    assert short.finished == 1
+    assert mixer.sources == [long]
+    # the sound data were not modified by the volume
+    assert np.all(mono == 1) and np.all(stereo == 0.25)
+
+    # volume changes are ramped over a block
+    long.volume = 1.0
+    out = mixer.render(64)
+    assert np.all(np.diff(out[:, 0]) > 0)
+    assert np.allclose(out[-1], 0.25)
+
+    mixer.remove(long)
+    assert np.all(mixer.render(64) == 0)
+    assert mixer.nUnderruns == mixer.nOverruns == 0
+
+
+def test_add_while_mixing():
+    # the callback removes finished sounds while others are being added
+    mixer = Mixer(channels=1, blockSize=16, maxSources=64)
+    stop = threading.Event()
+
+    def callback():
+        while not stop.is_set():
+            mixer.render(16)
+
+    switchInterval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    thread = threading.Thread(target=callback)
+    thread.start()
+    try:
+        playing = []
+        for n in range(2000):
+            mixer.add(_ArraySource(np.ones((n % 3, 1))))  # finishes at once
+            if n % 50 == 0:
+                playing.append(_EndlessSource())
+                mixer.add(playing[-1])
+    finally:
+        stop.set()
+        thread.join()
+        sys.setswitchinterval(switchInterval)
+    mixer.render(16)
+    assert mixer.sources == playing
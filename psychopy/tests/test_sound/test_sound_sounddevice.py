@@ -74,6 +74,41 @@ class TestSoundDevice(object):
         s4 = sound.Sound(self.testFile, startTime=-1, stopTime=10000)
         assert s4.getDuration() == s3.getDuration()
 
+    def test_cache(self):
+        """sounds from the same file share the decoded data"""
+        from psychopy.sound import backend_sounddevice
+        s1 = sound.Sound(self.testFile)
+        s2 = sound.Sound(self.testFile)
+        assert np.shares_memory(s1.sndArr, s2.sndArr)
+        assert not s1.sndArr.flags.writeable
+        s3 = sound.Sound(self.testFile, startTime=0.5)
+        assert not np.shares_memory(s1.sndArr, s3.sndArr)
+        backend_sounddevice.audioCache.clear()
+        assert len(backend_sounddevice.audioCache) == 0
+
+    def test_cache_memmap(self):
+        """memory-mapped files are dropped from the cache too"""
+        from psychopy.sound import backend_sounddevice
+        cache = backend_sounddevice._DecodedAudioCache(mmapMinBytes=0,
+                                                       maxEntries=2)
+        names = []
+        for n in range(3):
+            names.append(os.path.join(self.tmp, 'chime%i.wav' % n))
+            shutil.copy(self.testFile, names[-1])
+        first = cache.get(names[0])
+        assert isinstance(first.data, np.memmap)
+        cache.get(names[1])
+        cache.get(names[0])  # now the most recently used
+        cache.get(names[2])
+        assert len(cache) == 2 and cache.nBytes == 0
+        assert sorted(key[0] for key in cache._entries) == [names[0],
+                                                            names[2]]
+        # no caching at all
+        cache = backend_sounddevice._DecodedAudioCache(maxBytes=0,
+                                                       mmapMinBytes=0)
+        cache.get(names[0])
+        assert len(cache) == 0
+
     def test_methods(self):
         s = sound.Sound(secs=0.1)
         v = s.getVolume()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Tests for psychopy.tools.dottools"""
+
+import numpy
+
+from psychopy.tools import dottools
+
+
+def _fieldDots(*fields):
+    dots = dottools.DotArrays(sum(field.nDots for field in fields))
+    start = 0
+    for field in fields:
+        dottools.initDots(field, dots[start:start + field.nDots])
+        start += field.nDots
+    return dots
+
+
+def test_newDotsXY():
+    xy = dottools.newDotsXY(5000, (2, 4), 'sqr')
+    assert xy.shape == (5000, 2)
+    assert numpy.all(numpy.abs(xy) <= [1, 2])
+    assert xy[:, 1].max() > 1.9
+    xy = dottools.newDotsXY(5000, (2, 2), 'circle')
+    assert numpy.all(numpy.hypot(xy[:, 0], xy[:, 1]) < 1)
+
+
+def test_coherent_motion():
+    field = dottools.DotField(nDots=500, coherence=1.0, dotLife=-1,
+                              dir=90, speed=0.01)
+    dots = _fieldDots(field)
+    xy = dots.xy.copy()
+    dottools.updateDots([field], dots)
+    moved = numpy.abs(dots.xy[:, 1] - xy[:, 1] - 0.01) < 1e-9
+    # all dots move up, except those that left the field and were replaced
+    assert numpy.all(moved | (xy[:, 1] + 0.01 > 0.5))
+    assert numpy.allclose(dots.xy[moved, 0], xy[moved, 0])
+
+
+def test_lifetimes_and_position_noise():
+    field = dottools.DotField(nDots=1000, coherence=0.5, dotLife=5,
+                              speed=0, noiseDots='position')
+    dots = _fieldDots(field)
+    life = dots.life.copy()
+    xy = dots.xy.copy()
+    dottools.updateDots([field], dots)
+    dead = life <= 1
+    assert numpy.allclose(dots.life[~dead], life[~dead] - 1)
+    assert numpy.all(dots.life[dead] == 5)
+    # signal dots that are alive stay put, noise dots all get new positions
+    still = dots.signal & ~dead
+    assert numpy.all(dots.xy[still] == xy[still])
+    assert numpy.all(dots.xy[~dots.signal] != xy[~dots.signal])
+
+
+def test_bulk_update():
+    square = dottools.DotField(nDots=300, fieldSize=(1, 1), speed=0.05)
+    circle = dottools.DotField(nDots=200, fieldSize=(4, 4),
+                               fieldShape='circle', speed=0.05,
+                               noiseDots='walk', signalDots='different')
+    dots = _fieldDots(square, circle)
+    for frameN in range(50):
+        dottools.updateDots([square, circle], dots)
+    assert numpy.all(numpy.abs(dots.xy[:300]) <= 0.5)
+    assert numpy.all(numpy.hypot(dots.xy[300:, 0], dots.xy[300:, 1]) <= 2)
+    assert numpy.count_nonzero(dots.signal[300:]) == 100
+
+
+def test_benchmark():
+    results = dottools.benchmarkDots(nDots=[100], coherence=[0.5],
+                                     nFields=2, nFrames=5)
+    assert len(results) == 2
+    assert results[0]['maxMs'] >= results[0]['medianMs'] > 0
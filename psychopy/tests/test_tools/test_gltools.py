@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""Tests for psychopy.tools.gltools"""
+
+import numpy
+import pytest
+
+from psychopy import visual
+from psychopy.tools import gltools
+import pyglet.gl as GL
+
+
+def _readTexture(texture):
+    """The pixels of an RGB uint8 texture, as a (height, width, 3) array"""
+    pixels = numpy.zeros((texture.height, texture.width, 3), numpy.uint8)
+    GL.glBindTexture(texture.target, texture.id)
+    GL.glPixelStorei(GL.GL_PACK_ALIGNMENT, 1)
+    GL.glGetTexImage(texture.target, 0, GL.GL_RGB, GL.GL_UNSIGNED_BYTE,
+                     pixels.ctypes)
+    GL.glBindTexture(texture.target, 0)
+    return pixels
+
+
+class Test_streamingTexture(object):
+    def setup_class(self):
+        self.win = visual.Window([128, 128], pos=[50, 50], allowGUI=False,
+                                 autoLog=False)
+
+    def teardown_class(self):
+        self.win.close()
+
+    def test_stream(self):
+        # an odd width, so rows aren't 4 byte aligned
+        texture = gltools.createTexImage2D(
+            5, 3, internalFormat=GL.GL_RGB8, pixelFormat=GL.GL_RGB,
+            dataType=GL.GL_UNSIGNED_BYTE, unpackAlignment=1)
+        streamTex = gltools.createStreamingTexture(texture, nBuffers=2)
+        assert streamTex.size == 5 * 3 * 3
+        assert len(streamTex.buffers) == 2
+        firstPBO = streamTex.buffers[0].value
+
+        rng = numpy.random.RandomState(0)
+        for frameN in range(3):
+            image = rng.randint(0, 256, (3, 5, 3)).astype(numpy.uint8)
+            gltools.streamTexture(streamTex, image)
+            GL.glFinish()
+            assert numpy.all(_readTexture(texture) == image)
+            # the texture and the PBOs are left unbound
+            bound = GL.GLint()
+            GL.glGetIntegerv(GL.GL_PIXEL_UNPACK_BUFFER_BINDING, bound)
+            assert bound.value == 0
+        # the PBOs are used in turn
+        assert streamTex.buffers[0].value != firstPBO
+
+        with pytest.raises(ValueError):
+            gltools.streamTexture(streamTex, numpy.zeros((2, 5, 3),
+                                                         numpy.uint8))
+
+        pboIds = [pboId.value for pboId in streamTex.buffers]
+        gltools.deleteStreamingTexture(streamTex)
+        assert len(streamTex.buffers) == 0
+        assert not any(GL.glIsBuffer(pboId) for pboId in pboIds)
+        # the texture itself is kept
+        assert GL.glIsTexture(texture.id)
+        gltools.deleteTexture(texture)
+
+    def test_unsupported_format(self):
+        texture = gltools.createTexImage2D(
+            4, 4, internalFormat=GL.GL_RGBA8, pixelFormat=GL.GL_RGBA,
+            dataType=GL.GL_UNSIGNED_BYTE)
+        badTexture = texture._replace(dataType=GL.GL_UNSIGNED_INT_8_8_8_8)
+        with pytest.raises(ValueError):
+            gltools.createStreamingTexture(badTexture)
+        gltools.deleteTexture(texture)
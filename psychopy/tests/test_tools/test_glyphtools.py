@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Tests for psychopy.tools.glyphtools"""
+
+import numpy
+
+from psychopy.tools import glyphtools
+
+
+class _Glyph(object):
+    def __init__(self, char):
+        self.advance = 10 if char != 'i' else 4
+        if char == ' ':
+            self.vertices = (0, 0, 0, 0)
+        else:
+            self.vertices = (1, -2, self.advance - 1, 8)
+        self.tex_coords = (0, 0, 0, 1, 0, 0, 1, 1, 0, 0, 1, 0)
+
+        class _Texture(object):
+            id = 2 if char == 'x' else 1
+        self.owner = _Texture
+
+
+class _Font(object):
+    ascent = 8
+    descent = -2
+
+    def __init__(self):
+        self.nRendered = 0
+
+    def get_glyphs(self, text):
+        self.nRendered += len(text)
+        return [_Glyph(char) for char in text]
+
+
+def test_wrapLines():
+    advances = [10] * len('aa bb cc')
+    assert glyphtools.wrapLines('aa bb cc', advances) == [(0, 8, 80)]
+    # lines break at the spaces, which aren't counted in the widths
+    assert glyphtools.wrapLines('aa bb cc', advances, wrapWidth=45) == [
+        (0, 3, 20), (3, 6, 20), (6, 8, 20)]
+    assert glyphtools.wrapLines('aa bb cc', advances, wrapWidth=50) == [
+        (0, 6, 50), (6, 8, 20)]
+    # long words and newlines
+    assert glyphtools.wrapLines('aaaaaa\nb', [10] * 8, wrapWidth=30) == [
+        (0, 6, 60), (7, 8, 10)]
+
+
+def test_layout():
+    font = _Font()
+    atlas = glyphtools.GlyphAtlas(font)
+    layout = atlas.layout('ab i\nx', alignHoriz='center', alignVert='top')
+    assert layout.nLines == 2
+    assert layout.width == layout.contentWidth == 34
+    assert layout.height == 20
+    # 4 visible glyphs (not the space), with the one on another texture last
+    assert layout.vertices.shape == layout.texCoords.shape == (16, 2)
+    assert layout.batches == [(1, 0, 12), (2, 12, 4)]
+    # 'x' is centred on the second line, below the first
+    x = layout.vertices[12:]
+    assert numpy.allclose(x[:, 0], [13, 21, 21, 13])
+    assert numpy.allclose(x[:, 1], [-20, -20, -10, -10])
+    # laid out strings and glyphs are cached
+    assert atlas.layout('ab i\nx', alignHoriz='center') is layout
+    assert atlas.layout('ab i\nx', alignHoriz='left') is not layout
+    assert font.nRendered == len(atlas) == 5
+    atlas.layout('bax')
+    assert font.nRendered == 5
+
+
+def test_layout_cache_size():
+    atlas = glyphtools.getGlyphAtlas(_Font())
+    atlas.maxLayouts = 3
+    first = atlas.layout('a')
+    for text in ['b', 'c', 'a', 'd']:
+        atlas.layout(text)
+    assert atlas.layout('a') is first  # recently used, so kept
+    assert len(atlas._layouts) == 3
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""Tests for psychopy.tools.texturetools"""
+
+import numpy
+import pytest
+
+from psychopy.tools import texturetools
+
+
+def test_named_textures():
+    for name in texturetools.textureNames:
+        intensity = texturetools.createTextureArray(name, res=32)
+        assert intensity.ndim == 2
+        assert intensity.min() >= -1 and intensity.max() <= 1.1
+    assert texturetools.createTextureArray(None).shape == (1, 1)
+    assert texturetools.createTextureArray('gauss', res=16).shape == (16, 16)
+    with pytest.raises(ValueError):
+        texturetools.createTextureArray('notATexture')
+    assert texturetools.isTextureName('raisedCos')
+    assert not texturetools.isTextureName('face.jpg')
+    assert not texturetools.isTextureName(numpy.zeros((4, 4)))
+
+
+def test_cached_arrays():
+    texturetools.clearTextureArrays()
+    gauss = texturetools.getTextureArray('gauss', 64)
+    assert not gauss.flags.writeable
+    assert texturetools.getTextureArray('gauss', 64) is gauss
+    # only the parameters that affect the texture are part of the key
+    assert texturetools.getTextureArray(
+        'gauss', 64, {'fringeWidth': 0.5}) is gauss
+    assert texturetools.getTextureArray('gauss', 64, {'sd': 2}) is not gauss
+    assert texturetools.getTextureArray('none', 64) is \
+        texturetools.getTextureArray(None, 128)
+    numpy.testing.assert_array_equal(
+        gauss, texturetools.createTextureArray('gauss', 64))
+
+    texturetools.maxCachedArrays, maxArrays = 2, texturetools.maxCachedArrays
+    try:
+        for res in (8, 16, 32):
+            texturetools.getTextureArray('sin', res)
+        assert len(texturetools._cachedArrays) == 2
+    finally:
+        texturetools.maxCachedArrays = maxArrays
+        texturetools.clearTextureArrays()
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""The per-frame update of random dot fields, as used by
+:class:`~psychopy.visual.DotStim`. These don't need OpenGL, so dot motion can
+also be simulated (or timed, see `benchmarkDots`) without a window.
+"""
+from __future__ import absolute_import, division, print_function
+
+from builtins import object, range
+import timeit
+
+import numpy
+from numpy import pi
+
+
+def newDotsXY(nDots, fieldSize, fieldShape='sqr'):
+    """Returns an nDots x 2 array of positions spread uniformly over a field
+    of the given size and shape ('sqr' or 'circle'), centred on 0.
+    """
+    halfSize = 0.5 * numpy.abs(numpy.asarray(fieldSize, dtype=float))
+    xy = numpy.random.uniform(-1, 1, [nDots, 2])
+    if fieldShape == 'circle':
+        # replace the dots outside the circle until there are none
+        outside = numpy.hypot(xy[:, 0], xy[:, 1]) >= 1
+        nOutside = numpy.count_nonzero(outside)
+        while nOutside:
+            new = numpy.random.uniform(-1, 1, [nOutside, 2])
+            xy[outside] = new
+            stillOutside = numpy.hypot(new[:, 0], new[:, 1]) >= 1
+            outside[outside] = stillOutside
+            nOutside = numpy.count_nonzero(stillOutside)
+    xy *= halfSize
+    return xy
+
+
+class DotArrays(object):
+    """The state of the dots of one or more dot fields, in arrays that are
+    allocated once and then updated in place by `updateDots`.
+
+    Slicing (e.g. `dots[0:100]`) gives the DotArrays of a subset of the dots,
+    sharing memory with the original, so several fields can keep their dots
+    in one set of arrays and be updated together.
+
+    Attributes are `xy` (nDots x 2 positions), `life` (frames left to live),
+    `dirs` (directions of motion, radians), `signal` (bool, the signal dots)
+    and, for use during the update, `step` (nDots x 2 motion this frame),
+    `renew` (bool, dots to be replaced this frame), `halfSize` and `circle`.
+    """
+    _stateNames = ('xy', 'life', 'dirs', 'signal')
+    _arrayNames = _stateNames + ('step', 'renew', 'halfSize', 'circle',
+                                 '_mask', '_absXY', '_outXY', '_radius',
+                                 '_outCircle')
+
+    def __init__(self, nDots):
+        self.nDots = nDots
+        self.xy = numpy.zeros([nDots, 2])
+        self.life = numpy.zeros(nDots)
+        self.dirs = numpy.zeros(nDots)
+        self.signal = numpy.zeros(nDots, dtype=bool)
+        self.step = numpy.zeros([nDots, 2])
+        self.renew = numpy.zeros(nDots, dtype=bool)
+        self.halfSize = numpy.ones([nDots, 2])
+        self.circle = numpy.zeros(nDots, dtype=bool)
+        # scratch space
+        self._mask = numpy.zeros(nDots, dtype=bool)
+        self._absXY = numpy.zeros([nDots, 2])
+        self._outXY = numpy.zeros([nDots, 2], dtype=bool)
+        self._radius = numpy.zeros(nDots)
+        self._outCircle = numpy.zeros(nDots, dtype=bool)
+
+    def __len__(self):
+        return self.nDots
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError("DotArrays can only be sliced")
+        dots = DotArrays.__new__(DotArrays)
+        for name in self._arrayNames:
+            setattr(dots, name, getattr(self, name)[index])
+        dots.nDots = len(dots.life)
+        return dots
+
+    def copyState(self, other):
+        """Copy the positions, lives, directions and signal flags of
+        `other` (of the same length) into these arrays"""
+        for name in self._stateNames:
+            getattr(self, name)[...] = getattr(other, name)
+
+
+def initDots(field, dots):
+    """Give the dots of `field` random positions, lives and (noise)
+    directions, with the first coherence * nDots being signal dots.
+    """
+    dots.xy[...] = newDotsXY(field.nDots, field.fieldSize, field.fieldShape)
+    dots.life[...] = abs(field.dotLife) * numpy.random.rand(field.nDots)
+    dots.signal.fill(False)
+    dots.signal[:int(round(field.coherence * field.nDots))] = True
+    dots.dirs[...] = numpy.random.rand(field.nDots) * 2 * pi
+    dots.dirs[dots.signal] = field.dir * pi / 180
+
+
+def updateDots(fields, dots):
+    """Move the dots of one or more fields on by one frame.
+
+    `fields` are objects with the attributes of a DotStim (nDots, fieldSize,
+    fieldShape, speed, dir, dotLife, signalDots and noiseDots) and `dots`
+    is the DotArrays of all their dots, in the same order. Dots whose life
+    is over, or that have left their field, are given new positions by the
+    field's `_newDotsXY(n)` method if it has one, or by `newDotsXY`.
+    """
+    start = 0
+    for field in fields:
+        stop = start + field.nDots
+        _updateField(field, dots[start:stop])
+        start = stop
+
+    # move all the dots together and find those now outside their field
+    dots.xy += dots.step
+    numpy.abs(dots.xy, out=dots._absXY)
+    numpy.greater(dots._absXY, dots.halfSize, out=dots._outXY)
+    numpy.logical_or(dots._outXY[:, 0], dots._outXY[:, 1], out=dots._mask)
+    if dots.circle.any():
+        # distance from the centre, with the field normalised to radius 1
+        numpy.divide(dots._absXY, dots.halfSize, out=dots._absXY)
+        dots._absXY *= dots._absXY
+        numpy.add(dots._absXY[:, 0], dots._absXY[:, 1], out=dots._radius)
+        numpy.greater(dots._radius, 1, out=dots._outCircle)
+        numpy.copyto(dots._mask, dots._outCircle, where=dots.circle)
+    dots.renew |= dots._mask
+
+    start = 0
+    for field in fields:
+        stop = start + field.nDots
+        renew = dots.renew[start:stop]
+        nRenew = numpy.count_nonzero(renew)
+        if nRenew:
+            if hasattr(field, '_newDotsXY'):
+                newXY = field._newDotsXY(nRenew)
+            else:
+                newXY = newDotsXY(nRenew, field.fieldSize, field.fieldShape)
+            dots.xy[start:stop][renew] = newXY
+        start = stop
+
+
+def _updateField(field, dots):
+    """Ages the dots of a field, sets their directions and their step for
+    this frame, and flags (in dots.renew) those to be replaced."""
+    dots.halfSize[...] = 0.5 * numpy.abs(field.fieldSize)
+    dots.circle.fill(field.fieldShape == 'circle')
+
+    if field.dotLife > 0:  # if less than zero ignore it
+        # decrement. Then dots to be reborn will be negative
+        dots.life -= 1
+        numpy.less_equal(dots.life, 0, out=dots.renew)
+        dots.life[dots.renew] = field.dotLife
+    else:
+        dots.renew.fill(False)
+
+    # NB dots.dirs is in radians, but field.dir is in degs
+    if field.signalDots == 'different':
+        # noise and signal dots change identity constantly
+        numpy.random.shuffle(dots.dirs)
+        numpy.equal(dots.dirs, field.dir * pi / 180, out=dots.signal)
+    noise = numpy.logical_not(dots.signal, out=dots._mask)
+    if field.noiseDots == 'walk':
+        dots.dirs[noise] = (numpy.random.rand(numpy.count_nonzero(noise)) *
+                            2 * pi)
+
+    # 0 radians=East!
+    numpy.cos(dots.dirs, out=dots.step[:, 0])
+    numpy.sin(dots.dirs, out=dots.step[:, 1])
+    dots.step *= field.speed
+    if field.noiseDots == 'position':
+        # noise dots don't move; they get new positions instead
+        dots.step[noise] = 0
+        dots.renew |= noise
+
+
+class DotField(object):
+    """The parameters of a dot field, for use with `initDots` and
+    `updateDots` without a DotStim (and so without a window). The
+    arguments are as for DotStim.
+    """
+
+    def __init__(self, nDots=100, coherence=0.5, fieldSize=(1.0, 1.0),
+                 fieldShape='sqr', dotLife=3, dir=0.0, speed=0.01,
+                 signalDots='same', noiseDots='direction'):
+        self.nDots = nDots
+        self.coherence = coherence
+        self.fieldSize = numpy.asarray(fieldSize, dtype=float)
+        self.fieldShape = fieldShape
+        self.dotLife = dotLife
+        self.dir = dir
+        self.speed = speed
+        self.signalDots = signalDots
+        self.noiseDots = noiseDots
+
+
+def benchmarkDots(nDots=(100, 1000, 5000, 20000), coherence=(0.1, 0.5, 1.0),
+                  fieldShape=('sqr', 'circle'), nFields=1, nFrames=500,
+                  **fieldArgs):
+    """Times the update of dot fields (without drawing them), for each
+    combination of the numbers of dots, coherences and field shapes given.
+
+    `nFields` fields are updated together on each frame, and `fieldArgs`
+    are passed to DotField (e.g. noiseDots='walk').
+
+    Returns a list of dicts, one per combination, with the median and
+    maximum time per frame in ms.
+
+    usage::
+
+        for row in benchmarkDots(nDots=[5000], nFields=4):
+            print(row)
+    """
+    results = []
+    for shape in fieldShape:
+        for thisCoherence in coherence:
+            for thisNDots in nDots:
+                fields = [DotField(nDots=thisNDots, coherence=thisCoherence,
+                                   fieldShape=shape, **fieldArgs)
+                          for fieldN in range(nFields)]
+                dots = DotArrays(thisNDots * nFields)
+                for fieldN, field in enumerate(fields):
+                    initDots(field, dots[fieldN * thisNDots:
+                                         (fieldN + 1) * thisNDots])
+                frameTimes = numpy.zeros(nFrames)
+                for frameN in range(nFrames):
+                    t0 = timeit.default_timer()
+                    updateDots(fields, dots)
+                    frameTimes[frameN] = timeit.default_timer() - t0
+                results.append({'nDots': thisNDots, 'coherence': thisCoherence,
+                                'fieldShape': shape, 'nFields': nFields,
+                                'medianMs': numpy.median(frameTimes) * 1000,
+                                'maxMs': frameTimes.max() * 1000})
+    return results
@@ -11,7 +11,7 @@
 import ctypes
 import array
 from io import StringIO
-from collections import namedtuple, OrderedDict
+from collections import namedtuple, OrderedDict, deque
 import pyglet.gl as GL  # using Pyglet for now
 from contextlib import contextmanager
 from PIL import Image
@@ -640,6 +640,158 @@ def deleteTexture(texture):
     GL.glDeleteTextures(1, texture.id)
 
 
+# ------------------------------------------
+# Pixel Buffer Objects (PBO) Texture Streaming
+# ------------------------------------------
+#
+# Textures whose contents change every frame (e.g. movie frames) can be
+# updated through Pixel Buffer Objects. The pixel data is copied into a PBO
+# and the texture is updated from it, so 'glTexSubImage2D' returns right
+# away and the transfer to video memory happens asynchronously. Several
+# PBOs are used in turn so that writing a new image never has to wait for
+# the transfer of the previous one.
+#
+#   texDesc = createTexImage2D(width, height, internalFormat=GL.GL_RGB8,
+#                              pixelFormat=GL.GL_RGB,
+#                              dataType=GL.GL_UNSIGNED_BYTE,
+#                              unpackAlignment=1)
+#   streamDesc = createStreamingTexture(texDesc)
+#   # every frame
+#   streamTexture(streamDesc, frame)  # `frame` is a (height, width, 3) array
+#   GL.glBindTexture(GL.GL_TEXTURE_2D, texDesc.id)
+#
+
+# Streaming texture descriptor, 'buffers' is rotated after each upload
+StreamingTexture = namedtuple(
+    'StreamingTexture',
+    ['texture',  # TexImage2D descriptor of the texture being updated
+     'buffers',  # deque of PBO IDs
+     'size',  # bytes per image
+     'userData']
+)
+
+_pixelFormatChannels = {
+    GL.GL_RED: 1, GL.GL_ALPHA: 1, GL.GL_LUMINANCE: 1,
+    GL.GL_LUMINANCE_ALPHA: 2, GL.GL_RGB: 3, GL.GL_BGR: 3,
+    GL.GL_RGBA: 4, GL.GL_BGRA: 4}
+_dataTypeBytes = {
+    GL.GL_UNSIGNED_BYTE: 1, GL.GL_BYTE: 1, GL.GL_UNSIGNED_SHORT: 2,
+    GL.GL_SHORT: 2, GL.GL_UNSIGNED_INT: 4, GL.GL_INT: 4, GL.GL_FLOAT: 4}
+
+
+def createStreamingTexture(texture, nBuffers=2):
+    """Create Pixel Buffer Objects (PBO) for streaming image data to an
+    existing 2D texture.
+
+    Parameters
+    ----------
+    texture : :obj:`TexImage2D`
+        Descriptor of the texture to update. Its storage must already be
+        allocated (e.g. by 'createTexImage2D' or 'glTexImage2D'). Existing
+        texture IDs can be wrapped with a TexImage2D descriptor.
+    nBuffers : :obj:`int`
+        Number of PBOs to use in turn, should be 2 or more.
+
+    Returns
+    -------
+    :obj:`StreamingTexture`
+        A descriptor to pass to 'streamTexture'.
+
+    Notes
+    -----
+    Requires OpenGL 2.1 or the GL_ARB_pixel_buffer_object extension.
+
+    """
+    try:
+        size = (int(texture.width) * int(texture.height) *
+                _pixelFormatChannels[texture.pixelFormat] *
+                _dataTypeBytes[texture.dataType])
+    except KeyError:
+        raise ValueError("Unsupported pixel format or data type.")
+
+    buffers = (GL.GLuint * nBuffers)()
+    GL.glGenBuffers(nBuffers, buffers)
+    for pboId in buffers:
+        GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, pboId)
+        GL.glBufferData(GL.GL_PIXEL_UNPACK_BUFFER, size, None,
+                        GL.GL_STREAM_DRAW)
+    GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, 0)
+
+    return StreamingTexture(texture,
+                            deque(GL.GLuint(pboId) for pboId in buffers),
+                            size,
+                            dict())
+
+
+def streamTexture(streamTex, data):
+    """Update the texture of a streaming texture with new pixel data.
+
+    Parameters
+    ----------
+    streamTex : :obj:`StreamingTexture`
+        Descriptor returned by 'createStreamingTexture'.
+    data : :obj:`ndarray`
+        Pixel data for the whole texture, with the same size, pixel format
+        and data type as the texture (e.g. a (height, width, 3) uint8 array
+        for GL_RGB/GL_UNSIGNED_BYTE).
+
+    Returns
+    -------
+    :obj:`None'
+
+    Notes
+    -----
+    The texture is unbound after calling 'streamTexture'.
+
+    """
+    data = np.ascontiguousarray(data)
+    if data.nbytes != streamTex.size:
+        raise ValueError("Image data has {} bytes, expected {}.".format(
+            data.nbytes, streamTex.size))
+
+    texture = streamTex.texture
+    pboId = streamTex.buffers[0]
+    streamTex.buffers.rotate(-1)
+
+    GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, pboId)
+    # orphan the previous storage, so we don't wait on a pending transfer
+    GL.glBufferData(GL.GL_PIXEL_UNPACK_BUFFER, streamTex.size, None,
+                    GL.GL_STREAM_DRAW)
+    ptr = GL.glMapBuffer(GL.GL_PIXEL_UNPACK_BUFFER, GL.GL_WRITE_ONLY)
+    if ptr:
+        ctypes.memmove(ptr, data.ctypes.data, streamTex.size)
+        GL.glUnmapBuffer(GL.GL_PIXEL_UNPACK_BUFFER)
+
+    # update the texture from the PBO, returns without waiting
+    GL.glBindTexture(texture.target, texture.id)
+    GL.glPixelStorei(GL.GL_UNPACK_ALIGNMENT, int(texture.unpackAlignment))
+    if ptr:
+        GL.glTexSubImage2D(texture.target, 0, 0, 0,
+                           texture.width, texture.height,
+                           texture.pixelFormat, texture.dataType, None)
+    GL.glBindBuffer(GL.GL_PIXEL_UNPACK_BUFFER, 0)
+    if not ptr:  # could not map the buffer, upload directly
+        GL.glTexSubImage2D(texture.target, 0, 0, 0,
+                           texture.width, texture.height,
+                           texture.pixelFormat, texture.dataType,
+                           data.ctypes)
+    GL.glBindTexture(texture.target, 0)
+
+
+def deleteStreamingTexture(streamTex):
+    """Free the PBOs of a streaming texture. This does not delete the
+    texture itself.
+
+    Returns
+    -------
+    :obj:`None'
+
+    """
+    for pboId in streamTex.buffers:
+        GL.glDeleteBuffers(1, pboId)
+    streamTex.buffers.clear()
+
+
 # ---------------------------
 # Vertex Buffer Objects (VBO)
 # ---------------------------
@@ -665,7 +817,14 @@ VertexArrayObject = namedtuple(
 )
 
 
-def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
+# numpy types of the data of VBOs created from arrays
+_vboArrayTypes = {GL.GL_FLOAT: np.float32,
+                  GL.GL_UNSIGNED_INT: np.uint32,
+                  GL.GL_UNSIGNED_SHORT: np.uint16}
+
+
+def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER,
+              usage=GL.GL_STATIC_DRAW):
     """Create a single-storage array buffer, often referred to as Vertex Buffer
     Object (VBO).
 
@@ -673,6 +832,7 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
     ----------
     data : :obj:`list` or :obj:`tuple` of :obj:`float` or :obj:`int`
         Coordinates as a 1D array of floats (e.g. [X0, Y0, Z0, X1, Y1, Z1, ...])
+        or an `ndarray` of any shape (converted to 'dtype').
     size : :obj:`int`
         Number of coordinates per-vertex, default is 3.
     dtype : :obj:`int`
@@ -680,6 +840,9 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
         the type of 'data'.
     target : :obj:`int`
         Target used when binding the buffer (e.g. GL_VERTEX_ARRAY)
+    usage : :obj:`int`
+        Expected usage of the data, GL_STATIC_DRAW by default. Use
+        GL_DYNAMIC_DRAW for data that will be changed with 'updateVBO'.
 
     Returns
     -------
@@ -719,7 +882,12 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
     else:
         raise TypeError("Invalid type specified.")
 
-    if isinstance(data, array.array):
+    if isinstance(data, np.ndarray):
+        data = np.ascontiguousarray(data, dtype=_vboArrayTypes[dtype])
+        count = data.size
+        c_array = ctypes.cast(data.ctypes.data,
+                              ctypes.POINTER((useType * count)))[0]
+    elif isinstance(data, array.array):
         addr, count = data.buffer_info()
         c_array = ctypes.cast(addr, ctypes.POINTER((useType * count)))[0]
     else:
@@ -739,7 +907,7 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
                                  size,
                                  count,
                                  nIndices,
-                                 GL.GL_STATIC_DRAW,
+                                 usage,
                                  dtype,
                                  dict())
 
@@ -748,12 +916,48 @@ def createVBO(data, size=3, dtype=GL.GL_FLOAT, target=GL.GL_ARRAY_BUFFER):
     GL.glBufferData(target,
                     ctypes.sizeof(c_array),
                     c_array,
-                    GL.GL_STATIC_DRAW)
+                    usage)
     GL.glBindBuffer(target, 0)
 
     return vboDesc
 
 
+def updateVBO(vbo, data, offset=0, target=GL.GL_ARRAY_BUFFER):
+    """Replace part of the data of a Vertex Buffer Object (VBO).
+
+    Parameters
+    ----------
+    vbo : :obj:`VertexBufferObject`
+        Descriptor of the buffer, created with 'createVBO' (ideally with
+        usage=GL_DYNAMIC_DRAW).
+    data : :obj:`ndarray`
+        The new values, converted to the VBO's data type. Their number,
+        plus 'offset', must not exceed the number of values in the VBO.
+    offset : :obj:`int`
+        Index of the first value to replace (in values, not bytes).
+    target : :obj:`int`
+        Target used when binding the buffer.
+
+    Returns
+    -------
+    :obj:`None'
+
+    Examples
+    --------
+    # update the vertices of the elements 10 to 19 of an array of quads,
+    # each having 4 vertices of 3 coordinates
+    updateVBO(vboDesc, verts[10:20], offset=10 * 4 * 3)
+
+    """
+    data = np.ascontiguousarray(data, dtype=_vboArrayTypes[vbo.dtype])
+    if offset + data.size > vbo.count:
+        raise ValueError("Data do not fit in the VBO.")
+    GL.glBindBuffer(target, vbo.id)
+    GL.glBufferSubData(target, offset * data.itemsize, data.nbytes,
+                       data.ctypes.data)
+    GL.glBindBuffer(target, 0)
+
+
 def createVAO(vertexBuffers, indexBuffer=None):
     """Create a Vertex Array Object (VAO) with specified Vertex Buffer Objects.
     VAOs store buffer binding states, reducing CPU overhead when drawing objects
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Layout of text from the glyphs of a font into vertex and texture
+coordinate arrays, as used by :class:`~psychopy.visual.TextStim` with
+`useGlyphAtlas=True`. These don't need OpenGL (the glyph textures are
+created by the font), so layouts can also be computed and checked without
+a window.
+"""
+from __future__ import absolute_import, division, print_function
+
+from builtins import object
+from collections import OrderedDict, namedtuple
+import weakref
+
+import numpy
+
+# advance : horizontal distance to the next glyph, in pixels
+# vertices : (left, bottom, right, top) of the glyph relative to its origin
+#   on the baseline
+# texCoords : (u, v) of the bottom-left, bottom-right, top-right and top-left
+#   corners, as a flat tuple of 8 values
+# texID : the OpenGL texture holding the glyph
+GlyphMetrics = namedtuple('GlyphMetrics',
+                          ['advance', 'vertices', 'texCoords', 'texID'])
+
+
+class TextLayout(object):
+    """The quads of a laid-out string, ready to draw with GL_QUADS.
+
+    `vertices` and `texCoords` are (4 * nGlyphs, 2) float32 arrays, sorted
+    by texture, and `batches` a list of (texID, first, count) to pass to
+    glBindTexture and glDrawArrays. `width` is the width of the frame the
+    lines were aligned in (the wrap width, if given), `contentWidth` that of
+    the longest line and `height` that of all the lines, in pixels.
+    """
+    __slots__ = ('vertices', 'texCoords', 'batches', 'width',
+                 'contentWidth', 'height', 'nLines')
+
+    def __init__(self, vertices, texCoords, batches, width, contentWidth,
+                 height, nLines):
+        self.vertices = vertices
+        self.texCoords = texCoords
+        self.batches = batches
+        self.width = width
+        self.contentWidth = contentWidth
+        self.height = height
+        self.nLines = nLines
+
+
+def wrapLines(text, advances, wrapWidth=None):
+    """Split `text` into lines at newlines and, if `wrapWidth` is given,
+    at the spaces before words that would run past it (a single word that
+    is longer than the wrap width is not split).
+
+    `advances` gives the advance of each character of `text`. Returns a
+    list of (start, stop, width) for each line, where width excludes the
+    trailing spaces.
+    """
+    lines = []
+    start = 0
+    for paragraph in text.split('\n'):
+        stop = start + len(paragraph)
+        if wrapWidth is None:
+            width = sum(advances[start:start + len(paragraph.rstrip())])
+            lines.append((start, stop, width))
+        else:
+            lineStart = start
+            width = 0  # of the line up to the end of the last word
+            pen = 0  # including any spaces after it
+            pos = start
+            for word in paragraph.split(' '):
+                wordWidth = sum(advances[pos:pos + len(word)])
+                if word and width and pen + wordWidth > wrapWidth:
+                    lines.append((lineStart, pos, width))
+                    lineStart = pos
+                    pen = 0
+                if word:
+                    width = pen + wordWidth
+                pen += wordWidth
+                pos += len(word)
+                if pos < stop:  # the space after the word
+                    pen += advances[pos]
+                    pos += 1
+            lines.append((lineStart, stop, width))
+        start = stop + 1  # skip the newline
+    return lines
+
+
+def layoutText(text, glyphs, ascent, descent, wrapWidth=None,
+               alignHoriz='left', alignVert='top'):
+    """Lay out `text` using the `glyphs` of a font (a dict of
+    GlyphMetrics for every character of the text other than newlines).
+
+    Lines are wrapped at `wrapWidth` (pixels) and aligned within it (or
+    within the longest line if there is no wrap width) by `alignHoriz`. The
+    origin is at the left of that frame, and vertically at the top,
+    center or bottom of the lines (or the first baseline for
+    alignVert='baseline'), as with pyglet.font.Text.
+
+    Returns a TextLayout.
+    """
+    lineHeight = ascent - descent
+    advances = [glyphs[char].advance if char != '\n' else 0
+                for char in text]
+    lines = wrapLines(text, advances, wrapWidth)
+    contentWidth = max(width for start, stop, width in lines)
+    width = contentWidth if wrapWidth is None else wrapWidth
+    height = lineHeight * len(lines)
+
+    if alignHoriz in ('center', 'centre'):
+        alignX = 0.5
+    elif alignHoriz == 'right':
+        alignX = 1.0
+    else:
+        alignX = 0.0
+    if alignVert in ('center', 'centre'):
+        baseline = height / 2.0 - ascent
+    elif alignVert == 'bottom':
+        baseline = height - ascent
+    elif alignVert == 'baseline':
+        baseline = 0.0
+    else:
+        baseline = -ascent
+
+    # the origin of each visible glyph and its metrics
+    origins = []
+    quads = []
+    for lineN, (start, stop, lineWidth) in enumerate(lines):
+        x = (width - lineWidth) * alignX
+        y = baseline - lineN * lineHeight
+        for char in text[start:stop]:
+            glyph = glyphs[char]
+            left, bottom, right, top = glyph.vertices
+            if right > left and top > bottom:
+                origins.append((x, y))
+                quads.append(glyph)
+            x += glyph.advance
+
+    nGlyphs = len(quads)
+    vertices = numpy.zeros([nGlyphs, 4, 2], numpy.float32)
+    texCoords = numpy.zeros([nGlyphs, 4, 2], numpy.float32)
+    batches = []
+    if nGlyphs:
+        texIDs = numpy.array([glyph.texID for glyph in quads])
+        order = numpy.argsort(texIDs, kind='mergesort')
+        boxes = numpy.array([glyph.vertices for glyph in quads])[order]
+        origins = numpy.array(origins)[order]
+        # corners in the order bottom-left, bottom-right, top-right, top-left
+        vertices[:, :, 0] = boxes[:, [0, 2, 2, 0]] + origins[:, 0:1]
+        vertices[:, :, 1] = boxes[:, [1, 1, 3, 3]] + origins[:, 1:2]
+        texCoords[...] = numpy.array(
+            [glyph.texCoords for glyph in quads])[order].reshape(-1, 4, 2)
+        texIDs = texIDs[order]
+        starts = numpy.flatnonzero(numpy.diff(texIDs)) + 1
+        firsts = numpy.concatenate([[0], starts])
+        lasts = numpy.concatenate([starts, [nGlyphs]])
+        batches = [(int(texIDs[first]), int(first * 4),
+                    int((last - first) * 4))
+                   for first, last in zip(firsts, lasts)]
+
+    return TextLayout(vertices.reshape(-1, 2), texCoords.reshape(-1, 2),
+                      batches, width, contentWidth, height, len(lines))
+
+
+class GlyphAtlas(object):
+    """The glyphs of a font (a pyglet font, or anything with `ascent`,
+    `descent` and `get_glyphs(text)`), kept so that text can be laid out
+    without asking the font again, plus a cache of the most recently laid
+    out strings.
+
+    Glyphs are rendered by the font into its own textures the first time
+    they are needed. Use `getGlyphAtlas(font)` to get the atlas shared by
+    everything using the same font.
+    """
+
+    def __init__(self, font, maxLayouts=256):
+        self.font = font
+        self.ascent = font.ascent
+        self.descent = font.descent
+        self.maxLayouts = maxLayouts
+        self._glyphs = {}
+        self._layouts = OrderedDict()
+
+    def __len__(self):
+        return len(self._glyphs)
+
+    def getGlyphs(self, text):
+        """Returns the dict of GlyphMetrics, having added any characters of
+        `text` that it didn't have yet.
+        """
+        missing = set(text).difference(self._glyphs)
+        missing.discard('\n')
+        if missing:
+            chars = ''.join(sorted(missing))
+            for char, glyph in zip(chars, self.font.get_glyphs(chars)):
+                t = glyph.tex_coords  # (u, v, r) for each corner
+                self._glyphs[char] = GlyphMetrics(
+                    glyph.advance, tuple(glyph.vertices),
+                    (t[0], t[1], t[3], t[4], t[6], t[7], t[9], t[10]),
+                    glyph.owner.id)
+        return self._glyphs
+
+    def layout(self, text, wrapWidth=None, alignHoriz='left',
+               alignVert='top'):
+        """Returns the TextLayout of `text` (see `layoutText`), from the
+        cache if it was laid out recently. The layout is shared, so its
+        arrays should not be modified.
+        """
+        key = (text, wrapWidth, alignHoriz, alignVert)
+        layout = self._layouts.get(key)
+        if layout is not None:
+            self._layouts[key] = self._layouts.pop(key)  # most recently used
+            return layout
+        layout = layoutText(text, self.getGlyphs(text), self.ascent,
+                            self.descent, wrapWidth, alignHoriz, alignVert)
+        layout.vertices.flags.writeable = False
+        layout.texCoords.flags.writeable = False
+        self._layouts[key] = layout
+        while len(self._layouts) > self.maxLayouts:
+            self._layouts.popitem(last=False)
+        return layout
+
+    def clear(self):
+        """Forget the cached layouts (but not the glyphs)."""
+        self._layouts.clear()
+
+
+_atlases = weakref.WeakKeyDictionary()
+
+
+def getGlyphAtlas(font):
+    """Returns the GlyphAtlas of `font`, creating it if needed. The atlas
+    lives as long as the font (pyglet shares its fonts between everything
+    loading the same name, size and style).
+    """
+    atlas = _atlases.get(font)
+    if atlas is None:
+        atlas = _atlases[font] = GlyphAtlas(font)
+    return atlas
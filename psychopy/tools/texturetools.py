@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+"""Functions for generating the intensity arrays of the named textures and
+masks ('sin', 'gauss', 'raisedCos' etc). These don't need OpenGL, so can
+also be used to inspect or precompute textures without a window.
+"""
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+
+import numpy
+from numpy import pi
+
+from psychopy.tools.arraytools import makeRadialMatrix
+
+# names accepted as `tex` or `mask` by createTextureArray
+textureNames = ('none', 'None', 'color', 'sin', 'sqr', 'saw', 'tri',
+                'sinXsin', 'sqrXsqr', 'circle', 'gauss', 'cross', 'radRamp',
+                'raisedCos')
+
+# maximum number of arrays kept by getTextureArray
+maxCachedArrays = 64
+_cachedArrays = OrderedDict()
+
+
+def isTextureName(tex):
+    """True if `tex` is None or one of the named textures."""
+    try:
+        return tex is None or tex in textureNames
+    except (TypeError, ValueError):  # e.g. numpy arrays
+        return False
+
+
+def _maskParamsKey(tex, maskParams):
+    # only 'gauss' and 'raisedCos' depend on the mask parameters
+    if tex == 'gauss':
+        return maskParams['sd']
+    elif tex == 'raisedCos':
+        return maskParams['fringeWidth']
+    return None
+
+
+def createTextureArray(tex, res=128, maskParams=None):
+    """Create the intensity array, ranging -1:1, of a named texture.
+
+    :Parameters:
+
+        tex : str or None
+            One of `textureNames` (None, 'none' and 'color' give a uniform
+            texture).
+        res : int
+            The resolution of the texture.
+        maskParams : dict
+            'fringeWidth' (for 'raisedCos') and 'sd' (for 'gauss'). Missing
+            values take the defaults 0.2 and 3.
+
+    Returns a new array of shape (res, res), or (1, 1) for a uniform
+    texture.
+    """
+    allMaskParams = {'fringeWidth': 0.2, 'sd': 3}
+    if maskParams:
+        allMaskParams.update(maskParams)
+
+    sin = numpy.sin
+    if tex in (None, "none", "None", "color"):
+        # 4x4 (2x2 is SUPPOSED to be fine but generates weird colors!)
+        res = 1
+        intensity = numpy.ones([res, res], numpy.float32)
+    elif tex == "sin":
+        # NB 1j*res is a special mgrid notation
+        onePeriodX, onePeriodY = numpy.mgrid[0:res, 0:2 * pi:1j * res]
+        intensity = numpy.sin(onePeriodY - pi / 2)
+    elif tex == "sqr":  # square wave (symmetric duty cycle)
+        # NB 1j*res is a special mgrid notation
+        onePeriodX, onePeriodY = numpy.mgrid[0:res, 0:2 * pi:1j * res]
+        sinusoid = numpy.sin(onePeriodY - pi / 2)
+        intensity = numpy.where(sinusoid > 0, 1, -1)
+    elif tex == "saw":
+        intensity = (numpy.linspace(-1.0, 1.0, res, endpoint=True) *
+                     numpy.ones([res, 1]))
+    elif tex == "tri":
+        # -1:3 means the middle is at +1
+        intens = numpy.linspace(-1.0, 3.0, res, endpoint=True)
+        # remove from 3 to get back down to -1
+        intens[res // 2 + 1 :] = 2.0 - intens[res // 2 + 1 :]
+        intensity = intens * numpy.ones([res, 1])  # make 2D
+    elif tex == "sinXsin":
+        # NB 1j*res is a special mgrid notation
+        onePeriodX, onePeriodY = numpy.mgrid[0:2 * pi:1j * res,
+                                             0:2 * pi:1j * res]
+        intensity = sin(onePeriodX - pi / 2) * sin(onePeriodY - pi / 2)
+    elif tex == "sqrXsqr":
+        # NB 1j*res is a special mgrid notation
+        onePeriodX, onePeriodY = numpy.mgrid[0:2 * pi:1j * res,
+                                             0:2 * pi:1j * res]
+        sinusoid = sin(onePeriodX - pi / 2) * sin(onePeriodY - pi / 2)
+        intensity = numpy.where(sinusoid > 0, 1, -1)
+    elif tex == "circle":
+        rad = makeRadialMatrix(res)
+        intensity = (rad <= 1) * 2 - 1
+    elif tex == "gauss":
+        rad = makeRadialMatrix(res)
+        # 3sd.s by the edge of the stimulus
+        invVar = (1.0 / allMaskParams['sd']) ** 2.0
+        intensity = numpy.exp( -rad**2.0 / (2.0 * invVar)) * 2 - 1
+    elif tex == "cross":
+        X, Y = numpy.mgrid[-1:1:1j * res, -1:1:1j * res]
+        tfNegCross = (((X < -0.2) & (Y < -0.2)) |
+                      ((X < -0.2) & (Y > 0.2)) |
+                      ((X > 0.2) & (Y < -0.2)) |
+                      ((X > 0.2) & (Y > 0.2)))
+        # tfNegCross == True at places where the cross is transparent,
+        # i.e. the four corners
+        intensity = numpy.where(tfNegCross, -1, 1)
+    elif tex == "radRamp":  # a radial ramp
+        rad = makeRadialMatrix(res)
+        intensity = 1 - 2 * rad
+        # clip off the corners (circular)
+        intensity = numpy.where(rad < -1, intensity, -1)
+    elif tex == "raisedCos":  # A raised cosine
+        hammingLen = 1000  # affects the 'granularity' of the raised cos
+
+        rad = makeRadialMatrix(res)
+        intensity = numpy.zeros_like(rad)
+        intensity[numpy.where(rad < 1)] = 1
+        frng = allMaskParams['fringeWidth']
+        raisedCosIdx = numpy.where(
+            [numpy.logical_and(rad <= 1, rad >= 1 - frng)])[1:]
+
+        # Make a raised_cos (half a hamming window):
+        raisedCos = numpy.hamming(hammingLen)[ : hammingLen // 2]
+        raisedCos -= numpy.min(raisedCos)
+        raisedCos /= numpy.max(raisedCos)
+
+        # Measure the distance from the edge - this is your index into the
+        # hamming window:
+        dFromEdge = numpy.abs(
+            (1 - allMaskParams['fringeWidth']) - rad[raisedCosIdx])
+        dFromEdge /= numpy.max(dFromEdge)
+        dFromEdge *= numpy.round(hammingLen/2)
+
+        # This is the indices into the hamming (larger for small distances
+        # from the edge!):
+        portionIdx = (-1 * dFromEdge).astype(int)
+
+        # Apply the raised cos to this portion:
+        intensity[raisedCosIdx] = raisedCos[portionIdx]
+
+        # Scale it into the interval -1:1:
+        intensity = intensity - 0.5
+        intensity /= numpy.max(intensity)
+
+        # Sometimes there are some remaining artifacts from this process,
+        # get rid of them:
+        artifactIdx = numpy.where(numpy.logical_and(intensity == -1,
+                                                    rad < 0.99))
+        intensity[artifactIdx] = 1
+        artifactIdx = numpy.where(numpy.logical_and(intensity == 1,
+                                                    rad > 0.99))
+        intensity[artifactIdx] = 0
+
+    else:
+        raise ValueError("Unknown texture name: {}".format(tex))
+    return intensity
+
+
+def getTextureArray(tex, res=128, maskParams=None):
+    """As `createTextureArray`, but keeps the most recently used arrays
+    (up to `maxCachedArrays`) so that stimuli sharing a texture or mask
+    only compute it once. The returned array is read-only; copy it if you
+    need to modify it.
+    """
+    allMaskParams = {'fringeWidth': 0.2, 'sd': 3}
+    if maskParams:
+        allMaskParams.update(maskParams)
+    if tex in (None, 'None', 'none', 'color'):
+        tex = res = None  # all uniform textures are the same
+    key = (tex, res, _maskParamsKey(tex, allMaskParams))
+    intensity = _cachedArrays.get(key)
+    if intensity is not None:
+        _cachedArrays[key] = _cachedArrays.pop(key)  # most recently used
+        return intensity
+    intensity = createTextureArray(tex, res, allMaskParams)
+    intensity.flags.writeable = False
+    _cachedArrays[key] = intensity
+    while len(_cachedArrays) > maxCachedArrays:
+        _cachedArrays.popitem(last=False)
+    return intensity
+
+
+def clearTextureArrays():
+    """Empty the cache of `getTextureArray`."""
+    _cachedArrays.clear()
@@ -52,7 +52,7 @@ from psychopy.visual.slider import Slider
 from psychopy.visual.simpleimage import SimpleImageStim
 
 # stimuli derived from BaseVisualStim
-from psychopy.visual.dot import DotStim
+from psychopy.visual.dot import DotStim, DotStimGroup
 from psychopy.visual.grating import GratingStim
 from psychopy.visual.secondorder import EnvelopeGrating
 from psychopy.visual.movie import MovieStim
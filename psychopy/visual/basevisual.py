@@ -45,6 +45,7 @@ from psychopy.visual.helpers import (pointInPolygon, polygonsOverlap,
                                      setColor, findImageFile)
 from psychopy.tools.typetools import float_uint8
 from psychopy.tools.arraytools import makeRadialMatrix
+from psychopy.tools.texturetools import getTextureArray, isTextureName
 from . import globalVars
 
 import numpy
@@ -661,7 +662,20 @@ class TextureMixin(object):
         allMaskParams = {'fringeWidth': 0.2, 'sd': 3}
         allMaskParams.update(maskParams)
 
-        sin = numpy.sin
+        # reuse the window's texture if another stimulus already made it
+        cache = getattr(stim.win, 'textureCache', None)
+        cacheKey = None
+        if cache is not None:
+            cacheKey = self._textureCacheKey(
+                tex, pixFormat, res, allMaskParams, forcePOW2, dataType,
+                useShaders, interpolate)
+            if cacheKey is not None:
+                wasLum = cache.acquire(cacheKey, id, stim)
+                if wasLum is not None:
+                    return wasLum
+            # don't overwrite a texture other stimuli are using
+            cache.release(id)
+
         if type(tex) == numpy.ndarray:
             # handle a numpy array
             # for now this needs to be an NxN intensity array
@@ -694,115 +708,10 @@ class TextureMixin(object):
                 res = tex.shape[0]
             if useShaders:
                 dataType = GL.GL_FLOAT
-        elif tex in (None, "none", "None", "color"):
-            # 4x4 (2x2 is SUPPOSED to be fine but generates weird colors!)
-            res = 1
-            intensity = numpy.ones([res, res], numpy.float32)
-            wasLum = True
-        elif tex == "sin":
-            # NB 1j*res is a special mgrid notation
-            onePeriodX, onePeriodY = numpy.mgrid[0:res, 0:2 * pi:1j * res]
-            intensity = numpy.sin(onePeriodY - pi / 2)
-            wasLum = True
-        elif tex == "sqr":  # square wave (symmetric duty cycle)
-            # NB 1j*res is a special mgrid notation
-            onePeriodX, onePeriodY = numpy.mgrid[0:res, 0:2 * pi:1j * res]
-            sinusoid = numpy.sin(onePeriodY - pi / 2)
-            intensity = numpy.where(sinusoid > 0, 1, -1)
-            wasLum = True
-        elif tex == "saw":
-            intensity = (numpy.linspace(-1.0, 1.0, res, endpoint=True) *
-                         numpy.ones([res, 1]))
-            wasLum = True
-        elif tex == "tri":
-            # -1:3 means the middle is at +1
-            intens = numpy.linspace(-1.0, 3.0, res, endpoint=True)
-            # remove from 3 to get back down to -1
-            intens[res // 2 + 1 :] = 2.0 - intens[res // 2 + 1 :]
-            intensity = intens * numpy.ones([res, 1])  # make 2D
-            wasLum = True
-        elif tex == "sinXsin":
-            # NB 1j*res is a special mgrid notation
-            onePeriodX, onePeriodY = numpy.mgrid[0:2 * pi:1j * res,
-                                                 0:2 * pi:1j * res]
-            intensity = sin(onePeriodX - pi / 2) * sin(onePeriodY - pi / 2)
-            wasLum = True
-        elif tex == "sqrXsqr":
-            # NB 1j*res is a special mgrid notation
-            onePeriodX, onePeriodY = numpy.mgrid[0:2 * pi:1j * res,
-                                                 0:2 * pi:1j * res]
-            sinusoid = sin(onePeriodX - pi / 2) * sin(onePeriodY - pi / 2)
-            intensity = numpy.where(sinusoid > 0, 1, -1)
-            wasLum = True
-        elif tex == "circle":
-            rad = makeRadialMatrix(res)
-            intensity = (rad <= 1) * 2 - 1
-            wasLum = True
-        elif tex == "gauss":
-            rad = makeRadialMatrix(res)
-            # 3sd.s by the edge of the stimulus
-            invVar = (1.0 / allMaskParams['sd']) ** 2.0
-            intensity = numpy.exp( -rad**2.0 / (2.0 * invVar)) * 2 - 1
-            wasLum = True
-        elif tex == "cross":
-            X, Y = numpy.mgrid[-1:1:1j * res, -1:1:1j * res]
-            tfNegCross = (((X < -0.2) & (Y < -0.2)) |
-                          ((X < -0.2) & (Y > 0.2)) |
-                          ((X > 0.2) & (Y < -0.2)) |
-                          ((X > 0.2) & (Y > 0.2)))
-            # tfNegCross == True at places where the cross is transparent,
-            # i.e. the four corners
-            intensity = numpy.where(tfNegCross, -1, 1)
+        elif isTextureName(tex):
+            # named textures are shared with other stimuli, don't modify
+            intensity = getTextureArray(tex, res, allMaskParams)
             wasLum = True
-        elif tex == "radRamp":  # a radial ramp
-            rad = makeRadialMatrix(res)
-            intensity = 1 - 2 * rad
-            # clip off the corners (circular)
-            intensity = numpy.where(rad < -1, intensity, -1)
-            wasLum = True
-        elif tex == "raisedCos":  # A raised cosine
-            wasLum = True
-            hammingLen = 1000  # affects the 'granularity' of the raised cos
-
-            rad = makeRadialMatrix(res)
-            intensity = numpy.zeros_like(rad)
-            intensity[numpy.where(rad < 1)] = 1
-            frng = allMaskParams['fringeWidth']
-            raisedCosIdx = numpy.where(
-                [numpy.logical_and(rad <= 1, rad >= 1 - frng)])[1:]
-
-            # Make a raised_cos (half a hamming window):
-            raisedCos = numpy.hamming(hammingLen)[ : hammingLen // 2]
-            raisedCos -= numpy.min(raisedCos)
-            raisedCos /= numpy.max(raisedCos)
-
-            # Measure the distance from the edge - this is your index into the
-            # hamming window:
-            dFromEdge = numpy.abs(
-                (1 - allMaskParams['fringeWidth']) - rad[raisedCosIdx])
-            dFromEdge /= numpy.max(dFromEdge)
-            dFromEdge *= numpy.round(hammingLen/2)
-
-            # This is the indices into the hamming (larger for small distances
-            # from the edge!):
-            portionIdx = (-1 * dFromEdge).astype(int)
-
-            # Apply the raised cos to this portion:
-            intensity[raisedCosIdx] = raisedCos[portionIdx]
-
-            # Scale it into the interval -1:1:
-            intensity = intensity - 0.5
-            intensity /= numpy.max(intensity)
-
-            # Sometimes there are some remaining artifacts from this process,
-            # get rid of them:
-            artifactIdx = numpy.where(numpy.logical_and(intensity == -1,
-                                                        rad < 0.99))
-            intensity[artifactIdx] = 1
-            artifactIdx = numpy.where(numpy.logical_and(intensity == 1,
-                                                        rad > 0.99))
-            intensity[artifactIdx] = 0
-
         else:
             if isinstance(tex, basestring):
                 # maybe tex is the name of a file:
@@ -992,17 +901,57 @@ class TextureMixin(object):
                      GL.GL_MODULATE)  # ?? do we need this - think not!
         # unbind our texture so that it doesn't affect other rendering
         GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        if cacheKey is not None:
+            nBytes = data.nbytes
+            if interpolate:
+                nBytes += nBytes // 3  # mipmaps
+            cache.add(cacheKey, id, nBytes, wasLum,
+                      stim._origSize if wasImage else None)
         return wasLum
 
+    def _textureCacheKey(self, tex, pixFormat, res, maskParams, forcePOW2,
+                         dataType, useShaders, interpolate):
+        """Key of the texture in the window's texture cache, or None if
+        it can't be shared (numpy arrays, images in memory, or textures
+        colored on the CPU for lack of shaders).
+        """
+        if not useShaders and pixFormat != GL.GL_ALPHA:
+            return None
+        if isTextureName(tex):
+            if tex in (None, "none", "None", "color"):
+                tex = None
+            texKey = ('name', tex)
+        elif isinstance(tex, basestring):
+            filename = findImageFile(tex)
+            if not filename:
+                return None
+            stat = os.stat(filename)
+            texKey = ('file', os.path.abspath(filename), stat.st_size,
+                      stat.st_mtime)
+        else:
+            return None
+        return (texKey, res, pixFormat, dataType, forcePOW2, interpolate,
+                useShaders, tuple(sorted(maskParams.items())))
+
+    def _deleteTexture(self, texID):
+        """Delete a texture, or release it if it is shared with other
+        stimuli through the window's texture cache.
+        """
+        cache = getattr(self.win, 'textureCache', None)
+        if cache is not None and cache.isShared(texID):
+            cache.release(texID, delete=True)
+        else:
+            GL.glDeleteTextures(1, texID)
+
     def clearTextures(self):
         """Clear all textures associated with the stimulus.
 
         As of v1.61.00 this is called automatically during garbage collection
         of your stimulus, so doesn't need calling explicitly by the user.
         """
-        GL.glDeleteTextures(1, self._texID)
+        self._deleteTexture(self._texID)
         if hasattr(self, '_maskID'):
-            GL.glDeleteTextures(1, self._maskID)
+            self._deleteTexture(self._maskID)
 
     @attributeSetter
     def mask(self, value):
@@ -36,6 +36,7 @@ from psychopy import logging
 from psychopy.tools.attributetools import attributeSetter, setAttribute
 from psychopy.tools.arraytools import val2array
 from psychopy.tools.monitorunittools import cm2pix, deg2pix
+from psychopy.tools.dottools import DotArrays, newDotsXY, updateDots
 from psychopy.visual.basevisual import (BaseVisualStim, ColorMixin,
                                         ContainerMixin)
 
@@ -65,6 +66,10 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
 
     If further customisation is required, then the DotStim should be
     subclassed and its _update_dotsXY and _newDotsXY methods overridden.
+
+    The dots are updated in place, in arrays allocated when the stimulus is
+    created (see :mod:`psychopy.tools.dottools`). To update several
+    DotStims together, see :class:`DotStimGroup`.
     """
 
     def __init__(self,
@@ -106,6 +111,9 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
                                       autoLog=False)  # set at end of init
 
         self.nDots = nDots
+        self._group = None  # a DotStimGroup
+        self._dots = None
+        self._setDotArrays(DotArrays(nDots))
         # pos and size are ambiguous for dots so DotStim explicitly has
         # fieldPos = pos, fieldSize=size and then dotSize as additional param
         self.fieldPos = fieldPos  # self.pos is also set here
@@ -143,14 +151,14 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
         self.noiseDots = noiseDots
 
         # initialise a random array of X,Y
-        self. _verticesBase = self._dotsXY = self._newDotsXY(self.nDots)
+        self._verticesBase[...] = self._newDotsXY(self.nDots)
         # all dots have the same speed
         self._dotsSpeed = numpy.ones(self.nDots, 'f') * self.speed
         # abs() means we can ignore the -1 case (no life)
-        self._dotsLife = abs(dotLife) * numpy.random.rand(self.nDots)
+        self._dotsLife[...] = abs(dotLife) * numpy.random.rand(self.nDots)
         # numpy.random.shuffle(self._signalDots)  # not really necessary
         # set directions (only used when self.noiseDots='direction')
-        self._dotsDir = numpy.random.rand(self.nDots) * 2 * pi
+        self._dotsDir[...] = numpy.random.rand(self.nDots) * 2 * pi
         self._dotsDir[self._signalDots] = self.dir * pi / 180
 
         self._update_dotsXY()
@@ -191,7 +199,7 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
         :ref:`operations <attrib-operations>` are supported.
         """
         self.__dict__['dotLife'] = dotLife
-        self._dotsLife = abs(self.dotLife) * numpy.random.rand(self.nDots)
+        self._dotsLife[...] = abs(self.dotLife) * numpy.random.rand(self.nDots)
 
     @attributeSetter
     def signalDots(self, signalDots):
@@ -286,7 +294,7 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
             raise ValueError('DotStim.coherence must be between 0 and 1')
         _cohDots = coherence * self.nDots
         self.__dict__['coherence'] = round(_cohDots)/self.nDots
-        self._signalDots = numpy.zeros(self.nDots, dtype=bool)
+        self._signalDots.fill(False)
         self._signalDots[0:int(self.coherence * self.nDots)] = True
         # for 'direction' method we need to update the direction of the number
         # of signal dots immediately, but for other methods it will be done
@@ -294,7 +302,7 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
         #:::::::::::::::::::: AJS Actually you need to do this for 'walk' also otherwise
         #would be signal dots adopt random directions when the become sinal dots in later trails
         if self.noiseDots in ['direction', 'position','walk']:
-            self._dotsDir = numpy.random.rand(self.nDots) * 2 * pi
+            self._dotsDir[...] = numpy.random.rand(self.nDots) * 2 * pi
             self._dotsDir[self._signalDots] = self.dir * pi / 180
 
     def setFieldCoherence(self, val, op='', log=None):
@@ -344,7 +352,8 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
             win = self.win
         self._selectWindow(win)
 
-        self._update_dotsXY()
+        if self._group is None:  # otherwise the group updates the dots
+            self._update_dotsXY()
 
         GL.glPushMatrix()  # push before drawing, pop after
 
@@ -394,113 +403,71 @@ class DotStim(BaseVisualStim, ColorMixin, ContainerMixin):
             dots = self._newDots(nDots)
 
         """
-        # make more dots than we need and only use those within the circle
-        if self.fieldShape == 'circle':
-            while True:
-                # repeat until we have enough; fetch twice as many as needed
-                new = numpy.random.uniform(-1, 1, [nDots * 2, 2])
-                inCircle = (numpy.hypot(new[:, 0], new[:, 1]) < 1)
-                if sum(inCircle) >= nDots:
-                    return new[inCircle, :][:nDots, :] * self.fieldSize * 0.5
-        else:
-            return numpy.random.uniform(-0.5*self.fieldSize[0],
-                                        0.5*self.fieldSize[1], [nDots, 2])
+        return newDotsXY(nDots, self.fieldSize, self.fieldShape)
 
     def refreshDots(self):
         """Callable user function to choose a new set of dots"""
-        self._verticesBase = self._dotsXY = self._newDotsXY(self.nDots)
+        self._verticesBase[...] = self._newDotsXY(self.nDots)
+
+    def _setDotArrays(self, dots):
+        """Keep the dots in `dots` (a DotArrays), e.g. a slice of the arrays
+        of a DotStimGroup, copying the current dots into it"""
+        if self._dots is not None:
+            dots.copyState(self._dots)
+        self._dots = dots
+        self._verticesBase = self._dotsXY = dots.xy
+        self._dotsLife = dots.life
+        self._dotsDir = dots.dirs
+        self._signalDots = dots.signal
 
     def _update_dotsXY(self):
         """The user shouldn't call this - its gets done within draw().
         """
-
-        # Find dead dots, update positions, get new positions for
-        # dead and out-of-bounds
-        # renew dead dots
-        if self.dotLife > 0:  # if less than zero ignore it
-            # decrement. Then dots to be reborn will be negative
-            self._dotsLife -= 1
-            dead = (self._dotsLife <= 0.0)
-            self._dotsLife[dead] = self.dotLife
-        else:
-            dead = numpy.zeros(self.nDots, dtype=bool)
-
-        # update XY based on speed and dir
-        # NB self._dotsDir is in radians, but self.dir is in degs
-        # update which are the noise/signal dots
-        if self.signalDots == 'different':
-            #  **up to version 1.70.00 this was the other way around,
-            # not in keeping with Scase et al**
-            # noise and signal dots change identity constantly
-            numpy.random.shuffle(self._dotsDir)
-            # and then update _signalDots from that
-            self._signalDots = (self._dotsDir == (self.dir * pi / 180))
-
-        # update the locations of signal and noise; 0 radians=East!
-        reshape = numpy.reshape
-        if self.noiseDots == 'walk':
-            # noise dots are ~self._signalDots
-            sig = numpy.random.rand((~self._signalDots).sum())
-            self._dotsDir[~self._signalDots] = sig * pi * 2
-            # then update all positions from dir*speed
-            cosDots = reshape(numpy.cos(self._dotsDir), (self.nDots,))
-            sinDots = reshape(numpy.sin(self._dotsDir), (self.nDots,))
-            self._verticesBase[:, 0] += self.speed * cosDots
-            self._verticesBase[:, 1] += self.speed * sinDots
-        elif self.noiseDots == 'direction':
-            # simply use the stored directions to update position
-            cosDots = reshape(numpy.cos(self._dotsDir), (self.nDots,))
-            sinDots = reshape(numpy.sin(self._dotsDir), (self.nDots,))
-            self._verticesBase[:, 0] += self.speed * cosDots
-            self._verticesBase[:, 1] += self.speed * sinDots
-        elif self.noiseDots == 'position':
-            # update signal dots
-            sd = self._signalDots
-            sdSum = self._signalDots.sum()
-            cosDots = reshape(numpy.cos(self._dotsDir[sd]), (sdSum,))
-            sinDots = reshape(numpy.sin(self._dotsDir[sd]), (sdSum,))
-            self._verticesBase[sd, 0] += self.speed * cosDots
-            self._verticesBase[sd, 1] += self.speed * sinDots
-            # update noise dots
-            dead = dead + (~self._signalDots)  # just create new ones
-
-        # handle boundaries of the field
-        if self.fieldShape in (None, 'square', 'sqr'):
-            #dead0 = (numpy.abs(self._verticesBase[:, 0]) > 0.5)
-            #dead1 = (numpy.abs(self._verticesBase[:, 1]) > 0.5)
-            #dead = dead + dead0 + dead1
-            out0 = (numpy.abs(self._verticesBase[:, 0]) > 0.5*self.fieldSize[0])
-            out1 = (numpy.abs(self._verticesBase[:, 1]) > 0.5*self.fieldSize[1])
-            outofbounds = out0 + out1
-
-        elif self.fieldShape == 'circle':
-            #outofbounds=None
-            # transform to a normalised circle (radius = 1 all around)
-            # then to polar coords to check
-            # the normalised XY position (where radius should be < 1)
-            normXY = self._verticesBase / 0.5 / self.fieldSize
-            # add out-of-bounds to those that need replacing
-            #dead+= (numpy.hypot(normXY[:, 0], normXY[:, 1]) > 1)
-            outofbounds = (numpy.hypot(normXY[:, 0], normXY[:, 1]) > 1)
-
-        # update any dead dots
-        if sum(dead):
-            self._verticesBase[dead, :] = self._newDotsXY(sum(dead))
-            #self._verticesBase[dead, :] = -self._verticesBase[dead,:]
-
-        # Reposition any dots that have gone out of bounds. Net effect is to place dot one step inside the boundary on the other side of the aperture.
-        if sum(outofbounds):
-            self._verticesBase[outofbounds, :] = self._newDotsXY(sum(outofbounds))
-            #wind the dots back one step and store as tempary values
-            # if self.noiseDots == 'position':
-            #     tempvert0=self._verticesBase[sd,0]-self.speed * cosDots
-            #     tempvert1=self._verticesBase[sd,1]-self.speed * sinDots
-            # else:
-            #     tempvert0=self._verticesBase[:,0]-self.speed * cosDots
-            #     tempvert1=self._verticesBase[:,1]-self.speed * sinDots
-            # #reflect the position of the dots about the origine of the dot field
-            # self._verticesBase[outofbounds, 0] = -tempvert0[outofbounds]
-            # self._verticesBase[outofbounds, 1] = -tempvert1[outofbounds]
+        # find dead dots, update positions, get new positions for
+        # dead and out-of-bounds, all in place
+        updateDots([self], self._dots)
 
         # update the pixel XY coordinates in pixels (using _BaseVisual class)
         self._updateVertices()
+
+
+class DotStimGroup(object):
+    """Updates the dots of several DotStims together.
+
+    The dots of all the stimuli are kept in one set of arrays, so that each
+    step of the update (moving the dots, finding those outside their field
+    ...) is done once for all of them rather than once per stimulus. Draw
+    the group, rather than the stimuli, to update and draw them all::
+
+        left = visual.DotStim(win, nDots=2000, fieldPos=(-5, 0), ...)
+        right = visual.DotStim(win, nDots=2000, fieldPos=(5, 0), ...)
+        dots = visual.DotStimGroup([left, right])
+        while True:
+            dots.draw()
+            win.flip()
+
+    The stimuli can still be changed individually (e.g. left.coherence = 1)
+    but no longer move when drawn on their own.
+    """
+
+    def __init__(self, stims):
+        self.stims = list(stims)
+        self._dots = DotArrays(sum(stim.nDots for stim in self.stims))
+        start = 0
+        for stim in self.stims:
+            stop = start + stim.nDots
+            stim._setDotArrays(self._dots[start:stop])
+            stim._group = self
+            start = stop
+
+    def update(self):
+        """Move the dots of all the stimuli on by one frame"""
+        updateDots(self.stims, self._dots)
+        for stim in self.stims:
+            stim._updateVertices()
+
+    def draw(self, win=None):
+        """Update the dots of all the stimuli and draw them"""
+        self.update()
+        for stim in self.stims:
+            stim.draw(win)
@@ -32,6 +32,7 @@ from psychopy.visual import Window
 from psychopy.tools.arraytools import val2array
 from psychopy.tools.attributetools import attributeSetter, logAttrib, setAttribute
 from psychopy.tools.monitorunittools import convertToPix
+from psychopy.tools import gltools
 from psychopy.visual.helpers import setColor
 from psychopy.visual.basevisual import MinimalStim, TextureMixin
 from . import globalVars
@@ -75,7 +76,8 @@ class ElementArrayStim(MinimalStim, TextureMixin):
                  interpolate=True,
                  name=None,
                  autoLog=None,
-                 maskParams=None):
+                 maskParams=None,
+                 useVBOs=True):
         """
         :Parameters:
 
@@ -89,6 +91,12 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
             nElements :
                 number of elements in the array.
+
+            useVBOs :
+                keep the vertices, colors and texture coordinates of the
+                elements in vertex buffer objects on the graphics card (if
+                supported), and only upload the elements that change.
+                If False, all the arrays are sent on every draw.
         """
         # what local vars are defined (these are the init params) for use by
         # __repr__
@@ -115,6 +123,8 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         self.verticesBase = xys
         self._needVertexUpdate = True
         self._needColorUpdate = True
+        self._dirty = {}  # elements to update, as (start, stop)
+        self._vbos = None
         self.useShaders = True
         self.interpolate = interpolate
         self.__dict__['fieldDepth'] = fieldDepth
@@ -124,6 +134,8 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         if not self.win._haveShaders:
             raise Exception("ElementArrayStim requires shaders support"
                             " and floating point textures")
+        self.useVBOs = (useVBOs and GL.gl_info.have_extension(
+            'GL_ARB_vertex_buffer_object'))
 
         self.colorSpace = colorSpace
         if rgbs != None:
@@ -230,6 +242,7 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('xys')
         if value is None:
             fsz = self.fieldSize
             rand = numpy.random.rand
@@ -259,7 +272,7 @@ class ElementArrayStim(MinimalStim, TextureMixin):
             self.__dict__['xys'] = self._makeNx2(value, ['Nx2'])
         # to keep a record if we are to alter things later.
         self._xysAsNone = value is None
-        self._needVertexUpdate = True
+        self._markDirty('vertices', old, self.xys)
 
     def setXYs(self, value=None, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -287,8 +300,9 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('oris')
         self.__dict__['oris'] = self._makeNx1(value)  # set self.oris
-        self._needVertexUpdate = True
+        self._markDirty('vertices', old, self.oris)
 
     def setOris(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -312,8 +326,9 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('sfs')
         self.__dict__['sfs'] = self._makeNx2(value)  # set self.sfs
-        self._needTexCoordUpdate = True
+        self._markDirty('texCoords', old, self.sfs)
 
     def setSfs(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -331,8 +346,9 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`Operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('opacities')
         self.__dict__['opacities'] = self._makeNx1(value)
-        self._needColorUpdate = True
+        self._markDirty('colors', old, self.opacities)
 
     def setOpacities(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -351,9 +367,10 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`Operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('sizes')
         self.__dict__['sizes'] = self._makeNx2(value)
-        self._needVertexUpdate = True
-        self._needTexCoordUpdate = True
+        self._markDirty('vertices', old, self.sizes)
+        self._markDirty('texCoords', old, self.sizes)
 
     def setSizes(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -374,8 +391,9 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`Operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('phases')
         self.__dict__['phases'] = self._makeNx2(value)
-        self._needTexCoordUpdate = True
+        self._markDirty('texCoords', old, self.phases)
 
     def setPhases(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -421,6 +439,7 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         """See ``color`` for more info on the color parameter  and
         ``colorSpace`` for more info in the colorSpace parameter.
         """
+        old = self.__dict__.get('rgbs')
         setColor(self, color, colorSpace=colorSpace, operation=operation,
                  rgbAttrib='rgbs',  # or 'fillRGB' etc
                  colorAttrib='colors',
@@ -439,7 +458,7 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         else:
             raise ValueError("New value for setRgbs should be either "
                              "Nx1, Nx3 or a single value")
-        self._needColorUpdate = True
+        self._markDirty('colors', old, self.rgbs)
 
     @attributeSetter
     def contrs(self, value):
@@ -450,8 +469,9 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         :ref:`Operations <attrib-operations>` are supported.
         """
+        old = self.__dict__.get('contrs')
         self.__dict__['contrs'] = self._makeNx1(value)
-        self._needColorUpdate = True
+        self._markDirty('colors', old, self.contrs)
 
     def setContrs(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -467,7 +487,7 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         :ref:`Operations <attrib-operations>` are supported.
         """
         self.__dict__['fieldPos'] = val2array(value, False, False)
-        self._needVertexUpdate = True
+        self._markDirty('vertices')
 
     def setFieldPos(self, value, operation='', log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
@@ -499,6 +519,64 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         """
         setAttribute(self, 'fieldSize', value, log, operation)
 
+    # flags set when each group of arrays needs updating
+    _dirtyFlags = {'vertices': '_needVertexUpdate',
+                   'colors': '_needColorUpdate',
+                   'texCoords': '_needTexCoordUpdate'}
+
+    def _markDirty(self, arrays, old=None, new=None):
+        """Flags the `arrays` ('vertices', 'colors' or 'texCoords') as
+        needing an update for the elements whose values differ between
+        the `old` and `new` values of an attribute (or for all elements if
+        these aren't given).
+        """
+        N = self.nElements
+        if (old is None or new is None or old is new or
+                numpy.shape(old) != numpy.shape(new) or len(new) != N):
+            start, stop = 0, N
+        else:
+            changed = numpy.flatnonzero(
+                (old != new).reshape([N, -1]).any(axis=1))
+            if not len(changed):
+                return
+            start, stop = changed[0], changed[-1] + 1
+        if arrays in self._dirty:
+            prevStart, prevStop = self._dirty[arrays]
+            start, stop = min(start, prevStart), max(stop, prevStop)
+        self._dirty[arrays] = (start, stop)
+        setattr(self, self._dirtyFlags[arrays], True)
+
+    def _dirtyRange(self, arrays):
+        return self._dirty.pop(arrays, (0, self.nElements))
+
+    def _createVBOs(self):
+        dynamic = GL.GL_DYNAMIC_DRAW
+        self._vbos = {
+            'vertices': gltools.createVBO(self.verticesPix, 3, usage=dynamic),
+            'colors': gltools.createVBO(self._RGBAs, 4, usage=dynamic),
+            'texCoords': gltools.createVBO(self._texCoords, 2,
+                                           usage=dynamic),
+            'maskCoords': gltools.createVBO(self._maskCoords, 2)}
+
+    def _deleteVBOs(self):
+        if self._vbos is not None:
+            for vbo in self._vbos.values():
+                gltools.deleteVBO(vbo)
+            self._vbos = None
+
+    def _uploadVBO(self, name, data, start):
+        """Copy `data`, the values of the elements from `start`, to the
+        VBO `name` (if using VBOs)"""
+        if self._vbos is None:
+            return
+        vbo = self._vbos[name]
+        valuesPerElement = 4 * vbo.size  # for the 4 vertices of an element
+        if vbo.count != self.nElements * valuesPerElement:
+            # nElements has changed; recreate the VBOs on the next draw
+            self._deleteVBOs()
+            return
+        gltools.updateVBO(vbo, data, offset=start * valuesPerElement)
+
     def draw(self, win=None):
         """Draw the stimulus in its relevant window. You must call
         this method after every MyWin.update() if you want the
@@ -510,11 +588,14 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         self._selectWindow(win)
 
         if self._needVertexUpdate:
-            self._updateVertices()
+            self._updateVertices(*self._dirtyRange('vertices'))
         if self._needColorUpdate:
-            self.updateElementColors()
+            self.updateElementColors(*self._dirtyRange('colors'))
         if self._needTexCoordUpdate:
-            self.updateTextureCoords()
+            self.updateTextureCoords(*self._dirtyRange('texCoords'))
+        if self.useVBOs and self._vbos is None:
+            self._createVBOs()
+        vbos = self._vbos
 
         # scale the drawing frame and get to centre of field
         GL.glPushMatrix()  # push before drawing, pop after
@@ -524,11 +605,17 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         # GL.glLoadIdentity()
         self.win.setScale('pix')
 
-        cpcd = ctypes.POINTER(ctypes.c_double)
-        GL.glColorPointer(4, GL.GL_DOUBLE, 0,
-                          self._RGBAs.ctypes.data_as(cpcd))
-        GL.glVertexPointer(3, GL.GL_DOUBLE, 0,
-                           self.verticesPix.ctypes.data_as(cpcd))
+        if vbos is None:
+            cpcd = ctypes.POINTER(ctypes.c_double)
+            GL.glColorPointer(4, GL.GL_DOUBLE, 0,
+                              self._RGBAs.ctypes.data_as(cpcd))
+            GL.glVertexPointer(3, GL.GL_DOUBLE, 0,
+                               self.verticesPix.ctypes.data_as(cpcd))
+        else:
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbos['colors'].id)
+            GL.glColorPointer(4, GL.GL_FLOAT, 0, None)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbos['vertices'].id)
+            GL.glVertexPointer(3, GL.GL_FLOAT, 0, None)
 
         # setup the shaderprogram
         _prog = self.win._progSignedTexMask
@@ -548,10 +635,19 @@ class ElementArrayStim(MinimalStim, TextureMixin):
 
         # setup client texture coordinates first
         GL.glClientActiveTexture(GL.GL_TEXTURE0)
-        GL.glTexCoordPointer(2, GL.GL_DOUBLE, 0, self._texCoords.ctypes)
+        if vbos is None:
+            GL.glTexCoordPointer(2, GL.GL_DOUBLE, 0, self._texCoords.ctypes)
+        else:
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbos['texCoords'].id)
+            GL.glTexCoordPointer(2, GL.GL_FLOAT, 0, None)
         GL.glEnableClientState(GL.GL_TEXTURE_COORD_ARRAY)
         GL.glClientActiveTexture(GL.GL_TEXTURE1)
-        GL.glTexCoordPointer(2, GL.GL_DOUBLE, 0, self._maskCoords.ctypes)
+        if vbos is None:
+            GL.glTexCoordPointer(2, GL.GL_DOUBLE, 0, self._maskCoords.ctypes)
+        else:
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, vbos['maskCoords'].id)
+            GL.glTexCoordPointer(2, GL.GL_FLOAT, 0, None)
+            GL.glBindBuffer(GL.GL_ARRAY_BUFFER, 0)
         GL.glEnableClientState(GL.GL_TEXTURE_COORD_ARRAY)
 
         GL.glEnableClientState(GL.GL_COLOR_ARRAY)
@@ -575,22 +671,31 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         GL.glPopClientAttrib()
         GL.glPopMatrix()
 
-    def _updateVertices(self):
-        """Sets Stim.verticesPix from fieldPos.
+    def _updateVertices(self, start=0, stop=None):
+        """Sets Stim.verticesPix from fieldPos, for the elements from
+        `start` to `stop` (by default, all of them).
         """
+        if stop is None:
+            stop = self.nElements
+        if self.__dict__.get('verticesPix') is None:
+            start, stop = 0, self.nElements
+        whole = start == 0 and stop == self.nElements
+        n = stop - start
 
         # Handle the orientation, size and location of
         # each element in native units
 
         radians = 0.017453292519943295
+        sizes = self.sizes[start:stop]
+        oris = self.oris[start:stop] * radians
 
         # so we can do matrix rotation of coords we need shape=[n*4,3]
         # but we'll convert to [n,4,3] after matrix math
-        verts = numpy.zeros([self.nElements * 4, 3], 'd')
-        wx = -self.sizes[:, 0] * numpy.cos(self.oris[:] * radians) / 2
-        wy = self.sizes[:, 0] * numpy.sin(self.oris[:] * radians) / 2
-        hx = self.sizes[:, 1] * numpy.sin(self.oris[:] * radians) / 2
-        hy = self.sizes[:, 1] * numpy.cos(self.oris[:] * radians) / 2
+        verts = numpy.zeros([n * 4, 3], 'd')
+        wx = -sizes[:, 0] * numpy.cos(oris) / 2
+        wy = sizes[:, 0] * numpy.sin(oris) / 2
+        hx = sizes[:, 1] * numpy.sin(oris) / 2
+        hy = sizes[:, 1] * numpy.cos(oris) / 2
 
         # X vals of each vertex relative to the element's centroid
         verts[0::4, 0] = -wx - hx
@@ -605,81 +710,121 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         verts[3::4, 1] = -wy + hy
 
         # set of positions across elements
-        positions = self.xys + self.fieldPos
+        positions = self.xys[start:stop] + self.fieldPos
 
         # depth
-        verts[:, 2] = self.depths + self.fieldDepth
+        depths = numpy.asarray(self.depths)
+        if depths.size > 1:  # one per vertex
+            depths = depths.reshape(-1)[start * 4:stop * 4]
+        verts[:, 2] = depths + self.fieldDepth
         # rotate, translate, scale by units
         if positions.shape[0] * 4 == verts.shape[0]:
             positions = positions.repeat(4, 0)
         verts[:, :2] = convertToPix(vertices=verts[:, :2], pos=positions,
                                     units=self.units, win=self.win)
-        verts = verts.reshape([self.nElements, 4, 3])
-
-        # assign to self attribute; make sure it's contiguous
-        self.__dict__['verticesPix'] = numpy.require(verts,
-                                                     requirements=['C'])
-        self._needVertexUpdate = False
+        verts = verts.reshape([n, 4, 3])
+
+        if whole:
+            # assign to self attribute; make sure it's contiguous
+            self.__dict__['verticesPix'] = numpy.require(
+                verts, requirements=['C'])
+            self._dirty.pop('vertices', None)
+            self._needVertexUpdate = False
+        else:
+            self.verticesPix[start:stop] = verts
+            self._needVertexUpdate = 'vertices' in self._dirty
+        self._uploadVBO('vertices', self.verticesPix[start:stop], start)
 
     # ----------------------------------------------------------------------
-    def updateElementColors(self):
+    def updateElementColors(self, start=0, stop=None):
         """Create a new array of self._RGBAs based on self.rgbs.
 
         Not needed by the user (simple call setColors())
 
         For element arrays the self.rgbs values correspond to one
         element so this function also converts them to be one for
-        each vertex of each element.
-        """
-        N = self.nElements
-        self._RGBAs = numpy.zeros([N, 4], 'd')
+        each vertex of each element. If `start` and `stop` are given,
+        only the colors of those elements are updated.
+        """
+        if stop is None:
+            stop = self.nElements
+        if getattr(self, '_RGBAs', None) is None:
+            start, stop = 0, self.nElements
+        whole = start == 0 and stop == self.nElements
+        N = stop - start
+        rgbs = self.rgbs[start:stop]
+        contrs = self.contrs[start:stop]
+        RGBAs = numpy.zeros([N, 4], 'd')
         if self.colorSpace in ('rgb', 'dkl', 'lms', 'hsv'):
             # these spaces are 0-centred
-            self._RGBAs[:, 0:3] = (self.rgbs[:, :] *
-                self.contrs[:].reshape([N, 1]).repeat(3, 1) / 2 + 0.5)
+            RGBAs[:, 0:3] = (rgbs[:, :] *
+                contrs.reshape([N, 1]).repeat(3, 1) / 2 + 0.5)
         else:
-            self._RGBAs[:, 0:3] = (self.rgbs *
-                self.contrs[:].reshape([N, 1]).repeat(3, 1) / 255.0)
+            RGBAs[:, 0:3] = (rgbs *
+                contrs.reshape([N, 1]).repeat(3, 1) / 255.0)
 
-        self._RGBAs[:, -1] = self.opacities.reshape([N, ])
+        RGBAs[:, -1] = self.opacities[start:stop].reshape([N, ])
         # repeat for the 4 vertices in the grid
-        self._RGBAs = self._RGBAs.reshape([N, 1, 4]).repeat(4, 1)
-
-        self._needColorUpdate = False
-
-    def updateTextureCoords(self):
-        """Create a new array of self._maskCoords
-        """
-
-        N = self.nElements
-        self._maskCoords = numpy.array([[1, 0], [0, 0], [0, 1], [1, 1]],
-                                       'd').reshape([1, 4, 2])
-        self._maskCoords = self._maskCoords.repeat(N, 0)
+        RGBAs = RGBAs.reshape([N, 1, 4]).repeat(4, 1)
 
+        if whole:
+            self._RGBAs = RGBAs
+            self._dirty.pop('colors', None)
+            self._needColorUpdate = False
+        else:
+            self._RGBAs[start:stop] = RGBAs
+            self._needColorUpdate = 'colors' in self._dirty
+        self._uploadVBO('colors', self._RGBAs[start:stop], start)
+
+    def updateTextureCoords(self, start=0, stop=None):
+        """Create a new array of self._maskCoords (and self._texCoords, for
+        the elements from `start` to `stop`; by default all of them)
+        """
+        if stop is None:
+            stop = self.nElements
+        if getattr(self, '_texCoords', None) is None:
+            start, stop = 0, self.nElements
+        whole = start == 0 and stop == self.nElements
+
+        N = stop - start
+        if whole:
+            self._maskCoords = numpy.array([[1, 0], [0, 0], [0, 1], [1, 1]],
+                                           'd').reshape([1, 4, 2])
+            self._maskCoords = self._maskCoords.repeat(N, 0)
+
+        sfs = self.sfs[start:stop]
+        phases = self.phases[start:stop]
         # for the main texture
         # sf is dependent on size (openGL default)
         if self.units in ['norm', 'pix', 'height']:
-            L = old_div(-self.sfs[:, 0], 2) - self.phases[:, 0] + 0.5
-            R = old_div(+self.sfs[:, 0], 2) - self.phases[:, 0] + 0.5
-            T = old_div(+self.sfs[:, 1], 2) - self.phases[:, 1] + 0.5
-            B = old_div(-self.sfs[:, 1], 2) - self.phases[:, 1] + 0.5
+            L = old_div(-sfs[:, 0], 2) - phases[:, 0] + 0.5
+            R = old_div(+sfs[:, 0], 2) - phases[:, 0] + 0.5
+            T = old_div(+sfs[:, 1], 2) - phases[:, 1] + 0.5
+            B = old_div(-sfs[:, 1], 2) - phases[:, 1] + 0.5
         else:
             # we should scale to become independent of size
-            L = (-self.sfs[:, 0] * self.sizes[:, 0] / 2
-                 - self.phases[:, 0] + 0.5)
-            R = (+self.sfs[:, 0] * self.sizes[:, 0] / 2
-                 - self.phases[:, 0] + 0.5)
-            T = (+self.sfs[:, 1] * self.sizes[:, 1] / 2
-                 - self.phases[:, 1] + 0.5)
-            B = (-self.sfs[:, 1] * self.sizes[:, 1] / 2
-                 - self.phases[:, 1] + 0.5)
+            sizes = self.sizes[start:stop]
+            L = (-sfs[:, 0] * sizes[:, 0] / 2
+                 - phases[:, 0] + 0.5)
+            R = (+sfs[:, 0] * sizes[:, 0] / 2
+                 - phases[:, 0] + 0.5)
+            T = (+sfs[:, 1] * sizes[:, 1] / 2
+                 - phases[:, 1] + 0.5)
+            B = (-sfs[:, 1] * sizes[:, 1] / 2
+                 - phases[:, 1] + 0.5)
 
         # self._texCoords=numpy.array([[1,1],[1,0],[0,0],[0,1]],
         #           'd').reshape([1,4,2])
-        self._texCoords = (numpy.concatenate([[R, B], [L, B], [L, T], [R, T]])
+        texCoords = (numpy.concatenate([[R, B], [L, B], [L, T], [R, T]])
             .transpose().reshape([N, 4, 2]).astype('d'))
-        self._texCoords = numpy.ascontiguousarray(self._texCoords)
-        self._needTexCoordUpdate = False
+        if whole:
+            self._texCoords = numpy.ascontiguousarray(texCoords)
+            self._dirty.pop('texCoords', None)
+            self._needTexCoordUpdate = False
+        else:
+            self._texCoords[start:stop] = texCoords
+            self._needTexCoordUpdate = 'texCoords' in self._dirty
+        self._uploadVBO('texCoords', self._texCoords[start:stop], start)
 
     @attributeSetter
     def elementTex(self, value):
@@ -730,5 +875,7 @@ class ElementArrayStim(MinimalStim, TextureMixin):
         self.mask = value
 
     def __del__(self):
-        # remove textures from graphics card to prevent crash
+        # remove textures and buffers from graphics card to prevent crash
         self.clearTextures()
+        if getattr(self, '_vbos', None) is not None:
+            self._deleteVBOs()
@@ -27,6 +27,7 @@ from psychopy import logging
 
 from psychopy.tools.attributetools import attributeSetter, setAttribute
 from psychopy.tools.arraytools import val2array
+from psychopy.tools import gltools
 from psychopy.visual.basevisual import BaseVisualStim
 from psychopy.visual.basevisual import (ContainerMixin, ColorMixin,
                                         TextureMixin)
@@ -80,6 +81,8 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
         # Other stuff
         self._imName = image
         self.isLumImage = None
+        self._imageShape = None  # shape of the last numpy array image
+        self._streamTex = None
         self.interpolate = interpolate
         self.flipHoriz = flipHoriz
         self.flipVert = flipVert
@@ -236,6 +239,8 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
         """
         if hasattr(self, '_listID'):
             GL.glDeleteLists(self._listID, 1)
+        if getattr(self, '_streamTex', None) is not None:
+            gltools.deleteStreamingTexture(self._streamTex)
         self.clearTextures()
 
     def draw(self, win=None):
@@ -272,6 +277,10 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
         """
         self.__dict__['image'] = self._imName = value
 
+        if self._streamImage(value):
+            self._needTextureUpdate = False
+            return
+
         wasLumImage = self.isLumImage
         if type(value) != numpy.ndarray and value == "color":
             datatype = GL.GL_FLOAT
@@ -286,6 +295,14 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
                                                   dataType=datatype,
                                                   maskParams=self.maskParams,
                                                   forcePOW2=False)
+        if self._streamTex is not None:
+            # the texture was reallocated, so a new one will be needed
+            gltools.deleteStreamingTexture(self._streamTex)
+            self._streamTex = None
+        if type(value) == numpy.ndarray:
+            self._imageShape = value.shape
+        else:
+            self._imageShape = None
         # if user requested size=None then update the size for new stim here
         if hasattr(self, '_requestedSize') and self._requestedSize is None:
             self.size = None  # set size to default
@@ -294,6 +311,39 @@ class ImageStim(BaseVisualStim, ContainerMixin, ColorMixin, TextureMixin):
             self._needUpdate = True
         self._needTextureUpdate = False
 
+    def _streamImage(self, value):
+        """Update the texture with a numpy array of the same shape as the
+        previous one through pixel buffer objects, instead of creating the
+        texture again. Returns False if that isn't possible.
+        """
+        if (type(value) != numpy.ndarray or not self.useShaders or
+                value.shape != self._imageShape or
+                value.ndim not in (2, 3) or min(value.shape[:2]) < 2):
+            return False
+        if value.ndim == 3 and value.shape[2] not in (3, 4):
+            return False
+        if self._streamTex is None:
+            if not GL.gl_info.have_extension('GL_ARB_pixel_buffer_object'):
+                return False
+            # wrap the texture created by _createTexture for this shape
+            pixFormat = GL.GL_RGBA if value.ndim == 3 and \
+                value.shape[2] == 4 else GL.GL_RGB
+            self._streamTex = gltools.createStreamingTexture(
+                gltools.TexImage2D(self._texID, GL.GL_TEXTURE_2D,
+                                   value.shape[1], value.shape[0], None,
+                                   pixFormat, GL.GL_FLOAT, 1, 1, False,
+                                   dict()))
+
+        # same conversion as _createTexture does for numpy arrays
+        data = value.astype(numpy.float32)
+        if data.max() > 1 or data.min() < -1:
+            logging.error('numpy arrays used as textures should be in '
+                          'the range -1(black):1(white)')
+        if data.ndim == 2:  # luminance array to RGB
+            data = numpy.repeat(data[:, :, numpy.newaxis], 3, axis=2)
+        gltools.streamTexture(self._streamTex, data)
+        return True
+
     def setImage(self, value, log=None):
         """Usually you can use 'stim.attribute = value' syntax instead,
         but use this method if you need to suppress the log message.
@@ -39,18 +39,137 @@ from psychopy import logging, prefs #adding prefs to be able to check sound lib
 from psychopy.tools.arraytools import val2array
 from psychopy.tools.attributetools import logAttrib, setAttribute
 from psychopy.tools.filetools import pathToString
+from psychopy.tools import gltools
 from psychopy.visual.basevisual import BaseVisualStim, ContainerMixin, TextureMixin
 
 from moviepy.video.io.VideoFileClip import VideoFileClip
 
 import ctypes
+import threading
+from collections import deque
 import numpy
-from psychopy.clock import Clock
+from psychopy.clock import Clock, getTime
 from psychopy.constants import FINISHED, NOT_STARTED, PAUSED, PLAYING, STOPPED
 
 import pyglet.gl as GL
 
 
+class _FrameDecoder(threading.Thread):
+    """Decodes the frames of a moviepy clip ahead of time in a background
+    thread.
+
+    Frames are decoded, in order, into a fixed pool of preallocated buffers
+    and queued with their presentation time. The render thread takes the
+    frame it needs with getFrame() and hands the buffer back with release()
+    once it is no longer needed, so no memory is allocated per frame and
+    the decoder never gets more than `queueSize` frames ahead.
+
+    The clip must not be used by any other thread while the decoder runs.
+    """
+    def __init__(self, clip, frameInterval, duration, queueSize=8, name=''):
+        super(_FrameDecoder, self).__init__(name='%s frame decoder' % name)
+        self.daemon = True
+        self._clip = clip
+        self._frameInterval = frameInterval
+        self._duration = duration
+        # one extra buffer for the frame currently held by the render thread
+        shape = (int(clip.h), int(clip.w), 3)
+        self._free = deque(numpy.empty(shape, numpy.uint8)
+                           for n in range(queueSize + 1))
+        self._ready = deque()  # (presentation time, buffer)
+        self._cond = threading.Condition()
+        self._nextT = 0.0
+        self._seekCount = 0
+        self._running = True
+
+    def run(self):
+        cond = self._cond
+        while True:
+            with cond:
+                while self._running and (
+                        not self._free or self._nextT > self._duration):
+                    cond.wait()
+                if not self._running:
+                    return
+                buf = self._free.popleft()
+                t = self._nextT
+                seekCount = self._seekCount
+            try:
+                frame = self._clip.get_frame(t)
+            except OSError:
+                logging.warning("Frame {} not found, moving one frame and "
+                                "trying again".format(t))
+                frame = None
+            if frame is not None:
+                if frame.shape != buf.shape:
+                    buf = numpy.empty(frame.shape, numpy.uint8)
+                buf[...] = frame
+            with cond:
+                if seekCount != self._seekCount:
+                    # seek() was called while decoding; drop this frame
+                    self._free.append(buf)
+                    continue
+                if frame is None:
+                    self._free.append(buf)
+                else:
+                    self._ready.append((t, buf))
+                self._nextT = t + self._frameInterval
+                cond.notify_all()
+
+    def getFrame(self, t, wait=False, timeout=2.0):
+        """Take the most recent decoded frame due at time `t`.
+
+        Returns (frameTime, buffer, nSkipped), where nSkipped is the number
+        of older due frames that were discarded, or None if no frame for
+        `t` has been decoded yet. With `wait=True` this blocks (for up to
+        `timeout` sec) until the frame is available.
+        """
+        tDue = t + self._frameInterval / 100.0  # allow for rounding
+        cond = self._cond
+        with cond:
+            if wait:
+                # (Condition.wait_for doesn't exist on Python 2)
+                deadline = getTime() + timeout
+                while not (not self._running or
+                           self._nextT > self._duration or not self._free or
+                           (self._ready and self._ready[-1][0] >= t)):
+                    remaining = deadline - getTime()
+                    if remaining <= 0:
+                        break
+                    cond.wait(remaining)
+            due = []
+            while self._ready and self._ready[0][0] <= tDue:
+                due.append(self._ready.popleft())
+            if not due:
+                return None
+            self._free.extend(buf for frameT, buf in due[:-1])
+            cond.notify_all()
+        frameT, buf = due[-1]
+        return frameT, buf, len(due) - 1
+
+    def release(self, buf):
+        """Return a buffer from getFrame() to the pool."""
+        with self._cond:
+            self._free.append(buf)
+            self._cond.notify_all()
+
+    def seek(self, t):
+        """Drop all queued frames and continue decoding from time `t`."""
+        with self._cond:
+            self._seekCount += 1
+            self._free.extend(buf for frameT, buf in self._ready)
+            self._ready.clear()
+            self._nextT = t
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self.is_alive() and self is not threading.current_thread():
+            self.join()
+
+
 class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
     """A stimulus class for playing movies (mpeg, avi, etc...) in PsychoPy
     that does not require avbin. Instead it requires the cv2 python package
@@ -81,7 +200,8 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
                  noAudio=False,
                  vframe_callback=None,
                  fps=None,
-                 interpolate=True):
+                 interpolate=True,
+                 prefetchFrames=8):
         """
         :Parameters:
 
@@ -96,6 +216,15 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
             loop : bool, optional
                 Whether to start the movie over from the beginning if draw is
                 called and the movie is done.
+            prefetchFrames : int, optional
+                Number of frames decoded ahead of time by a background
+                thread, so that draw() only has to upload the frame for the
+                upcoming flip.
+
+        The number of frames skipped because they were decoded too late for
+        their flip is counted in `nDecodeLate`, and the number of draws for
+        which the next frame was due but not yet decoded (so the previous
+        frame was shown again) in `nQueueStarved`.
 
         """
         # what local vars are defined (these are the init params) for use
@@ -124,6 +253,12 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         self.noAudio = noAudio
         self._audioStream = None
         self.useTexSubImage2D = True
+        self.prefetchFrames = max(1, int(prefetchFrames))
+        self._mov = None
+        self._decoder = None
+        self._streamTex = None
+        self.nDecodeLate = 0
+        self.nQueueStarved = 0
 
         if noAudio:  # to avoid dependency problems in silent movies
             self.sound = None
@@ -151,8 +286,10 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
 
     def reset(self):
         self._numpyFrame = None
+        self._frameT = None
         self._nextFrameT = None
         self._texID = None
+        self._streamTex = None
         self.status = NOT_STARTED
 
     def setMovie(self, filename, log=True):
@@ -175,6 +312,11 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         duration (in seconds).
         """
         filename = pathToString(filename)
+        if self._decoder is not None:
+            self._decoder.stop()
+            self._decoder = None
+        if self._streamTex is not None:
+            gltools.deleteStreamingTexture(self._streamTex)
         self.reset()  # set status and timestamps etc
 
         # Create Video Stream stuff
@@ -207,6 +349,10 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         self._frameInterval = 1.0/self._mov.fps
         self.duration = self._mov.duration
         self.filename = filename
+        self._decoder = _FrameDecoder(self._mov, self._frameInterval,
+                                      self.duration, self.prefetchFrames,
+                                      name=self.name)
+        self._decoder.start()
         self._updateFrameTexture()
         logAttrib(self, log, 'movie', filename)
 
@@ -311,18 +457,46 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         # only advance if next frame (half of next retrace rate)
         if self._nextFrameT > self.duration:
             self._onEos()
+            if self._decoder is None:  # stopped
+                return None
         elif self._numpyFrame is not None:
+            if self.status != PLAYING:
+                return None
             if self._nextFrameT > (self._videoClock.getTime() -
                                    self._retraceInterval/2.0):
                 return None
-        try:
-            self._numpyFrame = self._mov.get_frame(self._nextFrameT) 
-        except OSError:
-            if self.autoLog:
-                logging.warning("Frame {} not found, moving one frame and trying again" 
-                    .format(self._nextFrameT), obj=self)
-            self._nextFrameT += self._frameInterval
-            self._updateFrameTexture()
+        if self._frameT is not None and self._nextFrameT <= self._frameT:
+            # the frame that is due is already on the texture
+            if self.status == PLAYING:
+                self._nextFrameT = self._frameT + self._frameInterval
+            return None
+
+        # take the latest decoded frame for the upcoming flip
+        tDue = self._nextFrameT
+        if self.status == PLAYING:
+            tDue = max(tDue, self._videoClock.getTime() -
+                       self._retraceInterval/2.0)
+        frame = self._decoder.getFrame(
+            tDue, wait=self._numpyFrame is None)
+        if frame is None:
+            if self._numpyFrame is not None:
+                self.nQueueStarved += 1  # show the previous frame again
+            return None
+        frameT, numpyFrame, nSkipped = frame
+        self.nDecodeLate += nSkipped
+        if self._numpyFrame is not None:
+            self._decoder.release(self._numpyFrame)
+        self._numpyFrame = numpyFrame
+        self._frameT = frameT
+        self._nextFrameT = frameT
+
+        if self._streamTex is not None:
+            # asynchronous upload through pixel buffer objects
+            gltools.streamTexture(self._streamTex, self._numpyFrame)
+            if self.status == PLAYING:
+                self._nextFrameT += self._frameInterval
+            return
+
         useSubTex = self.useTexSubImage2D
         if self._texID is None:
             self._texID = GL.GLuint()
@@ -377,6 +551,17 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         GL.glTexEnvi(GL.GL_TEXTURE_ENV, GL.GL_TEXTURE_ENV_MODE,
                      GL.GL_MODULATE)  # ?? do we need this - think not!
 
+        if (useSubTex is False and self.useTexSubImage2D and
+                GL.gl_info.have_extension('GL_ARB_pixel_buffer_object')):
+            # stream the following frames to this texture
+            self._streamTex = gltools.createStreamingTexture(
+                gltools.TexImage2D(
+                    self._texID, GL.GL_TEXTURE_2D,
+                    self._numpyFrame.shape[1], self._numpyFrame.shape[0],
+                    GL.GL_RGB8,
+                    GL.GL_RGB if self.interpolate else GL.GL_BGR,
+                    GL.GL_UNSIGNED_BYTE, 1, 1, False, dict()))
+
         if self.status == PLAYING:
             self._nextFrameT += self._frameInterval
 
@@ -446,6 +631,12 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
         # video is easy: set both times to zero and update the frame texture
         self._nextFrameT = t
         self._videoClock.reset(t)
+        if self._decoder is not None:
+            self._decoder.seek(t)
+            if self._numpyFrame is not None:
+                self._decoder.release(self._numpyFrame)
+            self._numpyFrame = None  # wait for the frame at t
+            self._frameT = None
         self._audioSeek(t)
 
     def _audioSeek(self, t):
@@ -471,6 +662,12 @@ class MovieStim3(BaseVisualStim, ContainerMixin, TextureMixin):
     def _unload(self):
         # remove textures from graphics card to prevent crash
         self.clearTextures()
+        if self._streamTex is not None:
+            gltools.deleteStreamingTexture(self._streamTex)
+            self._streamTex = None
+        if self._decoder is not None:
+            self._decoder.stop()
+            self._decoder = None
         if self._mov is not None:
             self._mov.close()
         self._mov = None
@@ -18,6 +18,8 @@ orientation, frequencyand phase. Also does beat stimuli. """
 
 from __future__ import absolute_import, print_function
 
+import threading
+
 import pyglet
 pyglet.options['debug_gl'] = False
 import ctypes
@@ -38,6 +40,62 @@ from numpy.fft import fft2, ifft2, fftshift, ifftshift
 
 from . import shaders as _shaders
 
+_pixelNoiseTypes = ['binary', 'Binary', 'normal', 'Normal', 'uniform',
+                    'Uniform']
+
+
+def _makeNoiseSample(noiseType, noiseTex, size, sideLength, noiseClip,
+                     rng=numpy.random):
+    """Make a noise sample from the noise built by NoiseStim.buildNoise().
+
+    `noiseTex` is the amplitude spectrum for the Fourier based noise types
+    and the values to shuffle for Binary noise. `size` is the side length
+    of Fourier based samples and `sideLength` the (x, y) size of pixel
+    based ones. `rng` is numpy.random or a numpy.random.RandomState.
+    """
+    if noiseType not in _pixelNoiseTypes:
+        Ph = rng.uniform(0, 2*numpy.pi, int(size**2))
+        Ph = numpy.reshape(Ph, (int(size), int(size)))
+        In = noiseTex*exp(1j*Ph)
+        Im = numpy.real(ifft2(In))
+        Im = ifftshift(Im)
+        gsd = filters.getRMScontrast(Im)
+        factor = (gsd*noiseClip)
+        numpy.clip(Im, -factor, factor, Im)
+        return Im/factor
+    elif noiseType in ['normal', 'Normal']:
+        return rng.randn(int(sideLength[1]), int(sideLength[0]))/noiseClip
+    elif noiseType in ['uniform', 'Uniform']:
+        return 2.0*rng.rand(int(sideLength[1]), int(sideLength[0]))-1.0
+    else:
+        # pick random noise sample by shuffling values
+        return numpy.reshape(rng.permutation(noiseTex),
+                             (int(sideLength[1]), int(sideLength[0])))
+
+
+def _makeBankSample(sampleArgs, seed):
+    """Make one sample of a noise bank, from its own seed."""
+    rng = numpy.random.RandomState(seed)
+    return _makeNoiseSample(*sampleArgs, rng=rng).astype(numpy.float32)
+
+
+_workerSampleArgs = None  # set in multiprocessing workers making a bank
+
+
+def _initBankWorker(sampleArgs):
+    global _workerSampleArgs
+    _workerSampleArgs = sampleArgs
+
+
+def _makeWorkerBankSample(seed):
+    return _makeBankSample(_workerSampleArgs, seed)
+
+
+def _hashable(value):
+    if isinstance(value, numpy.ndarray):
+        return tuple(value.ravel().tolist())
+    return value
+
 
 class NoiseStim(GratingStim):
     """A stimulus with 2 textures: a radom noise sample and a mask
@@ -95,6 +153,10 @@ class NoiseStim(GratingStim):
     The noise is rebuilt at next call of the draw function whenever a parameter starting 'noise' is notionally changed even if the value does not actually change every time. eg. setting a parameter to update every frame will cause a new noise sample on every frame but see below.
     A rebuild can also be forced at any time using the buildNoise() function.
     The updateNoise() function can be used at any time to produce a new random saple of noise without doing a full build. ie it is quicker than a full build.
+    The amplitude spectrum (filter) of the noise is only derived again by buildNoise() if a parameter actually changed value.
+    buildNoiseBank(nSamples, seed) precomputes a bank of nSamples samples (optionally in a background thread and/or a pool of processes);
+    updateNoise() then cycles through the bank, which is fast enough for dynamic noise at frame rate.
+    The bank is recomputed (with the same seed) when the noise is rebuilt.
     Both buildNoise and updateNoise can be slow for large samples. 
     Samples of Binary, Normal or Uniform noise can usually be made at frame rate using noiseUpdate. 
     Updating or building other noise types at frame rate may result in dropped frames. 
@@ -229,6 +291,13 @@ class NoiseStim(GratingStim):
         #self._calcEnvCyclesPerStim()
         self._sideLength=1.0   
         self._size=512         # in unlikely case where it does not get set anywehre else before use.
+        self._noiseKey = None  # parameters the current noiseTex was built for
+        self._noiseBank = []
+        self._noiseBankIndex = 0
+        self._noiseBankSettings = None  # (nSamples, seed, processes)
+        self._noiseBankKey = None  # what the samples in the bank were made for
+        self._noiseBankThread = None
+        self._noiseBankGeneration = 0
         self.buildNoise()
         self._needBuild = False
         #self._needNoiseUpdate = False
@@ -447,26 +516,123 @@ class NoiseStim(GratingStim):
     def updateNoise(self):
         """Updates the noise sample. Does not change any of the noise parameters 
             but choses a new random sample given the previously set parameters.
+            With a noise bank (see buildNoiseBank) this takes the next sample
+            of the bank.
         """
-
-        if not(self.noiseType in ['binary','Binary','normal','Normal','uniform','Uniform']):
-            Ph = numpy.random.uniform(0,2*numpy.pi,int(self._size**2))
-            Ph = numpy.reshape(Ph,(int(self._size),int(self._size)))
-            In = self.noiseTex*exp(1j*Ph)
-            Im = numpy.real(ifft2(In))
-            Im = ifftshift(Im)
-            gsd = filters.getRMScontrast(Im)
-            factor = (gsd*self.noiseClip)
-            numpy.clip(Im,-factor,factor,Im)
-            self.tex = Im/factor
-        elif self.noiseType in ['normal','Normal']:
-            self.tex = numpy.random.randn(int(self._sideLength[1]),int(self._sideLength[0]))/self.noiseClip
-        elif self.noiseType in ['uniform','Uniform']:
-            self.tex = 2.0*numpy.random.rand(int(self._sideLength[1]),int(self._sideLength[0]))-1.0
+        if self._noiseBankSettings is not None:
+            self.tex = self._nextBankSample()
+            return
+        # Binary samples are shuffles of noiseTex, which is left in order so
+        # that a noise bank is the same for the same seed
+        self.tex = _makeNoiseSample(self.noiseType,
+                                    getattr(self, 'noiseTex', None),
+                                    self._size, self._sideLength,
+                                    self.noiseClip)
+
+    def buildNoiseBank(self, nSamples, seed=None, background=False,
+                       processes=None):
+        """Precompute `nSamples` noise samples with the current parameters.
+        updateNoise() then cycles through them rather than making a new
+        sample each time.
+
+        :Parameters:
+
+            nSamples : int
+                Number of samples in the bank.
+            seed : int or None
+                Seed for the samples. The same seed gives the same samples,
+                however they are computed. If None, a seed is drawn from
+                numpy.random.
+            background : bool
+                Compute the samples in a background thread, returning right
+                away. updateNoise() cycles through the samples computed so
+                far (waiting for the first one if needed).
+            processes : int or None
+                Number of worker processes to compute the samples with. None
+                computes them in this process.
+
+        The bank is recomputed with the same seed whenever the noise is
+        rebuilt (see buildNoise). Use clearNoiseBank() to go back to making
+        a new sample on each updateNoise().
+        """
+        if seed is None:
+            seed = numpy.random.randint(0, 2**31 - 1)
+        self._noiseBankSettings = (int(nSamples), seed, processes)
+        self._noiseBankBackground = background
+        if self._needBuild:
+            self.buildNoise()  # also fills the bank
         else:
-            numpy.random.shuffle(self.noiseTex)  # pick random noise sample by shuffleing values
-            self.tex = numpy.reshape(self.noiseTex,(int(self._sideLength[1]),int(self._sideLength[0])))
-            
+            self._fillNoiseBank()
+            self.updateNoise()
+
+    def clearNoiseBank(self):
+        """Stop using (and computing) the noise bank."""
+        self._noiseBankSettings = None
+        self._noiseBankKey = None
+        self._noiseBankGeneration += 1  # stops a background thread
+        self._noiseBank = []
+
+    def _fillNoiseBank(self):
+        nSamples, seed, processes = self._noiseBankSettings
+        if self.noiseType in _pixelNoiseTypes:
+            size = None
+            sideLength = (int(self._sideLength[0]), int(self._sideLength[1]))
+        else:
+            size = int(self._size)
+            sideLength = None
+        sampleArgs = (self.noiseType, getattr(self, 'noiseTex', None),
+                      size, sideLength, self.noiseClip)
+        bankKey = (self._noiseKey, sideLength, _hashable(self.noiseClip),
+                   self._noiseBankSettings)
+        if bankKey == self._noiseBankKey:
+            return  # the bank already has these samples
+        self._noiseBankKey = bankKey
+        self._noiseBankGeneration += 1
+        generation = self._noiseBankGeneration
+        seeds = [(seed, n) for n in range(nSamples)]
+        bank = []
+        self._noiseBank = bank
+        self._noiseBankIndex = 0
+        self._noiseBankReady = threading.Event()
+
+        def fill():
+            if processes:
+                import multiprocessing
+                pool = multiprocessing.Pool(processes, _initBankWorker,
+                                            (sampleArgs,))
+                samples = pool.imap(_makeWorkerBankSample, seeds)
+            else:
+                pool = None
+                samples = (_makeBankSample(sampleArgs, seed)
+                           for seed in seeds)
+            try:
+                for sample in samples:
+                    if generation != self._noiseBankGeneration:
+                        break  # parameters changed, this bank is obsolete
+                    bank.append(sample)
+                    self._noiseBankReady.set()
+            finally:
+                self._noiseBankReady.set()
+                if pool is not None:
+                    pool.terminate()
+
+        if self._noiseBankBackground:
+            self._noiseBankThread = threading.Thread(target=fill)
+            self._noiseBankThread.daemon = True
+            self._noiseBankThread.start()
+        else:
+            fill()
+
+    def _nextBankSample(self):
+        bank = self._noiseBank
+        if not bank:
+            self._noiseBankReady.wait()
+            if not bank:
+                raise RuntimeError('The noise bank has no samples.')
+        sample = bank[self._noiseBankIndex % len(bank)]
+        self._noiseBankIndex += 1
+        return sample
+
     def buildNoise(self):
         """build a new noise sample. Required to act on changes to any noise parameters or texRes.
         """
@@ -490,6 +656,18 @@ class NoiseStim(GratingStim):
        
         self._size = mysize  # store for use by updateNoise()
         self._sf = mysf
+        # the amplitude spectrum only needs deriving again if a parameter
+        # that affects it actually changed
+        noiseKey = tuple(_hashable(v) for v in (
+            self.noiseType, mysize, sampleSize, mysf, lowsf, upsf,
+            self.noiseBW, self.noiseBWO, self.noiseFractalPower,
+            self.noiseFilterOrder, self.noiseImage))
+        if noiseKey == self._noiseKey:
+            self._needBuild = False
+            if self._noiseBankSettings is not None:
+                self._fillNoiseBank()
+            self.updateNoise()
+            return
         if self.noiseType in ['binary','Binary','normal','Normal','uniform','Uniform']:
             self._sideLength = numpy.round(mysize/sampleSize)  # dummy side length for use when unpacking noise samples in updateNoise()
             self._sideLength.astype(int)
@@ -578,7 +756,10 @@ class NoiseStim(GratingStim):
             self.noiseTex[0][0] = 0
         else:
             raise ValueError('Noise type not recognised.')
+        self._noiseKey = noiseKey
         self._needBuild = False # prevent noise from being re-built at next draw() unless a parameter is chnaged in the mean time.
+        if self._noiseBankSettings is not None:
+            self._fillNoiseBank()
         self.updateNoise()  # now choose the initial random sample.
         
  
@@ -32,6 +32,7 @@ import psychopy.event
 # (JWP has no idea why!)
 from psychopy.tools.monitorunittools import cm2pix, deg2pix, convertToPix
 from psychopy.tools.attributetools import attributeSetter, setAttribute
+from psychopy.tools.glyphtools import getGlyphAtlas
 from psychopy.visual.basevisual import (BaseVisualStim, ColorMixin,
     ContainerMixin)
 
@@ -101,6 +102,7 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
                  flipHoriz=False,
                  flipVert=False,
                  languageStyle='LTR',
+                 useGlyphAtlas=False,
                  name=None,
                  autoLog=None):
         """
@@ -137,6 +139,14 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
             in their isolated form. May also be applied in other scripts,
             such as Farsi or Urdu, that use Arabic-style alphabets.
 
+        **useGlyphAtlas**
+            If True (pyglet and glfw windows only), the text is drawn from
+            the glyphs of the font, which are shared by all the TextStims
+            using the same font, size and style, instead of pyglet laying
+            out the text each time it changes. The most recently used
+            strings are kept laid out, so changing the text (e.g. in RSVP)
+            is much faster, especially when the same words recur.
+
         :Parameters:
 
         """
@@ -178,6 +188,10 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
         self.__dict__['flipVert'] = flipVert
         self.__dict__['languageStyle'] = languageStyle
         self._pygletTextObj = None
+        self.__dict__['useGlyphAtlas'] = (
+            useGlyphAtlas and win.winType in ["pyglet", "glfw"])
+        self._glyphAtlas = None
+        self._textLayout = None
         self.__dict__['pos'] = numpy.array(pos, float)
 
         # generate the texture and list holders
@@ -260,6 +274,8 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
                                           dpi=72, italic=self.italic,
                                           bold=self.bold)
             self.__dict__['font'] = font
+            if self.useGlyphAtlas:
+                self._glyphAtlas = getGlyphAtlas(self._font)
         else:
             if font is None or len(font) == 0:
                 self.__dict__['font'] = pygame.font.get_default_font()
@@ -341,7 +357,9 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
 
             self.__dict__['text'] = text
 
-        if self.useShaders:
+        if self.useGlyphAtlas:
+            self._setTextLayout()
+        elif self.useShaders:
             self._setTextShaders(text)
         else:
             self._setTextNoShaders(text)
@@ -401,6 +419,32 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
         self._needSetText = False
         self._needUpdate = True
 
+    def _setTextLayout(self):
+        """Lay out the text from the glyph atlas of the current font (or
+        get the layout from the atlas's cache)
+        """
+        self._textLayout = self._glyphAtlas.layout(
+            self.text, self._wrapWidthPix, self.alignHoriz, self.alignVert)
+        self.width = self._textLayout.width
+        self._fontHeightPix = self._textLayout.height
+        self._needSetText = False
+        self._needUpdate = True
+
+    def _drawTextLayout(self):
+        """Draw the laid out glyphs, one batch per glyph texture
+        """
+        layout = self._textLayout
+        GL.glPushClientAttrib(GL.GL_CLIENT_VERTEX_ARRAY_BIT)
+        GL.glEnableClientState(GL.GL_VERTEX_ARRAY)
+        GL.glEnableClientState(GL.GL_TEXTURE_COORD_ARRAY)
+        GL.glVertexPointer(2, GL.GL_FLOAT, 0, layout.vertices.ctypes)
+        GL.glTexCoordPointer(2, GL.GL_FLOAT, 0, layout.texCoords.ctypes)
+        for texID, first, count in layout.batches:
+            GL.glBindTexture(GL.GL_TEXTURE_2D, texID)
+            GL.glDrawArrays(GL.GL_QUADS, first, count)
+        GL.glBindTexture(GL.GL_TEXTURE_2D, 0)
+        GL.glPopClientAttrib()
+
     def _updateListShaders(self):
         """Only used with pygame text - pyglet handles all from the draw()
         """
@@ -718,6 +762,8 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
         NOTE: currently always returns the size in pixels
         (this will change to return in stimulus units)
         """
+        if self.useGlyphAtlas:
+            return (self._textLayout.contentWidth, self._textLayout.height)
         return (self._pygletTextObj._layout.content_width,
                 self._pygletTextObj._layout.content_height)
 
@@ -780,6 +826,11 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
                 GL.glGetUniformLocation(self.win._progSignedTexFont, b"rgb"),
                 desiredRGB[0], desiredRGB[1], desiredRGB[2])
 
+        elif self.useGlyphAtlas:  # glyphs are white, so set glColor
+            desiredRGB = self._getDesiredRGB(
+                self.rgb, self.colorSpace, self.contrast)
+            GL.glColor4f(desiredRGB[0], desiredRGB[1],
+                         desiredRGB[2], self.opacity)
         else:  # color is set in texture, so set glColor to white
             GL.glColor4f(1, 1, 1, 1)
 
@@ -803,9 +854,11 @@ class TextStim(BaseVisualStim, ColorMixin, ContainerMixin):
             # unbind the main texture
             GL.glActiveTexture(GL.GL_TEXTURE0)
             GL.glEnable(GL.GL_TEXTURE_2D)
-            # then allow pyglet to bind and use texture during drawing
-
-            self._pygletTextObj.draw()
+            if self.useGlyphAtlas:
+                self._drawTextLayout()
+            else:
+                # then allow pyglet to bind and use texture during drawing
+                self._pygletTextObj.draw()
             GL.glDisable(GL.GL_TEXTURE_2D)
         else:
             # for pygame we should (and can) use a drawing list
@@ -129,7 +129,11 @@ class TextBox(object):
     Textbox Limitations:
     ~~~~~~~~~~~~~~~~~~~~
 
-    * Only Monospace Fonts are supported.
+    * Only Monospace Fonts are found by default. Other fonts can be added
+      to the font manager with, for example,
+      getFontManager().addFontFile(font_path, monospace_only=False); their
+      glyphs then have their own widths (and kerning) rather than being
+      placed one per text grid cell.
 
     * TextBox component is not a completely **standard** psychopy visual
       stim and has the following functional difference:
@@ -162,7 +166,7 @@ class TextBox(object):
     No change + redraw time^     0.240 msec    0.931 msec
     Initial Creation time^       0.927 msec    0.194 msec
     MonoSpace Font Support       Yes           Yes
-    Non MonoSpace Font Support   No            Yes
+    Non MonoSpace Font Support   Yes           Yes
     Adjustable Line Spacing      Yes           No
     Precise Text Pos. Info       Yes           No
     Auto logging Support         No            Yes
@@ -543,7 +547,13 @@ class TextBox(object):
             return None
         cline = self._getTextWrappedDoc().getParsedLine(col_row[1])
         # print('cline._trans_left,cline._trans_top:',cline._trans_left,cline._trans_top)
-        c = col_row[0] + cline._trans_left
+        if cline._advances is None:
+            c = col_row[0] + cline._trans_left
+        else:
+            # proportional font; glyphs aren't one per text grid cell
+            c = 0
+            ox += (cline._trans_left * self._text_grid._cell_size[0] +
+                   cline._advances[:col_row[0]].sum())
         r = col_row[1] + cline._trans_top
         x, y, width, height = self.getTextGridCellPlacement()[c, r, :]
 #        print('text_grid cell (%d,%d) placement: %d,%d %d,%d'%(c,r,x,y,width,height))
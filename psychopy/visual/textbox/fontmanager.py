@@ -11,6 +11,7 @@ from __future__ import absolute_import, division, print_function
 
 from builtins import chr
 from builtins import object
+from builtins import range
 import os
 import math
 import numpy as np
@@ -188,9 +189,7 @@ class FontManager(object):
             if not recursive:
                 break
 
-        return self.addFontFiles(font_paths)
-
-        return fi
+        return self.addFontFiles(font_paths, monospace_only)
 
     # Class methods for FontManager below this comment should not need to be
     # used by user scripts in most situations. Accessing them is okay.
@@ -212,11 +211,11 @@ class FontManager(object):
             if len(font_infos) == 0:
                 return False
             font_info = font_infos[0]
-            fid = MonospaceFontAtlas.getIdFromArgs(font_info, size, dpi)
+            fid = FontAtlas.getIdFromArgs(font_info, size, dpi)
             font_atlas = fm.font_atlas_dict.get(fid)
             if font_atlas is None:
                 font_atlas = fm.font_atlas_dict.setdefault(
-                    fid, MonospaceFontAtlas(font_info, size, dpi))
+                    fid, FontAtlas(font_info, size, dpi))
                 font_atlas.createFontAtlas()
             if fm.font_store:
                 t1 = getTime()
@@ -315,15 +314,25 @@ class FontInfo(object):
         return d
 
 
-class MonospaceFontAtlas(object):
+class FontAtlas(object):
+    """The glyphs of a font, at a given size and dpi, packed into a
+    TextureAtlas, with a display list for each glyph.
+
+    For monospace fonts each glyph's display list moves on by the width of
+    a text grid cell. Other fonts have glyphs of different widths, so their
+    display lists don't move on; use getAdvances() for the distance from
+    each glyph to the next (including kerning).
+    """
 
     def __init__(self, font_info, size, dpi):
         self.font_info = font_info
         self.size = size
         self.dpi = dpi
+        self.monospace = font_info.monospace
         self.id = self.getIdFromArgs(font_info, size, dpi)
         self._face = Face(font_info.path)
         self._face.set_char_size(height=self.size * 64, vres=self.dpi)
+        self._kerning = None
 
         self.charcode2glyph = None
         self.charcode2unichr = None
@@ -402,7 +411,7 @@ class MonospaceFontAtlas(object):
                     bitmap.width + 2, bitmap.rows + 2)
 
                 if x < 0:
-                    msg = ("MonospaceFontAtlas.get_region failed "
+                    msg = ("FontAtlas.get_region failed "
                            "for: {0}, requested area: {1}. Atlas Full!")
                     vals = charcode, (bitmap.width + 2, bitmap.rows + 2)
                     raise Exception(msg.format(vals))
@@ -416,6 +425,7 @@ class MonospaceFontAtlas(object):
                 self.charcode2glyph[charcode] = dict(
                     offset=(face.glyph.bitmap_left, face.glyph.bitmap_top),
                     size=(w, h),
+                    advance=face.glyph.advance.x / 64.0,
                     atlas_coords=(x, y, w, h),
                     texcoords=[x, y, x + w, y + h],
                     index=gindex,
@@ -434,7 +444,37 @@ class MonospaceFontAtlas(object):
         self.atlas.resize(height)
         self.atlas.upload()
         self.createDisplayLists()
-        self._face = None
+        if not self.monospace and face.has_kerning:
+            # keep the face to look up kerning pairs as they are needed
+            self._kerning = {}
+        else:
+            self._face = None
+
+    def getKerning(self, left, right):
+        """Returns the kerning (in pixels) between the glyphs of charcodes
+        `left` and `right`, which is 0 for fonts without kerning.
+        """
+        if self._kerning is None:
+            return 0.0
+        kern = self._kerning.get((left, right))
+        if kern is None:
+            kern = self._face.get_kerning(left, right).x / 64.0
+            self._kerning[(left, right)] = kern
+        return kern
+
+    def getAdvances(self, charcodes):
+        """Returns an array of the distance (in pixels) from each glyph of
+        `charcodes` to the next one, including the kerning between them.
+        Charcodes without a glyph advance by 0.
+        """
+        glyphs = self.charcode2glyph
+        advances = np.array([glyphs[c]['advance'] if c in glyphs else 0.0
+                             for c in charcodes], dtype=float)
+        if self._kerning is not None:
+            for i in range(len(charcodes) - 1):
+                advances[i] += self.getKerning(charcodes[i],
+                                               charcodes[i + 1])
+        return advances
 
     def createDisplayLists(self):
         glyph_count = len(self.charcode2unichr)
@@ -468,7 +508,8 @@ class MonospaceFontAtlas(object):
                 glTexCoord2f(gx2, gy1), glVertex2f(x2, -y1)
                 glTexCoord2f(gx2, gy2), glVertex2f(x2, -y2)
                 glEnd()
-                glTranslatef(max_tile_width, 0, 0)
+                if self.monospace:
+                    glTranslatef(max_tile_width, 0, 0)
             glEndList()
 
             display_lists_for_chars[charcode] = dl_index
@@ -491,6 +532,7 @@ class MonospaceFontAtlas(object):
 
     def __del__(self):
         self._face = None
+        self._kerning = None
         if self.atlas.texid is not None:
             #glDeleteTextures(1, self.atlas.texid)
             self.atlas.texid = None
@@ -506,3 +548,7 @@ class MonospaceFontAtlas(object):
         if self.charcode2unichr is not None:
             self.charcode2unichr.clear()
             self.charcode2unichr = None
+
+
+# for backwards compatibility
+MonospaceFontAtlas = FontAtlas
@@ -11,11 +11,13 @@ from __future__ import absolute_import, print_function
 from builtins import range
 from builtins import object
 from textwrap import TextWrapper
+from bisect import bisect_right
 import io
 import os
-from collections import deque
 from weakref import proxy
 
+from psychopy.tools.glyphtools import wrapLines
+
 
 class ParsedTextDocument(object):
 
@@ -26,6 +28,10 @@ class ParsedTextDocument(object):
 
         self._text_grid = proxy(text_grid)
         self._num_columns, self._max_visible_rows = text_grid._shape
+        # proportional fonts are wrapped at the width of the grid in pixels
+        self._glfont = text_grid._text_box._current_glfont
+        self._monospace = getattr(self._glfont, 'monospace', True)
+        self._wrap_width = text_grid._size[0]
 
         text_data = text_data.replace('\r\n', '\n')
         # if len(text_data) and text_data[-1] != u'\n':
@@ -33,7 +39,10 @@ class ParsedTextDocument(object):
         self._text = text_data
         self._children = []
 
-        self._limit_text_length = self._max_visible_rows * self._num_columns
+        self._limit_text_length = 0
+        if self._monospace:
+            self._limit_text_length = (self._max_visible_rows *
+                                       self._num_columns)
 
         if 0 < self._limit_text_length < len(self._text):
             self._text = self._text[:self._limit_text_length]
@@ -81,13 +90,11 @@ class ParsedTextDocument(object):
         end_index = int(end_index)
         deleted_text = self._text[start_index:end_index]
         if insertText is None:
-            self._text = ''.join([self._text[:start_index],
-                                  self._text[end_index:]])
-        else:
-            self._text = ''.join([self._text[:start_index],
-                                  insertText,
-                                  self._text[end_index:]])
-        self._parse(start_index)
+            insertText = ''
+        self._text = ''.join([self._text[:start_index],
+                              insertText,
+                              self._text[end_index:]])
+        self._relayout(start_index, end_index, start_index + len(insertText))
         return deleted_text
 
     def insertText(self, text, start_index, end_index=None):
@@ -100,7 +107,7 @@ class ParsedTextDocument(object):
         self._text = ''.join([self._text[:int(start_index)],
                               text,
                               self._text[int(end_index):]])
-        return self._parse(start_index)
+        return self._relayout(start_index, end_index, start_index + len(text))
 
     def parseTextTo(self, requested_line_index):
         requested_line_index = int(requested_line_index)
@@ -116,57 +123,98 @@ class ParsedTextDocument(object):
         return self.getParsedLineCount() - 1
 
     def _parse(self, from_text_index, to_text_index=None):
-        from_text_index = 0
-        to_text_index = self.getTextLength()
-        line_index = None
-
-        if self._children:
-            line_index = 0
-
-        update_lines = []
-        if line_index is not None:
-            update_lines = deque(self._children[:])
-        para_split_text = self._text[from_text_index:to_text_index].splitlines(True)
-        if len(para_split_text) == 0:
-            return
-
-        current_index = 0
-        for para_text in para_split_text:
-            current_index = self._wrapText(para_text, current_index,
-                                           update_lines)
-
-        if len(update_lines) > 0:
-            self._children = self._children[:-len(update_lines)]
-        self._text_parsed_to_index = current_index
-
-    def _wrapText(self, para_text, current_index, update_lines):
-        rewrap = False
-        para_text_index = 0
-        for linestr in self._text_wrapper.wrap(para_text):
-            if (linestr[-1] != u' ' and
-                    len(self._text) > current_index + len(linestr) and
-                    self._text[current_index + len(linestr)] == u' '):
-                last_space = linestr.rfind(u' ')
-                if last_space > 0:
-                    linestr = linestr[:last_space + 1]
-                    rewrap = True
-            if len(update_lines) > 0:
-                line = update_lines.popleft()
-                line._text = linestr
-                line._index_range = [current_index,
-                                     current_index + len(linestr)]
-                line.updateOrds(linestr)
-                line._gl_display_list[0] = 0
-            else:
-                ParsedTextLine(self, linestr,
-                               [current_index, current_index + len(linestr)])
-                line = self._children[-1]
+        # (re)wrap all of the text
+        self._children = []
+        self._relayout(0, 0, self.getTextLength())
+
+    def _relayout(self, start_index, old_end_index, new_end_index):
+        """Update the lines after the text from start_index to old_end_index
+        was replaced by the text now from start_index to new_end_index.
+
+        Only the paragraph(s) containing the edit are wrapped again, from
+        the first line of the paragraph, so that the lines are the same as
+        those of a full parse of the text. The lines of later paragraphs are
+        kept, along with their cached display lists, and just have their
+        indices shifted.
+        """
+        delta = new_end_index - old_end_index
+        lines = self._children
+        line_starts = [line._index_range[0] for line in lines]
+        first_line = max(bisect_right(line_starts, start_index) - 1, 0)
+        while (first_line > 0 and
+                not lines[first_line - 1]._text.endswith(u'\n')):
+            first_line -= 1
+        from_index = line_starts[first_line] if lines else 0
+
+        # the end of the paragraph containing the end of the edit
+        to_index = self._text.find(u'\n', max(new_end_index, from_index))
+        if to_index < 0:
+            to_index = len(self._text)
+        else:
+            to_index += 1
+        kept_lines = [line for line in lines[first_line:]
+                      if line._index_range[0] >= to_index - delta]
+
+        new_lines = lines[:first_line]
+        current_index = from_index
+        for linestr in self._wrapLines(self._text[from_index:to_index]):
+            new_lines.append(ParsedTextLine(
+                self, linestr, [current_index, current_index + len(linestr)],
+                line_index=len(new_lines)))
             current_index += len(linestr)
-            para_text_index += len(linestr)
-            if rewrap is True:
-                return self._wrapText(para_text[para_text_index:],
-                                      current_index, update_lines)
-        return current_index
+        for line in kept_lines:
+            line._index_range = [line._index_range[0] + delta,
+                                 line._index_range[1] + delta]
+            line._line_index = len(new_lines)
+            new_lines.append(line)
+        self._children = new_lines
+        self._text_parsed_to_index = len(self._text)
+
+    def _wrapLines(self, text):
+        line_strs = []
+        for para_text in text.splitlines(True):
+            if self._monospace:
+                line_strs.extend(self._wrapText(para_text))
+            else:
+                line_strs.extend(self._wrapTextProportional(para_text))
+        return line_strs
+
+    def _wrapText(self, para_text):
+        """Returns the lines of a paragraph, wrapped at the number of columns
+        of the text grid.
+        """
+        line_strs = []
+        para_index = 0
+        while para_index < len(para_text):
+            for linestr in self._text_wrapper.wrap(para_text[para_index:]):
+                next_index = para_index + len(linestr)
+                if (linestr[-1] != u' ' and
+                        len(para_text) > next_index and
+                        para_text[next_index] == u' '):
+                    last_space = linestr.rfind(u' ')
+                    if last_space > 0:
+                        # break at the last space; rewrap the rest
+                        linestr = linestr[:last_space + 1]
+                        line_strs.append(linestr)
+                        para_index += len(linestr)
+                        break
+                line_strs.append(linestr)
+                para_index += len(linestr)
+            else:
+                break
+        return line_strs
+
+    def _wrapTextProportional(self, para_text):
+        """Returns the lines of a paragraph, wrapped at the width of the
+        text grid using the advances (and kerning) of the font's glyphs.
+        """
+        line_end = para_text.rstrip(u'\n')
+        advances = self._glfont.getAdvances(ParsedTextLine.textToOrds(
+            line_end, self._glfont))
+        line_strs = [line_end[start:stop] for start, stop, width in
+                     wrapLines(line_end, advances, self._wrap_width)]
+        line_strs[-1] += para_text[len(line_end):]
+        return line_strs
 
     def clearCachedLineDisplayLists(self, from_char_index, to_char_index):
         if from_char_index < 0:
@@ -244,52 +292,75 @@ class ParsedTextLine(object):
     charcodes_with_glyphs = None
     replacement_charcode = None
 
-    def __init__(self, parent, source_text, index_range):
+    def __init__(self, parent, source_text, index_range, line_index=None):
         if parent:
             self._parent = proxy(parent)
-            self._parent.addChild(self)
+            if line_index is None:
+                self._parent.addChild(self)
         else:
             self._parent = None
         self._text = source_text
         self._index_range = index_range
-        self._line_index = parent.getChildCount() - 1
+        if line_index is None:
+            line_index = parent.getChildCount() - 1
+        self._line_index = line_index
 
         self._trans_left = 0
         self._trans_top = 0
 
-        self.updateOrds(self._text)
-
         # self.text_region_flags=numpy.ones((2,parent._num_columns),
         #   numpy.uint32)#*parent._text_grid.default_region_type_key
         self._gl_display_list = numpy.zeros(parent._num_columns, numpy.uint)
 
-    def updateOrds(self, text):
-        if ParsedTextLine.charcodes_with_glyphs is None:
-            active_text_style = self._parent._text_grid._text_box._current_glfont
-            if active_text_style:
-                ParsedTextLine.charcodes_with_glyphs = list(active_text_style.charcode2unichr.keys())
+        self.updateOrds(self._text)
+
+    @classmethod
+    def textToOrds(cls, text, glfont=None):
+        """Returns the charcodes used to draw `text`, with characters that
+        the font has no glyph for replaced.
+        """
+        if cls.charcodes_with_glyphs is None:
+            if glfont:
+                cls.charcodes_with_glyphs = set(glfont.charcode2unichr.keys())
 
-        ok_charcodes = ParsedTextLine.charcodes_with_glyphs
+        ok_charcodes = cls.charcodes_with_glyphs
 
-        if ParsedTextLine.replacement_charcode is None:
+        if cls.replacement_charcode is None:
             replacement_charcodes = [ord(cc)
                                      for cc in [u'?', u' ', u'_', u'-', u'0', u'=']
-                                     if cc in ok_charcodes]
+                                     if ord(cc) in ok_charcodes]
             if not replacement_charcodes:
-                ParsedTextLine.replacement_charcode = ok_charcodes[0]
+                cls.replacement_charcode = sorted(ok_charcodes)[0]
             else:
-                ParsedTextLine.replacement_charcode = replacement_charcodes[0]
+                cls.replacement_charcode = replacement_charcodes[0]
 
-        self._ords = []
+        ords = []
         text = text.replace(u'\n', ' ').replace(u'\t', ' ')
         for c in text:
             ccode = ord(c)
             if ccode in ok_charcodes:
-                self._ords.append(ccode)
+                ords.append(ccode)
             else:
-                self._ords.append(self.replacement_charcode)
+                ords.append(cls.replacement_charcode)
+        return ords
 
+    def updateOrds(self, text):
+        glfont = self._parent._text_grid._text_box._current_glfont
+        self._ords = self.textToOrds(text, glfont)
         self._length = len(self._ords)
+        if self._length > len(self._gl_display_list):
+            self._gl_display_list = numpy.zeros(self._length, numpy.uint)
+        self._gl_display_list[0:1] = 0
+
+        # proportional fonts: the distance to move on after each glyph, and
+        # the width of the line without any trailing spaces
+        self._advances = None
+        self._width = self._length
+        if not getattr(glfont, 'monospace', True):
+            self._advances = glfont.getAdvances(self._ords)
+            if text.endswith(u'\n'):
+                self._advances[-1] = 0
+            self._width = self._advances[:len(text.rstrip())].sum()
 
     def getIndex(self):
         return self._line_index
@@ -309,6 +380,11 @@ class ParsedTextLine(object):
     def getLength(self):
         return self._length
 
+    def getWidth(self):
+        """The width of the text of the line, without trailing spaces, in
+        pixels (or in text grid cells for monospace fonts)."""
+        return self._width
+
     def getDisplayList(self):
         return self._gl_display_list
 
@@ -317,6 +393,7 @@ class ParsedTextLine(object):
         del self._index_range
         del self._ords
         del self._gl_display_list
+        self._advances = None
 
     def __del__(self):
         if self._text is not None:
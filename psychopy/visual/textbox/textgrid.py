@@ -10,6 +10,7 @@ from __future__ import absolute_import, print_function
 
 from builtins import range
 from builtins import object
+import os
 import numpy as np
 from weakref import proxy
 from psychopy import core
@@ -147,7 +148,14 @@ class TextGrid(object):
         for li in range(line_count):
             cline = self._text_document.getParsedLine(li)
             line_length = cline.getLength()
-            if self._apply_padding:
+            if self._apply_padding and cline._advances is not None:
+                # proportional font; the line width is in pixels
+                cline._trans_left = ((self._size[0] - cline.getWidth()) *
+                                     self._pad_left_proportion /
+                                     self._cell_size[0])
+                cline._trans_top = int(
+                    (num_rows - line_count) * self._pad_top_proportion)
+            elif self._apply_padding:
                 cline._trans_left = int(
                     (num_cols - line_length + 1) * self._pad_left_proportion)
                 cline._trans_top = int(
@@ -162,8 +170,14 @@ class TextGrid(object):
         return 0
 
     def _setText(self, text):
-        self._text_document.deleteText(0, self._text_document.getTextLength(),
-                                       text)
+        # only replace the part of the text that changed (e.g. a typed
+        # character), so that only the lines of that paragraph are rewrapped
+        old_text = self._text_document.getText()
+        start = len(os.path.commonprefix([old_text, text]))
+        end_count = len(os.path.commonprefix(
+            [old_text[start:][::-1], text[start:][::-1]]))
+        self._text_document.deleteText(start, len(old_text) - end_count,
+                                       text[start:len(text) - end_count])
 
         self._deleteTextDL()
         self.applyPadding()
@@ -227,6 +241,19 @@ class TextGrid(object):
                     line_display_list[0:line_length] = [
                         active_text_style_dlist(c) for c in line_ords]
 
+                if cline._advances is not None:
+                    # proportional font; move on by each glyph's advance
+                    glPushMatrix()
+                    glTranslatef(cline._trans_left * cell_width, -
+                                 int(line_spacing/2.0 + cline._trans_top * cell_height), 0)
+                    for dlist, advance in zip(line_display_list[0:line_length],
+                                              cline._advances):
+                        glCallList(dlist)
+                        glTranslatef(advance, 0, 0)
+                    glPopMatrix()
+                    glTranslatef(0, -cell_height, 0)
+                    continue
+
                 glTranslatef(cline._trans_left * cell_width, -
                              int(line_spacing/2.0 + cline._trans_top * cell_height), 0)
                 glCallLists(line_length, GL_UNSIGNED_INT,
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""A per-window cache of the OpenGL textures created by
+`TextureMixin._createTexture`, so that stimuli with the same texture or mask
+(e.g. many gabors with tex='sin', mask='gauss') share a single texture
+instead of each computing and uploading their own.
+"""
+
+# Part of the PsychoPy library
+# Copyright (C) 2018 Jonathan Peirce
+# Distributed under the terms of the GNU General Public License (GPL).
+
+from __future__ import absolute_import, division, print_function
+
+from collections import OrderedDict
+import ctypes
+
+import pyglet
+GL = pyglet.gl
+
+
+class _CacheEntry(object):
+    __slots__ = ('texID', 'nBytes', 'refs', 'wasLum', 'origSize')
+
+    def __init__(self, texID, nBytes, wasLum, origSize):
+        self.texID = texID
+        self.nBytes = nBytes
+        self.refs = 1
+        self.wasLum = wasLum
+        self.origSize = origSize
+
+
+class TextureCache(object):
+    """Textures shared between the stimuli of a window.
+
+    Stimuli keep their texture IDs in `GL.GLuint` objects (e.g.
+    `stim._texID`). When a stimulus gets a texture that is already cached,
+    the GLuint is pointed at the cached texture and its own texture is
+    deleted. Cached textures are reference counted: a texture is only
+    deleted once no stimulus uses it and the total size of the cached
+    textures exceeds `maxBytes`, least recently used first.
+
+    Set `win.textureCache = None` to stop stimuli sharing textures.
+    """
+
+    def __init__(self, maxBytes=128 * 2**20):
+        self.maxBytes = maxBytes
+        self.nBytes = 0
+        self._entries = OrderedDict()  # key: _CacheEntry
+        self._keys = {}  # texture ID value: key
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def isShared(self, texID):
+        """True if the texture `texID` (a GLuint) is owned by the cache."""
+        return getattr(texID, 'value', None) in self._keys
+
+    def acquire(self, key, texID, stim=None):
+        """Point `texID` (a GLuint) at the cached texture for `key`. If
+        `texID` had a texture of its own that texture is deleted.
+
+        Returns the `wasLum` value of the cached texture, or None if `key`
+        is not in the cache (and `texID` is unchanged).
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries[key] = self._entries.pop(key)  # most recently used
+        if texID.value != entry.texID:
+            oldKey = self._keys.get(texID.value)
+            if oldKey is None:
+                GL.glDeleteTextures(1, texID)
+            else:  # was sharing another texture
+                self._entries[oldKey].refs -= 1
+            texID.value = entry.texID
+            entry.refs += 1
+            self._evict()
+        if stim is not None and entry.origSize is not None:
+            stim._origSize = entry.origSize
+        return entry.wasLum
+
+    def add(self, key, texID, nBytes, wasLum, origSize=None):
+        """Hand the texture `texID` (a GLuint), just created for `key`, to
+        the cache. The caller keeps using it, as its first reference.
+        """
+        self._entries[key] = _CacheEntry(texID.value, nBytes, wasLum,
+                                         origSize)
+        self._keys[texID.value] = key
+        self.nBytes += nBytes
+        self._evict()
+
+    def release(self, texID, delete=False):
+        """Drop a reference to the texture `texID` (a GLuint).
+
+        If the texture is shared, `texID` is given a new texture of its own
+        (so the caller can upload into it) or, with `delete=True`, set to 0.
+        Textures that are not shared are only deleted if `delete=True`.
+        """
+        key = self._keys.get(texID.value)
+        if key is None:
+            if delete:
+                GL.glDeleteTextures(1, texID)
+            return
+        entry = self._entries[key]
+        entry.refs -= 1
+        if delete:
+            texID.value = 0
+        else:
+            newID = GL.GLuint()
+            GL.glGenTextures(1, ctypes.byref(newID))
+            texID.value = newID.value
+        self._evict()
+
+    def _evict(self):
+        if self.nBytes <= self.maxBytes:
+            return
+        for key in list(self._entries):
+            entry = self._entries[key]
+            if entry.refs > 0:
+                continue
+            self._remove(key)
+            if self.nBytes <= self.maxBytes:
+                break
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        del self._keys[entry.texID]
+        self.nBytes -= entry.nBytes
+        GL.glDeleteTextures(1, GL.GLuint(entry.texID))
+
+    def clear(self):
+        """Delete all cached textures that are not in use."""
+        for key in [k for k, e in self._entries.items() if e.refs <= 0]:
+            self._remove(key)
@@ -81,6 +81,7 @@ import psychopy.tools.viewtools as viewtools
 from .text import TextStim
 from .grating import GratingStim
 from .helpers import setColor
+from .texturecache import TextureCache
 from . import globalVars
 
 try:
@@ -417,6 +418,8 @@ class Window(object):
         # also will need to check for ARB_float extension,
         # but that should be done after context is created
         self._haveShaders = self.backend.shadersSupported
+        # textures shared by stimuli with the same tex/mask
+        self.textureCache = TextureCache()
 
         self._setupGL()
 